@@ -0,0 +1,200 @@
+"""
+A shared cache of loaded assets with reference counting
+and memory accounting.
+
+Each entry counts the references held to it. Loading an
+asset acquires a reference and unloading it releases one,
+so an asset shared by several meshes stays loaded until
+every mesh has unloaded it.
+
+Entries without references are kept in least recently
+used order. They are evicted when the cache is over its
+host or GPU memory budget. Referenced entries are never
+evicted, so the budgets only bound the memory held by
+assets that nothing is using.
+
+Assets may provide a memory_usage method that returns a
+tuple of the host and GPU bytes they use. Assets without
+one are counted as 0 bytes.
+
+Usage:
+    cache = AssetCache( gpu_budget = 256 * 1024 * 1024 )
+
+    data = cache.acquire( filename )
+    if data == None:
+        data = Data( filename )
+        cache.add( filename, data )
+
+    # once the asset is no longer used
+    cache.release( filename )
+"""
+
+from collections import OrderedDict
+
+
+class CacheEntry( object ):
+
+    def __init__( self, asset, references, host_bytes, gpu_bytes ):
+        super( CacheEntry, self ).__init__()
+
+        self.asset = asset
+        self.references = references
+        self.host_bytes = host_bytes
+        self.gpu_bytes = gpu_bytes
+
+
+class AssetCache( object ):
+    """A reference counted cache of assets with LRU eviction
+    of unreferenced assets.
+    """
+
+    def __init__( self, host_budget = None, gpu_budget = None ):
+        """
+        @param host_budget: the number of bytes of host memory
+        the cache may hold. None is unbounded.
+        @param gpu_budget: the number of bytes of GPU memory
+        the cache may hold. None is unbounded.
+        """
+        super( AssetCache, self ).__init__()
+
+        self.host_budget = host_budget
+        self.gpu_budget = gpu_budget
+
+        # the entry of each key
+        # unreferenced entries are moved to the end when
+        # released, so the least recently used is first
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.host_bytes = 0
+        self.gpu_bytes = 0
+
+    def __contains__( self, key ):
+        return key in self.entries
+
+    def __getitem__( self, key ):
+        """Returns the asset without acquiring a reference.
+        """
+        return self.entries[ key ].asset
+
+    def __len__( self ):
+        return len( self.entries )
+
+    def references( self, key ):
+        """Returns the number of references held to an asset.
+        """
+        return self.entries[ key ].references
+
+    def acquire( self, key, references = 1 ):
+        """Returns an asset and adds references to it.
+
+        @param references: the number of references to add.
+        @return: the asset or None if it isn't cached.
+        """
+        entry = self.entries.get( key )
+        if entry == None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry.references += references
+        return entry.asset
+
+    def add( self, key, asset, references = 1 ):
+        """Adds an asset to the cache.
+
+        An asset added without references can be evicted
+        immediately if the cache is over budget.
+
+        @param references: the number of references the
+        caller holds.
+        @raise KeyError: if the key is already cached.
+        """
+        if key in self.entries:
+            raise KeyError( "Asset '%s' is already cached" % (key,) )
+
+        memory_usage = getattr( asset, 'memory_usage', None )
+        host_bytes, gpu_bytes = memory_usage() if memory_usage else (0, 0)
+
+        self.entries[ key ] = CacheEntry( asset, references, host_bytes, gpu_bytes )
+        self.host_bytes += host_bytes
+        self.gpu_bytes += gpu_bytes
+        self.evict()
+
+    def release( self, key ):
+        """Removes a reference to an asset.
+
+        Assets whose last reference is released become the
+        most recently used candidate for eviction.
+        Releasing an asset that isn't cached does nothing.
+        """
+        entry = self.entries.get( key )
+        if entry == None:
+            return
+
+        if entry.references > 0:
+            entry.references -= 1
+        if entry.references == 0:
+            # move to the end of the eviction order
+            del self.entries[ key ]
+            self.entries[ key ] = entry
+            self.evict()
+
+    def remove( self, key ):
+        """Removes an asset whether or not it is referenced.
+        """
+        entry = self.entries.pop( key, None )
+        if entry != None:
+            self.host_bytes -= entry.host_bytes
+            self.gpu_bytes -= entry.gpu_bytes
+
+    def _over_budget( self ):
+        return (
+            (self.host_budget != None and self.host_bytes > self.host_budget) or
+            (self.gpu_budget != None and self.gpu_bytes > self.gpu_budget)
+            )
+
+    def evict( self ):
+        """Evicts unreferenced assets, least recently used
+        first, until the cache is within its budgets.
+
+        @return: the number of assets evicted.
+        """
+        num_evicted = 0
+        if not self._over_budget():
+            return num_evicted
+
+        for key in [ key for key, entry in self.entries.items() if entry.references == 0 ]:
+            self.remove( key )
+            self.evictions += 1
+            num_evicted += 1
+            if not self._over_budget():
+                break
+        return num_evicted
+
+    def clear( self ):
+        """Removes every asset.
+
+        The statistics are not reset.
+        """
+        self.entries.clear()
+        self.host_bytes = 0
+        self.gpu_bytes = 0
+
+    def stats( self ):
+        """Returns a dictionary of the cache statistics.
+
+        The values are plain integers so they can be
+        exported, for example as JSON.
+        """
+        return {
+            'entries': len( self.entries ),
+            'referenced': sum( 1 for entry in self.entries.values() if entry.references > 0 ),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'host_bytes': self.host_bytes,
+            'gpu_bytes': self.gpu_bytes,
+            }
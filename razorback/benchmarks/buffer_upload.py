@@ -0,0 +1,57 @@
+"""Compares uploading a 1M vertex buffer through a
+ctypes array with passing the NumPy array's pointer.
+
+OpenGL calls are recorded by RecordingGL, so this
+measures the cost of preparing the data only.
+
+Usage:
+    python buffer_upload.py [num_vertices] [repeats]
+"""
+
+import sys
+import timeit
+
+# must be imported before pyglet.gl
+from razorback.benchmarks.gl_stub import RecordingGL
+
+import numpy
+from pyglet.gl import *
+
+import razorback.upload
+from razorback.upload import buffer_data
+
+
+def main():
+    num_vertices = 1000000
+    repeats = 5
+    if len( sys.argv ) > 1:
+        num_vertices = int( sys.argv[ 1 ] )
+    if len( sys.argv ) > 2:
+        repeats = int( sys.argv[ 2 ] )
+
+    # position and normal per vertex
+    array = numpy.random.rand( num_vertices, 6 ).astype( 'float32' )
+
+    def ctypes_upload():
+        razorback.upload.glBufferData(
+            GL_ARRAY_BUFFER,
+            array.nbytes,
+            (GLfloat * array.size)(*array.flat),
+            GL_STATIC_DRAW
+            )
+
+    def pointer_upload():
+        buffer_data( GL_ARRAY_BUFFER, array )
+
+    with RecordingGL( razorback.upload, capture = False ):
+        ctypes_time = min( timeit.repeat( ctypes_upload, number = 1, repeat = repeats ) )
+        pointer_time = min( timeit.repeat( pointer_upload, number = 1, repeat = repeats ) )
+
+    print 'Vertices: %i (%.1f MB)' % (num_vertices, array.nbytes / (1024.0 * 1024.0))
+    print 'ctypes array: %.2f ms' % (ctypes_time * 1000.0)
+    print 'Array pointer: %.4f ms' % (pointer_time * 1000.0)
+    print 'Speed up: %.0fx' % (ctypes_time / pointer_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Records OpenGL calls so GL code can be tested and
+benchmarked without a context.
+
+Import this module before any module that imports pyglet.gl.
+Doing so disables pyglet's shadow window, which would
+otherwise require a display. As it changes pyglet's options
+it is kept with the benchmarks and is never imported by
+the library itself.
+
+Usage:
+    import razorback.upload
+    with RecordingGL( razorback.upload ) as gl:
+        razorback.upload.buffer_data( GL_ARRAY_BUFFER, array )
+    print gl.count( 'glBufferData' )
+"""
+
+import ctypes
+
+import pyglet
+pyglet.options[ 'shadow_window' ] = False
+
+
+class RecordingGL( object ):
+    """Replaces the gl* functions of the specified modules
+    with functions that record their name and arguments.
+
+    Generator functions (glGenBuffers, glGenTextures, ...)
+    write unique ids into the array they are passed.
+
+    If capture is True, the bytes passed to glBufferData
+    and glBufferSubData are copied into the call record.
+
+    If passthrough is True, the original functions are
+    called after being recorded. This counts the calls
+    made to a real context.
+    """
+
+    def __init__( self, *modules, **kwargs ):
+        super( RecordingGL, self ).__init__()
+
+        self.modules = modules
+        self.capture = kwargs.get( 'capture', True )
+        self.passthrough = kwargs.get( 'passthrough', False )
+        self.calls = []
+        self.next_id = 1
+        self._originals = []
+
+    def __enter__( self ):
+        self.install()
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.uninstall()
+
+    def install( self ):
+        for module in self.modules:
+            for name, value in vars( module ).items():
+                if name.startswith( 'gl' ) and callable( value ):
+                    self._originals.append( (module, name, value) )
+                    setattr( module, name, self._recorder( name, value ) )
+
+    def uninstall( self ):
+        for module, name, value in self._originals:
+            setattr( module, name, value )
+        self._originals = []
+
+    def reset( self ):
+        self.calls = []
+
+    def count( self, name = None ):
+        """Returns the number of calls made to the
+        specified function.
+        If name is None, the total number of calls is returned.
+        """
+        if name == None:
+            return len( self.calls )
+        return len( [ call for call in self.calls if call[ 0 ] == name ] )
+
+    def counts( self ):
+        """Returns a dictionary of function name to
+        the number of times it was called.
+        """
+        result = {}
+        for call in self.calls:
+            result[ call[ 0 ] ] = result.get( call[ 0 ], 0 ) + 1
+        return result
+
+    def data( self, name = 'glBufferData' ):
+        """Returns the captured bytes of each call
+        to the specified upload function.
+        """
+        return [ call[ 2 ] for call in self.calls if call[ 0 ] == name ]
+
+    def _generate( self, count, ids ):
+        if hasattr( ids, 'value' ):
+            ids.value = self.next_id
+            self.next_id += 1
+        else:
+            for index in range( count ):
+                ids[ index ] = self.next_id
+                self.next_id += 1
+
+    def _recorder( self, name, function ):
+        def record( *args ):
+            if self.passthrough:
+                self.calls.append( (name, args, None) )
+                return function( *args )
+
+            captured = None
+            if name.startswith( 'glGen' ) and len( args ) == 2:
+                self._generate( *args )
+            elif self.capture and name == 'glBufferData' and args[ 2 ]:
+                captured = ctypes.string_at( args[ 2 ], args[ 1 ] )
+            elif self.capture and name == 'glBufferSubData' and args[ 3 ]:
+                captured = ctypes.string_at( args[ 3 ], args[ 2 ] )
+            self.calls.append( (name, args, captured) )
+        return record
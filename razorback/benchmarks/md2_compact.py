@@ -0,0 +1,64 @@
+"""Reports the memory used by float and compact MD2
+keyframes and the error introduced by quantising them.
+
+Usage:
+    python md2_compact.py [filename.md2 ...]
+"""
+
+import os
+import sys
+
+import numpy
+import pymesh.md2
+
+from razorback.md2.unify import process_frame_array
+from razorback.md2 import compact
+
+
+def main():
+    filenames = [
+        os.path.join(
+            os.path.dirname( __file__ ),
+            '../examples/data/md2/sydney.md2'
+            )
+        ]
+    if len( sys.argv ) > 1:
+        filenames = sys.argv[ 1: ]
+
+    total = compact.memory_report( 0, 0 )
+    for filename in filenames:
+        md2 = pymesh.md2.MD2()
+        md2.load( filename )
+        indices, tcs, frames = process_frame_array( md2 )
+
+        quantised, bounds = compact.quantise_frames( frames )
+        quantised_tcs = compact.quantise_tcs( tcs )
+        tc_bytes = quantised_tcs.nbytes if quantised_tcs is not None else tcs.nbytes
+
+        report = compact.memory_report(
+            frames.nbytes + tcs.nbytes,
+            quantised.nbytes + bounds.nbytes + tc_bytes
+            )
+        total = compact.memory_report(
+            total.float_bytes + report.float_bytes,
+            total.bytes + report.bytes
+            )
+
+        decoded = compact.dequantise_frames( quantised, bounds )
+        position_error = numpy.abs( decoded[ ..., 0:3 ] - frames[ ..., 0:3 ] ).max()
+        dots = numpy.sum( decoded[ ..., 3:6 ] * frames[ ..., 3:6 ], axis = -1 )
+        normal_error = numpy.degrees( numpy.arccos( numpy.clip( dots.min(), -1.0, 1.0 ) ) )
+
+        print compact.format_report( os.path.basename( filename ), report )
+        print '    max position error %.5f, max normal error %.2f degrees, %s texture coordinates' % (
+            position_error,
+            normal_error,
+            'uint16' if quantised_tcs is not None else 'float32'
+            )
+
+    if len( filenames ) > 1:
+        print compact.format_report( 'Total', total )
+
+
+if __name__ == "__main__":
+    main()
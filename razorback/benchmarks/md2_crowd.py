@@ -0,0 +1,125 @@
+"""Compares rendering a crowd of MD2 meshes with
+one Data.render call per node against a single
+instanced MD2Crowd.render call.
+
+Requires an OpenGL 3.3 context.
+The CPU time spent issuing each frame and the number of
+OpenGL calls made by razorback and by pygly's shader
+uniforms are reported.
+
+Usage:
+    python md2_crowd.py [filename.md2] [instances]
+"""
+
+import os
+import sys
+import time
+
+# must be imported before pyglet.gl
+from razorback.benchmarks.gl_stub import RecordingGL
+
+import numpy
+import pyglet
+from pyglet.gl import *
+from pyrr import matrix44
+import pygly.shader
+
+import razorback.md2
+import razorback.md2.crowd
+from razorback.md2 import Data, MD2Crowd
+
+
+def create_scene( num_instances, num_frames ):
+    random = numpy.random.RandomState( 0 )
+
+    models = numpy.zeros( (num_instances, 4, 4), dtype = 'float32' )
+    models[ :, [0, 1, 2, 3], [0, 1, 2, 3] ] = 1.0
+    models[ :, 3, 0:3 ] = random.uniform( -100.0, 100.0, (num_instances, 3) )
+
+    frames = random.uniform( 0.0, num_frames, num_instances )
+    fractions, frame1 = numpy.modf( frames )
+    frame2 = (frame1 + 1) % num_frames
+    return models, frame1, frame2, fractions
+
+
+def render_loop( data, projection, view, models, frame1, frame2, fractions ):
+    for index in range( len( models ) ):
+        data.render(
+            int( frame1[ index ] ),
+            int( frame2[ index ] ),
+            float( fractions[ index ] ),
+            projection,
+            matrix44.multiply( models[ index ], view )
+            )
+
+
+def render_crowd( crowd, projection, view, models, frame1, frame2, fractions ):
+    crowd.set_instances( models, frame1, frame2, fractions )
+    crowd.render( projection, view )
+
+
+def measure( function, *args ):
+    glFinish()
+    start = time.time()
+    function( *args )
+    issued = time.time() - start
+    glFinish()
+    return issued, time.time() - start
+
+
+def main():
+    filename = os.path.join(
+        os.path.dirname( __file__ ),
+        '../examples/data/md2/sydney.md2'
+        )
+    num_instances = 10000
+    if len( sys.argv ) > 1:
+        filename = sys.argv[ 1 ]
+    if len( sys.argv ) > 2:
+        num_instances = int( sys.argv[ 2 ] )
+
+    config = pyglet.gl.Config(
+        double_buffer = True,
+        major_version = 3,
+        minor_version = 3,
+        forward_compatible = True
+        )
+    window = pyglet.window.Window( config = config, visible = False )
+
+    data = Data( filename )
+    crowd = MD2Crowd( data, num_instances )
+    projection = matrix44.create_perspective_projection_matrix(
+        90.0, 1.0, 1.0, 1000.0
+        )
+    view = matrix44.create_identity()
+    scene = create_scene( num_instances, data.num_frames )
+
+    print '%i instances of %s' % (num_instances, os.path.basename( filename ))
+
+    for name, function, target in [
+        ('per node', render_loop, data),
+        ('instanced', render_crowd, crowd),
+        ]:
+        # warm up
+        function( target, projection, view, *scene )
+
+        issued, finished = measure( function, target, projection, view, *scene )
+
+        with RecordingGL(
+            razorback.md2,
+            razorback.md2.crowd,
+            pygly.shader,
+            passthrough = True
+            ) as gl:
+            function( target, projection, view, *scene )
+
+        print '%s:' % name
+        print '    CPU: %.2fms' % (issued * 1000.0)
+        print '    CPU + GPU: %.2fms' % (finished * 1000.0)
+        print '    OpenGL calls: %i' % gl.count()
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
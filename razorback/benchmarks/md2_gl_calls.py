@@ -0,0 +1,58 @@
+"""Counts the OpenGL calls made to render a single
+MD2 mesh.
+
+Requires an OpenGL 3.2 context.
+The calls made by razorback and by pygly's shader
+uniforms are counted.
+
+Usage:
+    python md2_gl_calls.py [filename.md2]
+"""
+
+import os
+import sys
+
+# must be imported before pyglet.gl
+from razorback.benchmarks.gl_stub import RecordingGL
+
+import pyglet
+from pyglet.gl import *
+from pyrr import matrix44
+import pygly.shader
+
+import razorback.md2
+from razorback.md2 import Data
+
+
+def main():
+    filename = os.path.join(
+        os.path.dirname( __file__ ),
+        '../examples/data/md2/sydney.md2'
+        )
+    if len( sys.argv ) > 1:
+        filename = sys.argv[ 1 ]
+
+    config = pyglet.gl.Config(
+        double_buffer = True,
+        major_version = 3,
+        minor_version = 2,
+        forward_compatible = True
+        )
+    window = pyglet.window.Window( config = config, visible = False )
+
+    data = Data( filename )
+    projection = matrix44.create_identity()
+    model_view = matrix44.create_identity()
+
+    with RecordingGL( razorback.md2, pygly.shader, passthrough = True ) as gl:
+        data.render( 0, 1, 0.5, projection, model_view )
+
+    print 'OpenGL calls per mesh per frame: %i' % gl.count()
+    for name, count in sorted( gl.counts().items() ):
+        print '    %s: %i' % (name, count)
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
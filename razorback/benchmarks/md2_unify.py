@@ -0,0 +1,79 @@
+"""Compares the vectorised MD2 index unification with
+the per-corner Python loop.
+
+Usage:
+    python md2_unify.py [filename.md2] [repeats]
+"""
+
+import os
+import sys
+import timeit
+
+import numpy
+import pymesh.md2
+
+from razorback.md2.unify import process_vertices, process_vertices_loop
+
+
+def compare( result1, result2 ):
+    indices1, tcs1, frames1 = result1
+    indices2, tcs2, frames2 = result2
+
+    if indices1.tostring() != indices2.tostring():
+        return False
+    if tcs1.tostring() != tcs2.tostring():
+        return False
+    for frame1, frame2 in zip( frames1, frames2 ):
+        if frame1.name != frame2.name:
+            return False
+        if frame1.vertices.tostring() != frame2.vertices.tostring():
+            return False
+        if frame1.normals.tostring() != frame2.normals.tostring():
+            return False
+    return True
+
+def main():
+    filename = os.path.join(
+        os.path.dirname( __file__ ),
+        '../examples/data/md2/sydney.md2'
+        )
+    repeats = 5
+    if len( sys.argv ) > 1:
+        filename = sys.argv[ 1 ]
+    if len( sys.argv ) > 2:
+        repeats = int( sys.argv[ 2 ] )
+
+    md2 = pymesh.md2.MD2()
+    md2.load( filename )
+
+    print 'Model: %s' % filename
+    print 'Frames: %i, vertices: %i, triangles: %i' % (
+        len( md2.frames ),
+        len( md2.frames[ 0 ].vertices ),
+        numpy.asarray( md2.triangles.vertex_indices ).size // 3
+        )
+
+    identical = compare(
+        process_vertices( md2 ),
+        process_vertices_loop( md2 )
+        )
+    print 'Byte identical output: %s' % identical
+
+    loop = min( timeit.repeat(
+        lambda: process_vertices_loop( md2 ),
+        number = 1,
+        repeat = repeats
+        ) )
+    vectorised = min( timeit.repeat(
+        lambda: process_vertices( md2 ),
+        number = 1,
+        repeat = repeats
+        ) )
+
+    print 'Python loop: %.2f ms' % (loop * 1000.0)
+    print 'Vectorised:  %.2f ms' % (vectorised * 1000.0)
+    print 'Speed up:    %.1fx' % (loop / vectorised)
+
+
+if __name__ == "__main__":
+    main()
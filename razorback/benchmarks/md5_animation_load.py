@@ -0,0 +1,83 @@
+"""Compares building the skeletons of an md5anim joint
+by joint with KeyframeSkeleton against building every
+frame at once with KeyframeBuilder.
+
+The frames of the animation are repeated until there
+are at least the requested number of frames.
+
+Usage:
+    python md5_animation_load.py [filename.md5anim] [frames]
+"""
+
+import os
+import sys
+import time
+
+# must be imported before pyglet.gl
+import razorback.benchmarks.gl_stub
+
+import numpy
+from pymesh.md5 import MD5_Anim
+
+from razorback.md5.skeleton import KeyframeSkeleton
+from razorback.md5.keyframes import KeyframeBuilder
+
+
+class RepeatedAnimation( object ):
+
+    def __init__( self, md5anim, num_frames ):
+        super( RepeatedAnimation, self ).__init__()
+
+        self.hierarchy = md5anim.hierarchy
+        self.base_frame = md5anim.base_frame
+
+        frames = list( md5anim.frames )
+        repeats = -(-num_frames // len( frames ))
+        self.frames = (frames * repeats)[ :max( num_frames, len( frames ) ) ]
+
+
+def main():
+    filename = os.path.join(
+        os.path.dirname( __file__ ),
+        '../examples/data/md5/boblampclean.md5anim'
+        )
+    num_frames = 1000
+    if len( sys.argv ) > 1:
+        filename = sys.argv[ 1 ]
+    if len( sys.argv ) > 2:
+        num_frames = int( sys.argv[ 2 ] )
+
+    md5anim = MD5_Anim()
+    md5anim.load( filename )
+    animation = RepeatedAnimation( md5anim, num_frames )
+
+    print '%s: %i frames, %i joints' % (
+        os.path.basename( filename ),
+        len( animation.frames ),
+        md5anim.hierarchy.num_joints
+        )
+
+    start = time.time()
+    skeletons = [
+        KeyframeSkeleton( animation, frame )
+        for frame in animation.frames
+        ]
+    loop_time = time.time() - start
+
+    start = time.time()
+    positions, orientations = KeyframeBuilder( animation ).build()
+    batch_time = time.time() - start
+
+    error = max(
+        numpy.abs( skeleton.positions - position ).max()
+        for skeleton, position in zip( skeletons, positions )
+        )
+
+    print 'KeyframeSkeleton: %.3fs' % loop_time
+    print 'KeyframeBuilder: %.3fs' % batch_time
+    print 'Speed up: %.1fx' % (loop_time / batch_time)
+    print 'Maximum position difference: %g' % error
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Bakes MD5 animations into keyframes and reports the
+memory and time used by each.
+
+Requires an OpenGL 3.2 context to create the mesh data.
+
+Usage:
+    python md5_bake.py [filename.md5mesh] [filename.md5anim ...]
+"""
+
+import os
+import sys
+
+# must be imported before pyglet.gl
+import razorback.benchmarks.gl_stub
+
+import pyglet
+from pymesh.md5 import MD5_Anim
+
+from razorback.md5 import MeshData
+from razorback.md5.skeleton import Animation
+from razorback.md5.bake import bake_animation, format_report
+
+
+def main():
+    path = os.path.join( os.path.dirname( __file__ ), '../examples/data/md5' )
+    mesh_filename = os.path.join( path, 'boblampclean.md5mesh' )
+    animation_filenames = [ os.path.join( path, 'boblampclean.md5anim' ) ]
+    if len( sys.argv ) > 1:
+        mesh_filename = sys.argv[ 1 ]
+    if len( sys.argv ) > 2:
+        animation_filenames = sys.argv[ 2: ]
+
+    config = pyglet.gl.Config(
+        double_buffer = True,
+        major_version = 3,
+        minor_version = 2,
+        forward_compatible = True
+        )
+    window = pyglet.window.Window( config = config, visible = False )
+
+    mesh_data = MeshData( mesh_filename )
+
+    for animation_filename in animation_filenames:
+        md5anim = MD5_Anim()
+        md5anim.load( animation_filename )
+        animation = Animation( md5anim )
+
+        baked = bake_animation( mesh_data, animation, mesh_filename, animation_filename )
+        print format_report( os.path.basename( animation_filename ), baked.report )
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measures the frame time of many animated MD5 characters.
+
+Each frame, every character samples its animation,
+uploads its skeleton and is rendered.
+The bone palette upload of md5.Mesh.set_skeleton is compared
+with re-creating the buffer with glBufferData each frame.
+
+Requires an OpenGL 3.2 context.
+
+Usage:
+    python md5_skeleton_upload.py [characters] [frames]
+"""
+
+import os
+import sys
+import time
+
+# must be imported before pyglet.gl
+import razorback.benchmarks.gl_stub
+
+import numpy
+import pyglet
+from pyglet.gl import *
+from pyrr import matrix44
+from pymesh.md5 import MD5_Mesh, MD5_Anim
+
+from razorback.md5 import Mesh
+from razorback.md5.skeleton import Animation, Skeleton
+from razorback.upload import buffer_data
+
+
+def set_skeleton_reallocate( mesh, skeleton ):
+    # the previous implementation of Mesh.set_skeleton
+    matrices = numpy.zeros( (skeleton.num_joints, 2, 4), dtype = 'float32' )
+    matrices[ :, 0 ] = skeleton.orientations
+    matrices[ :, 1, 0:3 ] = skeleton.positions
+
+    glBindBuffer( GL_TEXTURE_BUFFER, mesh.vbo )
+    buffer_data( GL_TEXTURE_BUFFER, matrices )
+
+    glBindTexture( GL_TEXTURE_BUFFER, mesh.tbo )
+    glTexBuffer( GL_TEXTURE_BUFFER, GL_RGBA32F, mesh.vbo )
+
+    glBindTexture( GL_TEXTURE_BUFFER, 0 )
+    glBindBuffer( GL_TEXTURE_BUFFER, 0 )
+
+def set_skeleton_palette( mesh, skeleton ):
+    mesh.set_skeleton( skeleton )
+
+def run( meshes, animation, skeletons, set_skeleton, num_frames ):
+    projection = matrix44.create_perspective_projection_matrix( 90.0, 1.0, 1.0, 1000.0 )
+    model_view = matrix44.create_from_translation( [ 0.0, 0.0, -200.0 ] )
+    offsets = numpy.linspace( 0.0, animation.num_frames / animation.frame_rate, len( meshes ) )
+
+    glFinish()
+    start = time.time()
+    for frame in range( num_frames ):
+        seconds = frame / 60.0
+        for mesh, skeleton, offset in zip( meshes, skeletons, offsets ):
+            animation.sample( seconds + offset, out = skeleton )
+            set_skeleton( mesh, skeleton )
+            mesh.render( projection, model_view )
+        glFinish()
+    return (time.time() - start) / num_frames
+
+def main():
+    num_characters = 100
+    num_frames = 100
+    if len( sys.argv ) > 1:
+        num_characters = int( sys.argv[ 1 ] )
+    if len( sys.argv ) > 2:
+        num_frames = int( sys.argv[ 2 ] )
+
+    path = os.path.join( os.path.dirname( __file__ ), '../examples/data/md5' )
+    md5mesh = MD5_Mesh()
+    md5mesh.load( os.path.join( path, 'boblampclean.md5mesh' ) )
+    md5anim = MD5_Anim()
+    md5anim.load( os.path.join( path, 'boblampclean.md5anim' ) )
+
+    config = pyglet.gl.Config(
+        double_buffer = True,
+        major_version = 3,
+        minor_version = 2,
+        forward_compatible = True
+        )
+    window = pyglet.window.Window( config = config, visible = False )
+
+    animation = Animation( md5anim, cache_size = None )
+    animation.prefetch( 0, animation.num_frames )
+
+    meshes = [ Mesh( md5mesh ) for index in range( num_characters ) ]
+    skeletons = [
+        Skeleton.empty( animation.skeleton( 0 ).parents )
+        for index in range( num_characters )
+        ]
+    for mesh in meshes:
+        mesh.set_skeleton( skeletons[ 0 ] )
+
+    print '%i characters, %i frames' % (num_characters, num_frames)
+    for name, set_skeleton in [
+        ('glBufferData per frame', set_skeleton_reallocate),
+        ('persistent palette', set_skeleton_palette),
+        ]:
+        # warm up
+        run( meshes, animation, skeletons, set_skeleton, 5 )
+        frame_time = run( meshes, animation, skeletons, set_skeleton, num_frames )
+        print '%s: %.2fms per frame' % (name, frame_time * 1000.0)
+
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
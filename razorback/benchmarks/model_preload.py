@@ -0,0 +1,84 @@
+"""Reports the wall time of preparing a set of OBJ models
+with razorback.preload as the number of processes grows.
+
+Usage:
+    python model_preload.py [models] [grid size] [max processes]
+
+The models are synthetic grids written to a temporary
+directory. The mesh cache is disabled so every run parses
+and processes every model. Only the preparation is timed,
+finalising needs an OpenGL context.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+from razorback import mesh_cache
+from razorback import preload
+from razorback.benchmarks.obj_parse import create_grid
+
+
+def main():
+    num_models = 32
+    size = 120
+    max_processes = multiprocessing.cpu_count()
+    if len( sys.argv ) > 1:
+        num_models = int( sys.argv[ 1 ] )
+    if len( sys.argv ) > 2:
+        size = int( sys.argv[ 2 ] )
+    if len( sys.argv ) > 3:
+        max_processes = int( sys.argv[ 3 ] )
+
+    mesh_cache.enabled = False
+
+    directory = tempfile.mkdtemp()
+    try:
+        text = create_grid( size )
+        filenames = []
+        for index in range( num_models ):
+            filename = os.path.join( directory, 'model%03i.obj' % index )
+            with open( filename, 'w' ) as file:
+                file.write( text )
+            filenames.append( filename )
+
+        print 'Models: %i grids of %ix%i, %.1fMB total' % (
+            num_models,
+            size,
+            size,
+            num_models * len( text ) / (1024.0 * 1024.0)
+            )
+
+        options = { '.obj': { 'chunk_size': 65536 } }
+
+        processes = 1
+        counts = []
+        while processes < max_processes:
+            counts.append( processes )
+            processes *= 2
+        counts.append( max_processes )
+
+        print 'Processes  Time (s)  Speed up  Efficiency'
+        serial = None
+        for processes in counts:
+            start = time.time()
+            preload.prepare( filenames, processes = processes, options = options )
+            elapsed = time.time() - start
+
+            if serial == None:
+                serial = elapsed
+            print '%9i  %8.2f  %7.2fx  %9.0f%%' % (
+                processes,
+                elapsed,
+                serial / elapsed,
+                100.0 * serial / elapsed / processes
+                )
+    finally:
+        shutil.rmtree( directory )
+
+
+if __name__ == "__main__":
+    main()
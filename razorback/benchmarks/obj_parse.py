@@ -0,0 +1,88 @@
+"""Reports the throughput of the block OBJ parser and
+the line by line parser in MB/s.
+
+Usage:
+    python obj_parse.py [filename.obj | grid size] [repeats]
+
+If no filename is given a synthetic grid with positions,
+texture coordinates and normals is generated.
+"""
+
+import os
+import sys
+import timeit
+from StringIO import StringIO
+
+from razorback.obj.stream import stream, stream_lines
+
+
+def create_grid( size ):
+    """Returns the text of an OBJ of a size x size grid of quads.
+    """
+    lines = []
+    for y in range( size + 1 ):
+        for x in range( size + 1 ):
+            lines.append( 'v %f %f %f' % (x, y, 0.0) )
+    for y in range( size + 1 ):
+        for x in range( size + 1 ):
+            lines.append( 'vt %f %f' % (x / float( size ), y / float( size )) )
+    lines.append( 'vn 0.0 0.0 1.0' )
+
+    lines.append( 'g grid' )
+    for y in range( size ):
+        for x in range( size ):
+            corner = y * (size + 1) + x + 1
+            quad = [ corner, corner + 1, corner + size + 2, corner + size + 1 ]
+            lines.append( 'f ' + ' '.join( [ '%i/%i/1' % (index, index) for index in quad ] ) )
+    return '\n'.join( lines ) + '\n'
+
+def consume( chunks ):
+    vertices = 0
+    for chunk in chunks:
+        vertices += len( chunk.vertices )
+    return vertices
+
+def main():
+    text = None
+    name = 'grid'
+    size = 300
+    repeats = 3
+    if len( sys.argv ) > 1:
+        if os.path.exists( sys.argv[ 1 ] ):
+            name = sys.argv[ 1 ]
+            with open( name, 'r' ) as file:
+                text = file.read()
+        else:
+            size = int( sys.argv[ 1 ] )
+    if len( sys.argv ) > 2:
+        repeats = int( sys.argv[ 2 ] )
+
+    if text == None:
+        name = 'grid %ix%i' % (size, size)
+        text = create_grid( size )
+
+    megabytes = len( text ) / (1024.0 * 1024.0)
+    print 'OBJ: %s, %.1fMB' % (name, megabytes)
+
+    vertices = consume( stream( StringIO( text ) ) )
+    line_vertices = consume( stream_lines( StringIO( text ) ) )
+    print 'Unified vertices: %i (line parser %i)' % (vertices, line_vertices)
+
+    block = min( timeit.repeat(
+        lambda: consume( stream( StringIO( text ) ) ),
+        number = 1,
+        repeat = repeats
+        ) )
+    line = min( timeit.repeat(
+        lambda: consume( stream_lines( StringIO( text ) ) ),
+        number = 1,
+        repeat = repeats
+        ) )
+
+    print 'Line parser:  %.2f MB/s' % (megabytes / line)
+    print 'Block parser: %.2f MB/s' % (megabytes / block)
+    print 'Speed up:     %.1fx' % (line / block)
+
+
+if __name__ == "__main__":
+    main()
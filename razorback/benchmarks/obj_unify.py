@@ -0,0 +1,93 @@
+"""Compares the vectorised OBJ vertex deduplication with
+the per-corner OrderedDict loop on a synthetic grid of
+quads.
+
+Usage:
+    python obj_unify.py [grid size] [repeats]
+"""
+
+import sys
+import timeit
+from collections import namedtuple
+
+import numpy
+
+from razorback.obj.unify import process_vertices, process_vertices_loop
+
+
+obj_layout = namedtuple( 'OBJ', [ 'vertices', 'texture_coords', 'normals', 'meshes' ] )
+
+
+def create_grid( size ):
+    """Creates a size x size grid of quads that share
+    their vertices and texture coordinates and have
+    a single normal.
+    """
+    x, y = numpy.meshgrid( numpy.arange( size + 1 ), numpy.arange( size + 1 ) )
+    vertices = numpy.column_stack( [ x.ravel(), y.ravel(), numpy.zeros( x.size ) ] )
+    tcs = vertices[ :, 0:2 ] / float( size )
+
+    faces = []
+    for row in range( size ):
+        for column in range( size ):
+            corner = row * (size + 1) + column
+            quad = [ corner, corner + 1, corner + size + 2, corner + size + 1 ]
+            faces.append( [ (index, index, 0) for index in quad ] )
+
+    mesh = {
+        'groups': [ 'grid' ],
+        'points': [],
+        'lines': [],
+        'faces': faces,
+        }
+    return obj_layout( vertices.tolist(), tcs.tolist(), [ [ 0.0, 0.0, 1.0 ] ], [ mesh ] )
+
+def compare( result1, result2 ):
+    for array1, array2 in zip( result1[ :3 ], result2[ :3 ] ):
+        if array1.tostring() != array2.tostring():
+            return False
+    for mesh1, mesh2 in zip( result1[ 3 ], result2[ 3 ] ):
+        if mesh1[ 1 ].tostring() != mesh2[ 1 ].tostring():
+            return False
+    return True
+
+def main():
+    size = 500
+    repeats = 3
+    if len( sys.argv ) > 1:
+        size = int( sys.argv[ 1 ] )
+    if len( sys.argv ) > 2:
+        repeats = int( sys.argv[ 2 ] )
+
+    model = create_grid( size )
+
+    print 'Faces: %i, triangles: %i, vertices: %i' % (
+        size * size,
+        size * size * 2,
+        len( model.vertices )
+        )
+
+    identical = compare(
+        process_vertices( model ),
+        process_vertices_loop( model )
+        )
+    print 'Byte identical output: %s' % identical
+
+    loop = min( timeit.repeat(
+        lambda: process_vertices_loop( model ),
+        number = 1,
+        repeat = repeats
+        ) )
+    vectorised = min( timeit.repeat(
+        lambda: process_vertices( model ),
+        number = 1,
+        repeat = repeats
+        ) )
+
+    print 'OrderedDict loop: %.2f ms' % (loop * 1000.0)
+    print 'Vectorised:       %.2f ms' % (vectorised * 1000.0)
+    print 'Speed up:         %.1fx' % (loop / vectorised)
+
+
+if __name__ == "__main__":
+    main()
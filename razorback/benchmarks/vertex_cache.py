@@ -0,0 +1,79 @@
+"""Reports the vertex cache efficiency of MD2, OBJ and MD5
+meshes before and after they are reordered.
+
+Usage:
+    python vertex_cache.py [filename.md2|.obj|.md5mesh ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy
+
+from razorback import vertex_cache
+
+
+def md2_meshes( filename ):
+    import pymesh.md2
+    from razorback.md2.unify import process_frame_array
+
+    md2 = pymesh.md2.MD2()
+    md2.load( filename )
+    indices, tcs, frames = process_frame_array( md2 )
+    yield os.path.basename( filename ), indices, len( tcs )
+
+def obj_meshes( filename ):
+    import pymesh.obj
+    from razorback.obj.unify import process_vertices
+
+    obj = pymesh.obj.OBJ()
+    obj.load( filename )
+    vertices, texture_coords, normals, meshes = process_vertices( obj.model )
+    for groups, indices, num_points, num_lines, num_faces in meshes:
+        if num_faces == 0:
+            continue
+        name = '%s %s' % (os.path.basename( filename ), ','.join( groups ))
+        yield name, indices[ num_points + num_lines: ], len( vertices )
+
+def md5_meshes( filename ):
+    from pymesh.md5 import MD5_Mesh
+
+    md5mesh = MD5_Mesh()
+    md5mesh.load( filename )
+    for index, mesh in enumerate( md5mesh.meshes ):
+        name = '%s mesh %i' % (os.path.basename( filename ), index)
+        yield name, numpy.asarray( mesh.tris ), mesh.num_verts
+
+loaders = {
+    '.md2': md2_meshes,
+    '.obj': obj_meshes,
+    '.md5mesh': md5_meshes,
+    }
+
+def main():
+    data = os.path.join( os.path.dirname( __file__ ), '../examples/data' )
+    filenames = [
+        os.path.join( data, 'md2/sydney.md2' ),
+        os.path.join( data, 'obj/humanoid_tri.obj' ),
+        os.path.join( data, 'md5/boblampclean.md5mesh' ),
+        ]
+    if len( sys.argv ) > 1:
+        filenames = sys.argv[ 1: ]
+
+    print 'Cache size: %i' % vertex_cache.cache_size
+    for filename in filenames:
+        loader = loaders[ os.path.splitext( filename )[ 1 ].lower() ]
+        for name, indices, num_vertices in loader( filename ):
+            start = time.time()
+            indices, order, report = vertex_cache.optimise( indices, num_vertices )
+            seconds = time.time() - start
+
+            print '%s, %.2f ms' % (
+                vertex_cache.format_report( name, report ),
+                seconds * 1000.0
+                )
+
+
+if __name__ == "__main__":
+    main()
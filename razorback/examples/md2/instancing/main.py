@@ -1,4 +1,5 @@
-"""Demonstrates MD2 loading, animation and rendering
+"""Demonstrates rendering many animated MD2 meshes
+with a single instanced draw call
 """
 # import this first to ensure pyglet is
 # setup for the OpenGL core profile
@@ -6,7 +7,6 @@ from pygly.examples.core.simple.main import SimpleApplication
 from pygly.examples.core.application import CoreApplication
 
 import os
-import math
 
 from PIL import Image
 import numpy
@@ -14,14 +14,13 @@ import pyglet
 from pyglet.gl import *
 
 from pygly.scene_node import SceneNode
-from pygly.render_callback_node import RenderCallbackNode
 import pygly.sorter
 from pygly.texture import Texture2D
 import pygly.pil_texture
 import pygly.texture
-from pyrr import matrix44
 
-from razorback.md2 import MD2_Mesh
+from razorback.md2 import MD2_Mesh, MD2Crowd
+from razorback.md2.animations import AnimationStateArray
 
 
 class MD2_Application( SimpleApplication ):
@@ -94,14 +93,15 @@ class MD2_Application( SimpleApplication ):
             '../../data/md2/sydney.md2'
             )
 
+        # every node shares a single mesh
+        self.mesh = MD2_Mesh( path )
+        self.mesh.load()
+
+        # render every node with a single draw call
+        self.crowd = MD2Crowd( self.mesh.data, len(positions) )
+
         for position in positions:
-            node = RenderCallbackNode(
-                'node-%s' % position,
-                None,
-                self.render_node
-                )
-            node.mesh = MD2_Mesh( path )
-            node.mesh.load()
+            node = SceneNode( 'node-%s' % position )
 
             # attach to our scene graph
             self.grid_root.add_child( node )
@@ -113,15 +113,20 @@ class MD2_Application( SimpleApplication ):
 
         # create a range of animation times
         # 0.0 <= x < num_frames
-        self.frames = numpy.linspace(
-            0.0,
-            float(self.renderables[ 0 ].mesh.num_frames),
-            len(positions),
-            endpoint = False
+        # each node plays the animation of its starting frame
+        self.animations = AnimationStateArray(
+            self.mesh.data.animation_table,
+            len(positions)
+            )
+        self.animations.set_frames(
+            slice( None ),
+            numpy.linspace(
+                0.0,
+                float(self.mesh.num_frames),
+                len(positions),
+                endpoint = False
+                )
             )
-
-        # create an array that will store our frame rates
-        self.frame_rate = numpy.zeros( len(self.renderables), dtype = numpy.float )
 
         self.animation = ''
 
@@ -139,21 +144,13 @@ class MD2_Application( SimpleApplication ):
         # rotate the scene nodes about their vertical axis
         self.grid_root.transform.object.rotate_y( dt * 0.2 )
 
-        # update our frame rates
-        self.frame_rate[:] = [ mesh_node.mesh.frame_rate for mesh_node in self.renderables ]
-
-
-        # increment our frame
-        #self.frames += dt * fps
-        self.frames += dt * self.frame_rate
-        numpy.mod(
-            self.frames,
-            self.renderables[ 0 ].mesh.num_frames,
-            self.frames
-            )
+        # increment our frames
+        self.animations.step( dt )
 
         # print the animation name of the first mesh
-        curr_anim = self.renderables[ 0 ].mesh.animation
+        curr_anim = self.mesh.data.animation_table.animation(
+            self.animations.frame1[ 0 ]
+            )
         if self.animation != curr_anim:
             self.animation = curr_anim
             print 'Curren animation:', self.animation
@@ -175,35 +172,23 @@ class MD2_Application( SimpleApplication ):
         glActiveTexture( GL_TEXTURE0 )
         self.texture.bind()
 
-        # iterate through our renderables
-        for node, frame in zip(self.renderables, self.frames):
-            # update the model view
-            world_matrix = node.world_transform.matrix
-            current_mv = matrix44.multiply(
-                world_matrix,
-                model_view
-                )
-
-            fraction, frame1 = math.modf( frame )
-            frame2 = (frame1 + 1.0) % node.mesh.num_frames
-
-            # update the frame
-            node.mesh.frame_1 = int(frame1)
-            node.mesh.frame_2 = int(frame2)
-            node.mesh.interpolation = fraction
+        # update our instances
+        world_matrices = numpy.array(
+            [ node.world_transform.matrix for node in self.renderables ]
+            )
+        self.crowd.set_instances(
+            world_matrices,
+            self.animations.frame1,
+            self.animations.frame2,
+            self.animations.fractions
+            )
 
-            # render a cube
-            node.render(
-                projection = projection,
-                model_view = current_mv
-                )
+        # render every node
+        self.crowd.render( projection, model_view )
 
         glActiveTexture( GL_TEXTURE0 )
         self.texture.unbind()
 
-    def render_node( self, node, **kwargs ):
-        node.mesh.render( **kwargs )
-
 
 def main():
     """Main function entry point.
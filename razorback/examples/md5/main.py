@@ -121,13 +121,9 @@ class MD5_Application( SimpleApplication ):
         #self.mesh_node.skeleton.set_skeleton( self.mesh_node.baseframe )
         self.mesh_node.skeleton.set_skeleton( self.mesh_node.anim.skeleton( 0 ) )
 
-        # create a list of frames
-        self.frames = [
-            skeleton
-            for skeleton in self.mesh_node.anim
-            ]
-        #self.frames = []
-        self.frames.append( self.mesh_node.baseframe )
+        # skeletons are built as they are needed
+        # the extra frame after the animation is the base frame
+        self.num_frames = self.mesh_node.anim.num_frames + 1
 
         self.frame = 0
         self.time_accumulator = 0.0
@@ -158,15 +154,25 @@ class MD5_Application( SimpleApplication ):
         CoreApplication.step( self, dt )
 
         if self.time_accumulator == 0.0:
-            self.mesh_node.mesh.set_skeleton( self.frames[ self.frame ] )
-            self.mesh_node.skeleton.set_skeleton( self.frames[ self.frame ] )
+            skeleton = self.frame_skeleton( self.frame )
+            self.mesh_node.mesh.set_skeleton( skeleton )
+            self.mesh_node.skeleton.set_skeleton( skeleton )
 
         self.time_accumulator += dt
         if self.time_accumulator > self.time_per_frame:
             self.time_accumulator = 0.0
 
             self.frame += 1
-            self.frame %= len( self.frames )
+            self.frame %= self.num_frames
+
+            # build the upcoming frames in a single batch
+            if self.frame < self.mesh_node.anim.num_frames:
+                self.mesh_node.anim.prefetch( self.frame, 8 )
+
+    def frame_skeleton( self, frame ):
+        if frame < self.mesh_node.anim.num_frames:
+            return self.mesh_node.anim.skeleton( frame )
+        return self.mesh_node.baseframe
 
 
     def render_scene( self, camera ):
@@ -0,0 +1,214 @@
+"""
+Loads assets in the background and finishes them on the
+render thread.
+
+Loading an asset is split in two.
+    * preparing: file I/O, parsing, index unification and
+      any other processing that doesn't touch OpenGL.
+      This runs on a worker thread.
+    * finalising: creating the asset's OpenGL objects and
+      uploading its data. This must run on the thread with
+      the OpenGL context.
+
+The prepare function passed to AsyncLoader.load returns an
+object with a finalise method. finalise is a generator that
+yields after each OpenGL object is created, which lets pump
+spread the uploads of large assets over several frames.
+
+Usage:
+    loader = AsyncLoader()
+    handle = loader.load( Data, filename, finalise = False )
+
+    # each frame
+    loader.pump( 2.0 )
+    if handle.is_ready:
+        data = handle.result
+"""
+
+import sys
+import time
+import threading
+import Queue
+
+
+class LoadHandle( object ):
+    """The state of an asynchronous load.
+    """
+
+    def __init__( self ):
+        super( LoadHandle, self ).__init__()
+
+        self.result = None
+        self.error = None
+        self.is_ready = False
+        self._callbacks = []
+
+    @property
+    def is_done( self ):
+        """Returns True once the load has completed or failed.
+        """
+        return self.is_ready or self.error != None
+
+    def add_callback( self, callback ):
+        """Calls callback with the handle once the load has
+        completed or failed.
+
+        Callbacks are called on the thread that calls pump.
+        If the load is already done, the callback is
+        called immediately.
+        """
+        if self.is_done:
+            callback( self )
+        else:
+            self._callbacks.append( callback )
+
+    def get( self ):
+        """Returns the loaded asset.
+
+        @raise: the exception raised while loading, if any.
+        @raise ValueError: if the load hasn't completed.
+        """
+        if self.error != None:
+            raise self.error
+        if not self.is_ready:
+            raise ValueError( "Asset hasn't finished loading" )
+        return self.result
+
+    def _complete( self, result ):
+        self.result = result
+        self.is_ready = True
+        self._call_callbacks()
+
+    def _fail( self, error ):
+        self.error = error
+        self._call_callbacks()
+
+    def _call_callbacks( self ):
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback( self )
+
+
+def completed_handle( result ):
+    """Returns a LoadHandle that has already completed.
+
+    Used for assets that were loaded previously.
+    """
+    handle = LoadHandle()
+    handle._complete( result )
+    return handle
+
+
+class AsyncLoader( object ):
+    """Prepares assets on worker threads and finalises
+    them during calls to pump.
+
+    Threads are used rather than processes as prepared
+    assets hold large NumPy arrays, which would otherwise
+    be pickled to return them, and NumPy and file I/O
+    release the GIL for most of the work.
+    """
+
+    def __init__( self, num_threads = 2 ):
+        super( AsyncLoader, self ).__init__()
+
+        self._requests = Queue.Queue()
+        self._prepared = Queue.Queue()
+        # the handle, asset and finalise steps being finalised
+        self._current = None
+        self._num_pending = 0
+
+        self.threads = [
+            threading.Thread( target = self._work, name = 'AsyncLoader%i' % index )
+            for index in range( num_threads )
+            ]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    @property
+    def num_pending( self ):
+        """Returns the number of loads that haven't completed
+        or failed.
+        """
+        return self._num_pending
+
+    def load( self, prepare, *args, **kwargs ):
+        """Calls prepare( *args, **kwargs ) on a worker thread.
+
+        @param prepare: a callable that returns an object with
+        a finalise generator method. prepare must not call
+        OpenGL.
+        @return: a LoadHandle for the asset.
+        """
+        handle = LoadHandle()
+        self._num_pending += 1
+        self._requests.put( (handle, prepare, args, kwargs) )
+        return handle
+
+    def _work( self ):
+        while True:
+            request = self._requests.get()
+            if request == None:
+                break
+
+            handle, prepare, args, kwargs = request
+            try:
+                asset = prepare( *args, **kwargs )
+            except Exception:
+                self._prepared.put( (handle, None, sys.exc_info()[ 1 ]) )
+            else:
+                self._prepared.put( (handle, asset, None) )
+
+    def pump( self, budget_ms = 2.0 ):
+        """Finalises prepared assets until budget_ms
+        milliseconds have passed.
+
+        This must be called from the thread with the
+        OpenGL context, normally once per frame.
+        At least one finalise step is run per call, so
+        loading always progresses.
+
+        @return: the number of loads that completed.
+        """
+        start = time.time()
+        num_completed = 0
+        while True:
+            if self._current == None:
+                try:
+                    handle, asset, error = self._prepared.get_nowait()
+                except Queue.Empty:
+                    break
+
+                if error != None:
+                    self._num_pending -= 1
+                    handle._fail( error )
+                    continue
+                self._current = (handle, asset, asset.finalise())
+
+            handle, asset, steps = self._current
+            try:
+                next( steps )
+            except StopIteration:
+                self._current = None
+                self._num_pending -= 1
+                handle._complete( asset )
+                num_completed += 1
+            except Exception:
+                self._current = None
+                self._num_pending -= 1
+                handle._fail( sys.exc_info()[ 1 ] )
+
+            if (time.time() - start) * 1000.0 >= budget_ms:
+                break
+        return num_completed
+
+    def shutdown( self ):
+        """Stops the worker threads once the loads already
+        requested have been prepared.
+        """
+        for thread in self.threads:
+            self._requests.put( None )
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
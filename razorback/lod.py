@@ -0,0 +1,331 @@
+"""
+Generates and selects levels of detail for triangle meshes.
+
+Meshes are simplified with quadric error metric half edge
+collapses. A vertex is only ever moved onto one of its
+neighbours, so every level of detail is an index buffer
+into the original vertex data and all levels can share
+a single vertex buffer.
+
+Vertices that share a position with another vertex, such
+as those split at texture seams, are never removed. This
+prevents cracks opening along the seams.
+"""
+
+import math
+import heapq
+
+import numpy
+
+from razorback import vertex_cache
+
+
+# the default fraction of triangles kept by each level
+# level 0 is always the original mesh
+default_ratios = (1.0, 0.5, 0.25, 0.125)
+
+# the weight of the planes that keep open edges in place
+boundary_weight = 1000.0
+
+
+def seam_vertices( positions ):
+    """Returns a boolean array marking vertices that
+    share their position with another vertex.
+    """
+    positions = numpy.ascontiguousarray( positions )
+    if len( positions ) == 0:
+        return numpy.zeros( 0, dtype = 'bool' )
+
+    unique, inverse, counts = numpy.unique(
+        positions.view( [ ('', positions.dtype) ] * positions.shape[ 1 ] ).ravel(),
+        return_inverse = True,
+        return_counts = True
+        )
+    return counts[ inverse ] > 1
+
+def _plane_quadrics( positions, triangles ):
+    # the area weighted plane quadric of each triangle
+    p0 = positions[ triangles[ :, 0 ] ]
+    p1 = positions[ triangles[ :, 1 ] ]
+    p2 = positions[ triangles[ :, 2 ] ]
+    normals = numpy.cross( p1 - p0, p2 - p0 )
+    areas = numpy.sqrt( numpy.sum( normals * normals, axis = -1 ) )
+
+    valid = areas > 0.0
+    normals[ valid ] /= areas[ valid ][ :, numpy.newaxis ]
+
+    planes = numpy.empty( (len( triangles ), 4) )
+    planes[ :, 0:3 ] = normals
+    planes[ :, 3 ] = -numpy.sum( normals * p0, axis = -1 )
+
+    quadrics = planes[ :, :, numpy.newaxis ] * planes[ :, numpy.newaxis, : ]
+    quadrics *= (areas * 0.5)[ :, numpy.newaxis, numpy.newaxis ]
+    return quadrics, normals
+
+def _vertex_quadrics( positions, triangles ):
+    quadrics = numpy.zeros( (len( positions ), 4, 4) )
+    face_quadrics, normals = _plane_quadrics( positions, triangles )
+    for corner in range( 3 ):
+        numpy.add.at( quadrics, triangles[ :, corner ], face_quadrics )
+
+    # add a plane perpendicular to each open edge so
+    # collapses don't pull the mesh away from its outline
+    edges = numpy.concatenate( [
+        triangles[ :, [ 0, 1 ] ],
+        triangles[ :, [ 1, 2 ] ],
+        triangles[ :, [ 2, 0 ] ],
+        ] )
+    faces = numpy.tile( numpy.arange( len( triangles ) ), 3 )
+    keys = numpy.sort( edges, axis = 1 )
+    keys = keys[ :, 0 ] * len( positions ) + keys[ :, 1 ]
+    unique, inverse, counts = numpy.unique( keys, return_inverse = True, return_counts = True )
+    boundary = counts[ inverse ] == 1
+
+    for (start, end), face in zip( edges[ boundary ], faces[ boundary ] ):
+        direction = positions[ end ] - positions[ start ]
+        normal = numpy.cross( direction, normals[ face ] )
+        length = math.sqrt( numpy.dot( normal, normal ) )
+        if length == 0.0:
+            continue
+        normal /= length
+        plane = numpy.append( normal, -numpy.dot( normal, positions[ start ] ) )
+        quadric = numpy.outer( plane, plane ) * boundary_weight * numpy.dot( direction, direction )
+        quadrics[ start ] += quadric
+        quadrics[ end ] += quadric
+
+    return quadrics
+
+def _face_normal( positions, a, b, c ):
+    return numpy.cross( positions[ b ] - positions[ a ], positions[ c ] - positions[ a ] )
+
+
+class _Simplifier( object ):
+
+    def __init__( self, positions, triangles, locked ):
+        self.positions = positions
+        self.triangles = triangles
+        self.locked = locked
+        self.quadrics = _vertex_quadrics( positions, triangles )
+        self.alive = numpy.ones( len( triangles ), dtype = 'bool' )
+        self.num_triangles = len( triangles )
+
+        self.vertex_faces = [ set() for index in range( len( positions ) ) ]
+        for face, triangle in enumerate( triangles ):
+            for vertex in triangle:
+                self.vertex_faces[ vertex ].add( face )
+
+        self.versions = numpy.zeros( len( positions ), dtype = 'int' )
+        self.heap = []
+        for vertex in range( len( positions ) ):
+            self._push_vertex( vertex )
+
+    def _neighbours( self, vertex ):
+        neighbours = set()
+        for face in self.vertex_faces[ vertex ]:
+            neighbours.update( self.triangles[ face ] )
+        neighbours.discard( vertex )
+        return neighbours
+
+    def _cost( self, source, target ):
+        position = numpy.append( self.positions[ target ], 1.0 )
+        quadric = self.quadrics[ source ] + self.quadrics[ target ]
+        return numpy.dot( position, numpy.dot( quadric, position ) )
+
+    def _push_vertex( self, vertex ):
+        # push the collapse of the vertex onto each neighbour
+        # and of each neighbour onto the vertex
+        for neighbour in self._neighbours( vertex ):
+            for source, target in ((vertex, neighbour), (neighbour, vertex)):
+                if self.locked[ source ]:
+                    continue
+                heapq.heappush(
+                    self.heap,
+                    (
+                        self._cost( source, target ),
+                        source,
+                        target,
+                        self.versions[ source ],
+                        self.versions[ target ]
+                        )
+                    )
+
+    def _valid( self, source, target ):
+        # collapsing must not flip or degenerate any
+        # triangle that remains
+        for face in self.vertex_faces[ source ]:
+            triangle = self.triangles[ face ]
+            if target in triangle:
+                continue
+            before = _face_normal( self.positions, *triangle )
+            after = _face_normal(
+                self.positions,
+                *[ target if vertex == source else vertex for vertex in triangle ]
+                )
+            if numpy.dot( before, after ) <= 0.0:
+                return False
+        return True
+
+    def _collapse( self, source, target ):
+        for face in list( self.vertex_faces[ source ] ):
+            triangle = self.triangles[ face ]
+            if target in triangle:
+                # the triangle collapses to a line
+                self.alive[ face ] = False
+                self.num_triangles -= 1
+                for vertex in triangle:
+                    self.vertex_faces[ vertex ].discard( face )
+            else:
+                triangle[ triangle == source ] = target
+                self.vertex_faces[ target ].add( face )
+        self.vertex_faces[ source ] = set()
+
+        self.quadrics[ target ] += self.quadrics[ source ]
+
+        # only collapses involving the target have changed cost
+        # older entries for the target are skipped by their version
+        self.versions[ source ] += 1
+        self.versions[ target ] += 1
+        self._push_vertex( target )
+
+    def simplify( self, target_triangles ):
+        while self.num_triangles > target_triangles and self.heap:
+            cost, source, target, source_version, target_version = heapq.heappop( self.heap )
+            if source_version != self.versions[ source ] or target_version != self.versions[ target ]:
+                continue
+            if not self._valid( source, target ):
+                continue
+            self._collapse( source, target )
+
+    def indices( self, dtype ):
+        return self.triangles[ self.alive ].astype( dtype ).ravel()
+
+
+def simplify( positions, indices, targets, locked = None ):
+    """Simplifies a triangle mesh to each of the
+    target triangle counts.
+
+    @param positions: the vertex positions (vertices x 3).
+    @param indices: the triangle indices.
+    @param targets: a sequence of decreasing triangle counts.
+    @param locked: an optional boolean array of vertices
+    that must not be removed. If None, vertices on texture
+    seams are locked.
+    @return: a list of index arrays, one per target, of the
+    same type as indices. A level may have more triangles
+    than its target if no more edges can be collapsed.
+    """
+    indices = numpy.asarray( indices )
+    positions = numpy.asarray( positions, dtype = 'float64' ).reshape( -1, 3 )
+    if locked is None:
+        locked = seam_vertices( positions )
+
+    # only simplify the vertices the triangles use
+    # so meshes that share a vertex buffer stay cheap
+    used, triangles = numpy.unique( indices.ravel(), return_inverse = True )
+    triangles = triangles.reshape( -1, 3 ).astype( 'int64' )
+
+    simplifier = _Simplifier( positions[ used ], triangles, numpy.asarray( locked )[ used ] )
+
+    levels = []
+    for target in targets:
+        simplifier.simplify( target )
+        levels.append( used[ simplifier.indices( 'int64' ) ].astype( indices.dtype ) )
+    return levels
+
+def lod_chain( positions, indices, ratios = default_ratios, locked = None, reorder = True ):
+    """Generates a level of detail for each ratio.
+
+    @param ratios: the fraction of triangles to keep in
+    each level, largest first. A ratio of 1.0 keeps the
+    original indices.
+    @param reorder: whether to reorder the simplified
+    levels for the vertex cache.
+    @return: a list of index arrays.
+    """
+    indices = numpy.asarray( indices )
+    num_triangles = len( indices.ravel() ) // 3
+    targets = [ int( num_triangles * ratio ) for ratio in ratios ]
+
+    levels = simplify( positions, indices, targets, locked )
+
+    # keep the original triangle order for full detail levels
+    # and reorder the simplified levels for the vertex cache
+    chain = []
+    for ratio, level in zip( ratios, levels ):
+        if ratio >= 1.0:
+            level = indices.ravel().copy()
+        elif reorder:
+            level = vertex_cache.optimise_indices( level )
+        chain.append( level )
+    return chain
+
+def projected_size( radius, distance, fov, viewport_height ):
+    """Returns the height in pixels of a bounding sphere
+    on screen.
+
+    Works with scalars or arrays.
+
+    @param fov: the vertical field of view in degrees.
+    """
+    distance = numpy.maximum( distance, 1.0e-6 )
+    scale = viewport_height / (2.0 * math.tan( math.radians( fov ) / 2.0 ))
+    return (radius * 2.0) * scale / distance
+
+
+class LODSelector( object ):
+    """
+    Selects a level of detail from the projected
+    screen size of a mesh.
+    """
+
+    def __init__( self, screen_sizes ):
+        """
+        @param screen_sizes: the minimum size in pixels for
+        each level, excluding the lowest detail level.
+        For example (200, 100, 50) selects level 0 above 200
+        pixels, level 1 above 100, level 2 above 50 and
+        level 3 below that.
+        """
+        super( LODSelector, self ).__init__()
+
+        self.screen_sizes = numpy.array( screen_sizes, dtype = 'float64' )
+        if numpy.any( numpy.diff( self.screen_sizes ) > 0.0 ):
+            raise ValueError( "Screen sizes must be decreasing" )
+
+    @property
+    def num_levels( self ):
+        return len( self.screen_sizes ) + 1
+
+    def select( self, size, num_levels = None ):
+        """Returns the level for a projected size in pixels.
+
+        Works with scalars or arrays.
+
+        @param num_levels: the number of levels the mesh has.
+        Levels beyond this are clamped to the lowest detail level.
+        """
+        level = numpy.searchsorted( -self.screen_sizes, -numpy.asarray( size ), side = 'right' )
+        if num_levels != None:
+            level = numpy.minimum( level, num_levels - 1 )
+        if numpy.ndim( level ) == 0:
+            return int( level )
+        return level
+
+    def select_sphere( self, radius, distance, fov, viewport_height, num_levels = None ):
+        """Returns the level for a bounding sphere.
+
+        See projected_size.
+        """
+        return self.select(
+            projected_size( radius, distance, fov, viewport_height ),
+            num_levels
+            )
+
+def bounding_radius( positions ):
+    """Returns the radius of a sphere about the
+    origin that contains every position.
+    """
+    positions = numpy.asarray( positions ).reshape( -1, 3 )
+    if len( positions ) == 0:
+        return 0.0
+    return float( numpy.sqrt( numpy.max( numpy.sum( positions * positions, axis = -1 ) ) ) )
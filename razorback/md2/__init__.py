@@ -2,13 +2,21 @@
 Improve using tips from here
 http://developer.apple.com/library/ios/#documentation/3DDrawing/Conceptual/OpenGLES_ProgrammingGuide/TechniquesforWorkingwithVertexData/TechniquesforWorkingwithVertexData.html
 
-* move frame data out of texture and back into vertex attributes
+Every keyframe is stored in a single buffer which the
+vertex shader reads through a texture buffer.
+Selecting a frame only changes a uniform, so the VAO
+is setup once.
+
+The 'compact' frame format quantises each frame vertex
+to 8 bytes and texture coordinates to GL_UNSIGNED_SHORT.
+See razorback.md2.compact.
+
 * interleave vertex data
-* convert tu / tv to GL_SHORT / GL_UNSIGNED_SHORT
 """
 
 import os
 import math
+import tempfile
 
 import numpy
 from pyglet.gl import *
@@ -19,6 +27,15 @@ import pygly.texture
 import pymesh.md2
 
 from razorback.keyframe_mesh import KeyframeMesh
+from razorback import mesh_cache
+from razorback import lod
+from razorback import vertex_cache
+from razorback.md2.unify import process_frame_array
+from razorback.md2 import compact
+from razorback.md2.animations import AnimationTable
+from razorback.upload import buffer_data
+from razorback.loader import completed_handle
+from razorback.asset_cache import AssetCache
 
 
 class Data( object ):
@@ -37,58 +54,432 @@ class Data( object ):
         'frag': open(os.path.dirname(__file__) + '/md2.frag','r').read(),
     }
 
-    _data = {}
+    # the loaded MD2s, each load holds a reference
+    # MD2s are keyed by cache_key
+    cache = AssetCache()
+
+    # the LoadHandle and number of requests of
+    # the keys being loaded by load_async
+    _loading = {}
+
+    frame_storage_modes = ( None, 'memory', 'mmap' )
+
+    frame_formats = ( 'float', 'compact' )
+
+    @classmethod
+    def cache_key( cls, filename, frame_storage = None, lod_ratios = None, frame_format = 'float' ):
+        """
+        Returns the key of an MD2 in the cache.
+
+        The same file loaded with different options
+        is cached separately.
+        """
+        if lod_ratios != None:
+            lod_ratios = tuple( lod_ratios )
+        return (filename, lod_ratios, frame_format, frame_storage)
 
     @classmethod 
-    def load( cls, filename ): 
+    def load( cls, filename, frame_storage = None, lod_ratios = None, frame_format = 'float' ): 
         # check if the model has been loaded previously 
-        if filename in Data._data: 
+        key = Data.cache_key( filename, frame_storage, lod_ratios, frame_format )
+        data = Data.cache.acquire( key )
+        if data != None:
             # create a new mesh with the same data 
-            return Data._data[ filename ]
+            return data
 
-        data = cls( filename ) 
+        data = cls(
+            filename,
+            frame_storage = frame_storage,
+            lod_ratios = lod_ratios,
+            frame_format = frame_format
+            ) 
 
         # store mesh for later 
-        Data._data[ filename ] = data
+        Data.cache.add( key, data )
 
         return data
 
     @classmethod
-    def unload( cls, filename ):
-        if filename in Data._data:
-            del Data._data[ filename ]
+    def load_async( cls, loader, filename, frame_storage = None, lod_ratios = None, frame_format = 'float' ):
+        """
+        Loads an MD2 with a razorback.loader.AsyncLoader.
+
+        The file is parsed on a loader thread and its
+        OpenGL objects are created by AsyncLoader.pump.
+        Requests for a file that is already loading share
+        the same load. Each request holds a reference once
+        the load completes, see unload.
+
+        @return: a LoadHandle for the Data.
+        """
+        key = Data.cache_key( filename, frame_storage, lod_ratios, frame_format )
+        data = Data.cache.acquire( key )
+        if data != None:
+            return completed_handle( data )
+
+        if key not in Data._loading:
+            handle = loader.load(
+                cls,
+                filename,
+                frame_storage = frame_storage,
+                lod_ratios = lod_ratios,
+                frame_format = frame_format,
+                finalise = False
+                )
+            Data._loading[ key ] = [ handle, 0 ]
+
+            def loaded( handle ):
+                handle, references = Data._loading.pop( key )
+                if not handle.is_ready:
+                    return
+
+                # the MD2 may have been loaded by Data.load while
+                # this load was in progress, if so the requests
+                # share the cached MD2 and the duplicate is discarded
+                if key in Data.cache:
+                    handle.result = Data.cache.acquire( key, references )
+                else:
+                    Data.cache.add( key, handle.result, references )
+            handle.add_callback( loaded )
+
+        Data._loading[ key ][ 1 ] += 1
+        return Data._loading[ key ][ 0 ]
+
+    @classmethod
+    def unload( cls, filename, frame_storage = None, lod_ratios = None, frame_format = 'float' ):
+        """
+        Releases a reference acquired by load or load_async.
+
+        The options must match those the MD2 was loaded with.
+        The MD2 stays in the cache until it is evicted by
+        the cache's memory budgets.
+        """
+        Data.cache.release( Data.cache_key( filename, frame_storage, lod_ratios, frame_format ) )
+
+    @classmethod
+    def from_arrays( cls, indices, tcs, frames, frame_names = None, animations = None, frame_storage = None, lod_ratios = None, frame_format = 'float' ):
+        """
+        Creates keyframe mesh data from arrays instead
+        of an MD2 file.
+
+        This allows other animated meshes, such as baked
+        MD5 animations, to be rendered as keyframes.
+
+        @param indices: the triangle indices.
+        @param tcs: the texture coordinate of each vertex
+        (vertices x 2).
+        @param frames: the position and normal of each vertex
+        of each frame (frames x vertices x 6).
+        @param frame_names: the name of each frame.
+        If None, frames are named by their index.
+        @param animations: see AnimationTable.
+        @param lod_ratios: see Data.
+        @param frame_format: see Data.
+        """
+        if frame_names == None:
+            frame_names = [ 'frame%03i' % index for index in range( len( frames ) ) ]
+
+        return cls(
+            arrays = (frame_names, indices, tcs, frames),
+            animations = animations,
+            frame_storage = frame_storage,
+            lod_ratios = lod_ratios,
+            frame_format = frame_format
+            )
 
-    def __init__( self, filename = None, buffer = None ):
+    def __init__( self, filename = None, buffer = None, frame_storage = None, arrays = None, animations = None, lod_ratios = None, frame_format = 'float', finalise = True ):
         """
         Loads an MD2 from the specified file.
 
+        The MD2 data is discarded once it has been
+        loaded into OpenGL.
+
         @param filename: the filename to load the mesh from.
-        @param interpolation: the number of frames to generate
-        between each loaded frame.
-        0 is the default (no interpolation).
-        It is suggested to keep the value low (0-2) to avoid
-        long load times.
+        @param buffer: MD2 data to load if filename is None.
+        @param frame_storage: how the frame data is kept after
+        it has been loaded into OpenGL.
+        None discards the frame data.
+        'memory' keeps the frame data as a single
+        (frames x vertices x 6) float32 array.
+        'mmap' keeps the same array in a memory mapped file.
+        The array is available as 'frame_data'.
+        @param arrays: a tuple of frame names, indices, tcs and
+        frames to load instead of an MD2. See from_arrays.
+        @param animations: the animations of the frames.
+        If None, the standard MD2 animations are used.
+        @param lod_ratios: the fraction of triangles kept by
+        each level of detail, for example lod.default_ratios.
+        The levels are simplified from the first frame and
+        share the vertices of the full mesh.
+        If None, only the full mesh is loaded.
+        @param frame_format: how the frames are stored in OpenGL.
+        'float' stores float32 positions and normals.
+        'compact' stores quantised positions and normals,
+        see razorback.md2.compact. Frames kept by frame_storage
+        are always float32.
+        @param finalise: whether to create the OpenGL objects.
+        If False, the mesh is only parsed and finalise must
+        be run on the thread with the OpenGL context before
+        the mesh is rendered. This lets the mesh be loaded
+        on another thread, see razorback.loader.
         """
         super( Data, self ).__init__()
+
+        if frame_storage not in Data.frame_storage_modes:
+            raise ValueError( "Unknown frame storage mode '%s'" % frame_storage )
+        if frame_format not in Data.frame_formats:
+            raise ValueError( "Unknown frame format '%s'" % frame_format )
         
-        self.frames = None
+        self.frame_data = None
+        self.animation_table = None
+        self.lods = None
+        # the vertex_cache.cache_report of the mesh
+        # meshes loaded from arrays or that aren't
+        # cached aren't reordered
+        self.cache_report = None
+        self.frame_format = frame_format
+        # the compact.memory_report of the frames
+        self.memory_report = None
+        # the type and normalisation of the texture coordinates
+        self.tc_format = None
         self.vao = None
         self.tc_vbo = None
         self.indice_vbo = None
+        self.frame_vbo = None
+        self.frame_tbo = None
+        self.bounds_vbo = None
+        self.bounds_tbo = None
+        self.shader = None
+        # set once the OpenGL objects have been created
+        self.is_ready = False
+        # the arrays to upload, kept until finalise
+        self._upload = None
+        # the bytes of buffers uploaded to OpenGL
+        self.gpu_bytes = 0
+
+        # the md2 data is only kept while loading
+        self.md2 = None
+
+        cached = None
+        if arrays == None:
+            cached = mesh_cache.load( filename, 'md2' )
+
+        if arrays != None:
+            frame_names, indices, tcs, frames = arrays
+            indices = numpy.ascontiguousarray( indices, dtype = 'uint32' ).ravel()
+            tcs = numpy.ascontiguousarray( tcs, dtype = 'float32' )
+            frames = numpy.ascontiguousarray( frames, dtype = 'float32' )
+        elif cached:
+            header, blocks = cached
+            frame_names = [ str( name ) for name in header[ 'frame_names' ] ]
+            indices = blocks[ 'indices' ]
+            tcs = blocks[ 'tcs' ]
+            frames = blocks[ 'frames' ]
+            if 'cache_report' in header:
+                self.cache_report = vertex_cache.cache_report( *header[ 'cache_report' ] )
+        else:
+            md2 = pymesh.md2.MD2()
+            if filename != None:
+                md2.load( filename )
+            else:
+                md2.load_from_buffer( buffer )
+
+            frame_names = [ frame.name for frame in md2.frames ]
+            indices, tcs, frames = process_frame_array( md2 )
+            del md2
+
+            # reorder the triangles and vertices
+            # for the vertex cache
+            header = { 'frame_names': frame_names }
+            if vertex_cache.enabled( filename, indices.size // 3 ):
+                indices, order, self.cache_report = vertex_cache.optimise( indices, len( tcs ) )
+                tcs = tcs[ order ]
+                frames = frames[ :, order ]
+                header[ 'cache_report' ] = list( self.cache_report )
+
+            mesh_cache.save(
+                filename,
+                'md2',
+                [
+                    ('indices', indices),
+                    ('tcs', tcs),
+                    ('frames', frames),
+                    ],
+                header
+                )
+
+        self.animation_table = AnimationTable( frame_names, animations )
+
+        if lod_ratios != None:
+            levels = self._lod_chain( filename, indices, frames, lod_ratios )
+        else:
+            levels = [ indices ]
+        
+        self._upload = self._prepare( levels, tcs, frames )
 
+        if frame_storage == 'memory':
+            # copy memory mapped frames into memory
+            if isinstance( frames, numpy.memmap ):
+                frames = numpy.array( frames )
+            self.frame_data = frames
+        elif frame_storage == 'mmap':
+            self.frame_data = self._map_frames( frames )
+
+        if finalise:
+            for step in self.finalise():
+                pass
+
+    def __del__( self ):
+        # free our vao
+        vao = getattr( self, 'vao', None )
+        if vao:
+            glDeleteVertexArrays( 1, vao )
+
+        # free our vbos
+        # texture coords, indices and frames
+        for name in [ 'tc_vbo', 'indice_vbo', 'frame_vbo', 'bounds_vbo' ]:
+            vbo = getattr( self, name, None )
+            if vbo:
+                glDeleteBuffers( 1, vbo )
+
+        # frame textures
+        for name in [ 'frame_tbo', 'bounds_tbo' ]:
+            tbo = getattr( self, name, None )
+            if tbo:
+                glDeleteTextures( 1, tbo )
+
+    @staticmethod
+    def _map_frames( frames ):
+        """
+        Returns the frame data backed by a memory mapped file.
+
+        Frames loaded from the mesh cache are already
+        memory mapped. Otherwise the frames are written to
+        a temporary file which is deleted when the array is.
+        """
+        if isinstance( frames, numpy.memmap ):
+            return frames
+
+        array = numpy.memmap(
+            tempfile.TemporaryFile(),
+            dtype = frames.dtype,
+            mode = 'w+',
+            shape = frames.shape
+            )
+        array[:] = frames
+        array.flush()
+        return array
+
+    @staticmethod
+    def _lod_chain( filename, indices, frames, ratios ):
+        """
+        Returns the indices of each level of detail.
+
+        Levels generated from a file are cached with the
+        ratios used to generate them.
+        """
+        ratios = [ float( ratio ) for ratio in ratios ]
+
+        cached = mesh_cache.load( filename, 'md2lod' )
+        if cached:
+            header, blocks = cached
+            if header.get( 'ratios' ) == ratios:
+                return [ blocks[ 'lod%i' % level ] for level in range( len( ratios ) ) ]
+
+        levels = lod.lod_chain(
+            frames[ 0, :, 0:3 ],
+            indices,
+            ratios,
+            reorder = vertex_cache.enabled( filename, indices.size // 3 )
+            )
+
+        mesh_cache.save(
+            filename,
+            'md2lod',
+            [ ('lod%i' % level, indices) for level, indices in enumerate( levels ) ],
+            { 'ratios': ratios }
+            )
+        return levels
+
+    def _prepare( self, levels, tcs, frames ):
+        """
+        Converts the MD2 arrays to the format they are
+        stored in by OpenGL.
+
+        Every level of detail is stored in the
+        same index buffer.
+
+        @return: a tuple of the indices, the texture
+        coordinates and a list of (array, texture format)
+        for each frame texture buffer.
+        """
+        indices = numpy.concatenate( levels ).astype( 'uint32' )
+
+        # the byte offset and number of indices of each level
+        self.lods = []
+        offset = 0
+        for level in levels:
+            self.lods.append( (offset * 4, len( level )) )
+            offset += len( level )
+
+        self.num_indices = len( levels[ 0 ] )
+        self.num_vertices = len( tcs )
+
+        # compact texture coordinates are normalised shorts
+        # unless they wrap the texture
+        quantised_tcs = compact.quantise_tcs( tcs ) if self.compact else None
+        if quantised_tcs is not None:
+            tcs = quantised_tcs
+            self.tc_format = (GL_UNSIGNED_SHORT, GL_TRUE)
+        else:
+            self.tc_format = (GL_FLOAT, GL_FALSE)
+
+        float_bytes = (len( frames ) * self.num_vertices * 6 * 4) + (self.num_vertices * 2 * 4)
+        if self.compact:
+            # each vertex is a single RGBA16UI texel
+            # position.xyz, normal
+            # each frame's scale and translation is
+            # 2 RGBA32F texels
+            quantised, bounds = compact.quantise_frames( frames )
+            frame_buffers = [ (quantised, GL_RGBA16UI), (bounds, GL_RGBA32F) ]
+            self.memory_report = compact.memory_report(
+                float_bytes,
+                quantised.nbytes + bounds.nbytes + tcs.nbytes
+                )
+        else:
+            # every frame is a single buffer
+            # each vertex is 3 RG32F texels
+            # position.xy, position.z normal.x, normal.yz
+            frame_buffers = [ (frames, GL_RG32F) ]
+            self.memory_report = compact.memory_report( float_bytes, float_bytes )
+
+        self.gpu_bytes = indices.nbytes + tcs.nbytes + sum(
+            array.nbytes for array, format in frame_buffers
+            )
+
+        return indices, tcs, frame_buffers
+
+    def finalise( self ):
+        """
+        Creates the OpenGL objects of the MD2.
+
+        This is a generator that yields after each
+        object is created, so the work can be spread
+        over several frames. It must run on the thread
+        with the OpenGL context.
+        """
         self.shader = ShaderProgram(
-            Shader( GL_VERTEX_SHADER, Data.shader_source['vert'] ),
+            Shader(
+                GL_VERTEX_SHADER,
+                compact.vertex_shader( Data.shader_source['vert'], self.compact )
+                ),
             Shader( GL_FRAGMENT_SHADER, Data.shader_source['frag'] ),
             link_now = False
             )
 
         # set our shader data
         # we MUST do this before we link the shader
-        self.shader.attributes.in_position_1 = 0
-        self.shader.attributes.in_normal_1 = 1
-        self.shader.attributes.in_position_2 = 2
-        self.shader.attributes.in_normal_2 = 3
-        self.shader.attributes.in_texture_coord = 4
+        self.shader.attributes.in_texture_coord = 0
 
         self.shader.frag_location( 'out_frag_colour' )
 
@@ -98,152 +489,25 @@ class Data( object ):
         # bind our uniform indices
         self.shader.bind()
         self.shader.uniforms.in_diffuse = 0
+        self.shader.uniforms.in_frame_data = 1
+        if self.compact:
+            self.shader.uniforms.in_frame_bounds = 2
+        self.shader.uniforms.in_num_vertices = self.num_vertices
         self.shader.unbind()
+        yield
 
-        self.md2 = pymesh.md2.MD2()
-        if filename != None:
-            self.md2.load( filename )
-        else:
-            self.md2.load_from_buffer( buffer )
-        
         # load into OpenGL
-        self._load()
-
-    def __del__( self ):
-        # free our vao
-        vao = getattr( self, 'vao', None )
-        if vao:
-            glDeleteVertexArrays( 1, vao )
-
-        # free our vbos
-        # texture coords
-        tcs = getattr( self, 'tc_vbo', None )
-        if tcs:
-            glDeleteBuffer( tcs )
-
-        # indices
-        indices = getattr( self, 'indice_vbo', None )
-        if indices:
-            glDeleteBuffer( indices )
-
-        # frames
-        frames = getattr( self, 'frames', None )
-        if frames:
-            for frame in frames:
-                glDeleteBuffer( frame )
-
-    def _load( self ):
-        """
-        Prepares the MD2 for rendering by OpenGL.
-        """
-        def process_vertices( md2 ):
-            """Processes MD2 data to generate a single set
-            of indices.
-
-            MD2 is an older format that has 2 sets of indices.
-            Vertex/Normal indices (md2.triangles.vertex_indices)
-            and Texture Coordinate indices (md2.triangles.tc_indices).
-
-            The problem is that modern 3D APIs don't like this.
-            OpenGL only allows a single set of indices.
-
-            We can either, extract the vertices, normals and
-            texture coordinates using the indices.
-            This will create a lot of data.
-
-            This function provides an alternative.
-            We iterate through the indices and determine if an index
-            has a unique vertex/normal and texture coordinate value.
-            If so, the index remains and the texture coordinate is moved
-            into the vertex index location in the texture coordinate array.
-
-            If not, a new vertex/normal/texture coordinate value is created
-            and the index is updated.
-
-            This function returns a tuple containing the following values.
-            (
-                [ new indices ],
-                [ new texture coordinate array ],
-                [ frame_layout( name, vertices, normals ) ]
-                )
-            """
-            # convert our vertex / tc indices to a single indice
-            # we iterate through our list and 
-            indices = []
-            frames = [
-                (
-                    frame.name,
-                    list(frame.vertices),
-                    list(frame.normals)
-                    )
-                for frame in md2.frames
-                ]
-
-            # set the size of our texture coordinate list to the
-            # same size as one of our frame's vertex lists
-            tcs = list( [[None, None]] * len(frames[ 0 ][ 1 ]) )
-
-            for v_index, tc_index in zip(
-                md2.triangles.vertex_indices,
-                md2.triangles.tc_indices,
-                ):
-
-                indice = v_index
-
-                if \
-                    tcs[ v_index ][ 0 ] == None and \
-                    tcs[ v_index ][ 1 ] == None:
-                    # no tc set yet
-                    # set ours
-                    tcs[ v_index ][ 0 ] = md2.tcs[ tc_index ][ 0 ]
-                    tcs[ v_index ][ 1 ] = md2.tcs[ tc_index ][ 1 ]
-
-                elif \
-                    tcs[ v_index ][ 0 ] != md2.tcs[ tc_index ][ 0 ] and \
-                    tcs[ v_index ][ 1 ] != md2.tcs[ tc_index ][ 1 ]:
-
-                    # a tc has been set and it's not ours
-                    # create a new indice
-                    indice = len( tcs )
-
-                    # add a new unique vertice
-                    for frame in frames:
-                        # vertex data
-                        frame[ 1 ].append( frame[ 1 ][ v_index ] )
-                        # normal data
-                        frame[ 2 ].append( frame[ 2 ][ v_index ] )
-                    # texture coordinate
-                    tcs.append(
-                        [
-                            md2.tcs[ tc_index ][ 0 ],
-                            md2.tcs[ tc_index ][ 1 ]
-                            ]
-                        )
-
-                # store the index
-                indices.append( indice )
-
-            # convert our frames to frame tuples
-            frame_tuples = [
-                pymesh.md2.MD2.frame_layout(
-                    frame[ 0 ],
-                    numpy.array( frame[ 1 ], dtype = numpy.float ),
-                    numpy.array( frame[ 2 ], dtype = numpy.float )
-                    )
-                for frame in frames
-                ]
-
-            return (
-                numpy.array( indices ),
-                numpy.array( tcs ),
-                frame_tuples
-                )
+        for step in self._load( *self._upload ):
+            yield
+        self._upload = None
+        self.is_ready = True
 
+    def _load( self, indices, tcs, frame_buffers ):
+        """
+        Loads the prepared arrays into OpenGL.
 
-        indices, tcs, frames = process_vertices( self.md2 )
-
-        self.num_indices = len( indices )
-
+        Yields after each buffer is loaded.
+        """
         # create a vertex array object
         # and vertex buffer objects for our core data
         self.vao = (GLuint)()
@@ -255,118 +519,138 @@ class Data( object ):
         # create our vbo buffers
         # one for texture coordinates
         # one for indices
-        vbos = (GLuint * 2)()
-        glGenBuffers( len(vbos), vbos )
-        self.tc_vbo = vbos[ 0 ]
-        self.indice_vbo = vbos[ 1 ]
+        # one for every frame
+        self.tc_vbo = (GLuint)()
+        self.indice_vbo = (GLuint)()
+        self.frame_vbo = (GLuint)()
+        glGenBuffers( 1, self.tc_vbo )
+        glGenBuffers( 1, self.indice_vbo )
+        glGenBuffers( 1, self.frame_vbo )
 
         # create our texture coordintes
-        tcs = tcs.astype( 'float32' )
         glBindBuffer( GL_ARRAY_BUFFER, self.tc_vbo )
-        glBufferData(
-            GL_ARRAY_BUFFER,
-            tcs.nbytes,
-            (GLfloat * tcs.size)(*tcs.flat),
-            GL_STATIC_DRAW
-            )
+        buffer_data( GL_ARRAY_BUFFER, tcs )
+        glEnableVertexAttribArray( 0 )
+        glVertexAttribPointer( 0, 2, self.tc_format[ 0 ], self.tc_format[ 1 ], 0, 0 )
 
         # create our index buffer
-        indices = indices.astype( 'uint32' )
+        # this is stored in the vao
         glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.indice_vbo )
-        glBufferData(
-            GL_ELEMENT_ARRAY_BUFFER,
-            indices.nbytes,
-            (GLuint * indices.size)(*indices.flat),
-            GL_STATIC_DRAW
-            )
-
-        def create_frame_data( vertices, normals ):
-            vbo = (GLuint)()
-            glGenBuffers( 1, vbo )
-
-            # interleave these arrays into a single array
-            array = numpy.empty( (len(vertices) * 2, 3), dtype = 'float32' )
-            array[::2] = vertices
-            array[1::2] = normals
-
-            glBindBuffer( GL_ARRAY_BUFFER, vbo )
-            glBufferData(
-                GL_ARRAY_BUFFER,
-                array.nbytes,
-                (GLfloat * array.size)(*array.flat),
-                GL_STATIC_DRAW
-                )
-
-            return vbo
-
-        # convert our frame data into VBOs
-        self.frames = [
-            create_frame_data( frame.vertices, frame.normals )
-            for frame in frames
-            ]
+        buffer_data( GL_ELEMENT_ARRAY_BUFFER, indices )
 
         # unbind our buffers
         glBindVertexArray( 0 )
         glBindBuffer( GL_ARRAY_BUFFER, 0 )
         glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
+        yield
+
+        # load the frames
+        # compact frames also have a buffer of frame bounds
+        frames, format = frame_buffers[ 0 ]
+        self.frame_tbo = self._load_texture_buffer( self.frame_vbo, frames, format )
+        yield
+
+        if len( frame_buffers ) > 1:
+            bounds, format = frame_buffers[ 1 ]
+            self.bounds_vbo = (GLuint)()
+            glGenBuffers( 1, self.bounds_vbo )
+            self.bounds_tbo = self._load_texture_buffer( self.bounds_vbo, bounds, format )
+            yield
+
+    @staticmethod
+    def _load_texture_buffer( vbo, data, format ):
+        glBindBuffer( GL_TEXTURE_BUFFER, vbo )
+        buffer_data( GL_TEXTURE_BUFFER, data )
+
+        tbo = (GLuint)()
+        glGenTextures( 1, tbo )
+        glBindTexture( GL_TEXTURE_BUFFER, tbo )
+        glTexBuffer( GL_TEXTURE_BUFFER, format, vbo )
+
+        glBindTexture( GL_TEXTURE_BUFFER, 0 )
+        glBindBuffer( GL_TEXTURE_BUFFER, 0 )
+        return tbo
+
+    @property
+    def compact( self ):
+        return self.frame_format == 'compact'
+
+    def memory_usage( self ):
+        """
+        Returns a tuple of the host and GPU bytes used by
+        the mesh, see razorback.asset_cache.
+
+        Memory mapped frames are backed by a file and are
+        not counted as host memory.
+        """
+        host_bytes = 0
+        if self.frame_data is not None and not isinstance( self.frame_data, numpy.memmap ):
+            host_bytes = self.frame_data.nbytes
+        return host_bytes, self.gpu_bytes
+
+    def bind_frames( self ):
+        """Binds the frame data to texture unit 1 and,
+        for compact frames, the frame bounds to unit 2.
+
+        Leaves texture unit 0 active.
+        """
+        glActiveTexture( GL_TEXTURE1 )
+        glBindTexture( GL_TEXTURE_BUFFER, self.frame_tbo )
+        if self.compact:
+            glActiveTexture( GL_TEXTURE2 )
+            glBindTexture( GL_TEXTURE_BUFFER, self.bounds_tbo )
+        glActiveTexture( GL_TEXTURE0 )
 
     @property
     def num_frames( self ):
-        return len( self.md2.frames )
+        return self.animation_table.num_frames
+
+    @property
+    def frame_names( self ):
+        return self.animation_table.frame_names
+
+    @property
+    def num_lods( self ):
+        return len( self.lods )
+
+    @property
+    def lod_triangle_counts( self ):
+        """Returns the number of triangles in each
+        level of detail.
+        """
+        return [ count // 3 for offset, count in self.lods ]
+
+    def render( self, frame1, frame2, interpolation, projection, model_view, lod = 0 ):
+        """Renders the mesh.
+
+        @param lod: the level of detail to render.
+        """
+        offset, count = self.lods[ lod ]
 
-    def render( self, frame1, frame2, interpolation, projection, model_view ):
         # bind our shader and pass in our model view
         self.shader.bind()
         self.shader.uniforms.in_model_view = model_view
         self.shader.uniforms.in_projection = projection
-        self.shader.uniforms.in_fraction = interpolation
+
+        # select our frames
+        self.shader.uniforms.in_frames = ( float(frame1), float(frame2), interpolation )
 
         # we don't bind the diffuse texture
         # this is up to the caller to allow
         # multiple textures to be used per mesh instance
-        frame1_data = self.frames[ frame1 ]
-        frame2_data = self.frames[ frame2 ]
+        self.bind_frames()
 
-        # unbind the shader
         glBindVertexArray( self.vao )
 
-        vertex_size = 6 * 4
-        vertex_offset = 0 * 4
-        normal_offset = 3 * 4
-
-        # frame 1
-        glBindBuffer( GL_ARRAY_BUFFER, frame1_data )
-        glEnableVertexAttribArray( 0 )
-        glEnableVertexAttribArray( 1 )
-        glVertexAttribPointer( 0, 3, GL_FLOAT, GL_FALSE, vertex_size, vertex_offset )
-        glVertexAttribPointer( 1, 3, GL_FLOAT, GL_FALSE, vertex_size, normal_offset )
-
-        # frame 2
-        glBindBuffer( GL_ARRAY_BUFFER, frame2_data )
-        glEnableVertexAttribArray( 2 )
-        glEnableVertexAttribArray( 3 )
-        glVertexAttribPointer( 2, 3, GL_FLOAT, GL_FALSE, vertex_size, vertex_offset )
-        glVertexAttribPointer( 3, 3, GL_FLOAT, GL_FALSE, vertex_size, normal_offset )
-
-        # texture coords
-        glBindBuffer( GL_ARRAY_BUFFER, self.tc_vbo )
-        glEnableVertexAttribArray( 4 )
-        glVertexAttribPointer( 4, 2, GL_FLOAT, GL_FALSE, 0, 0 )
-
-        # indices
-        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.indice_vbo )
-
         glDrawElements(
             GL_TRIANGLES,
-            self.num_indices,
+            count,
             GL_UNSIGNED_INT,
-            0
+            offset
             )
 
         # reset our state
         glBindVertexArray( 0 )
-        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
-        glBindBuffer( GL_ARRAY_BUFFER, 0 )
         self.shader.unbind()
 
 
@@ -381,14 +665,27 @@ class MD2_Mesh( KeyframeMesh ):
     of frames.
     """
     
-    def __init__( self, filename ):
+    def __init__( self, filename, frame_storage = None, lod_ratios = None, frame_format = 'float' ):
         """
         Loads an MD2 from the specified file.
+
+        @param frame_storage: see Data.
+        @param lod_ratios: see Data.
+        @param frame_format: see Data.
         """
         super( MD2_Mesh, self ).__init__()
         
         self.filename = filename
+        self.frame_storage = frame_storage
+        self.lod_ratios = lod_ratios
+        self.frame_format = frame_format
         self.data = None
+        # the LoadHandle of an asynchronous load
+        self.handle = None
+        # the number of asynchronous loads cancelled by unload
+        self._cancelled = 0
+        # the level of detail to render
+        self.lod = 0
         self.frame_1 = 0
         self.frame_2 = 0
         self.interpolation = 0.0
@@ -403,7 +700,7 @@ class MD2_Mesh( KeyframeMesh ):
     def animations( self ):
         """Returns the frame namesfor various animations.
         """
-        return pymesh.md2.MD2.animations.keys()
+        return self.data.animation_table.names
 
     @property
     def animation( self ):
@@ -413,17 +710,11 @@ class MD2_Mesh( KeyframeMesh ):
         The animation name is taken from the standard MD2
         animation names and not from the MD2 file itself.
         """
-        for name, value in pymesh.md2.MD2.animations.items():
-            if \
-                value[ 0 ] <= self.frame_1 and \
-                value[ 1 ] >= self.frame_1:
-                return name
-        # unknown animation
-        return None
+        return self.data.animation_table.animation( self.frame_1 )
 
     @property
     def frame_name( self ):
-        return self.data.md2.frames[ self.frame_1 ].name
+        return self.data.animation_table.frame_name( self.frame_1 )
 
     @property
     def frame_rate( self ):
@@ -436,20 +727,17 @@ class MD2_Mesh( KeyframeMesh ):
         """
         anim = self.animation
         if anim:
-            return self.animation_frame_rate( self.animation )
+            return self.animation_frame_rate( anim )
         else:
-            return 7.0
+            return AnimationTable.default_frame_rate
 
     def animation_start_end_frame( self, animation ):
-        return (
-            pymesh.md2.MD2.animations[ animation ][ 0 ],
-            pymesh.md2.MD2.animations[ animation ][ 1 ]
-            )
+        return self.data.animation_table.start_end_frame( animation )
 
     def animation_frame_rate( self, animation ):
         """Returns the frame rate for the specified animation
         """
-        return pymesh.md2.MD2.animations[ animation ][ 2 ]
+        return self.data.animation_table.animation_frame_rate( animation )
 
     def load( self ):
         """
@@ -457,20 +745,83 @@ class MD2_Mesh( KeyframeMesh ):
         specified filename.
         """
         if self.data == None:
-            self.data = Data.load( self.filename )
+            self.data = Data.load(
+                self.filename,
+                self.frame_storage,
+                self.lod_ratios,
+                self.frame_format
+                )
+
+    def load_async( self, loader ):
+        """
+        Reads the MD2 data in the background using a
+        razorback.loader.AsyncLoader.
+
+        The mesh isn't rendered until is_ready is True.
+        """
+        if self.data == None and self.handle == None:
+            self.handle = Data.load_async(
+                loader,
+                self.filename,
+                self.frame_storage,
+                self.lod_ratios,
+                self.frame_format
+                )
+            self.handle.add_callback( self._loaded )
+
+    def _loaded( self, handle ):
+        # loads complete in the order they were requested
+        if self._cancelled:
+            # the load was cancelled by unload
+            # release the reference it holds
+            self._cancelled -= 1
+            if handle.is_ready:
+                Data.unload(
+                    self.filename,
+                    self.frame_storage,
+                    self.lod_ratios,
+                    self.frame_format
+                    )
+            return
+
+        self.handle = None
+        if handle.is_ready:
+            self.data = handle.result
+
+    @property
+    def is_ready( self ):
+        """Returns True once the mesh can be rendered.
+        """
+        return self.data != None and self.data.is_ready
 
     def unload( self ):
+        if self.handle != None:
+            self._cancelled += 1
+            self.handle = None
         if self.data != None:
             self.data = None
-            Data.unload( self.filename )
+            Data.unload(
+                self.filename,
+                self.frame_storage,
+                self.lod_ratios,
+                self.frame_format
+                )
 
     def render( self, projection, model_view ):
+        # meshes that are still loading aren't rendered
+        if not self.is_ready:
+            return
+
         # TODO: bind our diffuse texture to TEX0
         self.data.render(
             self.frame_1,
             self.frame_2,
             self.interpolation,
             projection,
-            model_view
+            model_view,
+            self.lod
             )
 
+
+
+from razorback.md2.crowd import MD2Crowd
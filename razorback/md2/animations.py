@@ -0,0 +1,240 @@
+"""
+Frame and animation lookup tables for MD2 meshes.
+"""
+
+import numpy
+import pymesh.md2
+
+
+class AnimationTable( object ):
+    """
+    Provides frame names and animation lookups for an
+    MD2 mesh without keeping the MD2 data loaded.
+
+    Animations are taken from the standard MD2 animation
+    definitions and not from the MD2 file itself.
+
+    Each frame stores the index of the animation it belongs
+    to, so looking up the animation of a frame doesn't
+    require searching the animation definitions.
+    """
+
+    # frame rate used for frames outside of any animation
+    default_frame_rate = 7.0
+
+    def __init__( self, frame_names, animations = None ):
+        """
+        @param frame_names: the name of each frame.
+        @param animations: a dictionary of animation name to
+        (start frame, end frame, frames per second).
+        If None, the standard MD2 animations are used.
+        """
+        super( AnimationTable, self ).__init__()
+
+        if animations == None:
+            animations = pymesh.md2.MD2.animations
+
+        # MD2 frame names are at most 16 characters
+        self.frame_names = numpy.array( frame_names, dtype = 'S16' )
+
+        self.names = sorted( animations.keys() )
+        self.start_frames = numpy.array(
+            [ animations[ name ][ 0 ] for name in self.names ],
+            dtype = 'int32'
+            )
+        self.end_frames = numpy.array(
+            [ animations[ name ][ 1 ] for name in self.names ],
+            dtype = 'int32'
+            )
+        self.frame_rates = numpy.array(
+            [ animations[ name ][ 2 ] for name in self.names ],
+            dtype = 'float32'
+            )
+        self._indices = dict(
+            (name, index)
+            for index, name in enumerate( self.names )
+            )
+
+        # the animation index of each frame
+        # -1 for frames that aren't part of an animation
+        self.frame_animations = numpy.empty( self.num_frames, dtype = 'int16' )
+        self.frame_animations.fill( -1 )
+        for index in reversed( range( len( self.names ) ) ):
+            start = self.start_frames[ index ]
+            end = self.end_frames[ index ]
+            self.frame_animations[ start : end + 1 ] = index
+
+        # the frame rate of each frame
+        # index -1 selects the default frame rate
+        rates = numpy.append( self.frame_rates, self.default_frame_rate )
+        self.frame_frame_rates = rates[ self.frame_animations ].astype( 'float32' )
+
+    @property
+    def num_frames( self ):
+        return len( self.frame_names )
+
+    @property
+    def num_animations( self ):
+        return len( self.names )
+
+    def frame_name( self, frame ):
+        return str( self.frame_names[ frame ] )
+
+    def animation_index( self, animation ):
+        """Returns the index of the named animation.
+        """
+        return self._indices[ animation ]
+
+    def animation( self, frame ):
+        """Returns the name of the animation the frame
+        belongs to, or None if it isn't part of an animation.
+        """
+        index = self.frame_animations[ frame ]
+        if index < 0:
+            return None
+        return self.names[ index ]
+
+    def frame_rate( self, frame ):
+        """Returns the frames per second of the animation
+        the frame belongs to.
+        """
+        return float( self.frame_frame_rates[ frame ] )
+
+    def start_end_frame( self, animation ):
+        index = self._indices[ animation ]
+        return (
+            int( self.start_frames[ index ] ),
+            int( self.end_frames[ index ] )
+            )
+
+    def animation_frame_rate( self, animation ):
+        return float( self.frame_rates[ self._indices[ animation ] ] )
+
+
+class AnimationStateArray( object ):
+    """
+    Stores and advances the animation state of many
+    MD2 instances at once.
+
+    Each instance has a frame position, an animation,
+    a frame rate and a loop mode. Instances with an
+    animation of -1 play every frame of the mesh.
+
+    After each step, frame1, frame2 and fractions can be
+    passed directly to the renderer.
+
+    Usage:
+        states = AnimationStateArray( data.animation_table, 1000 )
+        states.set_animation( slice( None ), 'run' )
+        states.step( dt )
+        crowd.set_instances( models, states.frame1, states.frame2, states.fractions )
+    """
+
+    loop = 0
+    clamp = 1
+
+    def __init__( self, table, count ):
+        """
+        @param table: the AnimationTable of the mesh.
+        @param count: the number of instances.
+        """
+        super( AnimationStateArray, self ).__init__()
+
+        self.table = table
+
+        self.frames = numpy.zeros( count, dtype = 'float64' )
+        self.animations = numpy.empty( count, dtype = 'int16' )
+        self.animations.fill( -1 )
+        self.rates = numpy.empty( count, dtype = 'float32' )
+        self.rates.fill( table.default_frame_rate )
+        self.loop_modes = numpy.zeros( count, dtype = 'uint8' )
+
+        self.frame1 = numpy.zeros( count, dtype = 'int32' )
+        self.frame2 = numpy.zeros( count, dtype = 'int32' )
+        self.fractions = numpy.zeros( count, dtype = 'float32' )
+
+        # the frame range of each animation
+        # index -1 selects every frame
+        self._start_frames = numpy.append( table.start_frames, 0 )
+        self._end_frames = numpy.append( table.end_frames, table.num_frames - 1 )
+
+        self._update_frames()
+
+    def __len__( self ):
+        return len( self.frames )
+
+    def set_animation( self, indices, animation, rate = None, loop_mode = None ):
+        """Starts the named animation from its first frame.
+
+        @param indices: the instances to change. Any value
+        that can index a NumPy array.
+        @param animation: the animation name.
+        @param rate: the frames per second. If None, the
+        animation's frame rate is used.
+        @param loop_mode: loop or clamp. If None, the
+        current loop mode is kept.
+        """
+        index = self.table.animation_index( animation )
+        if rate is None:
+            rate = self.table.frame_rates[ index ]
+
+        self.animations[ indices ] = index
+        self.frames[ indices ] = self.table.start_frames[ index ]
+        self.rates[ indices ] = rate
+        if loop_mode is not None:
+            self.loop_modes[ indices ] = loop_mode
+
+        self._update_frames()
+
+    def set_frames( self, indices, frames ):
+        """Moves instances to the specified frames.
+
+        The animation and frame rate of each instance is
+        taken from the frame it is moved to.
+        """
+        frames = numpy.asarray( frames, dtype = 'float64' )
+        frame_indices = frames.astype( 'int32' )
+
+        self.frames[ indices ] = frames
+        self.animations[ indices ] = self.table.frame_animations[ frame_indices ]
+        self.rates[ indices ] = self.table.frame_frame_rates[ frame_indices ]
+
+        self._update_frames()
+
+    def step( self, dt ):
+        """Advances every instance by dt seconds.
+        """
+        starts = self._start_frames[ self.animations ]
+        ends = self._end_frames[ self.animations ]
+        lengths = ends - starts + 1
+
+        frames = self.frames + self.rates * dt
+
+        looping = self.loop_modes == AnimationStateArray.loop
+        self.frames[:] = numpy.where(
+            looping,
+            starts + numpy.mod( frames - starts, lengths ),
+            numpy.clip( frames, starts, ends )
+            )
+
+        self._update_frames( starts, ends, looping )
+
+    def _update_frames( self, starts = None, ends = None, looping = None ):
+        if starts is None:
+            starts = self._start_frames[ self.animations ]
+            ends = self._end_frames[ self.animations ]
+            looping = self.loop_modes == AnimationStateArray.loop
+
+        floor = numpy.floor( self.frames )
+        self.frame1[:] = floor
+        self.fractions[:] = self.frames - floor
+
+        # the frame after the last frame is either the
+        # first frame or the last frame again
+        next_frames = self.frame1 + 1
+        past_end = next_frames > ends
+        self.frame2[:] = numpy.where(
+            past_end,
+            numpy.where( looping, starts, ends ),
+            next_frames
+            )
@@ -0,0 +1,154 @@
+"""
+Quantises MD2 keyframes into a compact vertex format.
+
+Each frame vertex is stored as 4 unsigned 16 bit integers,
+a single RGBA16UI texel.
+    * x, y, z: the position quantised between the frame's
+      minimum and maximum position. Like the MD2 format
+      itself, each frame has a scale and translation.
+    * w: the normal as an octahedral encoded 2 x 8 bit value.
+
+This is 8 bytes per vertex per frame instead of the 24
+bytes used by float32 positions and normals.
+
+Texture coordinates in the range 0.0 to 1.0 are stored as
+normalised unsigned 16 bit integers.
+"""
+
+from collections import namedtuple
+
+import numpy
+
+
+# the shader define that enables the compact format
+shader_define = 'COMPACT_FRAMES'
+
+memory_report = namedtuple(
+    'memory_report',
+    [
+        'float_bytes',
+        'bytes',
+        ]
+    )
+
+
+def octahedral_encode( normals ):
+    """Encodes unit normals as 2 unsigned bytes.
+
+    @param normals: an array of normals (... x 3).
+    @return: a uint8 array (... x 2).
+    """
+    normals = numpy.asarray( normals, dtype = 'float64' )
+
+    # project onto the octahedron
+    length = numpy.sum( numpy.abs( normals ), axis = -1 )
+    length = numpy.maximum( length, 1.0e-12 )[ ..., numpy.newaxis ]
+    projected = normals / length
+    xy = projected[ ..., 0:2 ].copy()
+
+    # fold the lower hemisphere over the upper
+    lower = projected[ ..., 2 ] < 0.0
+    signs = numpy.where( xy[ lower ] >= 0.0, 1.0, -1.0 )
+    xy[ lower ] = (1.0 - numpy.abs( xy[ lower ][ ..., ::-1 ] )) * signs
+
+    encoded = numpy.round( (xy * 0.5 + 0.5) * 255.0 )
+    return numpy.clip( encoded, 0, 255 ).astype( 'uint8' )
+
+def octahedral_decode( encoded ):
+    """Decodes normals encoded by octahedral_encode.
+
+    This matches the vertex shader.
+    """
+    xy = numpy.asarray( encoded, dtype = 'float64' ) / 255.0 * 2.0 - 1.0
+    normals = numpy.empty( xy.shape[ :-1 ] + (3,) )
+    normals[ ..., 0:2 ] = xy
+    normals[ ..., 2 ] = 1.0 - numpy.sum( numpy.abs( xy ), axis = -1 )
+
+    lower = normals[ ..., 2 ] < 0.0
+    folded = normals[ lower ]
+    signs = numpy.where( folded[ ..., 0:2 ] >= 0.0, 1.0, -1.0 )
+    folded[ ..., 0:2 ] = (1.0 - numpy.abs( folded[ ..., 1::-1 ] )) * signs
+    normals[ lower ] = folded
+
+    length = numpy.sqrt( numpy.sum( normals * normals, axis = -1 ) )
+    return normals / length[ ..., numpy.newaxis ]
+
+def quantise_frames( frames ):
+    """Quantises float32 frames (frames x vertices x 6).
+
+    @return: a tuple of the uint16 frames (frames x vertices x 4)
+    and the float32 bounds of each frame (frames x 2 x 4).
+    The bounds are the scale followed by the translation
+    of the positions.
+    """
+    frames = numpy.asarray( frames )
+    positions = frames[ ..., 0:3 ].astype( 'float64' )
+
+    minimum = positions.min( axis = 1 )
+    maximum = positions.max( axis = 1 )
+    scale = (maximum - minimum) / 65535.0
+
+    # flat frames have no scale
+    inverse = numpy.zeros_like( scale )
+    numpy.divide( 1.0, scale, out = inverse, where = scale > 0.0 )
+
+    quantised = numpy.empty( frames.shape[ :2 ] + (4,), dtype = 'uint16' )
+    quantised[ ..., 0:3 ] = numpy.round(
+        (positions - minimum[ :, numpy.newaxis ]) * inverse[ :, numpy.newaxis ]
+        )
+
+    encoded = octahedral_encode( frames[ ..., 3:6 ] ).astype( 'uint16' )
+    quantised[ ..., 3 ] = encoded[ ..., 0 ] | (encoded[ ..., 1 ] << 8)
+
+    bounds = numpy.zeros( (len( frames ), 2, 4), dtype = 'float32' )
+    bounds[ :, 0, 0:3 ] = scale
+    bounds[ :, 1, 0:3 ] = minimum
+    return quantised, bounds
+
+def dequantise_frames( quantised, bounds ):
+    """Returns float32 frames from quantise_frames.
+    """
+    frames = numpy.empty( quantised.shape[ :2 ] + (6,), dtype = 'float32' )
+    frames[ ..., 0:3 ] = (
+        quantised[ ..., 0:3 ] * bounds[ :, numpy.newaxis, 0, 0:3 ]
+        + bounds[ :, numpy.newaxis, 1, 0:3 ]
+        )
+
+    encoded = numpy.empty( quantised.shape[ :2 ] + (2,), dtype = 'uint8' )
+    encoded[ ..., 0 ] = quantised[ ..., 3 ] & 0xFF
+    encoded[ ..., 1 ] = quantised[ ..., 3 ] >> 8
+    frames[ ..., 3:6 ] = octahedral_decode( encoded )
+    return frames
+
+def quantise_tcs( tcs ):
+    """Returns the texture coordinates as normalised
+    uint16 values.
+
+    Returns None if any texture coordinate is outside
+    of the range 0.0 to 1.0, these must stay as floats.
+    """
+    tcs = numpy.asarray( tcs )
+    if len( tcs ) and (tcs.min() < 0.0 or tcs.max() > 1.0):
+        return None
+    return numpy.round( tcs * 65535.0 ).astype( 'uint16' )
+
+def vertex_shader( source, compact ):
+    """Returns the vertex shader source with the compact
+    format enabled if compact is True.
+
+    The define is inserted after the #version line.
+    """
+    if not compact:
+        return source
+    version, newline, body = source.partition( '\n' )
+    return '%s\n#define %s\n%s' % (version, shader_define, body)
+
+def format_report( name, report ):
+    """Returns a single line description of a memory report.
+    """
+    return '%s: frames %.1fKB -> %.1fKB, %.1fx smaller' % (
+        name,
+        report.float_bytes / 1024.0,
+        report.bytes / 1024.0,
+        report.float_bytes / float( max( report.bytes, 1 ) )
+        )
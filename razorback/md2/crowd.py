@@ -0,0 +1,233 @@
+import os
+
+import numpy
+from pyglet.gl import *
+
+from pygly.shader import Shader, ShaderProgram
+
+from razorback.upload import buffer_data
+from razorback.md2 import compact
+
+
+class MD2Crowd( object ):
+    """
+    Renders many instances of an MD2 mesh with
+    a single instanced draw call.
+
+    Each instance has a model matrix, 2 frames and
+    the fraction to interpolate between them.
+    Instances are added on the CPU in batches of NumPy
+    arrays and uploaded once per render.
+
+    The diffuse texture must be bound to texture unit 0
+    by the caller.
+    """
+
+    shader_source = {
+        'vert': open(os.path.dirname(__file__) + '/md2_instanced.vert','r').read(),
+        'frag': open(os.path.dirname(__file__) + '/md2.frag','r').read(),
+    }
+
+    # model matrix (16) + frame 1, frame 2, fraction (3)
+    instance_size = 19
+
+    def __init__( self, data, capacity = 1024 ):
+        """
+        @param data: the md2.Data to render.
+        The data must have been finalised.
+        @param capacity: the initial number of instances
+        to allocate. The capacity grows as required.
+        """
+        super( MD2Crowd, self ).__init__()
+
+        if not data.is_ready:
+            raise ValueError( "MD2 data hasn't been finalised" )
+
+        self.data = data
+        self.num_instances = 0
+        self.instances = numpy.zeros(
+            (capacity, MD2Crowd.instance_size),
+            dtype = 'float32'
+            )
+        self._dirty = True
+
+        self.shader = ShaderProgram(
+            Shader(
+                GL_VERTEX_SHADER,
+                compact.vertex_shader( MD2Crowd.shader_source['vert'], self.data.compact )
+                ),
+            Shader( GL_FRAGMENT_SHADER, MD2Crowd.shader_source['frag'] ),
+            link_now = False
+            )
+
+        # set our shader data
+        # we MUST do this before we link the shader
+        # a mat4 uses 4 attribute locations
+        self.shader.attributes.in_texture_coord = 0
+        self.shader.attributes.in_model = 1
+        self.shader.attributes.in_frames = 5
+
+        self.shader.frag_location( 'out_frag_colour' )
+
+        # link the shader now
+        self.shader.link()
+
+        # bind our uniform indices
+        self.shader.bind()
+        self.shader.uniforms.in_diffuse = 0
+        self.shader.uniforms.in_frame_data = 1
+        if self.data.compact:
+            self.shader.uniforms.in_frame_bounds = 2
+        self.shader.uniforms.in_num_vertices = self.data.num_vertices
+        self.shader.unbind()
+
+        self.vao = (GLuint)()
+        self.instance_vbo = (GLuint)()
+        glGenVertexArrays( 1, self.vao )
+        glGenBuffers( 1, self.instance_vbo )
+
+        glBindVertexArray( self.vao )
+
+        # texture coordinates and indices are shared
+        # with the md2 data
+        glBindBuffer( GL_ARRAY_BUFFER, self.data.tc_vbo )
+        glEnableVertexAttribArray( 0 )
+        glVertexAttribPointer( 0, 2, self.data.tc_format[ 0 ], self.data.tc_format[ 1 ], 0, 0 )
+
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.data.indice_vbo )
+
+        # per instance values
+        stride = MD2Crowd.instance_size * 4
+        glBindBuffer( GL_ARRAY_BUFFER, self.instance_vbo )
+        for column in range( 4 ):
+            glEnableVertexAttribArray( 1 + column )
+            glVertexAttribPointer( 1 + column, 4, GL_FLOAT, GL_FALSE, stride, column * 4 * 4 )
+            glVertexAttribDivisor( 1 + column, 1 )
+
+        glEnableVertexAttribArray( 5 )
+        glVertexAttribPointer( 5, 3, GL_FLOAT, GL_FALSE, stride, 16 * 4 )
+        glVertexAttribDivisor( 5, 1 )
+
+        # unbind our buffers
+        glBindVertexArray( 0 )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
+
+    def __del__( self ):
+        vao = getattr( self, 'vao', None )
+        if vao:
+            glDeleteVertexArrays( 1, vao )
+
+        vbo = getattr( self, 'instance_vbo', None )
+        if vbo:
+            glDeleteBuffers( 1, vbo )
+
+    @property
+    def capacity( self ):
+        return len( self.instances )
+
+    def clear( self ):
+        """Removes all instances.
+        """
+        self.num_instances = 0
+        self._dirty = True
+
+    def reserve( self, capacity ):
+        """Ensures there is room for the specified
+        number of instances.
+        """
+        if capacity <= self.capacity:
+            return
+
+        instances = numpy.zeros(
+            (max( capacity, self.capacity * 2 ), MD2Crowd.instance_size),
+            dtype = 'float32'
+            )
+        instances[ :self.num_instances ] = self.instances[ :self.num_instances ]
+        self.instances = instances
+
+    def add( self, models, frame1, frame2, fractions ):
+        """Adds a batch of instances.
+
+        @param models: an array of model matrices (n x 4 x 4).
+        @param frame1: an array of the first frame of each instance.
+        @param frame2: an array of the second frame of each instance.
+        @param fractions: an array of the interpolation between
+        frame1 and frame2 of each instance.
+        """
+        models = numpy.asarray( models ).reshape( -1, 16 )
+        count = len( models )
+
+        self.reserve( self.num_instances + count )
+
+        batch = self.instances[ self.num_instances : self.num_instances + count ]
+        batch[ :, 0:16 ] = models
+        batch[ :, 16 ] = frame1
+        batch[ :, 17 ] = frame2
+        batch[ :, 18 ] = fractions
+
+        self.num_instances += count
+        self._dirty = True
+
+    def set_instances( self, models, frame1, frame2, fractions ):
+        """Replaces all instances with the specified batch.
+
+        See add.
+        """
+        self.clear()
+        self.add( models, frame1, frame2, fractions )
+
+    def upload( self ):
+        """Uploads the instance data if it has changed.
+        This is called by render.
+        """
+        if not self._dirty:
+            return
+
+        # re-specify the whole buffer so the driver can
+        # orphan the previous data instead of waiting for it
+        glBindBuffer( GL_ARRAY_BUFFER, self.instance_vbo )
+        buffer_data(
+            GL_ARRAY_BUFFER,
+            self.instances[ :self.num_instances ],
+            GL_STREAM_DRAW
+            )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+
+        self._dirty = False
+
+    def render( self, projection, view, lod = 0 ):
+        """Renders every instance.
+
+        @param projection: the projection matrix.
+        @param view: the camera's model view matrix.
+        Each instance's model matrix is applied before this.
+        @param lod: the level of detail to render every
+        instance with. Use a crowd per level to mix levels.
+        """
+        if self.num_instances == 0:
+            return
+
+        offset, count = self.data.lods[ lod ]
+
+        self.upload()
+
+        self.shader.bind()
+        self.shader.uniforms.in_view = view
+        self.shader.uniforms.in_projection = projection
+
+        self.data.bind_frames()
+
+        glBindVertexArray( self.vao )
+
+        glDrawElementsInstanced(
+            GL_TRIANGLES,
+            count,
+            GL_UNSIGNED_INT,
+            offset,
+            self.num_instances
+            )
+
+        # reset our state
+        glBindVertexArray( 0 )
+        self.shader.unbind()
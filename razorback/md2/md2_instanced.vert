@@ -0,0 +1,89 @@
+#version 150
+
+// inputs
+uniform mat4 in_view;
+uniform mat4 in_projection;
+
+// the number of vertices in each frame
+uniform int in_num_vertices;
+
+#ifdef COMPACT_FRAMES
+// every frame's vertices stored as quantised
+// position.xyz and an octahedral normal in RGBA16UI texels
+uniform usamplerBuffer in_frame_data;
+// the scale and translation of each frame's
+// positions stored as 2 RGBA32F texels
+uniform samplerBuffer in_frame_bounds;
+#else
+// every frame's vertices stored as
+// position.xyz, normal.xyz in RG32F texels
+uniform samplerBuffer in_frame_data;
+#endif
+
+in vec2 in_texture_coord;
+
+// per instance values
+in mat4 in_model;
+// frame 1, frame 2 and the fraction to interpolate between them
+in vec3 in_frames;
+
+// outputs
+out vec3 ex_normal;
+out vec2 ex_texture_coord;
+
+#ifdef COMPACT_FRAMES
+vec3 octahedral_decode( uint encoded )
+{
+    vec2 xy = vec2( encoded & 0xFFu, encoded >> 8u ) / 255.0 * 2.0 - 1.0;
+    vec3 normal = vec3( xy, 1.0 - abs( xy.x ) - abs( xy.y ) );
+    if( normal.z < 0.0 )
+    {
+        // unfold the lower hemisphere
+        vec2 signs = vec2( xy.x >= 0.0 ? 1.0 : -1.0, xy.y >= 0.0 ? 1.0 : -1.0 );
+        normal.xy = (1.0 - abs( xy.yx )) * signs;
+    }
+    return normalize( normal );
+}
+
+void get_frame_vertex( int frame, out vec3 position, out vec3 normal )
+{
+    uvec4 texel = texelFetch( in_frame_data, (frame * in_num_vertices) + gl_VertexID );
+    vec3 scale = texelFetch( in_frame_bounds, (frame * 2) + 0 ).xyz;
+    vec3 translation = texelFetch( in_frame_bounds, (frame * 2) + 1 ).xyz;
+
+    position = (vec3( texel.xyz ) * scale) + translation;
+    normal = octahedral_decode( texel.w );
+}
+#else
+void get_frame_vertex( int frame, out vec3 position, out vec3 normal )
+{
+    int texel = ((frame * in_num_vertices) + gl_VertexID) * 3;
+    vec2 texel1 = texelFetch( in_frame_data, texel + 0 ).xy;
+    vec2 texel2 = texelFetch( in_frame_data, texel + 1 ).xy;
+    vec2 texel3 = texelFetch( in_frame_data, texel + 2 ).xy;
+
+    position = vec3( texel1, texel2.x );
+    normal = vec3( texel2.y, texel3 );
+}
+#endif
+
+void main()
+{
+    vec3 position_1;
+    vec3 normal_1;
+    vec3 position_2;
+    vec3 normal_2;
+    get_frame_vertex( int(in_frames.x), position_1, normal_1 );
+    get_frame_vertex( int(in_frames.y), position_2, normal_2 );
+
+    // interpolate position
+    vec4 v = mix( vec4(position_1, 1.0), vec4(position_2, 1.0), in_frames.z );
+    gl_Position = in_projection * in_view * in_model * v;
+
+    // interpolate normals
+    ex_normal = normalize( mat3(in_model) * mix( normal_1, normal_2, in_frames.z ) );
+
+    // update our texture coordinate
+    // we should include a texture matrix here
+    ex_texture_coord = in_texture_coord;
+}
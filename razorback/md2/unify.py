@@ -0,0 +1,260 @@
+"""
+Converts MD2 data to a single set of indices.
+
+MD2 is an older format that has 2 sets of indices.
+Vertex/Normal indices (md2.triangles.vertex_indices)
+and Texture Coordinate indices (md2.triangles.tc_indices).
+
+The problem is that modern 3D APIs don't like this.
+OpenGL only allows a single set of indices.
+
+We can either, extract the vertices, normals and
+texture coordinates using the indices.
+This will create a lot of data.
+
+Instead we find each unique (vertex index, texture coordinate)
+pair. The first pair to reference a vertex keeps the vertex's
+index and the texture coordinate is moved into the vertex index
+location in the texture coordinate array.
+Every other pair becomes a new vertex which is appended
+to the end of the vertex list of every frame.
+"""
+
+import numpy
+import pymesh.md2
+
+
+def unify_indices( vertex_indices, tc_indices, tcs, num_vertices ):
+    """Generates a single set of indices from the MD2 vertex
+    and texture coordinate indices.
+
+    Texture coordinates are compared by value, so
+    duplicate texture coordinates in the file do not
+    generate extra vertices.
+
+    Vertices that are never referenced by a triangle
+    receive a texture coordinate of 0.0, 0.0.
+
+    Returns a tuple containing the following values.
+    (
+        [ new indices ],
+        [ new texture coordinate array ],
+        [ source vertex index for each new vertex ]
+        )
+    """
+    vertex_indices = numpy.asarray( vertex_indices ).ravel().astype( numpy.int64 )
+    tc_indices = numpy.asarray( tc_indices ).ravel()
+    tcs = numpy.asarray( tcs, dtype = numpy.float ).reshape( -1, 2 )
+
+    # give texture coordinates with the same value the same id
+    unique_tcs, tc_ids = numpy.unique( tcs, axis = 0, return_inverse = True )
+    num_tc_ids = len( unique_tcs )
+
+    # pack each corner's (vertex, tc) pair into a single key
+    keys = vertex_indices * num_tc_ids + tc_ids[ tc_indices ]
+    pairs, first_use, pair_of_corner = numpy.unique(
+        keys,
+        return_index = True,
+        return_inverse = True
+        )
+    pair_vertices = pairs // num_tc_ids
+    pair_tcs = unique_tcs[ pairs % num_tc_ids ]
+
+    # order the pairs by the corner that first used them
+    # the first pair to use a vertex owns the vertex
+    # every other pair creates a new vertex, appended in
+    # the order they are encountered
+    by_use = numpy.argsort( first_use, kind = 'mergesort' )
+    _, owner = numpy.unique( pair_vertices[ by_use ], return_index = True )
+    is_owner = numpy.zeros( len( pairs ), dtype = numpy.bool_ )
+    is_owner[ by_use[ owner ] ] = True
+
+    new_pairs = by_use[ ~is_owner[ by_use ] ]
+
+    pair_indices = pair_vertices.copy()
+    pair_indices[ new_pairs ] = num_vertices + numpy.arange( len( new_pairs ) )
+
+    vertex_map = numpy.concatenate( (
+        numpy.arange( num_vertices ),
+        pair_vertices[ new_pairs ]
+        ) )
+
+    new_tcs = numpy.zeros( (len( vertex_map ), 2), dtype = numpy.float )
+    new_tcs[ pair_indices ] = pair_tcs
+
+    indices = pair_indices[ pair_of_corner ].astype( numpy.int_ )
+
+    return indices, new_tcs, vertex_map
+
+def process_vertices( md2 ):
+    """Processes MD2 data to generate a single set
+    of indices.
+
+    The vertices and normals of every frame are gathered
+    in a single operation.
+
+    This function returns a tuple containing the following values.
+    (
+        [ new indices ],
+        [ new texture coordinate array ],
+        [ frame_layout( name, vertices, normals ) ]
+        )
+    """
+    num_vertices = len( md2.frames[ 0 ].vertices )
+
+    indices, tcs, vertex_map = unify_indices(
+        md2.triangles.vertex_indices,
+        md2.triangles.tc_indices,
+        md2.tcs,
+        num_vertices
+        )
+
+    # gather all frames at once
+    vertices = numpy.array(
+        [ frame.vertices for frame in md2.frames ],
+        dtype = numpy.float
+        )[ :, vertex_map ]
+    normals = numpy.array(
+        [ frame.normals for frame in md2.frames ],
+        dtype = numpy.float
+        )[ :, vertex_map ]
+
+    frames = [
+        pymesh.md2.MD2.frame_layout(
+            frame.name,
+            frame_vertices,
+            frame_normals
+            )
+        for frame, frame_vertices, frame_normals in zip(
+            md2.frames,
+            vertices,
+            normals
+            )
+        ]
+
+    return indices, tcs, frames
+
+def process_frame_array( md2 ):
+    """Processes MD2 data to generate a single set
+    of indices and a single array of frame data.
+
+    Each frame vertex contains the position followed
+    by the normal.
+
+    This function returns a tuple containing the following values.
+    (
+        uint32 indices,
+        float32 texture coordinates (vertices x 2),
+        float32 frames (frames x vertices x 6)
+        )
+    """
+    num_vertices = len( md2.frames[ 0 ].vertices )
+
+    indices, tcs, vertex_map = unify_indices(
+        md2.triangles.vertex_indices,
+        md2.triangles.tc_indices,
+        md2.tcs,
+        num_vertices
+        )
+
+    # interleave the source frames then gather
+    # the unified vertices of every frame at once
+    source = numpy.empty( (len( md2.frames ), num_vertices, 6), dtype = 'float32' )
+    for frame, frame_array in zip( md2.frames, source ):
+        frame_array[ :, 0:3 ] = frame.vertices
+        frame_array[ :, 3:6 ] = frame.normals
+    frames = source.take( vertex_map, axis = 1 )
+
+    return (
+        indices.astype( 'uint32' ),
+        tcs.astype( 'float32' ),
+        frames
+        )
+
+def process_vertices_loop( md2 ):
+    """Reference implementation of process_vertices.
+
+    Iterates through every triangle corner and
+    creates a new vertex each time a vertex is used with a
+    texture coordinate that differs from the one it was
+    first used with.
+
+    This is much slower than process_vertices and
+    is kept to verify and benchmark the vectorised version.
+    """
+    # convert our vertex / tc indices to a single indice
+    indices = []
+    frames = [
+        (
+            frame.name,
+            list(frame.vertices),
+            list(frame.normals)
+            )
+        for frame in md2.frames
+        ]
+
+    # set the size of our texture coordinate list to the
+    # same size as one of our frame's vertex lists
+    tcs = [ None ] * len( frames[ 0 ][ 1 ] )
+
+    # new vertices we've created for (vertex, tc) pairs
+    pairs = {}
+
+    for v_index, tc_index in zip(
+        numpy.asarray( md2.triangles.vertex_indices ).ravel(),
+        numpy.asarray( md2.triangles.tc_indices ).ravel()
+        ):
+
+        tc = tuple( float(value) for value in md2.tcs[ tc_index ] )
+        key = (v_index, tc)
+
+        if tcs[ v_index ] == None:
+            # no tc set yet
+            # set ours
+            tcs[ v_index ] = tc
+            indice = v_index
+
+        elif tcs[ v_index ] == tc:
+            # the vertex already uses our tc
+            indice = v_index
+
+        elif key in pairs:
+            # we've already created a vertex for this pair
+            indice = pairs[ key ]
+
+        else:
+            # a tc has been set and it's not ours
+            # create a new indice
+            indice = len( tcs )
+            pairs[ key ] = indice
+
+            # add a new unique vertice
+            for frame in frames:
+                # vertex data
+                frame[ 1 ].append( frame[ 1 ][ v_index ] )
+                # normal data
+                frame[ 2 ].append( frame[ 2 ][ v_index ] )
+            # texture coordinate
+            tcs.append( tc )
+
+        # store the index
+        indices.append( int(indice) )
+
+    # unused vertices have no tc
+    tcs = [ tc if tc != None else (0.0, 0.0) for tc in tcs ]
+
+    # convert our frames to frame tuples
+    frame_tuples = [
+        pymesh.md2.MD2.frame_layout(
+            frame[ 0 ],
+            numpy.array( frame[ 1 ], dtype = numpy.float ),
+            numpy.array( frame[ 2 ], dtype = numpy.float )
+            )
+        for frame in frames
+        ]
+
+    return (
+        numpy.array( indices ),
+        numpy.array( tcs, dtype = numpy.float ),
+        frame_tuples
+        )
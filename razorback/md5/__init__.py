@@ -13,9 +13,16 @@ from pyrr import vector
 from pyrr import quaternion
 from pyrr import matrix44
 from pygly.shader import Shader, ShaderProgram
+from pymesh.md5 import MD5_Mesh
 
 from razorback.mesh import Mesh
+from razorback import mesh_cache
+from razorback import lod
+from razorback import vertex_cache
+from razorback.upload import buffer_data, buffer_sub_data, allocate_buffer
 from razorback.md5.skeleton import BaseFrameSkeleton
+from razorback.md5.skinning import Skinner
+from razorback.md5 import compact
 
 
 """
@@ -39,19 +46,52 @@ class Mesh( Mesh ):
         'frag': open(os.path.dirname(__file__) + '/md5.frag','r').read(),
     }
 
-    def __init__( self, md5mesh ):
+    def __init__( self, md5mesh, layout = 'weights', lod_ratios = None, finalise = True ):
+        """
+        @param md5mesh: see MeshData.
+        @param layout: see MeshData.
+        @param lod_ratios: see MeshData.
+        @param finalise: see MeshData.
+        A mesh that isn't finalised can be loaded by a
+        razorback.loader.AsyncLoader.
+        """
         super( Mesh, self ).__init__()
 
-        self.mesh = MeshData( md5mesh )
-        self.vbo = (GLuint)()
-        self.tbo = (GLuint)()
+        self.mesh = MeshData( md5mesh, layout = layout, lod_ratios = lod_ratios, finalise = False )
+        self.vbo = None
+        self.tbo = None
         self.shader = None
+        # set once the OpenGL objects have been created
+        self.is_ready = False
 
+        # the joint data uploaded to the bone palette
+        # this is allocated once per skeleton size
+        self.joints = None
+
+        if finalise:
+            for step in self.finalise():
+                pass
+
+    def finalise( self ):
+        """
+        Creates the OpenGL objects of the mesh.
+
+        This is a generator that yields after each
+        object is created, see MeshData.finalise.
+        """
+        for step in self.mesh.finalise():
+            yield
+
+        self.vbo = (GLuint)()
+        self.tbo = (GLuint)()
         glGenBuffers( 1, self.vbo )
         glGenTextures( 1, self.tbo )
 
         self.shader = ShaderProgram(
-            Shader( GL_VERTEX_SHADER, Mesh.shader_source['vert'] ),
+            Shader(
+                GL_VERTEX_SHADER,
+                compact.vertex_shader( Mesh.shader_source['vert'], self.mesh.compact )
+                ),
             Shader( GL_FRAGMENT_SHADER, Mesh.shader_source['frag'] ),
             link_now = False
             )
@@ -61,10 +101,14 @@ class Mesh( Mesh ):
         self.shader.attributes.in_normal = 0
         self.shader.attributes.in_texture_coord = 1
         self.shader.attributes.in_bone_indices = 2
-        self.shader.attributes.in_bone_weights_1 = 3
-        self.shader.attributes.in_bone_weights_2 = 4
-        self.shader.attributes.in_bone_weights_3 = 5
-        self.shader.attributes.in_bone_weights_4 = 6
+        if self.mesh.compact:
+            self.shader.attributes.in_position = 3
+            self.shader.attributes.in_bone_biases = 4
+        else:
+            self.shader.attributes.in_bone_weights_1 = 3
+            self.shader.attributes.in_bone_weights_2 = 4
+            self.shader.attributes.in_bone_weights_3 = 5
+            self.shader.attributes.in_bone_weights_4 = 6
         self.shader.frag_location( 'out_frag_colour' )
 
         # link the shader now
@@ -78,20 +122,24 @@ class Mesh( Mesh ):
         self.shader.uniforms.in_bone_matrices = 4
         self.shader.unbind()
 
-    def set_skeleton( self, skeleton ):
-        # load the matrices into our texture buffer
-        #matrices = skeleton.matrices
-        matrices = numpy.zeros( (skeleton.num_joints, 2, 4), dtype = 'float32' )
-        matrices[ :, 0 ] = skeleton.orientations
-        matrices[ :, 1, 0:3 ] = skeleton.positions
+        self.is_ready = True
+
+    @property
+    def num_joints( self ):
+        if self.joints is None:
+            return 0
+        return len( self.joints )
+
+    def _allocate_joints( self, num_joints ):
+        # each joint is stored as 2 RGBA texels
+        # orientation.xyzw, position.xyz
+        # or for the compact layout as the 3 rows of
+        # a 3x4 skinning matrix
+        texels = 3 if self.mesh.compact else 2
+        self.joints = numpy.zeros( (num_joints, texels, 4), dtype = 'float32' )
 
         glBindBuffer( GL_TEXTURE_BUFFER, self.vbo )
-        glBufferData(
-            GL_TEXTURE_BUFFER,
-            matrices.nbytes,
-            (GLfloat * matrices.size)(*matrices.flat),
-            GL_STATIC_DRAW
-            )
+        allocate_buffer( GL_TEXTURE_BUFFER, self.joints.nbytes, GL_STREAM_DRAW )
 
         # link to our BO
         glBindTexture( GL_TEXTURE_BUFFER, self.tbo )
@@ -100,7 +148,30 @@ class Mesh( Mesh ):
         glBindTexture( GL_TEXTURE_BUFFER, 0 )
         glBindBuffer( GL_TEXTURE_BUFFER, 0 )
 
-    def render( self, projection, model_view ):
+    def set_skeleton( self, skeleton ):
+        # the bone palette is only re-created when
+        # the number of joints changes
+        if self.num_joints != skeleton.num_joints:
+            self._allocate_joints( skeleton.num_joints )
+
+        if self.mesh.compact:
+            compact.skinning_matrices( skeleton, self.mesh.inverse_bind, out = self.joints )
+        else:
+            self.joints[ :, 0 ] = skeleton.orientations
+            self.joints[ :, 1, 0:3 ] = skeleton.positions
+
+        # orphan the previous joints so we don't wait
+        # for any draw calls still using them
+        glBindBuffer( GL_TEXTURE_BUFFER, self.vbo )
+        allocate_buffer( GL_TEXTURE_BUFFER, self.joints.nbytes, GL_STREAM_DRAW )
+        buffer_sub_data( GL_TEXTURE_BUFFER, 0, self.joints )
+        glBindBuffer( GL_TEXTURE_BUFFER, 0 )
+
+    def render( self, projection, model_view, lod = 0 ):
+        # meshes that are still loading aren't rendered
+        if not self.is_ready:
+            return
+
         # bind our shader and pass in our model view
         self.shader.bind()
         self.shader.uniforms.in_model_view = model_view
@@ -111,7 +182,7 @@ class Mesh( Mesh ):
         glBindTexture( GL_TEXTURE_BUFFER, self.tbo )
 
         # render the mesh
-        self.mesh.render()
+        self.mesh.render( lod )
 
         # restore state
         glActiveTexture( GL_TEXTURE0 + 3 )
@@ -136,22 +207,223 @@ class MeshData( object ):
             ]
         )
 
+    layouts = ( 'weights', 'compact' )
+
 
-    def __init__( self, md5mesh ):
+    def __init__( self, md5mesh, layout = 'weights', lod_ratios = None, finalise = True ):
+        """
+        @param md5mesh: a loaded MD5_Mesh or the filename of
+        an md5mesh file.
+        Mesh data loaded from a file is cached by
+        razorback.mesh_cache.
+        @param layout: the vertex layout uploaded to OpenGL.
+        'weights' stores a position per weight (80 bytes).
+        'compact' stores the bind pose position, 8 bit bone
+        indices and 16 bit biases (24 bytes) and skins with
+        inverse bind matrices. See razorback.md5.compact.
+        The weights are kept in 'arrays' for either layout.
+        @param lod_ratios: the fraction of triangles kept by
+        each level of detail, for example lod.default_ratios.
+        The levels are simplified in the bind pose and
+        share the vertices of the full meshes.
+        If None, only the full meshes are loaded.
+        @param finalise: whether to create the OpenGL objects.
+        If False, the mesh is only loaded and finalise must
+        be run on the thread with the OpenGL context before
+        the mesh is rendered.
+        """
         super( MeshData, self ).__init__()
 
-        self.md5mesh = md5mesh
+        if layout not in MeshData.layouts:
+            raise ValueError( "Unknown vertex layout '%s'" % layout )
+
+        self.md5mesh = None
+        self.filename = None
+        if isinstance( md5mesh, basestring ):
+            self.filename = md5mesh
+        else:
+            self.md5mesh = md5mesh
+
+        # the number of vertices and triangles in each mesh
+        self.mesh_sizes = None
+        # the vertex data as a mesh_layout of arrays
+        # kept for CPU side processing such as skinning
+        self.arrays = None
+        # the first triangle and number of triangles
+        # of each mesh in each level of detail
+        self.lods = None
+        self.lod_ratios = lod_ratios
+        # the triangles of every level of detail
+        # uploaded to the index buffer
+        self.indices = None
+        # a vertex_cache.cache_report for each mesh
+        # empty if the meshes weren't reordered
+        self.cache_reports = None
+        self.layout = layout
+        # the compact_layout arrays and the inverse bind
+        # matrix of each joint for the compact layout
+        self.compact_arrays = None
+        self.inverse_bind = None
         self.vaos = None
         self.vbos = None
+        # set once the OpenGL objects have been created
+        self.is_ready = False
 
         self.load()
 
+        if finalise:
+            for step in self.finalise():
+                pass
+
     def load( self ):
-        mesh = self._generate_mesh()
+        cached = mesh_cache.load( self.filename, 'md5mesh' )
+        if cached:
+            header, blocks = cached
+            mesh = MeshData.mesh_layout(
+                *[ blocks[ name ] for name in MeshData.mesh_layout._fields ]
+                )
+            self.mesh_sizes = [ tuple( sizes ) for sizes in header[ 'meshes' ] ]
+            self.cache_reports = [
+                vertex_cache.cache_report( *report )
+                for report in header.get( 'cache_reports', [] )
+                ]
+        else:
+            if self.md5mesh == None:
+                self.md5mesh = MD5_Mesh()
+                self.md5mesh.load( self.filename )
+
+            mesh = self._generate_mesh()
+            self.mesh_sizes = [
+                (submesh.num_verts, submesh.num_tris)
+                for submesh in self.md5mesh.meshes
+                ]
+
+            mesh_cache.save(
+                self.filename,
+                'md5mesh',
+                zip( MeshData.mesh_layout._fields, mesh ),
+                {
+                    'meshes': self.mesh_sizes,
+                    'cache_reports': [ list( report ) for report in self.cache_reports ],
+                    }
+                )
+
+        self.arrays = mesh
+        self.lods = [ self._triangle_ranges( [ num_tris for num_verts, num_tris in self.mesh_sizes ] ) ]
+        self.indices = mesh.indices
+
+        if self.compact:
+            self._load_compact( mesh )
+
+        if self.lod_ratios != None:
+            self._load_lods()
+
+    def finalise( self ):
+        """
+        Loads the mesh into OpenGL.
+
+        This is a generator that yields after the buffers
+        and after the vertex arrays are created, so the work
+        can be spread over several frames. It must run on the
+        thread with the OpenGL context.
+        """
+        self.vbos = self._generate_vbos( self.compact_arrays if self.compact else self.arrays )
+        yield
 
-        # load into opengl
-        self.vbos = self._generate_vbos( mesh )
         self.vaos = self._generate_vaos( self.vbos )
+        self.is_ready = True
+
+    def _load_compact( self, mesh ):
+        cached = mesh_cache.load( self.filename, 'md5compact' )
+        if cached:
+            header, blocks = cached
+            self.inverse_bind = blocks[ 'inverse_bind' ]
+            self.compact_arrays = compact.compact_layout(
+                blocks[ 'positions' ],
+                mesh.tcs,
+                blocks[ 'bone_indices' ],
+                blocks[ 'biases' ],
+                mesh.indices
+                )
+            return
+
+        # the weights are relative to the base frame
+        if self.md5mesh == None:
+            self.md5mesh = MD5_Mesh()
+            self.md5mesh.load( self.filename )
+        bind_skeleton = BaseFrameSkeleton( self.md5mesh )
+
+        self.inverse_bind = compact.inverse_bind_matrices( bind_skeleton )
+        self.compact_arrays = compact.compact_arrays( mesh, bind_skeleton )
+
+        mesh_cache.save(
+            self.filename,
+            'md5compact',
+            [
+                ('positions', self.compact_arrays.positions),
+                ('bone_indices', self.compact_arrays.bone_indices),
+                ('biases', self.compact_arrays.biases),
+                ('inverse_bind', self.inverse_bind),
+                ]
+            )
+
+    def _load_lods( self ):
+        ratios = [ float( ratio ) for ratio in self.lod_ratios ]
+        num_meshes = len( self.mesh_sizes )
+
+        # levels are only cached for the bind pose
+        cached = mesh_cache.load( self.filename, 'md5lod' )
+        if cached:
+            header, blocks = cached
+            if header.get( 'ratios' ) == ratios and header.get( 'pose' ) == 'bind':
+                self._set_lods( [
+                    [ blocks[ 'lod%i_%i' % (level, mesh) ] for mesh in range( num_meshes ) ]
+                    for level in range( 1, len( ratios ) )
+                    ] )
+                return
+
+        if self.md5mesh == None:
+            self.md5mesh = MD5_Mesh()
+            self.md5mesh.load( self.filename )
+        levels = self._lod_levels(
+            BaseFrameSkeleton( self.md5mesh ),
+            ratios,
+            vertex_cache.enabled( self.filename, self.lod_triangle_counts[ 0 ] )
+            )
+        self._set_lods( levels )
+
+        mesh_cache.save(
+            self.filename,
+            'md5lod',
+            [
+                ('lod%i_%i' % (level, mesh), indices)
+                for level, meshes in enumerate( levels, 1 )
+                for mesh, indices in enumerate( meshes )
+                ],
+            { 'ratios': ratios, 'pose': 'bind' }
+            )
+
+    @property
+    def compact( self ):
+        return self.layout == 'compact'
+
+    @property
+    def vertex_size( self ):
+        """Returns the number of bytes uploaded per vertex.
+        """
+        if self.compact:
+            arrays = self.compact_arrays
+            names = [ 'positions', 'tcs', 'bone_indices', 'biases' ]
+        else:
+            arrays = self.arrays
+            names = [ 'tcs', 'bone_indices', 'weights' ]
+
+        size = 0
+        for name in names:
+            array = numpy.asarray( getattr( arrays, name ) )
+            dtype = 'float32' if array.dtype.kind == 'f' else array.dtype
+            size += numpy.dtype( dtype ).itemsize * int( numpy.prod( array.shape[ 1: ] ) )
+        return size
 
     def _generate_mesh( self ):
         def prepare_submesh( mesh ):
@@ -242,7 +514,7 @@ class MeshData( object ):
         # prepare our mesh vertex data
         mesh_data = MeshData.mesh_layout(
             # normals
-            numpy.empty( (self.md5mesh.num_verts, 3), dtype = 'float32' ),
+            numpy.zeros( (self.md5mesh.num_verts, 3), dtype = 'float32' ),
             # tcs
             numpy.empty( (self.md5mesh.num_verts, 2), dtype = 'float32' ),
             # bone_indices
@@ -254,6 +526,9 @@ class MeshData( object ):
             numpy.empty( (self.md5mesh.num_tris, 3), dtype = 'uint32' )
             )
 
+        self.cache_reports = []
+        reorder = vertex_cache.enabled( self.filename, self.md5mesh.num_tris )
+
         current_vert_offset = 0
         current_tri_offset = 0
         for mesh in self.md5mesh.meshes:
@@ -262,6 +537,16 @@ class MeshData( object ):
             tcs, weights, bone_indices = prepare_submesh( mesh )
             #normals = prepare_normals( mesh, positions )
 
+            # reorder the triangles and vertices for the
+            # vertex cache, the skinning shader is expensive
+            tris = mesh.tris
+            if reorder:
+                tris, order, report = vertex_cache.optimise( tris, mesh.num_verts )
+                tcs = numpy.asarray( tcs )[ order ]
+                weights = weights[ order ]
+                bone_indices = bone_indices[ order ]
+                self.cache_reports.append( report )
+
             # write to our arrays
             start, end = current_vert_offset, current_vert_offset + mesh.num_verts
 
@@ -276,44 +561,128 @@ class MeshData( object ):
             # store our indices
             start, end = current_tri_offset, current_tri_offset + mesh.num_tris
 
-            mesh_data.indices[ start : end ] = mesh.tris
+            mesh_data.indices[ start : end ] = numpy.asarray( tris ).reshape( -1, 3 )
 
             # increment our current offset by the number of vertices
             current_tri_offset += mesh.num_tris
 
         return mesh_data
 
+    @staticmethod
+    def _triangle_ranges( counts, offset = 0 ):
+        ranges = []
+        for count in counts:
+            ranges.append( (offset, count) )
+            offset += count
+        return ranges
+
+    @property
+    def num_lods( self ):
+        return len( self.lods )
+
+    @property
+    def lod_triangle_counts( self ):
+        """Returns the number of triangles in each
+        level of detail.
+        """
+        return [ sum( count for offset, count in ranges ) for ranges in self.lods ]
+
+    def generate_lods( self, skeleton, ratios = lod.default_ratios ):
+        """Generates levels of detail for each mesh.
+
+        The meshes are simplified in the pose of the
+        skeleton and every level shares the mesh's vertices
+        and bone weights. Levels in the bind pose are better
+        generated with the lod_ratios option, which caches
+        them.
+
+        The levels aren't cached, so they are only reordered
+        for the vertex cache if vertex_cache.reorder_uncached
+        is set. If the mesh has been finalised the index
+        buffer is uploaded again.
+
+        @param skeleton: the skeleton to pose the mesh with.
+        @param ratios: the fraction of triangles kept by
+        each level. The first level should be 1.0.
+        """
+        reorder = vertex_cache.enabled( None, self.lod_triangle_counts[ 0 ] )
+        self._set_lods( self._lod_levels( skeleton, ratios, reorder ) )
+
+        if self.vbos != None:
+            glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.vbos.indices )
+            buffer_data( GL_ELEMENT_ARRAY_BUFFER, self.indices, dtype = 'uint32' )
+            glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
+
+    def _lod_levels( self, skeleton, ratios, reorder ):
+        """Returns the indices of each mesh for each level
+        after the full meshes.
+        """
+        skinner = Skinner.from_mesh_data( self )
+        positions, normals = skinner.skin( skeleton, normals = False )
+        skinner.close()
+
+        indices = numpy.asarray( self.arrays.indices ).reshape( -1, 3 )
+
+        # simplify each mesh with its own vertices
+        # its indices are relative to its first vertex
+        chains = []
+        vertex_offset = 0
+        triangle_offset = 0
+        for num_verts, num_tris in self.mesh_sizes:
+            chains.append(
+                lod.lod_chain(
+                    positions[ vertex_offset : vertex_offset + num_verts ],
+                    indices[ triangle_offset : triangle_offset + num_tris ],
+                    ratios,
+                    reorder = reorder
+                    )
+                )
+            vertex_offset += num_verts
+            triangle_offset += num_tris
+
+        return [
+            [ chain[ level ] for chain in chains ]
+            for level in range( 1, len( ratios ) )
+            ]
+
+    def _set_lods( self, levels ):
+        # store every level after the full meshes
+        indices = numpy.asarray( self.arrays.indices ).reshape( -1, 3 )
+        self.lods = self.lods[ :1 ]
+        arrays = [ indices.ravel() ]
+        offset = len( indices )
+        for meshes in levels:
+            counts = [ len( mesh ) // 3 for mesh in meshes ]
+            self.lods.append( self._triangle_ranges( counts, offset ) )
+            arrays.extend( meshes )
+            offset += sum( counts )
+
+        self.indices = numpy.concatenate( arrays ).astype( 'uint32' ).reshape( -1, 3 )
+
     def _generate_vbos( self, bindpose ):
-        def fill_array_buffer( vbo, data, gltype ):
+        if self.compact:
+            return self._generate_compact_vbos( bindpose )
+
+        def fill_array_buffer( vbo, data, dtype ):
             glBindBuffer( GL_ARRAY_BUFFER, vbo )
-            glBufferData(
-                GL_ARRAY_BUFFER,
-                data.nbytes,
-                (gltype * data.size)(*data.flat),
-                GL_STATIC_DRAW
-                )
+            buffer_data( GL_ARRAY_BUFFER, data, dtype = dtype )
 
-        def fill_index_buffer( bo, data, gltype ):
+        def fill_index_buffer( bo, data, dtype ):
             glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, bo )
-            glBufferData(
-                GL_ELEMENT_ARRAY_BUFFER,
-                data.nbytes,
-                (gltype * data.size)(*data.flat),
-                GL_STATIC_DRAW
-                )
+            buffer_data( GL_ELEMENT_ARRAY_BUFFER, data, dtype = dtype )
 
         # load our vertex buffers
         # these are per-vertex values
         vbos = (GLuint * 5)()
         glGenBuffers( len(vbos), vbos )
-        #fill_array_buffer( vbos[ 0 ], bindpose.normals, GLfloat )
-        fill_array_buffer( vbos[ 1 ], bindpose.tcs, GLfloat )
-        #fill_array_buffer( vbos[ 2 ], bindpose.bone_indices, GLuint )
-        fill_array_buffer( vbos[ 2 ], bindpose.bone_indices, GLfloat )
-        fill_array_buffer( vbos[ 3 ], bindpose.weights, GLfloat )
+        #fill_array_buffer( vbos[ 0 ], bindpose.normals, 'float32' )
+        fill_array_buffer( vbos[ 1 ], bindpose.tcs, 'float32' )
+        #fill_array_buffer( vbos[ 2 ], bindpose.bone_indices, 'uint32' )
+        fill_array_buffer( vbos[ 2 ], bindpose.bone_indices, 'float32' )
+        fill_array_buffer( vbos[ 3 ], bindpose.weights, 'float32' )
 
-        # triangle indices
-        fill_index_buffer( vbos[ 4 ], bindpose.indices, GLuint )
+        # triangle indices of every level of detail
+        fill_index_buffer( vbos[ 4 ], self.indices, 'uint32' )
 
         # unbind
         glBindBuffer( GL_ARRAY_BUFFER, 0 )
@@ -327,59 +696,38 @@ class MeshData( object ):
             vbos[ 4 ]
             )
 
-    def _generate_vaos( self, vbos ):
-        def calculate_offset( offset, elements, bytes ):
-            return offset * elements * bytes
-
-        # create our VAOs
-        vaos = (GLuint * self.md5mesh.num_meshes)()
-        glGenVertexArrays( self.md5mesh.num_meshes, vaos )
-
-        # bind the arrays to our VAOs
-        current_offset = 0
-        for vao, mesh in zip( vaos, self.md5mesh.meshes ):
-            glBindVertexArray( vao )
-
-            """
-            # normals
-            offset = calculate_offset( current_offset, 3, 4 )
-            glBindBuffer( GL_ARRAY_BUFFER, vbos.normals )
-            glEnableVertexAttribArray( 0 )
-            glVertexAttribPointer( 0, 3, GL_FLOAT, GL_FALSE, 0, offset )
-            """
+    def _generate_compact_vbos( self, arrays ):
+        vbos = (GLuint * 5)()
+        glGenBuffers( len(vbos), vbos )
 
-            # tcs
-            offset = calculate_offset( current_offset, 2, 4 )
-            glBindBuffer( GL_ARRAY_BUFFER, vbos.tcs )
-            glEnableVertexAttribArray( 1 )
-            glVertexAttribPointer( 1, 2, GL_FLOAT, GL_FALSE, 0, offset)
+        for vbo, name in zip( vbos, [ 'positions', 'tcs', 'bone_indices', 'biases' ] ):
+            glBindBuffer( GL_ARRAY_BUFFER, vbo )
+            buffer_data( GL_ARRAY_BUFFER, getattr( arrays, name ) )
 
-            # bone_indices
-            offset = calculate_offset( current_offset, 4, 4 )
-            glBindBuffer( GL_ARRAY_BUFFER, vbos.bone_indices )
-            glEnableVertexAttribArray( 2 )
-            #glVertexAttribIPointer( 2, 4, GL_UNSIGNED_INT, GL_FALSE, 0, offset )
-            glVertexAttribPointer( 2, 4, GL_FLOAT, GL_FALSE, 0, offset )
+        # triangle indices of every level of detail
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, vbos[ 4 ] )
+        buffer_data( GL_ELEMENT_ARRAY_BUFFER, self.indices, dtype = 'uint32' )
 
-            # weights
-            offset = calculate_offset( current_offset, 16, 4 )
-            stride = 16 * 4
-            glBindBuffer( GL_ARRAY_BUFFER, vbos.weights )
+        # unbind
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
 
-            glEnableVertexAttribArray( 3 )
-            glVertexAttribPointer( 3, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 0) )
+        return compact.compact_layout( *vbos )
 
-            glEnableVertexAttribArray( 4 )
-            glVertexAttribPointer( 4, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 4) )
+    def _generate_vaos( self, vbos ):
+        # create our VAOs
+        vaos = (GLuint * len(self.mesh_sizes))()
+        glGenVertexArrays( len(self.mesh_sizes), vaos )
 
-            glEnableVertexAttribArray( 5 )
-            glVertexAttribPointer( 5, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 8) )
+        # bind the arrays to our VAOs
+        current_offset = 0
+        for vao, (num_verts, num_tris) in zip( vaos, self.mesh_sizes ):
+            glBindVertexArray( vao )
 
-            glEnableVertexAttribArray( 6 )
-            glVertexAttribPointer( 6, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 12) )
+            self.bind_attributes( vbos, current_offset )
 
             # increment our buffer offset to the next mesh
-            current_offset += mesh.num_verts
+            current_offset += num_verts
 
             #break
 
@@ -389,10 +737,81 @@ class MeshData( object ):
 
         return vaos
 
-    def render( self ):
+    def bind_attributes( self, vbos, current_offset ):
+        """Binds the vertex attributes of a mesh to the
+        current VAO.
+
+        @param current_offset: the index of the mesh's
+        first vertex.
+        """
+        def calculate_offset( offset, elements, bytes ):
+            return offset * elements * bytes
+
+        """
+        # normals
+        offset = calculate_offset( current_offset, 3, 4 )
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.normals )
+        glEnableVertexAttribArray( 0 )
+        glVertexAttribPointer( 0, 3, GL_FLOAT, GL_FALSE, 0, offset )
+        """
+
+        # tcs
+        offset = calculate_offset( current_offset, 2, 4 )
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.tcs )
+        glEnableVertexAttribArray( 1 )
+        glVertexAttribPointer( 1, 2, GL_FLOAT, GL_FALSE, 0, offset)
+
+        if self.compact:
+            self._bind_compact_attributes( vbos, current_offset )
+            return
+
+        # bone_indices
+        offset = calculate_offset( current_offset, 4, 4 )
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.bone_indices )
+        glEnableVertexAttribArray( 2 )
+        #glVertexAttribIPointer( 2, 4, GL_UNSIGNED_INT, GL_FALSE, 0, offset )
+        glVertexAttribPointer( 2, 4, GL_FLOAT, GL_FALSE, 0, offset )
+
+        # weights
+        offset = calculate_offset( current_offset, 16, 4 )
+        stride = 16 * 4
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.weights )
+
+        glEnableVertexAttribArray( 3 )
+        glVertexAttribPointer( 3, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 0) )
+
+        glEnableVertexAttribArray( 4 )
+        glVertexAttribPointer( 4, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 4) )
+
+        glEnableVertexAttribArray( 5 )
+        glVertexAttribPointer( 5, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 8) )
+
+        glEnableVertexAttribArray( 6 )
+        glVertexAttribPointer( 6, 4, GL_FLOAT, GL_FALSE, stride, offset + (4 * 12) )
+
+    def _bind_compact_attributes( self, vbos, current_offset ):
+        # bind pose positions
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.positions )
+        glEnableVertexAttribArray( 3 )
+        glVertexAttribPointer( 3, 3, GL_FLOAT, GL_FALSE, 0, current_offset * 3 * 4 )
+
+        # bone indices are read as integers
+        if self.compact_arrays.bone_indices.dtype == numpy.uint8:
+            index_type, index_size = GL_UNSIGNED_BYTE, 1
+        else:
+            index_type, index_size = GL_UNSIGNED_SHORT, 2
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.bone_indices )
+        glEnableVertexAttribArray( 2 )
+        glVertexAttribIPointer( 2, 4, index_type, 0, current_offset * 4 * index_size )
+
+        # normalised biases
+        glBindBuffer( GL_ARRAY_BUFFER, vbos.biases )
+        glEnableVertexAttribArray( 4 )
+        glVertexAttribPointer( 4, 4, GL_UNSIGNED_SHORT, GL_TRUE, 0, current_offset * 4 * 2 )
+
+    def render( self, lod = 0 ):
         # bind our vertex attributes
-        current_offset = 0
-        for index, (vao, mesh) in enumerate( zip( self.vaos, self.md5mesh.meshes ) ):
+        for index, (vao, (current_offset, num_tris)) in enumerate( zip( self.vaos, self.lods[ lod ] ) ):
             # num indices = num tris * 3 indices per tri
             # offset = offset * 3 indices per tri * 4 bytes per element
             # bind our indices
@@ -400,13 +819,11 @@ class MeshData( object ):
             glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.vbos.indices )
             glDrawElements(
                 GL_TRIANGLES,
-                mesh.num_tris * 3,
+                num_tris * 3,
                 GL_UNSIGNED_INT,
                 current_offset * 3 * 4
                 )
 
-            current_offset += mesh.num_tris
-
             #break
 
         # reset our state
@@ -414,4 +831,5 @@ class MeshData( object ):
         glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
 
 
-
+from razorback.md5.palette import PaletteAtlas
+from razorback.md5.crowd import MD5Crowd
@@ -0,0 +1,258 @@
+"""
+Bakes MD5 animations into keyframes.
+
+Each frame of an animation is skinned on the CPU and stored
+in the same (frames x vertices x 6) position and normal layout
+used by razorback.md2.Data, so baked characters can be drawn
+with keyframe interpolation instead of skinning.
+
+Bakes of files are cached with razorback.mesh_cache.
+While baking, completed frames are written to a partial file
+so an interrupted bake resumes where it stopped.
+"""
+
+import os
+import json
+import time
+import hashlib
+from collections import namedtuple
+
+import numpy
+
+from razorback import mesh_cache
+from razorback.md2 import Data as KeyframeData
+from razorback.md5.skinning import Skinner, mesh_indices
+
+
+bake_report = namedtuple(
+    'BakeReport',
+    [
+        'frames',
+        'vertices',
+        # the size of the baked frames in bytes
+        'nbytes',
+        # the time spent baking in seconds
+        'seconds',
+        # the number of frames baked, excluding resumed frames
+        'baked_frames',
+        # True if the bake was loaded from the cache
+        'cached',
+        ]
+    )
+
+baked_layout = namedtuple(
+    'BakedAnimation',
+    [
+        'indices',
+        'tcs',
+        'frames',
+        'frame_rate',
+        'report',
+        ]
+    )
+
+
+def format_report( name, report ):
+    """Returns a single line description of a bake report.
+    """
+    return '%s: %i frames x %i vertices, %.1fMB, %.2fs, %i frames baked%s' % (
+        name,
+        report.frames,
+        report.vertices,
+        report.nbytes / (1024.0 * 1024.0),
+        report.seconds,
+        report.baked_frames,
+        ' (cached)' if report.cached else ''
+        )
+
+def _mesh_key( mesh_data ):
+    # identifies the vertices and triangles skinned by a bake
+    # the order of MeshData's vertices depends on whether it
+    # was reordered for the vertex cache, so the file alone
+    # doesn't identify them
+    digest = hashlib.sha1()
+    digest.update( repr( [ tuple( sizes ) for sizes in mesh_data.mesh_sizes ] ).encode( 'utf-8' ) )
+    for array in [
+        mesh_data.arrays.weights,
+        mesh_data.arrays.bone_indices,
+        mesh_data.arrays.indices
+        ]:
+        array = numpy.ascontiguousarray( array )
+        digest.update( ('%s%r' % (array.dtype.str, array.shape)).encode( 'utf-8' ) )
+        digest.update( array.data )
+    return digest.hexdigest()
+
+def _partial_filenames( animation_filename, kind ):
+    path = mesh_cache.cache_filename( animation_filename, kind )
+    return path + '.partial', path + '.partial.json'
+
+def _open_partial( animation_filename, kind, key, shape ):
+    # returns the partial frames and the number of
+    # frames already baked into them
+    data_path, progress_path = _partial_filenames( animation_filename, kind )
+
+    completed = 0
+    if os.path.exists( data_path ) and os.path.exists( progress_path ):
+        try:
+            with open( progress_path, 'r' ) as f:
+                progress = json.load( f )
+            if progress[ 'key' ] == key and tuple( progress[ 'shape' ] ) == shape:
+                completed = progress[ 'completed' ]
+        except (IOError, ValueError, KeyError):
+            completed = 0
+
+    if not os.path.exists( os.path.dirname( data_path ) ):
+        os.makedirs( os.path.dirname( data_path ) )
+
+    frames = numpy.memmap(
+        data_path,
+        dtype = 'float32',
+        mode = 'r+' if completed else 'w+',
+        shape = shape
+        )
+    return frames, completed
+
+def _write_progress( animation_filename, kind, key, shape, completed ):
+    data_path, progress_path = _partial_filenames( animation_filename, kind )
+    with open( progress_path, 'w' ) as f:
+        json.dump( { 'key': key, 'shape': list( shape ), 'completed': completed }, f )
+
+def _remove_partial( animation_filename, kind ):
+    for path in _partial_filenames( animation_filename, kind ):
+        if os.path.exists( path ):
+            os.remove( path )
+
+def bake_animation(
+    mesh_data,
+    animation,
+    mesh_filename = None,
+    animation_filename = None,
+    threads = None,
+    checkpoint = 16
+    ):
+    """Bakes every frame of an animation.
+
+    @param mesh_data: the md5.MeshData to skin.
+    @param animation: the md5.skeleton.Animation to bake.
+    @param mesh_filename: the md5mesh file the mesh data was
+    loaded from.
+    @param animation_filename: the md5anim file the animation
+    was loaded from. The bake is only cached and resumable if
+    both filenames are provided and the mesh cache is enabled.
+    Bakes are cached for each vertex order of the mesh data,
+    as meshes loaded from a file are reordered for the vertex
+    cache and meshes created from an MD5_Mesh aren't.
+    @param threads: see md5.skinning.Skinner.
+    @param checkpoint: the number of frames baked between
+    saving progress.
+    @return: a baked_layout of the indices, tcs, frames,
+    frame rate and a bake_report.
+    """
+    start = time.time()
+
+    indices = mesh_indices(
+        mesh_data.arrays.indices,
+        mesh_data.mesh_sizes
+        ).astype( 'uint32' ).ravel()
+    tcs = numpy.ascontiguousarray( mesh_data.arrays.tcs, dtype = 'float32' )
+    shape = (animation.num_frames, len( tcs ), 6)
+
+    cacheable = mesh_cache.enabled and mesh_filename != None and animation_filename != None
+    dependencies = []
+    if cacheable:
+        # an animation can be baked for several meshes
+        # and for several vertex orders of a mesh
+        mesh_path = os.path.abspath( mesh_filename )
+        mesh_key = _mesh_key( mesh_data )
+        kind = 'md5bake-%s' % hashlib.sha1(
+            ('%s:%s' % (mesh_path, mesh_key)).encode( 'utf-8' )
+            ).hexdigest()[ :12 ]
+        dependencies = [ mesh_filename ]
+
+    if cacheable:
+        cached = mesh_cache.load( animation_filename, kind, dependencies )
+        if cached:
+            header, blocks = cached
+            frames = blocks[ 'frames' ]
+            return baked_layout(
+                indices,
+                tcs,
+                frames,
+                animation.frame_rate,
+                bake_report(
+                    shape[ 0 ],
+                    shape[ 1 ],
+                    frames.nbytes,
+                    time.time() - start,
+                    0,
+                    True
+                    )
+                )
+
+    completed = 0
+    key = None
+    if cacheable:
+        # the partial bake is discarded if either file
+        # or the mesh data changes
+        key = [
+            mesh_path,
+            mesh_key,
+            os.stat( mesh_filename ).st_mtime,
+            os.path.abspath( animation_filename ),
+            os.stat( animation_filename ).st_mtime,
+            ]
+        frames, completed = _open_partial( animation_filename, kind, key, shape )
+    else:
+        frames = numpy.empty( shape, dtype = 'float32' )
+
+    skinner = Skinner.from_mesh_data( mesh_data, threads = threads )
+    try:
+        for index in range( completed, animation.num_frames ):
+            positions, normals = skinner.skin( animation.skeleton( index ) )
+            frames[ index, :, 0:3 ] = positions
+            frames[ index, :, 3:6 ] = normals
+
+            # save our progress so we can resume
+            baked = index + 1
+            if cacheable and (baked % checkpoint == 0 or baked == animation.num_frames):
+                frames.flush()
+                _write_progress( animation_filename, kind, key, shape, baked )
+    finally:
+        skinner.close()
+
+    report = bake_report(
+        shape[ 0 ],
+        shape[ 1 ],
+        frames.nbytes,
+        time.time() - start,
+        animation.num_frames - completed,
+        False
+        )
+
+    if cacheable:
+        mesh_cache.save(
+            animation_filename,
+            kind,
+            [ ('frames', frames) ],
+            dependencies = dependencies
+            )
+        frames = numpy.array( frames )
+        _remove_partial( animation_filename, kind )
+
+    return baked_layout( indices, tcs, frames, animation.frame_rate, report )
+
+def keyframe_data( baked, name = 'baked', frame_storage = None ):
+    """Creates an md2.Data that renders a baked animation.
+
+    The frames form a single animation with the
+    specified name.
+    """
+    return KeyframeData.from_arrays(
+        baked.indices,
+        baked.tcs,
+        baked.frames,
+        animations = {
+            name: (0, len( baked.frames ) - 1, baked.frame_rate),
+            },
+        frame_storage = frame_storage
+        )
@@ -0,0 +1,154 @@
+"""
+Converts MD5 vertex weights into a compact skinning layout.
+
+MD5 vertices store a position for each weight, relative to
+the weight's joint. This needs 4 x 4 floats per vertex.
+
+The compact layout stores each vertex once in the bind pose
+with 4 joint indices and 4 biases:
+    * position: 3 x float32
+    * bone indices: 4 x uint8, or uint16 for skeletons with
+      more than 256 joints
+    * biases: 4 x normalised uint16
+This is 24 bytes of skinning data per vertex instead of 80.
+
+Each joint is then uploaded as a skinning matrix, the joint's
+transform multiplied by the inverse of its bind pose transform.
+The matrices are stored as the 3 rows of a 3 x 4 matrix.
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from razorback.md5 import quaternions
+from razorback.md5.skinning import skin_positions
+
+
+# the shader define that enables the compact layout
+shader_define = 'COMPACT_SKINNING'
+
+compact_layout = namedtuple(
+    'MD5_CompactData',
+    [
+        'positions',
+        'tcs',
+        'bone_indices',
+        'biases',
+        'indices'
+        ]
+    )
+
+
+def transform_matrices( skeleton ):
+    """Returns the 3 x 4 transform of each joint.
+    """
+    matrices = numpy.empty( (skeleton.num_joints, 3, 4), dtype = 'float32' )
+    matrices[ :, :, 0:3 ] = quaternions.to_matrix(
+        quaternions.normalise( skeleton.orientations )
+        )
+    matrices[ :, :, 3 ] = skeleton.positions
+    return matrices
+
+def inverse_bind_matrices( skeleton ):
+    """Returns the inverse of each joint's transform
+    as 3 x 4 matrices.
+
+    @param skeleton: the bind pose, normally the
+    md5mesh base frame.
+    """
+    matrices = transform_matrices( skeleton )
+
+    # the inverse of a rotation is its transpose
+    rotations = numpy.swapaxes( matrices[ :, :, 0:3 ], 1, 2 )
+    inverse = numpy.empty_like( matrices )
+    inverse[ :, :, 0:3 ] = rotations
+    inverse[ :, :, 3 ] = -numpy.einsum( 'jab,jb->ja', rotations, matrices[ :, :, 3 ] )
+    return inverse
+
+def skinning_matrices( skeleton, inverse_bind, out = None ):
+    """Returns the skinning matrix of each joint,
+    the joint's transform multiplied by its inverse
+    bind pose transform.
+
+    @param out: an optional (joints, 3, 4) array to write to.
+    """
+    matrices = transform_matrices( skeleton )
+    if out is None:
+        out = numpy.empty_like( matrices )
+
+    rotations = matrices[ :, :, 0:3 ]
+    out[ :, :, 0:3 ] = numpy.einsum( 'jab,jbc->jac', rotations, inverse_bind[ :, :, 0:3 ] )
+    out[ :, :, 3 ] = numpy.einsum( 'jab,jb->ja', rotations, inverse_bind[ :, :, 3 ] ) + matrices[ :, :, 3 ]
+    return out
+
+def quantise_biases( biases ):
+    """Normalises the biases of each vertex and quantises
+    them to uint16.
+
+    The biases of each vertex sum to exactly 65535.
+    """
+    biases = numpy.asarray( biases, dtype = 'float64' )
+    totals = numpy.sum( biases, axis = -1 )[ :, numpy.newaxis ]
+    totals[ totals == 0.0 ] = 1.0
+
+    quantised = numpy.round( biases / totals * 65535.0 ).astype( 'int64' )
+
+    # put any rounding error in the largest bias
+    largest = numpy.argmax( quantised, axis = -1 )
+    rows = numpy.arange( len( quantised ) )
+    quantised[ rows, largest ] += 65535 - numpy.sum( quantised, axis = -1 )
+    return quantised.astype( 'uint16' )
+
+def bone_index_type( num_joints ):
+    """Returns the smallest type that can index every joint.
+    """
+    return 'uint8' if num_joints <= 256 else 'uint16'
+
+def compact_arrays( mesh, bind_skeleton ):
+    """Converts an MD5 MeshData mesh_layout to a compact_layout.
+
+    @param mesh: the mesh_layout arrays of the mesh.
+    @param bind_skeleton: the skeleton the weights are
+    relative to, normally the md5mesh base frame.
+    """
+    weights = numpy.asarray( mesh.weights )
+    joints = numpy.asarray( mesh.bone_indices ).astype( 'int32' )
+
+    # pose the vertices in the bind pose
+    positions = skin_positions(
+        weights,
+        joints,
+        bind_skeleton.positions,
+        bind_skeleton.orientations
+        ).astype( 'float32' )
+
+    return compact_layout(
+        positions,
+        mesh.tcs,
+        joints.astype( bone_index_type( bind_skeleton.num_joints ) ),
+        quantise_biases( weights[ ..., 3 ] ),
+        mesh.indices
+        )
+
+def skin_compact( positions, bone_indices, biases, matrices ):
+    """Poses compact vertices by skinning matrices.
+
+    This matches the vertex shader.
+    """
+    biases = numpy.asarray( biases, dtype = 'float32' ) / 65535.0
+    selected = matrices[ bone_indices.astype( 'int32' ) ]
+    transformed = numpy.einsum( 'vjab,vb->vja', selected[ ..., 0:3 ], positions )
+    transformed += selected[ ..., 3 ]
+    return numpy.sum( transformed * biases[ ..., numpy.newaxis ], axis = 1 )
+
+def vertex_shader( source, compact ):
+    """Returns the vertex shader source with the compact
+    layout enabled if compact is True.
+
+    The define is inserted after the #version line.
+    """
+    if not compact:
+        return source
+    version, newline, body = source.partition( '\n' )
+    return '%s\n#define %s\n%s' % (version, shader_define, body)
@@ -0,0 +1,246 @@
+import os
+
+import numpy
+from pyglet.gl import *
+
+from pygly.shader import Shader, ShaderProgram
+
+from razorback.upload import buffer_data
+
+
+class MD5Crowd( object ):
+    """
+    Renders many instances of an MD5 mesh with one
+    instanced draw call per sub-mesh.
+
+    Each instance has a model matrix and a palette base,
+    the index of its skeleton's first joint in a
+    PaletteAtlas. Every instance reads its joints from
+    the atlas' single texture buffer.
+
+    The diffuse texture must be bound to texture unit 0
+    by the caller.
+    """
+
+    shader_source = {
+        'vert': open(os.path.dirname(__file__) + '/md5_instanced.vert','r').read(),
+        'frag': open(os.path.dirname(__file__) + '/md5.frag','r').read(),
+    }
+
+    # model matrix (16) + palette base (1)
+    instance_size = 17
+
+    def __init__( self, mesh_data, atlas, capacity = 256 ):
+        """
+        @param mesh_data: the md5.MeshData to render.
+        The mesh data must have been finalised.
+        @param atlas: the PaletteAtlas holding each
+        instance's skeleton.
+        @param capacity: the initial number of instances
+        to allocate. The capacity grows as required.
+        """
+        super( MD5Crowd, self ).__init__()
+
+        if mesh_data.compact:
+            raise ValueError( "MD5Crowd requires the 'weights' vertex layout" )
+        if not mesh_data.is_ready:
+            raise ValueError( "MD5 mesh data hasn't been finalised" )
+
+        self.mesh_data = mesh_data
+        self.atlas = atlas
+        self.num_instances = 0
+        self.instances = numpy.zeros(
+            (capacity, MD5Crowd.instance_size),
+            dtype = 'float32'
+            )
+        self._dirty = True
+
+        self.shader = ShaderProgram(
+            Shader( GL_VERTEX_SHADER, MD5Crowd.shader_source['vert'] ),
+            Shader( GL_FRAGMENT_SHADER, MD5Crowd.shader_source['frag'] ),
+            link_now = False
+            )
+
+        # set our shader data
+        # we MUST do this before we link the shader
+        # these match md5.Mesh
+        self.shader.attributes.in_normal = 0
+        self.shader.attributes.in_texture_coord = 1
+        self.shader.attributes.in_bone_indices = 2
+        self.shader.attributes.in_bone_weights_1 = 3
+        self.shader.attributes.in_bone_weights_2 = 4
+        self.shader.attributes.in_bone_weights_3 = 5
+        self.shader.attributes.in_bone_weights_4 = 6
+        # a mat4 uses 4 attribute locations
+        self.shader.attributes.in_model = 7
+        self.shader.attributes.in_palette_base = 11
+        self.shader.frag_location( 'out_frag_colour' )
+
+        # link the shader now
+        self.shader.link()
+
+        # bind our uniform indices
+        self.shader.bind()
+        self.shader.uniforms.in_diffuse = 0
+        self.shader.uniforms.in_specular = 1
+        self.shader.uniforms.in_normal = 2
+        self.shader.uniforms.in_bone_matrices = 4
+        self.shader.unbind()
+
+        self.instance_vbo = (GLuint)()
+        glGenBuffers( 1, self.instance_vbo )
+
+        self.vaos = self._generate_vaos()
+
+    def __del__( self ):
+        vaos = getattr( self, 'vaos', None )
+        if vaos:
+            glDeleteVertexArrays( len( vaos ), vaos )
+
+        vbo = getattr( self, 'instance_vbo', None )
+        if vbo:
+            glDeleteBuffers( 1, vbo )
+
+    def _generate_vaos( self ):
+        mesh_sizes = self.mesh_data.mesh_sizes
+
+        vaos = (GLuint * len(mesh_sizes))()
+        glGenVertexArrays( len(mesh_sizes), vaos )
+
+        stride = MD5Crowd.instance_size * 4
+
+        current_offset = 0
+        for vao, (num_verts, num_tris) in zip( vaos, mesh_sizes ):
+            glBindVertexArray( vao )
+
+            # per vertex values are shared with the mesh data
+            self.mesh_data.bind_attributes( self.mesh_data.vbos, current_offset )
+            glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.mesh_data.vbos.indices )
+
+            # per instance values
+            glBindBuffer( GL_ARRAY_BUFFER, self.instance_vbo )
+            for column in range( 4 ):
+                glEnableVertexAttribArray( 7 + column )
+                glVertexAttribPointer( 7 + column, 4, GL_FLOAT, GL_FALSE, stride, column * 4 * 4 )
+                glVertexAttribDivisor( 7 + column, 1 )
+
+            glEnableVertexAttribArray( 11 )
+            glVertexAttribPointer( 11, 1, GL_FLOAT, GL_FALSE, stride, 16 * 4 )
+            glVertexAttribDivisor( 11, 1 )
+
+            current_offset += num_verts
+
+        # unbind
+        glBindVertexArray( 0 )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
+
+        return vaos
+
+    @property
+    def capacity( self ):
+        return len( self.instances )
+
+    def clear( self ):
+        """Removes all instances.
+        """
+        self.num_instances = 0
+        self._dirty = True
+
+    def reserve( self, capacity ):
+        """Ensures there is room for the specified
+        number of instances.
+        """
+        if capacity <= self.capacity:
+            return
+
+        instances = numpy.zeros(
+            (max( capacity, self.capacity * 2 ), MD5Crowd.instance_size),
+            dtype = 'float32'
+            )
+        instances[ :self.num_instances ] = self.instances[ :self.num_instances ]
+        self.instances = instances
+
+    def add( self, models, palette_bases ):
+        """Adds a batch of instances.
+
+        @param models: an array of model matrices (n x 4 x 4).
+        @param palette_bases: the palette base of each
+        instance's skeleton, as returned by PaletteAtlas.allocate.
+        """
+        models = numpy.asarray( models ).reshape( -1, 16 )
+        count = len( models )
+
+        self.reserve( self.num_instances + count )
+
+        batch = self.instances[ self.num_instances : self.num_instances + count ]
+        batch[ :, 0:16 ] = models
+        batch[ :, 16 ] = palette_bases
+
+        self.num_instances += count
+        self._dirty = True
+
+    def set_instances( self, models, palette_bases ):
+        """Replaces all instances with the specified batch.
+
+        See add.
+        """
+        self.clear()
+        self.add( models, palette_bases )
+
+    def upload( self ):
+        """Uploads the instance data if it has changed.
+        This is called by render.
+        """
+        if not self._dirty:
+            return
+
+        glBindBuffer( GL_ARRAY_BUFFER, self.instance_vbo )
+        buffer_data(
+            GL_ARRAY_BUFFER,
+            self.instances[ :self.num_instances ],
+            GL_STREAM_DRAW
+            )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+
+        self._dirty = False
+
+    def render( self, projection, view, lod = 0 ):
+        """Renders every instance.
+
+        The atlas must have been uploaded.
+
+        @param projection: the projection matrix.
+        @param view: the camera's model view matrix.
+        Each instance's model matrix is applied before this.
+        @param lod: the level of detail to render every
+        instance with. See the lod_ratios of MeshData.
+        """
+        if self.num_instances == 0:
+            return
+
+        self.upload()
+
+        self.shader.bind()
+        self.shader.uniforms.in_view = view
+        self.shader.uniforms.in_projection = projection
+
+        # every instance's joints are in one texture buffer
+        self.atlas.bind( 4 )
+
+        for vao, (current_offset, num_tris) in zip( self.vaos, self.mesh_data.lods[ lod ] ):
+            glBindVertexArray( vao )
+            glDrawElementsInstanced(
+                GL_TRIANGLES,
+                num_tris * 3,
+                GL_UNSIGNED_INT,
+                current_offset * 3 * 4,
+                self.num_instances
+                )
+
+        # reset our state
+        glBindVertexArray( 0 )
+
+        glBindTexture( GL_TEXTURE_BUFFER, 0 )
+        glActiveTexture( GL_TEXTURE0 )
+        self.shader.unbind()
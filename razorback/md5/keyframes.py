@@ -0,0 +1,186 @@
+"""
+Builds the skeletons of every frame of an md5anim
+with array operations.
+
+The frame components of each joint are gathered with
+indices precomputed from the hierarchy flags.
+Joints are then made relative to their parents one
+level of the hierarchy at a time, for every frame at once.
+"""
+
+import numpy
+
+from razorback.md5 import quaternions
+
+
+# hierarchy flags for each animated component
+# position x, y, z, orientation x, y, z
+component_flags = numpy.array( [ 1, 2, 4, 8, 16, 32 ] )
+
+
+def hierarchy_arrays( md5anim ):
+    """Returns the parent, flags and start index of each
+    joint of the md5anim's hierarchy as arrays.
+    """
+    joints = list( md5anim.hierarchy )
+    parents = numpy.array( [ joint.parent for joint in joints ], dtype = 'int' )
+    flags = numpy.array( [ joint.flags for joint in joints ], dtype = 'int' )
+    start_indices = numpy.array( [ joint.start_index for joint in joints ], dtype = 'int' )
+    return parents, flags, start_indices
+
+def base_frame_arrays( md5anim ):
+    """Returns the base frame positions and
+    orientations as arrays.
+    """
+    joints = list( md5anim.base_frame )
+    positions = numpy.array( [ joint.position for joint in joints ], dtype = 'float32' )
+    orientations = numpy.array( [ joint.orientation for joint in joints ], dtype = 'float32' )
+    return positions.reshape( -1, 3 ), orientations.reshape( len( joints ), -1 )
+
+def component_indices( flags, start_indices ):
+    """Returns the index into the frame data of each
+    joint's position and orientation components.
+
+    The result has the shape (joints, 6).
+    Components that aren't animated are -1 and keep
+    their base frame value.
+    """
+    animated = (flags[ :, numpy.newaxis ] & component_flags) != 0
+
+    # animated components are stored consecutively
+    # from the joint's start index
+    offsets = numpy.cumsum( animated, axis = 1 ) - animated
+    return numpy.where(
+        animated,
+        start_indices[ :, numpy.newaxis ] + offsets,
+        -1
+        )
+
+def hierarchy_levels( parents ):
+    """Returns a list of joint index arrays, one for each
+    depth of the hierarchy, excluding root joints.
+    """
+    depths = numpy.zeros( len( parents ), dtype = 'int' )
+    for index, parent in enumerate( parents ):
+        # parents should always be an bone we've
+        # previously calculated
+        assert parent < index
+        if parent >= 0:
+            depths[ index ] = depths[ parent ] + 1
+
+    return [
+        numpy.nonzero( depths == depth )[ 0 ]
+        for depth in range( 1, depths.max() + 1 if len( depths ) else 1 )
+        ]
+
+def frame_values( frame, num_components ):
+    """Returns the component values of a frame as an array.
+    """
+    values = getattr( frame, 'values', None )
+    if values is None:
+        values = [ frame.value( index ) for index in range( num_components ) ]
+    return numpy.asarray( values, dtype = 'float32' )[ :num_components ]
+
+
+class KeyframeBuilder( object ):
+    """
+    Creates the joint positions and orientations of an
+    md5anim's frames.
+
+    The hierarchy and base frame are read once, frames can
+    then be built in any order and in batches.
+    """
+
+    def __init__( self, md5anim ):
+        super( KeyframeBuilder, self ).__init__()
+
+        self.md5anim = md5anim
+
+        self.parents, flags, start_indices = hierarchy_arrays( md5anim )
+        base_positions, base_orientations = base_frame_arrays( md5anim )
+
+        self.indices = component_indices( flags, start_indices )
+        self.animated = self.indices >= 0
+        self.num_components = int( self.indices.max() + 1 ) if self.animated.any() else 0
+
+        # the base frame values of each component
+        self.base_components = numpy.hstack(
+            (base_positions, base_orientations[ :, 0:3 ])
+            )
+        self.levels = hierarchy_levels( self.parents )
+
+    @property
+    def num_joints( self ):
+        return len( self.parents )
+
+    @property
+    def num_frames( self ):
+        return len( self.md5anim.frames )
+
+    def frame_values( self, frames ):
+        """Returns the component values of the specified
+        frame indices as a (frames, components) array.
+        """
+        all_frames = self.md5anim.frames
+        return numpy.array(
+            [
+                frame_values( all_frames[ index ], self.num_components )
+                for index in frames
+                ],
+            dtype = 'float32'
+            ).reshape( len( frames ), self.num_components )
+
+    def build( self, frames = None ):
+        """Builds the skeletons of the specified frames.
+
+        @param frames: a sequence of frame indices.
+        If None, every frame is built.
+        @return: a tuple of positions (frames, joints, 3) and
+        orientations (frames, joints, 4).
+        Joint values are relative to the model, not the parent.
+        """
+        if frames is None:
+            frames = range( self.num_frames )
+
+        values = self.frame_values( frames )
+
+        # begin with the base frame values and overlay
+        # the animated values of each frame
+        components = numpy.empty(
+            (len( values ), self.num_joints, 6),
+            dtype = 'float32'
+            )
+        components[:] = self.base_components
+        components[ :, self.animated ] = values[ :, self.indices[ self.animated ] ]
+
+        positions = numpy.ascontiguousarray( components[ ..., 0:3 ] )
+        orientations = numpy.empty(
+            (len( values ), self.num_joints, 4),
+            dtype = 'float32'
+            )
+        orientations[ ..., 0:3 ] = components[ ..., 3:6 ]
+        orientations[ ..., 3 ] = quaternions.compute_w( components[ ..., 3:6 ] )
+
+        # make each joint relative to its parent
+        # parents are always processed before their children
+        for joints in self.levels:
+            parents = self.parents[ joints ]
+            parent_positions = positions[ :, parents ]
+            parent_orientations = orientations[ :, parents ]
+
+            # rotate our position by our parents
+            # and add our parent's position
+            positions[ :, joints ] = parent_positions + quaternions.apply_to_vector(
+                parent_orientations,
+                positions[ :, joints ]
+                )
+
+            # multiply our orientation by our parent's
+            orientations[ :, joints ] = quaternions.normalise(
+                quaternions.multiply(
+                    parent_orientations,
+                    orientations[ :, joints ]
+                    )
+                )
+
+        return positions, orientations
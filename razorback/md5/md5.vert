@@ -6,12 +6,20 @@ uniform mat4 in_projection;
 
 in vec3 in_normal;
 in vec2 in_texture_coord;
+#ifdef COMPACT_SKINNING
+// the bind pose position and the
+// normalised bias of each bone
+in vec3 in_position;
+in uvec4 in_bone_indices;
+in vec4 in_bone_biases;
+#else
 //in uvec4 in_bone_indices;
 in vec4 in_bone_indices;
 in vec4 in_bone_weights_1;
 in vec4 in_bone_weights_2;
 in vec4 in_bone_weights_3;
 in vec4 in_bone_weights_4;
+#endif
 
 uniform samplerBuffer in_bone_matrices;
 
@@ -68,6 +76,7 @@ vec3 get_bone_position( int weight_index )
     return texelFetch( in_bone_matrices, (weight_index * 2) + 1 ).xyz;
 }
 
+#ifndef COMPACT_SKINNING
 mat4 get_weight_matrix()
 {
     return mat4(
@@ -89,6 +98,7 @@ float get_weight_bias( int weight_index )
     mat4 weights = get_weight_matrix();
     return weights[ weight_index ].w;
 }
+#endif
 
 
 vec3 rotate_vector( vec4 quat, vec3 vec )
@@ -120,9 +130,35 @@ int get_bone_index( int index )
     return int( in_bone_indices[ index ] );
 }
 
+#ifdef COMPACT_SKINNING
+vec3 apply_bone( int index )
+{
+    // each bone is the 3 rows of a 3x4 skinning matrix
+    // which transforms the bind pose position
+    int texel = get_bone_index( index ) * 3;
+    vec4 position = vec4( in_position, 1.0 );
+    vec3 skinned = vec3(
+        dot( texelFetch( in_bone_matrices, texel + 0 ), position ),
+        dot( texelFetch( in_bone_matrices, texel + 1 ), position ),
+        dot( texelFetch( in_bone_matrices, texel + 2 ), position )
+        );
+    return skinned * in_bone_biases[ index ];
+}
+#endif
+
 
 void main()
 {
+#ifdef COMPACT_SKINNING
+    // sum the positions applied by each bone
+    ex_position = vec4(
+        apply_bone( 0 ) +
+        apply_bone( 1 ) +
+        apply_bone( 2 ) +
+        apply_bone( 3 ),
+        1.0
+        );
+#else
     // get the bone matrices
     /*
     mat4 bone1 = get_bone_matrix( get_bone_index( 0 ) );
@@ -179,6 +215,7 @@ void main()
         1.0
         );
     //ex_position = vec4( pos1, 1.0);
+#endif
 
     // apply model view matrices
     gl_Position = in_projection * in_model_view * ex_position;
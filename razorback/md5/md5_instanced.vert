@@ -0,0 +1,85 @@
+#version 150
+
+// inputs
+uniform mat4 in_view;
+uniform mat4 in_projection;
+
+in vec3 in_normal;
+in vec2 in_texture_coord;
+in vec4 in_bone_indices;
+in vec4 in_bone_weights_1;
+in vec4 in_bone_weights_2;
+in vec4 in_bone_weights_3;
+in vec4 in_bone_weights_4;
+
+// per instance values
+in mat4 in_model;
+// the index of the instance's first joint in the palette
+in float in_palette_base;
+
+// the joints of every instance
+uniform samplerBuffer in_bone_matrices;
+
+// outputs
+out vec4 ex_position;
+out vec3 ex_normal;
+out vec2 ex_texture_coord;
+
+vec4 get_bone_quaternion( int joint_index )
+{
+    return texelFetch( in_bone_matrices, (joint_index * 2) + 0 );
+}
+
+vec3 get_bone_position( int joint_index )
+{
+    return texelFetch( in_bone_matrices, (joint_index * 2) + 1 ).xyz;
+}
+
+mat4 get_weight_matrix()
+{
+    return mat4(
+        in_bone_weights_1,
+        in_bone_weights_2,
+        in_bone_weights_3,
+        in_bone_weights_4
+        );
+}
+
+vec3 rotate_vector( vec4 quat, vec3 vec )
+{
+    return vec + 2.0 * cross(cross(vec, quat.xyz ) + quat.w * vec, quat.xyz);
+}
+
+int get_bone_index( int index )
+{
+    return int( in_palette_base ) + int( in_bone_indices[ index ] );
+}
+
+vec3 apply_weight( mat4 weights, int index )
+{
+    int joint_index = get_bone_index( index );
+    vec3 position = get_bone_position( joint_index ) + rotate_vector(
+        get_bone_quaternion( joint_index ),
+        weights[ index ].xyz
+        );
+    return position * weights[ index ].w;
+}
+
+void main()
+{
+    mat4 weights = get_weight_matrix();
+
+    // sum the positions applied by the weights
+    ex_position = vec4(
+        apply_weight( weights, 0 ) +
+        apply_weight( weights, 1 ) +
+        apply_weight( weights, 2 ) +
+        apply_weight( weights, 3 ),
+        1.0
+        );
+
+    // apply model view matrices
+    gl_Position = in_projection * in_view * in_model * ex_position;
+
+    ex_texture_coord = in_texture_coord;
+}
@@ -0,0 +1,166 @@
+"""
+Packs the joints of many skeletons into a single
+texture buffer.
+"""
+
+import bisect
+
+import numpy
+from pyglet.gl import *
+
+from razorback.upload import buffer_sub_data, allocate_buffer
+
+
+class PaletteAtlas( object ):
+    """
+    Stores the current joints of many skeletons in one
+    texture buffer so they can be rendered without
+    binding a texture buffer per skeleton.
+
+    Each skeleton is given a range of joints, its palette
+    base, with allocate. Joints are stored in the same layout
+    as md5.Mesh, 2 RGBA texels per joint, orientation.xyzw and
+    position.xyz. The shader adds the palette base to each
+    bone index.
+
+    Skeletons are written on the CPU with set_skeleton and
+    uploaded together once per frame with upload.
+    """
+
+    def __init__( self, capacity = 1024 ):
+        """
+        @param capacity: the initial number of joints.
+        The atlas grows as required.
+        """
+        super( PaletteAtlas, self ).__init__()
+
+        self.joints = numpy.zeros( (capacity, 2, 4), dtype = 'float32' )
+
+        # the number of joints in use, including free ranges
+        # below the last allocated range
+        self.size = 0
+        # palette base to number of joints
+        self.ranges = {}
+        # free (base, number of joints) ranges
+        self.free = []
+
+        self._allocated_bytes = 0
+
+        self.vbo = (GLuint)()
+        self.tbo = (GLuint)()
+        glGenBuffers( 1, self.vbo )
+        glGenTextures( 1, self.tbo )
+
+    def __del__( self ):
+        vbo = getattr( self, 'vbo', None )
+        if vbo:
+            glDeleteBuffers( 1, vbo )
+
+        tbo = getattr( self, 'tbo', None )
+        if tbo:
+            glDeleteTextures( 1, tbo )
+
+    @property
+    def capacity( self ):
+        return len( self.joints )
+
+    def allocate( self, num_joints ):
+        """Reserves a range of joints for a skeleton.
+
+        @return: the palette base of the range.
+        """
+        # re-use the first free range that is large enough
+        for index, (base, count) in enumerate( self.free ):
+            if count >= num_joints:
+                if count == num_joints:
+                    del self.free[ index ]
+                else:
+                    self.free[ index ] = (base + num_joints, count - num_joints)
+                self.ranges[ base ] = num_joints
+                return base
+
+        if self.size + num_joints > self.capacity:
+            joints = numpy.zeros(
+                (max( self.size + num_joints, self.capacity * 2 ), 2, 4),
+                dtype = 'float32'
+                )
+            joints[ :self.size ] = self.joints[ :self.size ]
+            self.joints = joints
+
+        base = self.size
+        self.size += num_joints
+        self.ranges[ base ] = num_joints
+        return base
+
+    def release( self, base ):
+        """Returns a range of joints to the atlas.
+
+        The range is merged with any adjacent free ranges.
+        Free ranges at the end of the atlas are removed
+        so they are no longer uploaded.
+        """
+        count = self.ranges.pop( base )
+
+        # merge with the free ranges either side
+        index = bisect.bisect( self.free, (base, count) )
+        if index < len( self.free ) and self.free[ index ][ 0 ] == base + count:
+            count += self.free.pop( index )[ 1 ]
+        if index > 0:
+            previous_base, previous_count = self.free[ index - 1 ]
+            if previous_base + previous_count == base:
+                index -= 1
+                del self.free[ index ]
+                base = previous_base
+                count += previous_count
+
+        if base + count == self.size:
+            self.size = base
+        else:
+            self.free.insert( index, (base, count) )
+
+    def set_skeleton( self, base, skeleton ):
+        """Writes the skeleton's joints into the range
+        beginning at base.
+        """
+        count = self.ranges[ base ]
+        if skeleton.num_joints != count:
+            raise ValueError(
+                "Skeleton has %i joints, range has %i" % (skeleton.num_joints, count)
+                )
+
+        joints = self.joints[ base : base + count ]
+        joints[ :, 0 ] = skeleton.orientations
+        joints[ :, 1, 0:3 ] = skeleton.positions
+
+    def upload( self ):
+        """Uploads every skeleton's joints.
+
+        Free ranges are skipped.
+        """
+        glBindBuffer( GL_TEXTURE_BUFFER, self.vbo )
+
+        # orphan the previous joints so we don't wait
+        # for any draw calls still using them
+        allocate_buffer( GL_TEXTURE_BUFFER, self.joints.nbytes, GL_STREAM_DRAW )
+
+        # upload the allocated joints between each free range
+        joint_bytes = self.joints.strides[ 0 ]
+        start = 0
+        for base, count in self.free + [ (self.size, 0) ]:
+            if base > start:
+                buffer_sub_data( GL_TEXTURE_BUFFER, start * joint_bytes, self.joints[ start:base ] )
+            start = base + count
+
+        # the texture buffer only needs to be linked
+        # when the buffer is first created or grows
+        if self._allocated_bytes != self.joints.nbytes:
+            self._allocated_bytes = self.joints.nbytes
+            glBindTexture( GL_TEXTURE_BUFFER, self.tbo )
+            glTexBuffer( GL_TEXTURE_BUFFER, GL_RGBA32F, self.vbo )
+            glBindTexture( GL_TEXTURE_BUFFER, 0 )
+
+        glBindBuffer( GL_TEXTURE_BUFFER, 0 )
+
+    def bind( self, unit ):
+        glActiveTexture( GL_TEXTURE0 + unit )
+        glBindTexture( GL_TEXTURE_BUFFER, self.tbo )
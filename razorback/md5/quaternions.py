@@ -0,0 +1,148 @@
+"""
+Quaternion functions that operate on arrays of quaternions.
+
+Quaternions are stored as [x, y, z, w] along the last axis,
+matching pyrr.quaternion. Every function broadcasts over the
+leading axes, so a whole skeleton, or a whole animation,
+can be processed with a single call.
+"""
+
+import numpy
+
+
+def compute_w( xyz ):
+    """Computes the W component of unit quaternions from
+    their X, Y and Z components.
+
+    Matches pymesh.md5.common.compute_quaternion_w.
+    """
+    w = 1.0 - numpy.sum( xyz * xyz, axis = -1 )
+    numpy.maximum( w, 0.0, out = w )
+    return numpy.sqrt( w, out = w )
+
+def multiply( quat1, quat2, out = None ):
+    """Multiplies quat1 by quat2.
+
+    Equivalent to pyrr.quaternion.cross( quat1, quat2 ).
+    """
+    x1, y1, z1, w1 = numpy.rollaxis( numpy.asarray( quat1 ), -1 )
+    x2, y2, z2, w2 = numpy.rollaxis( numpy.asarray( quat2 ), -1 )
+
+    if out is None:
+        shape = numpy.broadcast( x1, x2 ).shape + (4,)
+        out = numpy.empty( shape, dtype = numpy.result_type( quat1, quat2 ) )
+
+    # calculate into temporaries in case out is one of the inputs
+    x = x1 * w2 + y1 * z2 - z1 * y2 + w1 * x2
+    y = -x1 * z2 + y1 * w2 + z1 * x2 + w1 * y2
+    z = x1 * y2 - y1 * x2 + z1 * w2 + w1 * z2
+    w = -x1 * x2 - y1 * y2 - z1 * z2 + w1 * w2
+
+    out[ ..., 0 ] = x
+    out[ ..., 1 ] = y
+    out[ ..., 2 ] = z
+    out[ ..., 3 ] = w
+    return out
+
+def apply_to_vector( quat, vec ):
+    """Rotates 3 component vectors by quaternions.
+
+    Equivalent to pyrr.quaternion.apply_to_vector, which
+    calculates quat * vec * conjugate( quat ).
+    The quaternions do not need to be unit length.
+    """
+    quat = numpy.asarray( quat )
+    vec = numpy.asarray( vec )
+
+    u = quat[ ..., 0:3 ]
+    w = quat[ ..., 3:4 ]
+
+    uv = numpy.sum( u * vec, axis = -1 )[ ..., numpy.newaxis ]
+    uu = numpy.sum( u * u, axis = -1 )[ ..., numpy.newaxis ]
+
+    return (w * w - uu) * vec + 2.0 * uv * u + 2.0 * w * numpy.cross( u, vec )
+
+def to_matrix( quat ):
+    """Converts unit quaternions to 3x3 rotation matrices.
+
+    The matrices rotate column vectors the same as
+    apply_to_vector, ie. numpy.dot( matrix, vec ).
+    """
+    x, y, z, w = numpy.rollaxis( numpy.asarray( quat ), -1 )
+
+    matrix = numpy.empty( x.shape + (3, 3), dtype = numpy.result_type( quat, 'float32' ) )
+    matrix[ ..., 0, 0 ] = 1.0 - 2.0 * (y * y + z * z)
+    matrix[ ..., 0, 1 ] = 2.0 * (x * y - z * w)
+    matrix[ ..., 0, 2 ] = 2.0 * (x * z + y * w)
+    matrix[ ..., 1, 0 ] = 2.0 * (x * y + z * w)
+    matrix[ ..., 1, 1 ] = 1.0 - 2.0 * (x * x + z * z)
+    matrix[ ..., 1, 2 ] = 2.0 * (y * z - x * w)
+    matrix[ ..., 2, 0 ] = 2.0 * (x * z - y * w)
+    matrix[ ..., 2, 1 ] = 2.0 * (y * z + x * w)
+    matrix[ ..., 2, 2 ] = 1.0 - 2.0 * (x * x + y * y)
+    return matrix
+
+def normalise( quat, out = None ):
+    """Normalises quaternions to unit length.
+    """
+    quat = numpy.asarray( quat )
+    length = numpy.sqrt( numpy.sum( quat * quat, axis = -1 ) )[ ..., numpy.newaxis ]
+    return numpy.divide( quat, length, out = out )
+
+def _shortest_path( quat1, quat2 ):
+    # negate quat2 where it is on the opposite hemisphere
+    # so we interpolate along the shortest path
+    dot = numpy.sum( quat1 * quat2, axis = -1 )[ ..., numpy.newaxis ]
+    sign = numpy.where( dot < 0.0, -1.0, 1.0 )
+    return dot * sign, sign
+
+def nlerp( quat1, quat2, t, out = None ):
+    """Linearly interpolates between quaternions and
+    normalises the result.
+
+    Faster than slerp, but the rate of rotation is
+    not constant.
+
+    @param t: the interpolation, 0.0 returns quat1 and 1.0
+    returns quat2. May be a scalar or an array with the
+    same leading shape as the quaternions.
+    @param out: an optional array to write the result to.
+    This may be quat1.
+    """
+    quat1 = numpy.asarray( quat1 )
+    quat2 = numpy.asarray( quat2 )
+    t = numpy.asarray( t )
+    if t.ndim:
+        t = t[ ..., numpy.newaxis ]
+
+    dot, sign = _shortest_path( quat1, quat2 )
+    result = quat1 * (1.0 - t) + quat2 * (sign * t)
+    return normalise( result, out = out )
+
+def slerp( quat1, quat2, t, out = None ):
+    """Spherically interpolates between quaternions.
+
+    Quaternions that are almost identical are
+    linearly interpolated.
+
+    See nlerp for the parameters.
+    """
+    quat1 = numpy.asarray( quat1 )
+    quat2 = numpy.asarray( quat2 )
+    t = numpy.asarray( t )
+    if t.ndim:
+        t = t[ ..., numpy.newaxis ]
+
+    dot, sign = _shortest_path( quat1, quat2 )
+    numpy.minimum( dot, 1.0, out = dot )
+
+    theta = numpy.arccos( dot )
+    sin_theta = numpy.sin( theta )
+    linear = sin_theta < 1.0e-6
+    sin_theta[ linear ] = 1.0
+
+    weight1 = numpy.where( linear, 1.0 - t, numpy.sin( (1.0 - t) * theta ) / sin_theta )
+    weight2 = numpy.where( linear, t, numpy.sin( t * theta ) / sin_theta )
+
+    result = quat1 * weight1 + quat2 * (sign * weight2)
+    return normalise( result, out = out )
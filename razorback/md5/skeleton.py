@@ -1,5 +1,5 @@
 import os
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 import numpy
 from pyglet.gl import *
@@ -9,6 +9,10 @@ from pyrr import matrix44
 from pygly.shader import Shader, ShaderProgram
 from pymesh.md5.common import compute_quaternion_w
 
+from razorback.upload import buffer_data
+from razorback.md5.keyframes import KeyframeBuilder
+from razorback.md5 import quaternions
+
 
 class Skeleton( object ):
 
@@ -21,12 +25,12 @@ class Skeleton( object ):
             ]
         )
 
-    def __init__( self ):
+    def __init__( self, parents = None, positions = None, orientations = None ):
         super( Skeleton, self ).__init__()
 
-        self.parents = None
-        self.positions = None
-        self.orientations = None
+        self.parents = parents
+        self.positions = positions
+        self.orientations = orientations
 
     @property
     def num_joints( self ):
@@ -83,9 +87,53 @@ class Skeleton( object ):
             dtype = 'float32'
             )
 
+    @classmethod
+    def empty( cls, parents ):
+        """Creates a skeleton with uninitialised joints.
+        Used as the output of interpolate.
+        """
+        return Skeleton(
+            parents,
+            numpy.empty( (len( parents ), 3), dtype = 'float32' ),
+            numpy.empty( (len( parents ), 4), dtype = 'float32' )
+            )
+
     @staticmethod
-    def interpolate( skeleton1, skeleton2, percentage ):
-        pass
+    def interpolate( skeleton1, skeleton2, percentage, out = None, slerp = False ):
+        """Interpolates between two skeletons.
+
+        Positions are linearly interpolated.
+        Orientations are interpolated with NLERP, or with
+        SLERP if slerp is True.
+
+        @param percentage: 0.0 returns skeleton1, 1.0
+        returns skeleton2.
+        @param out: the skeleton to write the result to.
+        If None, a new skeleton is created. This may be
+        skeleton1 or skeleton2.
+        @return: the interpolated skeleton.
+        """
+        if out == None:
+            out = Skeleton.empty( skeleton1.parents )
+
+        positions1 = skeleton1.positions
+        positions2 = skeleton2.positions
+        if out.positions is positions2:
+            positions1, positions2 = positions2, positions1
+            percentage = 1.0 - percentage
+        numpy.multiply( positions1, 1.0 - percentage, out = out.positions )
+        out.positions += positions2 * percentage
+
+        function = quaternions.slerp if slerp else quaternions.nlerp
+        function(
+            skeleton1.orientations,
+            skeleton2.orientations,
+            percentage,
+            out = out.orientations
+            )
+
+        out.parents = skeleton1.parents
+        return out
 
 
 class BaseFrameSkeleton( Skeleton ):
@@ -189,18 +237,32 @@ class KeyframeSkeleton( Skeleton ):
 
 
 class Animation( object ):
-
-    def __init__( self, md5anim ):
+    """
+    Provides the skeletons of an md5anim's frames.
+
+    Skeletons are built when they are first requested
+    and kept in a least recently used cache.
+    The hits and misses counters can be used to
+    size the cache.
+    """
+
+    def __init__( self, md5anim, cache_size = 64 ):
+        """
+        @param md5anim: the loaded MD5_Anim.
+        @param cache_size: the maximum number of skeletons
+        to keep. If None, every skeleton is kept.
+        """
         super( Animation, self ).__init__()
         
         self.md5anim = md5anim
-        self.skeletons = None
+        self.builder = KeyframeBuilder( self.md5anim )
+        self.cache_size = cache_size
+        self.skeletons = OrderedDict()
 
-        # fill in any missing frame data for each joint
-        self.skeletons = [
-            KeyframeSkeleton( self.md5anim, frame )
-            for frame in self.md5anim.frames
-            ]
+        self.hits = 0
+        self.misses = 0
+
+        self._blend_skeleton = None
 
     @property
     def frame_rate( self ):
@@ -208,19 +270,146 @@ class Animation( object ):
 
     @property
     def num_frames( self ):
-        return len( self.skeletons )
+        return self.builder.num_frames
 
     def __iter__( self ):
         return self.next()
 
     def next( self ):
-        for skeleton in self.skeletons:
-            yield skeleton
+        for index in range( self.num_frames ):
+            yield self.skeleton( index )
 
     def skeleton( self, index ):
-        # TODO: interpolate between animations
+        index %= self.num_frames
+
+        skeleton = self.skeletons.pop( index, None )
+        if skeleton != None:
+            self.hits += 1
+            self.skeletons[ index ] = skeleton
+            return skeleton
+
+        self.misses += 1
+        self._build( [ index ] )
         return self.skeletons[ index ]
 
+    def frame_interpolation( self, time, loop = True ):
+        """Returns the 2 frames to interpolate between and
+        the interpolation for the specified time in seconds.
+        """
+        frame = time * self.frame_rate
+        if loop:
+            frame %= self.num_frames
+        else:
+            frame = min( max( frame, 0.0 ), self.num_frames - 1 )
+
+        frame1 = int( frame )
+        fraction = frame - frame1
+        frame2 = frame1 + 1
+        if frame2 >= self.num_frames:
+            frame2 = 0 if loop else frame1
+        return frame1, frame2, fraction
+
+    def sample( self, time, out = None, loop = True, slerp = False ):
+        """Returns the skeleton at the specified time
+        in seconds, interpolated between frames.
+
+        @param out: the skeleton to write the result to.
+        Passing the same skeleton each time avoids creating
+        a new skeleton for every sample.
+        @param loop: if True the animation repeats, otherwise
+        it stops on the last frame.
+        @param slerp: see Skeleton.interpolate.
+        """
+        frame1, frame2, fraction = self.frame_interpolation( time, loop )
+        return Skeleton.interpolate(
+            self.skeleton( frame1 ),
+            self.skeleton( frame2 ),
+            fraction,
+            out = out,
+            slerp = slerp
+            )
+
+    @staticmethod
+    def blend( animation1, time1, animation2, time2, weight, out = None, loop = True, slerp = False ):
+        """Samples 2 animations and blends them together.
+
+        The animations must use the same skeleton.
+
+        @param weight: 0.0 returns animation1, 1.0
+        returns animation2.
+        @param out: see sample.
+        """
+        out = animation1.sample( time1, out = out, loop = loop, slerp = slerp )
+
+        # sample the second animation into a skeleton
+        # it keeps so we don't create one each time
+        if animation2._blend_skeleton == None:
+            animation2._blend_skeleton = Skeleton.empty( out.parents )
+        other = animation2.sample(
+            time2,
+            out = animation2._blend_skeleton,
+            loop = loop,
+            slerp = slerp
+            )
+
+        return Skeleton.interpolate( out, other, weight, out = out, slerp = slerp )
+
+    def prefetch( self, index, count ):
+        """Builds the skeletons of the count frames following
+        and including index, wrapping at the end of the
+        animation.
+
+        The frames are built in a single batch.
+        Frames already in the cache are not rebuilt.
+        """
+        if self.cache_size != None:
+            count = min( count, self.cache_size )
+        count = min( count, self.num_frames )
+
+        frames = [
+            (index + offset) % self.num_frames
+            for offset in range( count )
+            ]
+
+        # mark the cached frames as recently used
+        # so building the missing frames won't evict them
+        missing = []
+        for frame in frames:
+            skeleton = self.skeletons.pop( frame, None )
+            if skeleton != None:
+                self.skeletons[ frame ] = skeleton
+            else:
+                missing.append( frame )
+
+        if missing:
+            self._build( missing )
+
+    def clear( self ):
+        """Removes all skeletons from the cache.
+        """
+        self.skeletons.clear()
+
+    def reset_statistics( self ):
+        self.hits = 0
+        self.misses = 0
+
+    def _build( self, frames ):
+        # each skeleton is a view into the frame arrays
+        positions, orientations = self.builder.build( frames )
+        for frame, frame_positions, frame_orientations in zip(
+            frames, positions, orientations
+            ):
+            self.skeletons[ frame ] = Skeleton(
+                self.builder.parents,
+                frame_positions,
+                frame_orientations
+                )
+
+        # remove the least recently used skeletons
+        if self.cache_size != None:
+            while len( self.skeletons ) > self.cache_size:
+                self.skeletons.popitem( last = False )
+
 
 class SkeletonRenderer( object ):
     
@@ -283,12 +472,7 @@ class SkeletonRenderer( object ):
         glBindVertexArray( self.vao )
 
         glBindBuffer( GL_ARRAY_BUFFER, self.indices_vbo )
-        glBufferData(
-            GL_ARRAY_BUFFER,
-            np_lines.nbytes,
-            (GLuint * np_lines.size)(*np_lines.flat),
-            GL_DYNAMIC_DRAW
-            )
+        buffer_data( GL_ARRAY_BUFFER, np_lines, GL_DYNAMIC_DRAW )
 
         glEnableVertexAttribArray( 0 )
         glVertexAttribIPointer( 0, 1, GL_UNSIGNED_INT, GL_FALSE, 0, 0 )
@@ -305,12 +489,7 @@ class SkeletonRenderer( object ):
         matrices[ :, 1, 0:3 ] = skeleton.positions
 
         glBindBuffer( GL_TEXTURE_BUFFER, self.matrix_vbo )
-        glBufferData(
-            GL_TEXTURE_BUFFER,
-            matrices.nbytes,
-            (GLfloat * matrices.size)(*matrices.flat),
-            GL_STATIC_DRAW
-            )
+        buffer_data( GL_TEXTURE_BUFFER, matrices )
 
         # link to our BO
         glBindTexture( GL_TEXTURE_BUFFER, self.matrix_tbo )
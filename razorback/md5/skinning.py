@@ -0,0 +1,187 @@
+"""
+Skins MD5 meshes on the CPU.
+
+This performs the same calculation as md5.vert, so posed
+vertices are available for collision, picking and baking,
+and skinning can be tested without a GPU.
+
+Each vertex is the sum of up to 4 weights. Each weight's
+position is rotated by its joint's orientation, offset by the
+joint's position and scaled by the weight's bias.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import numpy
+from pyrr import quaternion
+
+from razorback.md5 import quaternions
+
+
+def mesh_indices( indices, mesh_sizes ):
+    """Converts the triangle indices of each sub-mesh,
+    which are relative to the sub-mesh's first vertex,
+    to indices into the whole vertex array.
+    """
+    indices = numpy.array( indices, dtype = 'int64' ).reshape( -1, 3 )
+
+    vertex_offset = 0
+    triangle_offset = 0
+    for num_verts, num_tris in mesh_sizes:
+        indices[ triangle_offset : triangle_offset + num_tris ] += vertex_offset
+        vertex_offset += num_verts
+        triangle_offset += num_tris
+    return indices
+
+def skin_positions( weights, joints, positions, orientations, out = None ):
+    """Calculates the posed position of each vertex.
+
+    @param weights: the weights of each vertex (vertices, 4, 4)
+    stored as position.xyz, bias.
+    @param joints: the joint index of each weight (vertices, 4).
+    @param positions: the skeleton's joint positions.
+    @param orientations: the skeleton's joint orientations.
+    @param out: an optional (vertices, 3) array to write to.
+    """
+    rotated = quaternions.apply_to_vector(
+        orientations[ joints ],
+        weights[ ..., 0:3 ]
+        )
+    rotated += positions[ joints ]
+    rotated *= weights[ ..., 3:4 ]
+    return numpy.sum( rotated, axis = 1, out = out )
+
+def generate_normals( positions, indices, out = None ):
+    """Calculates vertex normals by summing the normals
+    of the triangles each vertex belongs to.
+
+    Larger triangles have more influence on the normal.
+
+    @param indices: the triangles' vertex indices (triangles, 3).
+    """
+    v1 = positions[ indices[ :, 0 ] ]
+    v2 = positions[ indices[ :, 1 ] ]
+    v3 = positions[ indices[ :, 2 ] ]
+    face_normals = numpy.cross( v2 - v1, v3 - v1 )
+
+    if out is None:
+        out = numpy.empty( positions.shape, dtype = positions.dtype )
+
+    # accumulate each face normal onto its 3 vertices
+    vertices = indices.ravel()
+    for axis in range( 3 ):
+        out[ :, axis ] = numpy.bincount(
+            vertices,
+            weights = numpy.repeat( face_normals[ :, axis ], 3 ),
+            minlength = len( positions )
+            )
+
+    lengths = numpy.sqrt( numpy.sum( out * out, axis = -1 ) )[ :, numpy.newaxis ]
+    lengths[ lengths == 0.0 ] = 1.0
+    out /= lengths
+    return out
+
+def skin_positions_loop( weights, joints, positions, orientations ):
+    """Calculates the posed position of each vertex one
+    weight at a time.
+
+    This is the reference implementation for skin_positions.
+    """
+    result = numpy.zeros( (len( weights ), 3), dtype = 'float32' )
+    for index, (vertex_weights, vertex_joints) in enumerate( zip( weights, joints ) ):
+        for weight, joint in zip( vertex_weights, vertex_joints ):
+            rotated = quaternion.apply_to_vector( orientations[ joint ], weight[ 0:3 ] )
+            result[ index ] += (positions[ joint ] + rotated) * weight[ 3 ]
+    return result
+
+
+class Skinner( object ):
+    """
+    Poses a mesh by a skeleton on the CPU.
+
+    The output arrays are allocated once and are
+    overwritten by each call to skin.
+
+    Large meshes can be skinned in chunks of vertices
+    across a thread pool. NumPy releases the GIL during
+    most array operations, so chunks run in parallel.
+    """
+
+    def __init__( self, weights, bone_indices, indices = None, threads = None, chunk_size = 16384 ):
+        """
+        @param weights: the weights of each vertex (vertices, 4, 4).
+        @param bone_indices: the joint index of each weight
+        (vertices, 4).
+        @param indices: the triangle indices of the whole mesh.
+        If None, normals are not generated.
+        @param threads: the number of threads to skin with.
+        If None, skinning runs on the calling thread.
+        @param chunk_size: the number of vertices per chunk
+        when using threads.
+        """
+        super( Skinner, self ).__init__()
+
+        self.weights = numpy.asarray( weights, dtype = 'float32' ).reshape( -1, 4, 4 )
+        self.joints = numpy.asarray( bone_indices ).reshape( -1, 4 ).astype( 'int32' )
+        self.indices = None
+        if indices is not None:
+            self.indices = numpy.asarray( indices ).reshape( -1, 3 )
+
+        self.positions = numpy.zeros( (self.num_vertices, 3), dtype = 'float32' )
+        self.normals = numpy.zeros( (self.num_vertices, 3), dtype = 'float32' )
+
+        self.chunk_size = chunk_size
+        self.pool = ThreadPool( threads ) if threads else None
+
+    @classmethod
+    def from_mesh_data( cls, mesh_data, **kwargs ):
+        """Creates a skinner for an md5.MeshData.
+        """
+        return cls(
+            mesh_data.arrays.weights,
+            mesh_data.arrays.bone_indices,
+            mesh_indices( mesh_data.arrays.indices, mesh_data.mesh_sizes ),
+            **kwargs
+            )
+
+    @property
+    def num_vertices( self ):
+        return len( self.weights )
+
+    def close( self ):
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def skin( self, skeleton, normals = True ):
+        """Poses the mesh by the skeleton.
+
+        @param normals: if True, and indices were provided,
+        the posed normals are generated.
+        @return: a tuple of positions and normals.
+        The normals are None if they were not generated.
+        """
+        positions = skeleton.positions
+        orientations = skeleton.orientations
+
+        def skin_chunk( start ):
+            end = start + self.chunk_size
+            skin_positions(
+                self.weights[ start : end ],
+                self.joints[ start : end ],
+                positions,
+                orientations,
+                out = self.positions[ start : end ]
+                )
+
+        if self.pool and self.num_vertices > self.chunk_size:
+            self.pool.map( skin_chunk, range( 0, self.num_vertices, self.chunk_size ) )
+        else:
+            skin_positions( self.weights, self.joints, positions, orientations, out = self.positions )
+
+        if not normals or self.indices is None:
+            return self.positions, None
+
+        generate_normals( self.positions, self.indices, out = self.normals )
+        return self.positions, self.normals
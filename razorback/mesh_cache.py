@@ -0,0 +1,261 @@
+"""
+Stores processed mesh data in a binary file so it doesn't
+have to be parsed and converted again.
+
+The cache file consists of:
+    * an 8 byte magic string 'RZBMESH' followed by a null byte.
+    * the format version and the header size as
+      little-endian unsigned 32 bit integers.
+    * a JSON header describing the source file and each block.
+    * the raw data of each block, aligned to 16 bytes.
+
+The header records the absolute path, modification time and
+size of the source file, the razorback version that wrote
+the cache and the content version. If any of these differ
+the cache is ignored.
+
+The content version must be incremented whenever the data
+written to cache files changes, for example when a mesh is
+processed differently, as the razorback version is not
+changed between releases.
+
+Blocks are memory mapped when the cache is read.
+"""
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+import numpy
+
+from razorback.version import __version__
+
+
+magic = 'RZBMESH\0'
+format_version = 1
+alignment = 16
+
+# the version of the cached data
+content_version = 1
+
+# set to False to disable the mesh cache
+enabled = True
+
+# the directory cache files are written to
+directory = os.path.join( os.path.expanduser( '~' ), '.razorback', 'cache' )
+
+
+def _source_key( filename ):
+    stat = os.stat( filename )
+    return {
+        'source': os.path.abspath( filename ),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'version': __version__,
+        'content_version': content_version,
+        }
+
+def _dependency_keys( dependencies ):
+    keys = []
+    for filename in dependencies:
+        key = _source_key( filename )
+        del key[ 'version' ]
+        del key[ 'content_version' ]
+        keys.append( key )
+    return keys
+
+def is_enabled( filename ):
+    """Returns True if data generated from the source
+    file is saved to the cache.
+    """
+    return enabled and filename != None
+
+def cache_filename( filename, kind ):
+    """Returns the cache file used for the specified
+    source file and data type.
+    """
+    path = os.path.abspath( filename )
+    name = hashlib.sha1( path.encode( 'utf-8' ) ).hexdigest()
+    return os.path.join( directory, '%s.%s.rzb' % (name, kind) )
+
+def _align( offset ):
+    return (offset + alignment - 1) // alignment * alignment
+
+def write( path, blocks, header ):
+    """Writes a cache file.
+
+    @param path: the file to write.
+    @param blocks: a list of (name, numpy array) tuples.
+    @param header: a dictionary stored with the blocks.
+    It must be serialisable to JSON.
+    """
+    arrays = [
+        (name, numpy.ascontiguousarray( array ))
+        for name, array in blocks
+        ]
+
+    # the header size depends on the block offsets
+    # so calculate offsets relative to the start of the data
+    offset = 0
+    descriptions = []
+    for name, array in arrays:
+        offset = _align( offset )
+        descriptions.append( {
+            'name': name,
+            'dtype': array.dtype.str,
+            'shape': list( array.shape ),
+            'offset': offset,
+            } )
+        offset += array.nbytes
+
+    header = dict( header )
+    header[ 'blocks' ] = descriptions
+    encoded = json.dumps( header )
+    data_start = _align( struct.calcsize( '<8sII' ) + len( encoded ) )
+
+    # write to a unique temporary file so a partially
+    # written cache is never read, and writers of the
+    # same cache file, on other threads or processes,
+    # don't write to the same file
+    handle, temp = tempfile.mkstemp( suffix = '.tmp', dir = os.path.dirname( path ) )
+    try:
+        with os.fdopen( handle, 'wb' ) as f:
+            f.write( struct.pack( '<8sII', magic, format_version, len( encoded ) ) )
+            f.write( encoded )
+            for description, (name, array) in zip( descriptions, arrays ):
+                f.seek( data_start + description[ 'offset' ] )
+                f.write( array.tostring() )
+
+        try:
+            os.rename( temp, path )
+        except OSError:
+            # Windows can't rename over an existing file
+            if not os.path.exists( path ):
+                raise
+            os.remove( path )
+            os.rename( temp, path )
+    finally:
+        if os.path.exists( temp ):
+            os.remove( temp )
+
+def read( path ):
+    """Reads a cache file.
+
+    Returns a tuple of the header and a dictionary
+    of memory mapped blocks.
+    Returns None if the file is missing or invalid.
+    """
+    if not os.path.exists( path ):
+        return None
+
+    # the header and blocks are read through the same
+    # open file, so a cache replaced by another writer
+    # while it is read can't mix the two files
+    prefix_size = struct.calcsize( '<8sII' )
+    with open( path, 'rb' ) as f:
+        file_size = os.fstat( f.fileno() ).st_size
+        prefix = f.read( prefix_size )
+        if len( prefix ) != prefix_size:
+            return None
+        file_magic, version, header_size = struct.unpack( '<8sII', prefix )
+        if file_magic != magic or version != format_version:
+            return None
+        try:
+            header = json.loads( f.read( header_size ) )
+        except ValueError:
+            return None
+        if not isinstance( header, dict ):
+            return None
+
+        data_start = _align( prefix_size + header_size )
+        blocks = {}
+        try:
+            for description in header[ 'blocks' ]:
+                dtype = numpy.dtype( str( description[ 'dtype' ] ) )
+                shape = tuple( int( size ) for size in description[ 'shape' ] )
+                start = data_start + int( description[ 'offset' ] )
+                nbytes = dtype.itemsize * int( numpy.prod( shape ) )
+                if start < data_start or min( shape + (0,) ) < 0:
+                    return None
+                if nbytes > 0 and start + nbytes > file_size:
+                    # the file is truncated
+                    return None
+
+                if nbytes == 0:
+                    # empty arrays can't be memory mapped
+                    array = numpy.empty( shape, dtype = dtype )
+                else:
+                    array = numpy.memmap(
+                        f,
+                        dtype = dtype,
+                        mode = 'r',
+                        offset = start,
+                        shape = shape
+                        )
+                blocks[ str( description[ 'name' ] ) ] = array
+        except (KeyError, TypeError, ValueError):
+            # the header is malformed
+            return None
+
+    return header, blocks
+
+def load( filename, kind, dependencies = () ):
+    """Returns the cached data for a source file.
+
+    @param filename: the source file the data was generated from.
+    @param kind: the type of data, for example 'md2'.
+    @param dependencies: other files the data was generated
+    from. The cache is out of date if any of them change.
+    @return: a tuple of the header and a dictionary of
+    memory mapped blocks, or None if the data isn't cached
+    or the cache is out of date.
+    """
+    if not is_enabled( filename ):
+        return None
+
+    try:
+        key = _source_key( filename )
+        key[ 'dependencies' ] = _dependency_keys( dependencies )
+        result = read( cache_filename( filename, kind ) )
+    except (IOError, OSError):
+        return None
+
+    if result == None:
+        return None
+
+    header, blocks = result
+    for name, value in key.items():
+        if header.get( name ) != value:
+            return None
+    if header.get( 'kind' ) != kind:
+        return None
+    return header, blocks
+
+def save( filename, kind, blocks, header = None, dependencies = () ):
+    """Caches the data generated from a source file.
+
+    Failing to write the cache is not an error, the
+    data will simply be generated again next time.
+
+    @param filename: the source file the data was generated from.
+    @param kind: the type of data, for example 'md2'.
+    @param blocks: a list of (name, numpy array) tuples.
+    @param header: a dictionary of extra values to store.
+    @param dependencies: see load.
+    """
+    if not is_enabled( filename ):
+        return
+
+    try:
+        values = dict( header or {} )
+        values.update( _source_key( filename ) )
+        values[ 'dependencies' ] = _dependency_keys( dependencies )
+        values[ 'kind' ] = kind
+
+        if not os.path.exists( directory ):
+            os.makedirs( directory )
+        write( cache_filename( filename, kind ), blocks, values )
+    except (IOError, OSError):
+        pass
@@ -1,12 +1,23 @@
 import os
-from collections import OrderedDict
+import ctypes
+from StringIO import StringIO
 
+import numpy
 from pyglet.gl import *
 
 from pygly.shader import Shader, ShaderProgram
 import pymesh.obj
 
 from razorback.mesh import Mesh
+from razorback import mesh_cache
+from razorback import lod
+from razorback.obj.unify import process_vertices, optimise_meshes, optimise_faces
+from razorback.obj import draw
+from razorback.obj import stream
+from razorback import vertex_cache
+from razorback.upload import buffer_data, GrowableBuffer
+from razorback.loader import completed_handle
+from razorback.asset_cache import AssetCache
 
 
 class Data( object ):
@@ -16,32 +27,429 @@ class Data( object ):
         'frag': open(os.path.dirname(__file__) + '/obj.frag','r').read()
     }
 
-    _data = {}
+    # the loaded OBJs, each load holds a reference
+    # OBJs are keyed by cache_key
+    cache = AssetCache()
+
+    # the LoadHandle and number of requests of
+    # the keys being loaded by load_async
+    _loading = {}
 
     @classmethod
-    def load( cls, filename ):
+    def cache_key( cls, filename, lod_ratios = None, chunk_size = None ):
+        """
+        Returns the key of an OBJ in the cache.
+
+        The same file loaded with different levels of
+        detail is cached separately. The chunk size only
+        changes how the file is read, so it isn't part
+        of the key.
+        """
+        if lod_ratios != None:
+            lod_ratios = tuple( lod_ratios )
+        return (filename, lod_ratios)
+
+    @classmethod
+    def load( cls, filename, lod_ratios = None, chunk_size = None ):
         # check if the model has been loaded previously 
-        if filename in Data._data: 
+        key = Data.cache_key( filename, lod_ratios, chunk_size )
+        data = Data.cache.acquire( key )
+        if data != None:
             # create a new mesh with the same data 
-            return Data._data[ filename ]
+            return data
 
-        data = cls( filename ) 
+        data = cls( filename, lod_ratios = lod_ratios, chunk_size = chunk_size ) 
 
         # store mesh for later 
-        Data._data[ filename ] = data
+        Data.cache.add( key, data )
 
         return data
 
     @classmethod
-    def unload( cls, filename ):
-        if filename in Data._data:
-            del Data._data[ filename ]
+    def load_async( cls, loader, filename, lod_ratios = None, chunk_size = None ):
+        """
+        Loads an OBJ with a razorback.loader.AsyncLoader.
 
-    def __init__( self, filename = None, buffer = None ):
+        The file is parsed on a loader thread and its
+        OpenGL objects are created by AsyncLoader.pump.
+        Requests for a file that is already loading share
+        the same load. Each request holds a reference once
+        the load completes, see unload.
+
+        @return: a LoadHandle for the Data.
+        """
+        key = Data.cache_key( filename, lod_ratios, chunk_size )
+        data = Data.cache.acquire( key )
+        if data != None:
+            return completed_handle( data )
+
+        if key not in Data._loading:
+            handle = loader.load(
+                cls,
+                filename,
+                lod_ratios = lod_ratios,
+                chunk_size = chunk_size,
+                finalise = False
+                )
+            Data._loading[ key ] = [ handle, 0 ]
+
+            def loaded( handle ):
+                handle, references = Data._loading.pop( key )
+                if not handle.is_ready:
+                    return
+
+                # the OBJ may have been loaded by Data.load while
+                # this load was in progress, if so the requests
+                # share the cached OBJ and the duplicate is discarded
+                if key in Data.cache:
+                    handle.result = Data.cache.acquire( key, references )
+                else:
+                    Data.cache.add( key, handle.result, references )
+            handle.add_callback( loaded )
+
+        Data._loading[ key ][ 1 ] += 1
+        return Data._loading[ key ][ 0 ]
+
+    @classmethod
+    def unload( cls, filename, lod_ratios = None, chunk_size = None ):
+        """
+        Releases a reference acquired by load or load_async.
+
+        The options must match those the OBJ was loaded with.
+        The OBJ stays in the cache until it is evicted by
+        the cache's memory budgets.
+        """
+        Data.cache.release( Data.cache_key( filename, lod_ratios, chunk_size ) )
+
+    def __init__( self, filename = None, buffer = None, lod_ratios = None, chunk_size = None, finalise = True ):
+        """
+        Loads an OBJ from the specified file.
+
+        @param filename: the filename to load the mesh from.
+        @param buffer: OBJ data to load if filename is None.
+        @param lod_ratios: the fraction of faces kept by each
+        level of detail, for example lod.default_ratios.
+        Points and lines are not simplified.
+        If None, only the full mesh is loaded.
+        @param chunk_size: if not None, an OBJ that isn't in
+        the mesh cache is streamed and uploaded chunk_size
+        corners at a time instead of being parsed by pymesh.
+        Only the vertex data is bounded by the chunk size, the
+        indices of every mesh and the stream's table of unified
+        vertices grow with the file and are kept until the mesh
+        is loaded.
+        Streamed OBJs are not saved to the mesh cache so they
+        are not reordered for the vertex cache, unless
+        vertex_cache.reorder_uncached is set, in which case
+        only their faces are reordered.
+        @param finalise: whether to create the OpenGL objects.
+        If False, the mesh is only parsed and finalise must
+        be run on the thread with the OpenGL context before
+        the mesh is rendered. Streamed chunks are then kept
+        in memory until finalise uploads them.
+        """
         super( Data, self ).__init__()
 
+        # the indices of the meshes in each group
         self.meshes = {}
+        # the index buffer ranges of each mesh
+        self.mesh_ranges = []
+        # the draw calls of each (groups, lod) rendered
+        self.draw_tables = {}
+        self.num_lods = 1
+        # a vertex_cache.cache_report for each mesh
+        # empty if the meshes weren't reordered
+        self.cache_reports = None
+        self.vao = None
+        self.element_vbo = None
+        self.vbo = None
+        self.shader = None
+        # set once the OpenGL objects have been created
+        self.is_ready = False
+        # the arrays to upload, kept until finalise
+        self._upload = None
+        # the bytes of buffers uploaded to OpenGL
+        self.gpu_bytes = 0
+
+        self.obj = None
+
+        cached = mesh_cache.load( filename, 'obj' )
+        if cached:
+            header, blocks = cached
+            vertices = blocks[ 'vertices' ]
+            texture_coords = blocks[ 'texture_coords' ]
+            normals = blocks[ 'normals' ]
+
+            self.cache_reports = [
+                vertex_cache.cache_report( *report )
+                for report in header.get( 'cache_reports', [] )
+                ]
+
+            # split our indices back into meshes
+            meshes = []
+            offset = 0
+            for groups, num_points, num_lines, num_faces in header[ 'meshes' ]:
+                count = num_points + num_lines + num_faces
+                meshes.append(
+                    (
+                        [ str( group ) for group in groups ],
+                        blocks[ 'indices' ][ offset : offset + count ],
+                        num_points,
+                        num_lines,
+                        num_faces
+                        )
+                    )
+                offset += count
+        elif chunk_size != None:
+            vertices, texture_coords, normals, meshes = self._stream(
+                filename,
+                buffer,
+                chunk_size,
+                lod_ratios != None,
+                upload = finalise
+                )
+        else:
+            self.obj = pymesh.obj.OBJ()
+            if filename != None:
+                self.obj.load( filename )
+            else:
+                self.obj.load_from_buffer( buffer )
+
+            vertices, texture_coords, normals, meshes = process_vertices( self.obj.model )
+            self.cache_reports = []
+            if vertex_cache.enabled( filename, self._num_triangles( meshes ) ):
+                vertices, texture_coords, normals, meshes, self.cache_reports = optimise_meshes(
+                    vertices,
+                    texture_coords,
+                    normals,
+                    meshes
+                    )
 
+            indices = [ mesh[ 1 ] for mesh in meshes ]
+            mesh_cache.save(
+                filename,
+                'obj',
+                [
+                    ('vertices', vertices),
+                    ('texture_coords', texture_coords),
+                    ('normals', normals),
+                    ('indices', numpy.concatenate( indices ) if indices else numpy.empty( 0, dtype = 'uint32' )),
+                    ],
+                {
+                    'meshes': [
+                        (groups, num_points, num_lines, num_faces)
+                        for groups, _, num_points, num_lines, num_faces in meshes
+                        ],
+                    'cache_reports': [ list( report ) for report in self.cache_reports ],
+                    }
+                )
+
+        if lod_ratios != None:
+            # streamed vertices are numbered in the order they
+            # are first used, not the order of pymesh's meshes
+            layout = 'streamed' if not cached and chunk_size != None else 'obj'
+            lods = self._lod_chains( filename, vertices, meshes, lod_ratios, layout )
+            self.num_lods = len( lod_ratios )
+        else:
+            lods = [ [] for mesh in meshes ]
+
+        indices = self._prepare( meshes, lods )
+        self._upload = (vertices, texture_coords, normals, indices)
+
+        if finalise:
+            for step in self.finalise():
+                pass
+
+    def __del__( self ):
+        # free our vao
+        vao = getattr( self, 'vao', None )
+        if vao:
+            glDeleteVertexArrays( 1, vao )
+
+        # free our index and vertex buffers
+        element_vbo = getattr( self, 'element_vbo', None )
+        if element_vbo:
+            glDeleteBuffers( 1, element_vbo )
+        vbo = getattr( self, 'vbo', None )
+        if vbo:
+            glDeleteBuffers( 3, vbo )
+
+    def __getstate__( self ):
+        # Data that hasn't been finalised is pickled by
+        # razorback.preload, the parsed OBJ isn't needed
+        state = self.__dict__.copy()
+        state[ 'obj' ] = None
+        return state
+
+    def _stream( self, filename, buffer, chunk_size, keep_vertices, upload = True ):
+        """
+        Streams the OBJ into growable vertex buffers.
+
+        The vertices of each chunk are uploaded as it is read,
+        but the indices of each mesh are kept in memory for the
+        whole file, as the chunks of a mesh are joined into one
+        range of the index buffer.
+
+        @param keep_vertices: if True, the streamed vertex
+        positions are returned, otherwise None is returned.
+        @param upload: if False, the vertices are kept in memory
+        instead of being uploaded, so no OpenGL calls are made.
+        @return: a tuple of the vertex positions, texture
+        coordinates, normals and the meshes in the format of
+        process_vertices. Vertex arrays that were uploaded and
+        not kept are None.
+        """
+        if upload:
+            buffers = [ GrowableBuffer( GL_ARRAY_BUFFER ) for index in range( 3 ) ]
+        # the chunks of each vertex array that are kept in memory
+        kept = [ keep_vertices or not upload, not upload, not upload ]
+        chunks = ( [], [], [] )
+        num_vertices = 0
+
+        # the groups and point, line and face indices of each mesh
+        mesh_data = {}
+
+        if filename != None:
+            source = open( filename, 'r' )
+        else:
+            source = StringIO( buffer )
+
+        try:
+            for chunk in stream.stream( source, chunk_size ):
+                for index, array in enumerate( chunk[ :3 ] ):
+                    if upload:
+                        buffers[ index ].append( array )
+                    if kept[ index ]:
+                        chunks[ index ].append( array )
+                num_vertices += len( chunk.vertices )
+
+                for mesh, groups, points, lines, faces in chunk.meshes:
+                    if mesh not in mesh_data:
+                        mesh_data[ mesh ] = (groups, [], [], [])
+                    for indices, array in zip( mesh_data[ mesh ][ 1: ], [ points, lines, faces ] ):
+                        indices.append( array )
+        finally:
+            source.close()
+
+        if upload:
+            self.vbo = (GLuint * 3)( *[ growable.buffer.value for growable in buffers ] )
+            self.gpu_bytes += sum( growable.capacity for growable in buffers )
+
+        meshes = []
+        for mesh in sorted( mesh_data.keys() ):
+            groups, points, lines, faces = mesh_data[ mesh ]
+            points, lines, faces = [
+                numpy.concatenate( arrays ) for arrays in [ points, lines, faces ]
+                ]
+            meshes.append(
+                (
+                    groups,
+                    numpy.concatenate( [ points, lines, faces ] ),
+                    len( points ),
+                    len( lines ),
+                    len( faces )
+                    )
+                )
+        # streamed OBJs aren't cached
+        self.cache_reports = []
+        if vertex_cache.enabled( None, self._num_triangles( meshes ) ):
+            meshes, self.cache_reports = optimise_faces( meshes, num_vertices )
+
+        arrays = []
+        for keep, array_chunks, width in zip( kept, chunks, [ 3, 2, 3 ] ):
+            if not keep:
+                arrays.append( None )
+            elif array_chunks:
+                arrays.append( numpy.concatenate( array_chunks ) )
+            else:
+                arrays.append( numpy.empty( (0, width), dtype = 'float32' ) )
+        return tuple( arrays ) + ( meshes, )
+
+    @staticmethod
+    def _num_triangles( meshes ):
+        return sum( num_faces // 3 for groups, indices, num_points, num_lines, num_faces in meshes )
+
+    @staticmethod
+    def _lod_chains( filename, vertices, meshes, ratios, layout ):
+        """
+        Returns the face indices of each level of detail
+        below the full mesh, for each mesh.
+
+        Levels generated from a file are cached with the
+        ratios used to generate them and the layout of the
+        vertices they index, 'streamed' or 'obj', as streamed
+        and parsed OBJs number their vertices differently.
+        """
+        ratios = [ float( ratio ) for ratio in ratios ]
+
+        cached = mesh_cache.load( filename, 'objlod' )
+        if cached:
+            header, blocks = cached
+            if header.get( 'ratios' ) == ratios and header.get( 'vertices' ) == layout:
+                # split the indices back into meshes and levels
+                chains = []
+                offset = 0
+                for counts in header[ 'meshes' ]:
+                    levels = []
+                    for count in counts:
+                        levels.append( blocks[ 'indices' ][ offset : offset + count ] )
+                        offset += count
+                    chains.append( levels )
+                return chains
+
+        reorder = vertex_cache.enabled( filename, Data._num_triangles( meshes ) )
+        chains = []
+        for groups, indices, num_points, num_lines, num_faces in meshes:
+            if num_faces == 0:
+                chains.append( [] )
+                continue
+            faces = indices[ num_points + num_lines : ]
+            levels = lod.lod_chain( vertices, faces, ratios, reorder = reorder )
+            # the full mesh is already in the index buffer
+            chains.append( levels[ 1: ] )
+
+        indices = [ level for levels in chains for level in levels ]
+        mesh_cache.save(
+            filename,
+            'objlod',
+            [
+                ('indices', numpy.concatenate( indices ) if indices else numpy.empty( 0, dtype = 'uint32' )),
+                ],
+            {
+                'ratios': ratios,
+                'vertices': layout,
+                'meshes': [ [ len( level ) for level in levels ] for levels in chains ],
+                }
+            )
+        return chains
+
+    def _prepare( self, meshes, lods ):
+        """
+        Merges the indices of every mesh into a single
+        buffer and records the meshes of each group.
+
+        @return: the merged indices.
+        """
+        indices, self.mesh_ranges = draw.buffer_layout( meshes, lods )
+
+        # add the mesh to each of the mesh groups
+        # each group has a list of meshes it owns
+        for index, mesh in enumerate( meshes ):
+            for group in mesh[ 0 ]:
+                if group not in self.meshes:
+                    self.meshes[ group ] = []
+                self.meshes[ group ].append( index )
+        return indices
+
+    def finalise( self ):
+        """
+        Creates the OpenGL objects of the OBJ.
+
+        This is a generator that yields after each
+        object is created, so the work can be spread
+        over several frames. It must run on the thread
+        with the OpenGL context.
+        """
         # create our shader
         self.shader = ShaderProgram(
             Shader( GL_VERTEX_SHADER, Data.shader_source['vert'] ),
@@ -63,272 +471,138 @@ class Data( object ):
         self.shader.bind()
         self.shader.uniforms.tex0 = 0
         self.shader.unbind()
+        yield
 
-        self.obj = pymesh.obj.OBJ()
-        if filename != None:
-            self.obj.load( filename )
-        else:
-            self.obj.load_from_buffer( buffer )
-        
-        self._load()
+        # load our vertex buffer objects
+        for step in self._load( *self._upload ):
+            yield
+        self._upload = None
+        self.is_ready = True
 
-    def _load( self ):
+    def _load( self, vertices, texture_coords, normals, indices ):
         """
-        Processes the data loaded by the MD2 Loader
-        """
-        # convert the md2 data into data for the gpu
-        # first, load our vertex buffer objects
-        self._load_vertex_buffers()
-
-    def _load_vertex_buffers( self ):
-        # we need to convert from 3 lists with 3 sets of indices
-        # to 3 lists with 1 set of indices
-        # so for each index, we need to check if we already
-        # have a matching vertex, and if not, make one
-        vertex_bin = OrderedDict([])
-        vertices = []
-        texture_coords = []
-        normals = []
-
-        def process_vertex_data( bin, vertices, texture_coords, normals, data ):
-            # check if we've already got this unique vertex in our list
-            if data not in bin:
-                # the vertex doesn't exist yet
-                # insert into our vertex bin
-                bin[ data ] = len(bin)
-
-                # convert our indices into actual data
-                v_index, tc_index, n_index = data
-
-                vertices.extend(
-                    list(self.obj.model.vertices[ v_index ])
-                    )
-
-                # map our texture coordinates
-                # if no tc is present, insert 0.0, 0.0
-                if tc_index != None:
-                    texture_coords.extend(
-                        list(self.obj.model.texture_coords[ tc_index ])
-                        )
-                else:
-                    texture_coords.extend( [0.0, 0.0] )
-
-                # map our normals
-                # if no normal is present, insert 0.0, 0.0, 0.0
-                if n_index != None:
-                    normals.extend(
-                        list(self.obj.model.normals[ n_index ])
-                        )
-                else:
-                    normals.extend( [0.0, 0.0, 0.0] )
-
-            # return the new index
-            return bin[ data ]
-
-
-        for mesh in self.obj.model.meshes:
-            indices = []
-
-            num_points = 0
-            num_lines = 0
-            num_faces = 0
-
-            # check if we need to create a point mesh
-            if len(mesh['points']) > 0:
-                # remap each point from a random set of indices
-                # to a unique vertex
-                for point in mesh['points']:
-                    indices.append(
-                        process_vertex_data(
-                            vertex_bin,
-                            vertices,
-                            texture_coords,
-                            normals,
-                            point
-                            )
-                        )
-                num_points = len(mesh['points'])
-
-            # check if we need to create a line mesh
-            if len(mesh['lines']) > 0:
-                # each line tuple is a line strip
-                # the easiest way to render is to convert to
-                # line segments
-                def convert_to_lines( strip ):
-                    result = []
-                    previous = strip[ 0 ]
-                    for point in strip[ 1: ]:
-                        result.extend( [previous, point] )
-                        previous = point
-                    return result
-                
-                # convert each line strip into line segments
-                line_segments = []
-                for strip in mesh['lines']:
-                    line_segments.extend( convert_to_lines( strip ) )
-
-                # remap each point from a random set of indices
-                # to a unique vertex
-                for point in line_segments:
-                    indices.append(
-                        process_vertex_data(
-                            vertex_bin,
-                            vertices,
-                            texture_coords,
-                            normals,
-                            point
-                            )
-                        )
-                num_lines = len(line_segments)
-
-            # check if we need to create a face mesh
-            if len(mesh['faces']) > 0:
-                # faces are stored as a list of triangle fans
-                # we need to covnert them to triangles
-                def convert_to_triangles( fan ):
-                    # convert from triangle fan
-                    # 0, 1, 2, 3, 4, 5
-                    # to triangle list
-                    # 0, 1, 2, 0, 2, 3, 0, 3, 4, 0, 4, 5
-                    result = []
-                    start = fan[ 0 ]
-                    previous = fan[ 1 ]
-                    for point in fan[ 2: ]:
-                        result.extend( [start, previous, point ] )
-                        previous = point
-                    return result
-
-                # convert each triangle face to triangles
-                triangle_indices = []
-                for face in mesh['faces']:
-                    triangle_indices.extend( convert_to_triangles( face ) )
-
-                # remap each point from a random set of indices
-                # to a unique vertex
-                for point in triangle_indices:
-                    indices.append(
-                        process_vertex_data(
-                            vertex_bin,
-                            vertices,
-                            texture_coords,
-                            normals,
-                            point
-                            )
-                        )
-                num_faces = len(triangle_indices)
-
-            # create our index arrays
-            element_vbo = (GLuint)()
-            glGenBuffers( 1, element_vbo )
-            glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, element_vbo )
-            glBufferData(
-                GL_ELEMENT_ARRAY_BUFFER,
-                len(indices) * 4,
-                (GLuint * len(indices))(*indices),
-                GL_STATIC_DRAW
-                )
-            glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
-
-            # store our indices
-            gl_data = (
-                element_vbo,
-                (0, num_points),
-                (num_points, num_lines),
-                (num_points + num_lines, num_faces)
-                )
-
-            # add the mesh to each of the mesh groups
-            # each group has a list of meshes it owns
-            for group in mesh['groups']:
-                if group not in self.meshes:
-                    self.meshes[ group ] = []
-                self.meshes[ group ].append( gl_data )
+        Loads the processed OBJ data into OpenGL.
 
+        Yields after each buffer is loaded.
+        """
         self.vao = (GLuint)()
         glGenVertexArrays( 1, self.vao )
         glBindVertexArray( self.vao )
 
+        # create our index array
+        # the element array binding is stored in the vao
+        self.element_vbo = (GLuint)()
+        glGenBuffers( 1, self.element_vbo )
+        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, self.element_vbo )
+        buffer_data( GL_ELEMENT_ARRAY_BUFFER, indices )
+        self.gpu_bytes += indices.nbytes
+
+        glBindVertexArray( 0 )
+        yield
+
         # create our global vertex data
-        self.vbo = (GLuint * 3)()
-        glGenBuffers( 3, self.vbo )
-
-        # create a VBO for our vertices
-        glBindBuffer( GL_ARRAY_BUFFER, self.vbo[ 0 ] )
-        glBufferData(
-            GL_ARRAY_BUFFER,
-            len(vertices) * 4,
-            (GLfloat * len(vertices))(*vertices),
-            GL_STATIC_DRAW
-            )
-        glVertexAttribPointer( 0, 3, GL_FLOAT, GL_FALSE, 0, 0 )
-        glEnableVertexAttribArray( 0 )
-
-        # create a VBO for our texture coordinates
-        glBindBuffer( GL_ARRAY_BUFFER, self.vbo[ 1 ] )
-        glBufferData(
-            GL_ARRAY_BUFFER,
-            len(texture_coords) * 4,
-            (GLfloat * len(texture_coords))(*texture_coords),
-            GL_STATIC_DRAW
-            )
-        glVertexAttribPointer( 1, 2, GL_FLOAT, GL_FALSE, 0, 0 )
-        glEnableVertexAttribArray( 1 )
-
-        # create a VBO for our normals
-        glBindBuffer( GL_ARRAY_BUFFER, self.vbo[ 2 ] )
-        glBufferData(
-            GL_ARRAY_BUFFER,
-            len(normals) * 4,
-            (GLfloat * len(normals))(*normals),
-            GL_STATIC_DRAW
-            )
-        glVertexAttribPointer( 2, 3, GL_FLOAT, GL_FALSE, 0, 0 )
-        glEnableVertexAttribArray( 2 )
+        # streamed vertex data is already in self.vbo
+        if self.vbo == None:
+            self.vbo = (GLuint * 3)()
+            glGenBuffers( 3, self.vbo )
+            for vbo, array in zip( self.vbo, [ vertices, texture_coords, normals ] ):
+                glBindBuffer( GL_ARRAY_BUFFER, vbo )
+                buffer_data( GL_ARRAY_BUFFER, array )
+                glBindBuffer( GL_ARRAY_BUFFER, 0 )
+                self.gpu_bytes += numpy.asarray( array ).nbytes
+                yield
+
+        # point our attributes at the vertices,
+        # texture coordinates and normals
+        glBindVertexArray( self.vao )
+        for index, size in enumerate( [ 3, 2, 3 ] ):
+            glBindBuffer( GL_ARRAY_BUFFER, self.vbo[ index ] )
+            glVertexAttribPointer( index, size, GL_FLOAT, GL_FALSE, 0, 0 )
+            glEnableVertexAttribArray( index )
 
         # unbind our buffers
         glBindBuffer( GL_ARRAY_BUFFER, 0 )
         glBindVertexArray( 0 )
 
-    def render( self, projection, model_view, groups ):
+    def memory_usage( self ):
+        """
+        Returns a tuple of the host and GPU bytes used by
+        the OBJ, see razorback.asset_cache.
+
+        The vertices and indices are only kept by OpenGL.
+        The parsed pymesh OBJ, if any, isn't counted.
+        """
+        return 0, self.gpu_bytes
+
+    def _group_ranges( self, groups ):
+        """Returns the ranges of each mesh in the groups.
+
+        Meshes in more than one of the groups are only
+        included once.
+        """
+        meshes = set()
+        for group in groups:
+            meshes.update( self.meshes[ group ] )
+        return [ self.mesh_ranges[ mesh ] for mesh in sorted( meshes ) ]
+
+    def triangle_counts( self, groups ):
+        """Returns the number of triangles in each level
+        of detail of the specified groups.
+        """
+        counts = [ 0 ] * self.num_lods
+        for points, lines, faces in self._group_ranges( groups ):
+            for level in range( self.num_lods ):
+                counts[ level ] += faces[ min( level, len( faces ) - 1 ) ][ 1 ] // 3
+        return counts
+
+    def draw_table( self, groups, lod = 0 ):
+        """Returns the glMultiDrawElements arguments needed
+        to render the groups at a level of detail.
+
+        Tables are cached for each groups tuple and lod.
+
+        @return: a list of (primitive, counts, offsets, draw count).
+        """
+        key = (tuple( groups ), lod)
+        if key not in self.draw_tables:
+            primitives = {
+                'points': GL_POINTS,
+                'lines': GL_LINES,
+                'faces': GL_TRIANGLES,
+                }
+
+            table = []
+            for primitive, ranges in draw.draw_table( self._group_ranges( groups ), lod ):
+                counts = (GLsizei * len( ranges ))( *[ count for offset, count in ranges ] )
+                offsets = (ctypes.c_void_p * len( ranges ))( *[ offset * 4 for offset, count in ranges ] )
+                table.append( (primitives[ primitive ], counts, offsets, len( ranges )) )
+            self.draw_tables[ key ] = table
+        return self.draw_tables[ key ]
+
+    def render( self, projection, model_view, groups, lod = 0 ):
+        """Renders the specified groups.
+
+        The groups are rendered with a single
+        glMultiDrawElements call per primitive type.
+
+        @param lod: the level of detail to render
+        the faces with.
+        """
         self.shader.bind()
         self.shader.uniforms.in_model_view = model_view
         self.shader.uniforms.in_projection = projection
 
         glBindVertexArray( self.vao )
 
-        # iterate through the specified groups
-        for group in groups:
-            # get the group
-            for mesh in self.meshes[ group ]:
-                element_vbo, points, lines, faces = mesh
-
-                # render the group
-                glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, element_vbo )
-
-                if points[ 1 ] > 0:
-                    glDrawElements(
-                        GL_POINTS,
-                        points[ 1 ],
-                        GL_UNSIGNED_INT,
-                        0
-                        )
-                if lines[ 1 ] > 0:
-                    glDrawElements(
-                        GL_LINES,
-                        lines[ 1 ],
-                        GL_UNSIGNED_INT,
-                        points[ 1 ]
-                        )
-                if faces[ 1 ] > 0:
-                    glDrawElements(
-                        GL_TRIANGLES,
-                        faces[ 1 ],
-                        GL_UNSIGNED_INT,
-                        points[ 1 ] + lines[ 1 ]
-                        )
-
+        for primitive, counts, offsets, draw_count in self.draw_table( groups, lod ):
+            glMultiDrawElements(
+                primitive,
+                counts,
+                GL_UNSIGNED_INT,
+                offsets,
+                draw_count
+                )
 
-        glBindBuffer( GL_ELEMENT_ARRAY_BUFFER, 0 )
         glBindVertexArray( 0 )
 
         self.shader.unbind()
@@ -337,14 +611,25 @@ class Data( object ):
 
 
 class OBJ_Mesh( Mesh ):
-    def __init__( self, filename ):
+    def __init__( self, filename, lod_ratios = None, chunk_size = None ):
         """
         Loads an OBJ from the specified file.
+
+        @param lod_ratios: see Data.
+        @param chunk_size: see Data.
         """
         super( OBJ_Mesh, self ).__init__()
         
         self.filename = filename
+        self.lod_ratios = lod_ratios
+        self.chunk_size = chunk_size
         self.data = None
+        # the LoadHandle of an asynchronous load
+        self.handle = None
+        # the number of asynchronous loads cancelled by unload
+        self._cancelled = 0
+        # the level of detail to render
+        self.lod = 0
 
     def load( self ):
         """
@@ -352,17 +637,56 @@ class OBJ_Mesh( Mesh ):
         specified filename.
         """
         if self.data == None:
-            self.data = Data.load( self.filename )
+            self.data = Data.load( self.filename, self.lod_ratios, self.chunk_size )
+
+    def load_async( self, loader ):
+        """
+        Reads the OBJ data in the background using a
+        razorback.loader.AsyncLoader.
+
+        The mesh isn't rendered until is_ready is True.
+        """
+        if self.data == None and self.handle == None:
+            self.handle = Data.load_async( loader, self.filename, self.lod_ratios, self.chunk_size )
+            self.handle.add_callback( self._loaded )
+
+    def _loaded( self, handle ):
+        # loads complete in the order they were requested
+        if self._cancelled:
+            # the load was cancelled by unload
+            # release the reference it holds
+            self._cancelled -= 1
+            if handle.is_ready:
+                Data.unload( self.filename, self.lod_ratios, self.chunk_size )
+            return
+
+        self.handle = None
+        if handle.is_ready:
+            self.data = handle.result
+
+    @property
+    def is_ready( self ):
+        """Returns True once the mesh can be rendered.
+        """
+        return self.data != None and self.data.is_ready
 
     def unload( self ):
+        if self.handle != None:
+            self._cancelled += 1
+            self.handle = None
         if self.data != None:
             self.data = None
-            Data.unload( self.filename )
+            Data.unload( self.filename, self.lod_ratios, self.chunk_size )
 
     def render( self, projection, model_view, groups ):
+        # meshes that are still loading aren't rendered
+        if not self.is_ready:
+            return
+
         self.data.render(
             projection,
             model_view,
-            groups
+            groups,
+            self.lod
             )
 
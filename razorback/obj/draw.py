@@ -0,0 +1,111 @@
+"""
+Merges the indices of every OBJ mesh into a single index
+buffer and builds the draw calls for a set of groups.
+
+The buffer is laid out by primitive rather than by mesh.
+    * the points of every mesh
+    * the lines of every mesh
+    * the faces of every mesh
+    * the faces of every mesh at each lower level of detail
+Meshes are in the same order in each section, so a set of
+groups that covers neighbouring meshes, or the whole model,
+becomes a single range per primitive type.
+"""
+
+import numpy
+
+
+# the primitive types of each mesh, in render order
+primitives = ( 'points', 'lines', 'faces' )
+
+
+def buffer_layout( meshes, lods ):
+    """Arranges the indices of each mesh in a single buffer.
+
+    @param meshes: the meshes returned by unify.process_vertices.
+    @param lods: the face indices of each level of detail below
+    the full mesh, for each mesh.
+    @return: a tuple of the uint32 indices and the ranges of
+    each mesh. The ranges are a tuple of
+    ( (offset, count) of points, (offset, count) of lines,
+    [ (offset, count) of faces at each level of detail ] ).
+    Offsets and counts are in indices.
+    """
+    num_levels = max( [ len( levels ) + 1 for levels in lods ] + [ 1 ] )
+
+    # split each mesh into sections
+    sections = [ [] for index in range( 2 + num_levels ) ]
+    for (groups, indices, num_points, num_lines, num_faces), levels in zip( meshes, lods ):
+        start = num_points + num_lines
+        sections[ 0 ].append( indices[ :num_points ] )
+        sections[ 1 ].append( indices[ num_points : start ] )
+        sections[ 2 ].append( indices[ start : start + num_faces ] )
+        for level in range( 1, num_levels ):
+            if level <= len( levels ):
+                sections[ 2 + level ].append( levels[ level - 1 ] )
+            else:
+                sections[ 2 + level ].append( None )
+
+    ranges = [ ( None, None, [] ) for mesh in meshes ]
+    buffers = []
+    offset = 0
+    for section, arrays in enumerate( sections ):
+        for mesh, array in enumerate( arrays ):
+            if array is None:
+                # meshes without levels of detail
+                # render their full faces at every level
+                continue
+            points, lines, faces = ranges[ mesh ]
+            current = (offset, len( array ))
+            if section == 0:
+                points = current
+            elif section == 1:
+                lines = current
+            else:
+                faces.append( current )
+            ranges[ mesh ] = (points, lines, faces)
+
+            buffers.append( array )
+            offset += len( array )
+
+    if buffers:
+        indices = numpy.concatenate( buffers ).astype( 'uint32' )
+    else:
+        indices = numpy.empty( 0, dtype = 'uint32' )
+    return indices, ranges
+
+def merge_ranges( ranges ):
+    """Sorts (offset, count) ranges and joins any that
+    are adjacent in the buffer.
+
+    Empty ranges are removed.
+    """
+    merged = []
+    for offset, count in sorted( ranges ):
+        if count == 0:
+            continue
+        if merged and merged[ -1 ][ 0 ] + merged[ -1 ][ 1 ] == offset:
+            merged[ -1 ] = (merged[ -1 ][ 0 ], merged[ -1 ][ 1 ] + count)
+        else:
+            merged.append( (offset, count) )
+    return merged
+
+def draw_table( ranges, lod = 0 ):
+    """Returns the draw calls needed to render a set of meshes.
+
+    @param ranges: the buffer_layout ranges of the meshes to draw.
+    Each mesh should appear once.
+    @param lod: the level of detail of the faces.
+    @return: a list of (primitive, [ (offset, count) ]) for
+    each primitive type with something to draw.
+    """
+    points = [ mesh[ 0 ] for mesh in ranges ]
+    lines = [ mesh[ 1 ] for mesh in ranges ]
+    faces = [ mesh[ 2 ][ min( lod, len( mesh[ 2 ] ) - 1 ) ] for mesh in ranges ]
+
+    table = []
+    for primitive, primitive_ranges in zip( primitives, [ points, lines, faces ] ):
+        merged = merge_ranges( primitive_ranges )
+        if merged:
+            table.append( (primitive, merged) )
+    return table
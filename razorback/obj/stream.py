@@ -0,0 +1,621 @@
+"""
+Streams OBJ files into unified vertices and indices.
+
+Loading an OBJ with pymesh keeps every vertex, texture
+coordinate, normal and face of the file as Python objects
+until the whole file has been parsed.
+
+stream reads the file in large blocks and yields a chunk
+of new unified vertices and indices each time chunk_size
+corners have been read. Between chunks only the file's
+vertex data, which any later face may refer to, and a table
+of the unified vertices are kept, both as NumPy arrays.
+Neither is bounded by chunk_size, they grow with the file,
+but they are far smaller than pymesh's Python objects.
+The caller decides what to keep of each chunk.
+
+Most of an OBJ is runs of v, vt, vn and f lines. Each run
+in a block is joined and converted by a single
+numpy.fromstring call rather than tokenized a line at a time.
+
+Meshes are split the same way as pymesh, a new mesh is started
+by each 'o', 'g' and 'usemtl' statement after the current mesh
+has any points, lines or faces.
+"""
+
+import re
+from collections import namedtuple
+from itertools import groupby
+
+import numpy
+
+from razorback.obj.unify import strip_to_lines, fan_to_triangles, corner_keys
+
+
+# vertices, texture_coords and normals are the unified
+# vertices first used in the chunk
+# meshes is a list of
+# (mesh index, groups, uint32 points, uint32 lines, uint32 faces)
+# for each mesh with indices in the chunk
+# indices refer to every unified vertex streamed so far
+chunk_layout = namedtuple(
+    'OBJ_Chunk',
+    [
+        'vertices',
+        'texture_coords',
+        'normals',
+        'meshes'
+        ]
+    )
+
+
+class GrowableArray( object ):
+    """A float32 array of fixed width rows that rows can be
+    appended to.
+
+    Capacity is doubled when it runs out.
+    """
+
+    def __init__( self, width, capacity = 1024 ):
+        super( GrowableArray, self ).__init__()
+
+        self.data = numpy.empty( (capacity, width), dtype = 'float32' )
+        self.count = 0
+
+    def extend( self, values ):
+        """Appends a flat list of values to the array.
+        """
+        width = self.data.shape[ 1 ]
+        rows = numpy.array( values, dtype = 'float32' ).reshape( -1, width )
+        required = self.count + len( rows )
+        if required > len( self.data ):
+            data = numpy.empty( (max( required, len( self.data ) * 2 ), width), dtype = 'float32' )
+            data[ :self.count ] = self.data[ :self.count ]
+            self.data = data
+        self.data[ self.count : required ] = rows
+        self.count = required
+
+    @property
+    def array( self ):
+        return self.data[ :self.count ]
+
+
+class VertexTable( object ):
+    """Assigns a unified vertex index to each (v, tc, n) corner.
+
+    The unified vertices that share a position are chained
+    together, beginning at first[ v ]. Chains are normally
+    only a few vertices long, so each corner is matched in a
+    few vectorised steps regardless of the size of the table.
+    """
+
+    def __init__( self ):
+        super( VertexTable, self ).__init__()
+
+        # the first unified vertex of each position, or -1
+        self.first = numpy.empty( 0, dtype = 'int64' )
+        # the (v, tc, n) corner of each unified vertex
+        self.corners = numpy.empty( (0, 3), dtype = 'int64' )
+        # the next unified vertex with the same position, or -1
+        self.next = numpy.empty( 0, dtype = 'int64' )
+
+    @property
+    def count( self ):
+        return len( self.corners )
+
+    def unify( self, corners ):
+        """Returns the unified index of each corner and the
+        corners of the unified vertices added by this call.
+
+        New unified vertices are numbered in the order they
+        are first used.
+
+        @param corners: int64 (v, tc, n) corners (n x 3) with
+        missing indices set to -1.
+        @return: a tuple of uint32 indices and int64 corners (n x 3).
+        """
+        corners = numpy.ascontiguousarray( corners, dtype = 'int64' ).reshape( -1, 3 )
+        if len( corners ) == 0:
+            return numpy.empty( 0, dtype = 'uint32' ), corners
+
+        num_positions = corners[ :, 0 ].max() + 1
+        if num_positions > len( self.first ):
+            first = numpy.empty( max( num_positions, len( self.first ) * 2 ), dtype = 'int64' )
+            first[ :len( self.first ) ] = self.first
+            first[ len( self.first ): ] = -1
+            self.first = first
+
+        # unique corners of the chunk in order of first use
+        keys = corner_keys( corners )
+        _, index, inverse = numpy.unique( keys, return_index = True, return_inverse = True )
+        order = numpy.argsort( index )
+        rank = numpy.empty( len( order ), dtype = 'int64' )
+        rank[ order ] = numpy.arange( len( order ) )
+        unique = corners[ index[ order ] ]
+
+        # follow the chain of each position looking for a match
+        result = numpy.empty( len( unique ), dtype = 'int64' )
+        result.fill( -1 )
+        active = numpy.arange( len( unique ) )
+        candidates = self.first[ unique[ :, 0 ] ]
+        while True:
+            valid = candidates >= 0
+            active = active[ valid ]
+            candidates = candidates[ valid ]
+            if len( active ) == 0:
+                break
+            match = numpy.all( self.corners[ candidates, 1: ] == unique[ active, 1: ], axis = -1 )
+            result[ active[ match ] ] = candidates[ match ]
+            active = active[ ~match ]
+            candidates = self.next[ candidates[ ~match ] ]
+
+        # add the corners that weren't found
+        new = numpy.flatnonzero( result < 0 )
+        result[ new ] = self.count + numpy.arange( len( new ) )
+        added = unique[ new ]
+        if len( new ) == 0:
+            # every corner is already in the table
+            return result[ rank[ inverse.ravel() ] ].astype( 'uint32' ), added
+
+        # link each new vertex at the start of its position's chain
+        positions = added[ :, 0 ]
+        by_position = numpy.argsort( positions, kind = 'mergesort' )
+        sorted_ids = result[ new ][ by_position ]
+        sorted_positions = positions[ by_position ]
+        sorted_links = self.first[ sorted_positions ]
+        same = sorted_positions[ :-1 ] == sorted_positions[ 1: ]
+        sorted_links[ :-1 ][ same ] = sorted_ids[ 1: ][ same ]
+        starts = numpy.concatenate( [ [ True ], ~same ] )
+        self.first[ sorted_positions[ starts ] ] = sorted_ids[ starts ]
+
+        links = numpy.empty( len( new ), dtype = 'int64' )
+        links[ sorted_ids - self.count ] = sorted_links
+
+        self.corners = numpy.concatenate( [ self.corners, added ] )
+        self.next = numpy.concatenate( [ self.next, links ] )
+
+        return result[ rank[ inverse.ravel() ] ].astype( 'uint32' ), added
+
+
+def _gather( array, indices ):
+    """Returns the rows of array at indices, with zeros
+    for indices of -1.
+    """
+    result = numpy.zeros( (len( indices ), array.shape[ 1 ]), dtype = 'float32' )
+    valid = indices >= 0
+    result[ valid ] = array[ indices[ valid ] ]
+    return result
+
+
+# the array and width of each vertex data statement
+_value_widths = {
+    'v': (0, 3),
+    'vt': (1, 2),
+    'vn': (2, 3),
+    }
+
+# the primitive of each polygon statement
+_primitives = {
+    'p': 0,
+    'l': 1,
+    'f': 2,
+    }
+
+# statements parsed a block at a time
+_block_statements = set( _value_widths.keys() + _primitives.keys() )
+
+# matches a corner with more than one '/'
+_two_slashes = re.compile( r'/[^\s/]*/' )
+
+
+def _line_statement( line ):
+    """Returns the statement of a line that begins with
+    a v, vt, vn, f, l or p statement.
+
+    Other lines may return anything that isn't one of these.
+    """
+    return line[ :2 ].rstrip()
+
+def parse_values( lines, statement, width ):
+    """Parses a run of v, vt or vn lines with numpy.fromstring.
+
+    @return: a float32 array (lines x width) or None if any
+    line doesn't have exactly width values.
+    """
+    text = ' '.join( lines ).replace( statement, ' ' )
+    values = numpy.fromstring( text, dtype = 'float32', sep = ' ' )
+    if len( values ) != len( lines ) * width:
+        return None
+    return values.reshape( -1, width )
+
+def parse_corners( lines, statement ):
+    """Parses a run of f, l or p lines with numpy.fromstring.
+
+    Every corner in the run must have the same format as the
+    first corner, one of v, v/vt, v//vn or v/vt/vn.
+
+    @return: a tuple of the OBJ indices of each corner
+    as int64 (n x 3), with 0 for missing indices, and the
+    number of corners on each line. None is returned if the
+    corners have different formats.
+    """
+    text = ' '.join( lines ).replace( statement, ' ' )
+
+    tokens = lines[ 0 ].split()
+    if len( tokens ) < 2:
+        return None
+    parts = tokens[ 1 ].split( '/' )
+    present = [ index for index, part in enumerate( parts ) if part != '' ]
+    if len( parts ) > 3 or present[ :1 ] != [ 0 ]:
+        return None
+
+    slashes = text.count( '/' )
+    doubles = text.count( '//' )
+    if present == [ 0, 2 ]:
+        # v//vn
+        values = numpy.fromstring( text.replace( '//', ' ' ), dtype = 'int64', sep = ' ' )
+    elif len( present ) == len( parts ) and doubles == 0:
+        values = numpy.fromstring( text.replace( '/', ' ' ), dtype = 'int64', sep = ' ' )
+    else:
+        return None
+
+    # every missing index is a '//'
+    num_corners = len( values ) - slashes + doubles
+    if num_corners <= 0 or len( values ) != num_corners * len( present ):
+        return None
+    if slashes != num_corners * (len( parts ) - 1):
+        return None
+    if doubles != num_corners * (len( parts ) - len( present )):
+        return None
+    if len( parts ) == 2 and _two_slashes.search( text ):
+        return None
+
+    corners = numpy.zeros( (num_corners, 3), dtype = 'int64' )
+    corners[ :, present ] = values.reshape( -1, len( present ) )
+
+    if statement == 'f' and num_corners == len( lines ) * 3:
+        # every face has at least 3 corners
+        # so these must all be triangles
+        lengths = numpy.empty( len( lines ), dtype = 'int64' )
+        lengths.fill( 3 )
+    else:
+        lengths = numpy.array( [ len( line.split() ) - 1 for line in lines ], dtype = 'int64' )
+    return corners, lengths
+
+
+class _Parser( object ):
+    """Holds the state of a stream between lines.
+    """
+
+    def __init__( self, chunk_size ):
+        super( _Parser, self ).__init__()
+
+        self.chunk_size = chunk_size
+        self.arrays = [ GrowableArray( 3 ), GrowableArray( 2 ), GrowableArray( 3 ) ]
+        # values read since the arrays were last extended
+        self.pending_values = [ [], [], [] ]
+        # the number of v, vt and vn statements read
+        self.counts = [ 0, 0, 0 ]
+        self.table = VertexTable()
+
+        self.groups = [ 'default' ]
+        self.mesh = -1
+        self.mesh_groups = []
+        # pending corners and polygon lengths of each mesh
+        # for points, lines and faces
+        self.pending = {}
+        self.num_pending = 0
+        # chunks flushed but not yet yielded
+        self.chunks = []
+        self._new_mesh()
+
+    def _new_mesh( self ):
+        self.mesh += 1
+        self.mesh_groups.append( list( self.groups ) )
+        self.has_data = False
+
+    def _split_mesh( self ):
+        if self.has_data:
+            self._new_mesh()
+
+    def _add_values( self, kind, tokens, width ):
+        values = [ float( token ) for token in tokens[ 1 : 1 + width ] ]
+        values.extend( [ 0.0 ] * (width - len( values )) )
+        self.pending_values[ kind ].extend( values )
+        self.counts[ kind ] += 1
+
+    def _resolve( self, value, kind ):
+        if value == '':
+            return -1
+        index = int( value )
+        if index < 0:
+            return self.counts[ kind ] + index
+        return index - 1
+
+    def _pending( self, primitive ):
+        """Returns the lists of pending corner and polygon
+        length arrays of the current mesh.
+        """
+        if self.mesh not in self.pending:
+            self.pending[ self.mesh ] = ( ([], []), ([], []), ([], []) )
+        return self.pending[ self.mesh ][ primitive ]
+
+    def _add_polygon( self, primitive, tokens ):
+        # keep chunks within chunk_size corners
+        if self.num_pending and self.num_pending + len( tokens ) - 1 > self.chunk_size:
+            self.chunks.append( self.flush() )
+
+        corner_arrays, length_arrays = self._pending( primitive )
+        # lines are added to python lists until
+        # a block of polygons is added
+        if not corner_arrays or not isinstance( corner_arrays[ -1 ], list ):
+            corner_arrays.append( [] )
+            length_arrays.append( [] )
+        corners = corner_arrays[ -1 ]
+        lengths = length_arrays[ -1 ]
+
+        for token in tokens[ 1: ]:
+            parts = token.split( '/' ) + [ '', '' ]
+            corners.extend( [
+                self._resolve( parts[ 0 ], 0 ),
+                self._resolve( parts[ 1 ], 1 ),
+                self._resolve( parts[ 2 ], 2 ),
+                ] )
+        lengths.append( len( tokens ) - 1 )
+
+        self.has_data = True
+        self.num_pending += len( tokens ) - 1
+
+    def _add_corners( self, primitive, corners, lengths ):
+        """Adds a block of resolved corners, flushing chunks
+        between its polygons so that chunks only have more
+        than chunk_size corners if a single polygon does.
+        """
+        ends = numpy.cumsum( lengths )
+        first = 0
+        start = 0
+        while first < len( lengths ):
+            space = self.chunk_size - self.num_pending
+            last = int( numpy.searchsorted( ends, start + space, side = 'right' ) )
+            if last == first:
+                if self.num_pending:
+                    self.chunks.append( self.flush() )
+                    continue
+                # a polygon larger than a chunk
+                last = first + 1
+            end = int( ends[ last - 1 ] )
+
+            corner_arrays, length_arrays = self._pending( primitive )
+            corner_arrays.append( corners[ start:end ] )
+            length_arrays.append( lengths[ first:last ] )
+            self.has_data = True
+            self.num_pending += end - start
+            if self.num_pending >= self.chunk_size:
+                self.chunks.append( self.flush() )
+
+            first = last
+            start = end
+
+    def parse_line( self, line ):
+        """Parses a line and returns a list of the chunks
+        that are ready.
+        """
+        self._parse_line( line )
+        return self._ready()
+
+    def _parse_line( self, line ):
+        tokens = line.split()
+        if not tokens:
+            return
+
+        statement = tokens[ 0 ]
+        if statement == 'v':
+            self._add_values( 0, tokens, 3 )
+        elif statement == 'vt':
+            self._add_values( 1, tokens, 2 )
+        elif statement == 'vn':
+            self._add_values( 2, tokens, 3 )
+        elif statement == 'f':
+            self._add_polygon( 2, tokens )
+        elif statement == 'l':
+            self._add_polygon( 1, tokens )
+        elif statement == 'p':
+            # each index is a separate point
+            for token in tokens[ 1: ]:
+                self._add_polygon( 0, [ statement, token ] )
+        elif statement == 'g':
+            self._split_mesh()
+            self.groups = tokens[ 1: ] or [ 'default' ]
+            self.mesh_groups[ self.mesh ] = list( self.groups )
+        elif statement in ('o', 'usemtl'):
+            self._split_mesh()
+
+    def parse_lines( self, lines ):
+        """Parses a list of lines and yields any chunks
+        that are ready.
+
+        Runs of lines with a statement that can be parsed
+        a block at a time are passed to parse_block.
+        """
+        for statement, run in groupby( lines, _line_statement ):
+            if statement in _block_statements:
+                chunks = self.parse_block( list( run ) )
+            else:
+                chunks = []
+                for line in run:
+                    chunks.extend( self.parse_line( line ) )
+            for chunk in chunks:
+                yield chunk
+
+    def parse_block( self, lines ):
+        """Parses a run of lines with the same statement,
+        v, vt, vn, f, l or p, and returns a list of the
+        chunks that are ready.
+        """
+        statement = lines[ 0 ].split( None, 1 )[ 0 ]
+        if statement in _value_widths:
+            kind, width = _value_widths[ statement ]
+            values = parse_values( lines, statement, width )
+            if values is None:
+                # irregular values
+                for line in lines:
+                    self._parse_line( line )
+                return self._ready()
+
+            self._flush_values()
+            self.arrays[ kind ].extend( values )
+            self.counts[ kind ] += len( values )
+            return []
+
+        primitive = _primitives[ statement ]
+        corners = parse_corners( lines, statement )
+        if corners is None:
+            # mixed corner formats
+            for line in lines:
+                self._parse_line( line )
+            return self._ready()
+
+        corners, lengths = corners
+        if statement == 'p':
+            # each index is a separate point
+            lengths = numpy.ones( len( corners ), dtype = 'int64' )
+
+        # resolve the corners to zero based indices
+        # with -1 for missing indices
+        for kind in range( 3 ):
+            column = corners[ :, kind ]
+            missing = column == 0
+            column[ column > 0 ] -= 1
+            column[ column < 0 ] += self.counts[ kind ]
+            column[ missing ] = -1
+
+        self._add_corners( primitive, corners, lengths )
+        return self._ready()
+
+    def _ready( self ):
+        """Returns a list of the chunks that are ready.
+        """
+        if max( [ len( values ) for values in self.pending_values ] ) >= self.chunk_size:
+            self._flush_values()
+
+        if self.num_pending >= self.chunk_size:
+            self.chunks.append( self.flush() )
+
+        chunks = self.chunks
+        self.chunks = []
+        return chunks
+
+    def _flush_values( self ):
+        for array, values in zip( self.arrays, self.pending_values ):
+            if values:
+                array.extend( values )
+                del values[:]
+
+    def flush( self ):
+        """Returns a chunk of the pending corners, or None if
+        there are none.
+        """
+        if self.num_pending == 0:
+            return None
+        self._flush_values()
+
+        # triangulate each mesh
+        meshes = []
+        all_corners = []
+        for mesh in sorted( self.pending.keys() ):
+            counts = []
+            for primitive, (corner_arrays, length_arrays) in enumerate( self.pending[ mesh ] ):
+                corners = numpy.concatenate(
+                    [ numpy.zeros( (0, 3), dtype = 'int64' ) ]
+                    + [ numpy.asarray( array, dtype = 'int64' ).reshape( -1, 3 ) for array in corner_arrays ]
+                    )
+                lengths = numpy.concatenate(
+                    [ numpy.zeros( 0, dtype = 'int64' ) ]
+                    + [ numpy.asarray( array, dtype = 'int64' ) for array in length_arrays ]
+                    )
+                if primitive == 1:
+                    corners = corners[ strip_to_lines( lengths ) ]
+                elif primitive == 2:
+                    corners = corners[ fan_to_triangles( lengths ) ]
+                all_corners.append( corners )
+                counts.append( len( corners ) )
+            meshes.append( (mesh, counts) )
+
+        indices, added = self.table.unify( numpy.concatenate( all_corners ) )
+
+        chunk_meshes = []
+        offset = 0
+        for mesh, counts in meshes:
+            primitives = []
+            for count in counts:
+                primitives.append( indices[ offset : offset + count ] )
+                offset += count
+            chunk_meshes.append( tuple( [ mesh, list( self.mesh_groups[ mesh ] ) ] + primitives ) )
+
+        self.pending = {}
+        self.num_pending = 0
+
+        vertices, texture_coords, normals = [ array.array for array in self.arrays ]
+        return chunk_layout(
+            _gather( vertices, added[ :, 0 ] ),
+            _gather( texture_coords, added[ :, 1 ] ),
+            _gather( normals, added[ :, 2 ] ),
+            chunk_meshes
+            )
+
+
+def stream( file, chunk_size = 65536, block_size = 4 * 1024 * 1024 ):
+    """Yields chunk_layout chunks of an OBJ file.
+
+    The file is read block_size bytes at a time. Runs of
+    v, vt, vn, f, l and p lines are each parsed by a single
+    numpy.fromstring call. Other lines, and runs that can't
+    be parsed this way, are parsed a line at a time.
+
+    @param file: a file like object to read the OBJ from.
+    @param chunk_size: the number of corners read before
+    a chunk is yielded. Chunks only have more corners than
+    this if a single polygon does.
+    @param block_size: the number of bytes to read at a time.
+    """
+    parser = _Parser( chunk_size )
+    remainder = ''
+    while True:
+        block = file.read( block_size )
+        if not block:
+            break
+
+        # only parse complete lines
+        block = remainder + block
+        end = block.rfind( '\n' ) + 1
+        remainder = block[ end: ]
+
+        for chunk in parser.parse_lines( block[ :end ].splitlines() ):
+            yield chunk
+
+    for chunk in parser.parse_lines( remainder.splitlines() ):
+        yield chunk
+
+    chunk = parser.flush()
+    if chunk != None:
+        yield chunk
+
+def stream_lines( lines, chunk_size = 65536 ):
+    """Yields chunk_layout chunks of an OBJ file, parsing
+    one line at a time.
+
+    This is much slower than stream and is kept to verify
+    and benchmark the block parser.
+
+    @param lines: an iterable of the file's lines.
+    @param chunk_size: the number of corners read before
+    a chunk is yielded.
+    """
+    parser = _Parser( chunk_size )
+    for line in lines:
+        for chunk in parser.parse_line( line ):
+            yield chunk
+
+    chunk = parser.flush()
+    if chunk != None:
+        yield chunk
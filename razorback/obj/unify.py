@@ -0,0 +1,398 @@
+"""
+Converts OBJ data to a single set of indices.
+
+OBJ stores vertices, texture coordinates and normals in
+separate lists, each with their own set of indices.
+OpenGL only allows a single set of indices.
+"""
+
+from collections import OrderedDict
+from itertools import chain, imap
+
+import numpy
+
+from razorback import vertex_cache
+
+
+def _corner_array( corners, count ):
+    """Converts an iterable of count (v, tc, n) index tuples
+    to an int64 array (count x 3).
+
+    Missing texture coordinate and normal indices become -1.
+    """
+    # None converts to NaN when read as floats
+    corners = numpy.fromiter(
+        chain.from_iterable( corners ),
+        dtype = 'float64',
+        count = count * 3
+        ).reshape( -1, 3 )
+    corners[ numpy.isnan( corners ) ] = -1.0
+    return corners.astype( 'int64' )
+
+def corner_keys( corners ):
+    """Returns a sortable key for each (v, tc, n) corner.
+
+    The corners are packed into int64 keys relative to the
+    smallest index of each column when they fit, otherwise
+    each row is viewed as a single structured value, which
+    is much slower to sort.
+
+    @param corners: a contiguous int64 array (n x 3).
+    """
+    if len( corners ) == 0:
+        return numpy.empty( 0, dtype = 'int64' )
+
+    minimum = corners.min( axis = 0 )
+    spans = [ int( span ) for span in corners.max( axis = 0 ) - minimum + 1 ]
+    if spans[ 0 ] * spans[ 1 ] * spans[ 2 ] >= 2 ** 63:
+        return corners.view( [ ('v', 'int64'), ('tc', 'int64'), ('n', 'int64') ] ).ravel()
+
+    offsets = corners - minimum
+    return (offsets[ :, 0 ] * spans[ 1 ] + offsets[ :, 1 ]) * spans[ 2 ] + offsets[ :, 2 ]
+
+def _polygon_corners( polygons ):
+    """Flattens a list of polygons (lists of corners) to a
+    corner array and the number of corners in each polygon.
+    """
+    lengths = numpy.fromiter( imap( len, polygons ), dtype = 'int64', count = len( polygons ) )
+    corners = _corner_array( chain.from_iterable( polygons ), int( lengths.sum() ) )
+    return corners, lengths
+
+def _polygon_indices( lengths, start, count ):
+    """Enumerates the line segments or triangles of each polygon.
+
+    A polygon of n corners has n - count elements. Element i
+    of a polygon is at corner start + i of the polygon.
+
+    @return: a tuple of the corner of each element and the
+    first corner of the element's polygon.
+    """
+    offsets = numpy.cumsum( lengths ) - lengths
+    counts = numpy.maximum( lengths - count, 0 )
+    polygon = numpy.repeat( numpy.arange( len( lengths ) ), counts )
+    first = numpy.cumsum( counts ) - counts
+    element = numpy.arange( counts.sum() ) - first[ polygon ]
+    return offsets[ polygon ] + start + element, offsets[ polygon ]
+
+def strip_to_lines( lengths ):
+    """Returns the corner indices of the line segments of
+    a set of line strips.
+
+    @param lengths: the number of corners in each strip.
+    """
+    previous, _ = _polygon_indices( lengths, 0, 1 )
+    return numpy.column_stack( [ previous, previous + 1 ] ).ravel()
+
+def fan_to_triangles( lengths ):
+    """Returns the corner indices of the triangles of
+    a set of triangle fans.
+
+    Converts from triangle fan
+    0, 1, 2, 3, 4, 5
+    to triangle list
+    0, 1, 2, 0, 2, 3, 0, 3, 4, 0, 4, 5
+
+    @param lengths: the number of corners in each fan.
+    """
+    previous, start = _polygon_indices( lengths, 1, 2 )
+    return numpy.column_stack( [ start, previous, previous + 1 ] ).ravel()
+
+def process_vertices( model ):
+    """Processes OBJ model data to generate a single set
+    of indices.
+
+    Each (v, tc, n) corner is packed into a single int64 key.
+    numpy.unique finds the unique corners, which are numbered
+    in the order they are first used, and the vertex data is
+    gathered for all of them at once.
+
+    Points are rendered as is, line strips are converted to
+    line segments and faces (triangle fans) are converted to
+    triangles.
+
+    This function returns a tuple containing the following values.
+    (
+        float32 vertices (n x 3),
+        float32 texture coordinates (n x 2),
+        float32 normals (n x 3),
+        [ (groups, uint32 indices, num_points, num_lines, num_faces) ]
+        )
+    The indices of each mesh are ordered points, lines, faces.
+
+    The output is identical to process_vertices_loop.
+    """
+    mesh_corners = []
+    meshes = []
+    for mesh in model.meshes:
+        points = _corner_array( mesh['points'], len( mesh['points'] ) )
+
+        corners, lengths = _polygon_corners( mesh['lines'] )
+        lines = corners[ strip_to_lines( lengths ) ]
+
+        corners, lengths = _polygon_corners( mesh['faces'] )
+        faces = corners[ fan_to_triangles( lengths ) ]
+
+        mesh_corners.append( numpy.concatenate( [ points, lines, faces ] ) )
+        meshes.append( (list( mesh['groups'] ), len( points ), len( lines ), len( faces )) )
+
+    vertices = numpy.array( model.vertices, dtype = 'float32' ).reshape( -1, 3 )
+    texture_coords = numpy.array( model.texture_coords, dtype = 'float32' ).reshape( -1, 2 )
+    normals = numpy.array( model.normals, dtype = 'float32' ).reshape( -1, 3 )
+
+    if mesh_corners:
+        corners = numpy.ascontiguousarray( numpy.concatenate( mesh_corners ), dtype = 'int64' )
+    else:
+        corners = numpy.zeros( (0, 3), dtype = 'int64' )
+
+    # number the unique corners by their first use
+    keys = corner_keys( corners )
+    _, first, inverse = numpy.unique( keys, return_index = True, return_inverse = True )
+    order = numpy.argsort( first )
+    remap = numpy.empty( len( order ), dtype = 'uint32' )
+    remap[ order ] = numpy.arange( len( order ) )
+    indices = remap[ inverse.ravel() ]
+    unique = corners[ first[ order ] ]
+
+    # a missing tc or normal index of -1 selects
+    # the zero row appended to the end of the array
+    texture_coords = numpy.concatenate( [ texture_coords, numpy.zeros( (1, 2), dtype = 'float32' ) ] )
+    normals = numpy.concatenate( [ normals, numpy.zeros( (1, 3), dtype = 'float32' ) ] )
+
+    result = []
+    offset = 0
+    for groups, num_points, num_lines, num_faces in meshes:
+        count = num_points + num_lines + num_faces
+        result.append(
+            (
+                groups,
+                indices[ offset : offset + count ],
+                num_points,
+                num_lines,
+                num_faces
+                )
+            )
+        offset += count
+
+    return (
+        vertices[ unique[ :, 0 ] ],
+        texture_coords[ unique[ :, 1 ] ],
+        normals[ unique[ :, 2 ] ],
+        result
+        )
+
+def process_vertices_loop( model ):
+    """Reference implementation of process_vertices.
+
+    For each index we check if we already have a matching
+    vertex, and if not, make one.
+
+    This is much slower than process_vertices and
+    is kept to verify and benchmark the vectorised version.
+    """
+    # we need to convert from 3 lists with 3 sets of indices
+    # to 3 lists with 1 set of indices
+    # so for each index, we need to check if we already
+    # have a matching vertex, and if not, make one
+    vertex_bin = OrderedDict([])
+    vertices = []
+    texture_coords = []
+    normals = []
+    meshes = []
+
+    def process_vertex_data( bin, vertices, texture_coords, normals, data ):
+        # check if we've already got this unique vertex in our list
+        if data not in bin:
+            # the vertex doesn't exist yet
+            # insert into our vertex bin
+            bin[ data ] = len(bin)
+
+            # convert our indices into actual data
+            v_index, tc_index, n_index = data
+
+            vertices.extend(
+                list(model.vertices[ v_index ])
+                )
+
+            # map our texture coordinates
+            # if no tc is present, insert 0.0, 0.0
+            if tc_index != None:
+                texture_coords.extend(
+                    list(model.texture_coords[ tc_index ])
+                    )
+            else:
+                texture_coords.extend( [0.0, 0.0] )
+
+            # map our normals
+            # if no normal is present, insert 0.0, 0.0, 0.0
+            if n_index != None:
+                normals.extend(
+                    list(model.normals[ n_index ])
+                    )
+            else:
+                normals.extend( [0.0, 0.0, 0.0] )
+
+        # return the new index
+        return bin[ data ]
+
+
+    for mesh in model.meshes:
+        indices = []
+
+        num_points = 0
+        num_lines = 0
+        num_faces = 0
+
+        # check if we need to create a point mesh
+        if len(mesh['points']) > 0:
+            # remap each point from a random set of indices
+            # to a unique vertex
+            for point in mesh['points']:
+                indices.append(
+                    process_vertex_data(
+                        vertex_bin,
+                        vertices,
+                        texture_coords,
+                        normals,
+                        point
+                        )
+                    )
+            num_points = len(mesh['points'])
+
+        # check if we need to create a line mesh
+        if len(mesh['lines']) > 0:
+            # each line tuple is a line strip
+            # the easiest way to render is to convert to
+            # line segments
+            def convert_to_lines( strip ):
+                result = []
+                previous = strip[ 0 ]
+                for point in strip[ 1: ]:
+                    result.extend( [previous, point] )
+                    previous = point
+                return result
+
+            # convert each line strip into line segments
+            line_segments = []
+            for strip in mesh['lines']:
+                line_segments.extend( convert_to_lines( strip ) )
+
+            # remap each point from a random set of indices
+            # to a unique vertex
+            for point in line_segments:
+                indices.append(
+                    process_vertex_data(
+                        vertex_bin,
+                        vertices,
+                        texture_coords,
+                        normals,
+                        point
+                        )
+                    )
+            num_lines = len(line_segments)
+
+        # check if we need to create a face mesh
+        if len(mesh['faces']) > 0:
+            # faces are stored as a list of triangle fans
+            # we need to covnert them to triangles
+            def convert_to_triangles( fan ):
+                # convert from triangle fan
+                # 0, 1, 2, 3, 4, 5
+                # to triangle list
+                # 0, 1, 2, 0, 2, 3, 0, 3, 4, 0, 4, 5
+                result = []
+                start = fan[ 0 ]
+                previous = fan[ 1 ]
+                for point in fan[ 2: ]:
+                    result.extend( [start, previous, point ] )
+                    previous = point
+                return result
+
+            # convert each triangle face to triangles
+            triangle_indices = []
+            for face in mesh['faces']:
+                triangle_indices.extend( convert_to_triangles( face ) )
+
+            # remap each point from a random set of indices
+            # to a unique vertex
+            for point in triangle_indices:
+                indices.append(
+                    process_vertex_data(
+                        vertex_bin,
+                        vertices,
+                        texture_coords,
+                        normals,
+                        point
+                        )
+                    )
+            num_faces = len(triangle_indices)
+
+        meshes.append(
+            (
+                list( mesh['groups'] ),
+                numpy.array( indices, dtype = 'uint32' ),
+                num_points,
+                num_lines,
+                num_faces
+                )
+            )
+
+    return (
+        numpy.array( vertices, dtype = 'float32' ).reshape( -1, 3 ),
+        numpy.array( texture_coords, dtype = 'float32' ).reshape( -1, 2 ),
+        numpy.array( normals, dtype = 'float32' ).reshape( -1, 3 ),
+        meshes
+        )
+
+def optimise_faces( meshes, num_vertices ):
+    """Reorders the faces of each mesh for the vertex cache.
+
+    Takes the meshes of process_vertices and returns them
+    with a vertex_cache.cache_report for each mesh.
+    """
+    optimised = []
+    reports = []
+    for groups, indices, num_points, num_lines, num_faces in meshes:
+        start = num_points + num_lines
+        faces = indices[ start: ]
+        before = vertex_cache.acmr( faces )
+        faces = vertex_cache.optimise_indices( faces, num_vertices )
+        after = vertex_cache.acmr( faces )
+
+        indices = numpy.concatenate( [ indices[ :start ], faces ] )
+        optimised.append( (groups, indices, num_points, num_lines, num_faces) )
+        reports.append(
+            vertex_cache.cache_report(
+                num_faces // 3,
+                len( numpy.unique( faces ) ),
+                before,
+                after
+                )
+            )
+    return optimised, reports
+
+def optimise_meshes( vertices, texture_coords, normals, meshes ):
+    """Reorders the faces of each mesh for the vertex cache
+    and the vertices by their first use.
+
+    Takes and returns the values of process_vertices,
+    followed by a vertex_cache.cache_report for each mesh.
+    """
+    optimised, reports = optimise_faces( meshes, len( vertices ) )
+
+    # the meshes share their vertices so order
+    # them by their first use in any mesh
+    if optimised:
+        all_indices = numpy.concatenate( [ mesh[ 1 ] for mesh in optimised ] )
+        order, all_indices = vertex_cache.vertex_fetch_order( all_indices, len( vertices ) )
+
+        offset = 0
+        for index, (groups, indices, num_points, num_lines, num_faces) in enumerate( optimised ):
+            indices = all_indices[ offset : offset + len( indices ) ]
+            offset += len( indices )
+            optimised[ index ] = (groups, indices, num_points, num_lines, num_faces)
+
+        vertices = vertices[ order ]
+        texture_coords = texture_coords[ order ]
+        normals = normals[ order ]
+
+    return vertices, texture_coords, normals, optimised, reports
@@ -0,0 +1,122 @@
+"""
+Prepares many models in parallel with a process pool.
+
+Parsing and processing a model is single threaded and,
+unlike file I/O, mostly holds the GIL, so a level of models
+is prepared across processes instead of threads.
+
+Each worker creates the model's Data with finalise = False.
+The prepared Data, including its NumPy arrays, is pickled
+back to the calling process. The OpenGL objects are then
+created on the calling thread and the Data is added to
+the asset cache of its type, so later calls to Data.load
+and the meshes' load methods with the same options
+return it.
+
+Workers also write the mesh cache, so preparing the same
+models again reads memory mapped cache files instead.
+
+Usage:
+    preload.preload(
+        [ 'level/ogre.md2', 'level/castle.obj' ],
+        options = { '.obj': { 'chunk_size': 65536 } }
+        )
+"""
+
+import os
+import multiprocessing
+
+from razorback import md2
+from razorback import obj
+
+
+# the Data type of each model file extension
+data_types = {
+    '.md2': md2.Data,
+    '.obj': obj.Data,
+    }
+
+
+def data_type( filename ):
+    """Returns the Data type used to load a model.
+
+    @raise ValueError: if the file type isn't supported.
+    """
+    extension = os.path.splitext( filename )[ 1 ].lower()
+    if extension not in data_types:
+        raise ValueError( "Unsupported model type '%s'" % filename )
+    return data_types[ extension ]
+
+def _options( filename, options ):
+    if options == None:
+        return {}
+    return options.get( os.path.splitext( filename )[ 1 ].lower(), {} )
+
+def _cache_key( filename, options ):
+    return data_type( filename ).cache_key( filename, **_options( filename, options ) )
+
+def _prepare( request ):
+    filename, options = request
+    return data_type( filename )( filename, finalise = False, **options )
+
+def prepare( filenames, processes = None, options = None ):
+    """Parses and processes models in a process pool.
+
+    No OpenGL calls are made.
+
+    @param filenames: the model files to prepare.
+    @param processes: the number of worker processes.
+    If None, a process is used per CPU. If 1, the models
+    are prepared in the calling process.
+    @param options: a dictionary of file extension to the
+    keyword arguments for its Data type, for example
+    { '.md2': { 'frame_format': 'compact' } }.
+    @return: a list of the Data of each file. The Data must
+    be finalised before it is rendered.
+    """
+    requests = [ (filename, _options( filename, options )) for filename in filenames ]
+
+    if processes == 1 or len( requests ) < 2:
+        return [ _prepare( request ) for request in requests ]
+
+    pool = multiprocessing.Pool( processes )
+    try:
+        # models vary greatly in size, so hand them
+        # out one at a time
+        return pool.map( _prepare, requests, chunksize = 1 )
+    finally:
+        pool.close()
+        pool.join()
+
+def preload( filenames, processes = None, options = None ):
+    """Prepares models in a process pool, then finalises
+    them and adds them to the Data cache of their type.
+
+    This must be called on the thread with the OpenGL
+    context. Models that are already cached are skipped.
+
+    Preloaded models are cached without references, so
+    they can be evicted if the cache is over budget before
+    they are loaded.
+
+    @param processes: see prepare.
+    @param options: see prepare.
+    @return: the Data of each file.
+    """
+    loaded = {}
+    pending = []
+    for filename in filenames:
+        cache = data_type( filename ).cache
+        key = _cache_key( filename, options )
+        if key in cache:
+            loaded[ filename ] = cache[ key ]
+        elif filename not in pending:
+            pending.append( filename )
+
+    for filename, data in zip( pending, prepare( pending, processes, options ) ):
+        for step in data.finalise():
+            pass
+        data_type( filename ).cache.add( _cache_key( filename, options ), data, references = 0 )
+        loaded[ filename ] = data
+
+    return [ loaded[ filename ] for filename in filenames ]
@@ -0,0 +1,115 @@
+import json
+import unittest
+
+from razorback.asset_cache import AssetCache
+
+
+class Asset( object ):
+
+    def __init__( self, host_bytes, gpu_bytes ):
+        super( Asset, self ).__init__()
+
+        self.host_bytes = host_bytes
+        self.gpu_bytes = gpu_bytes
+
+    def memory_usage( self ):
+        return self.host_bytes, self.gpu_bytes
+
+
+class test_asset_cache( unittest.TestCase ):
+
+    def setUp( self ):
+        self.cache = AssetCache( gpu_budget = 100 )
+
+    def tearDown( self ):
+        pass
+
+    def test_acquire( self ):
+        self.assertEqual( self.cache.acquire( 'a' ), None, "Missing asset returned" )
+
+        asset = Asset( 10, 20 )
+        self.cache.add( 'a', asset )
+        self.assertTrue( self.cache.acquire( 'a' ) is asset, "Incorrect asset" )
+        self.assertEqual( self.cache.references( 'a' ), 2, "Incorrect references" )
+        self.assertEqual( (self.cache.host_bytes, self.cache.gpu_bytes), (10, 20), "Incorrect sizes" )
+        self.assertEqual( (self.cache.hits, self.cache.misses), (1, 1), "Incorrect hits and misses" )
+        self.assertRaises( KeyError, self.cache.add, 'a', asset )
+
+        # keys may be tuples of a filename and its load options
+        self.cache.add( ('b', None), asset )
+        self.assertRaises( KeyError, self.cache.add, ('b', None), asset )
+
+        # several references can be acquired at once
+        self.cache.acquire( 'a', references = 3 )
+        self.assertEqual( self.cache.references( 'a' ), 5, "Incorrect references" )
+
+    def test_shared_release( self ):
+        # releasing one reference keeps the asset
+        # for its other users
+        self.cache.add( 'a', Asset( 0, 60 ) )
+        self.cache.acquire( 'a' )
+        self.cache.release( 'a' )
+        self.cache.add( 'b', Asset( 0, 60 ) )
+        self.assertTrue( 'a' in self.cache, "Referenced asset evicted" )
+        self.assertEqual( self.cache.gpu_bytes, 120, "Incorrect GPU bytes" )
+
+        # once unreferenced, the asset is evicted
+        self.cache.release( 'a' )
+        self.assertFalse( 'a' in self.cache, "Unreferenced asset not evicted" )
+        self.assertEqual( self.cache.gpu_bytes, 60, "Incorrect GPU bytes" )
+        self.assertEqual( self.cache.evictions, 1, "Incorrect evictions" )
+
+    def test_lru( self ):
+        for key in 'abc':
+            self.cache.add( key, Asset( 0, 30 ) )
+        # a is released last, so b is the least recently used
+        for key in 'bca':
+            self.cache.release( key )
+
+        self.cache.add( 'd', Asset( 0, 30 ) )
+        self.assertEqual( sorted( self.cache.entries.keys() ), [ 'a', 'c', 'd' ], "Incorrect asset evicted" )
+
+        # acquiring an unreferenced asset keeps it
+        self.assertTrue( self.cache.acquire( 'c' ) != None, "Cached asset missing" )
+        self.cache.add( 'e', Asset( 0, 30 ) )
+        self.assertEqual( sorted( self.cache.entries.keys() ), [ 'c', 'd', 'e' ], "Incorrect asset evicted" )
+
+    def test_host_budget( self ):
+        cache = AssetCache( host_budget = 50 )
+        cache.add( 'a', Asset( 40, 1000 ), references = 0 )
+        cache.add( 'b', Asset( 40, 1000 ), references = 0 )
+        self.assertEqual( cache.entries.keys(), [ 'b' ], "Incorrect asset evicted" )
+
+        # assets without memory_usage are free
+        cache.add( 'c', object(), references = 0 )
+        self.assertEqual( len( cache ), 2, "Free asset evicted" )
+
+    def test_stats( self ):
+        self.cache.add( 'a', Asset( 5, 50 ) )
+        self.cache.add( 'b', Asset( 5, 50 ), references = 0 )
+        self.cache.acquire( 'b' )
+        self.cache.release( 'a' )
+        self.cache.add( 'c', Asset( 5, 50 ) )
+
+        stats = self.cache.stats()
+        self.assertEqual(
+            stats,
+            {
+                'entries': 2,
+                'referenced': 2,
+                'hits': 1,
+                'misses': 0,
+                'evictions': 1,
+                'host_bytes': 10,
+                'gpu_bytes': 100,
+                },
+            "Incorrect stats"
+            )
+        self.assertEqual( json.loads( json.dumps( stats ) ), stats, "Stats can't be exported" )
+
+        self.cache.clear()
+        self.assertEqual( (len( self.cache ), self.cache.gpu_bytes), (0, 0), "Cache not cleared" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import time
+import unittest
+
+from razorback.loader import AsyncLoader, completed_handle
+
+
+class Asset( object ):
+    """An asset that takes num_steps calls to finalise.
+    """
+
+    def __init__( self, name, num_steps = 3, step_time = 0.0, fail = False ):
+        super( Asset, self ).__init__()
+
+        if name == None:
+            raise ValueError( "Missing name" )
+
+        self.name = name
+        self.num_steps = num_steps
+        self.step_time = step_time
+        self.fail = fail
+        self.steps = 0
+        self.is_ready = False
+
+    def finalise( self ):
+        for step in range( self.num_steps ):
+            time.sleep( self.step_time )
+            self.steps += 1
+            if self.fail:
+                raise RuntimeError( "Upload failed" )
+            yield
+        self.is_ready = True
+
+
+class test_loader( unittest.TestCase ):
+
+    def setUp( self ):
+        self.loader = AsyncLoader( num_threads = 2 )
+
+    def tearDown( self ):
+        self.loader.shutdown()
+
+    def pump_until_done( self, handles, budget_ms = 2.0 ):
+        for frame in range( 1000 ):
+            if all( handle.is_done for handle in handles ):
+                return frame
+            self.loader.pump( budget_ms )
+            time.sleep( 0.001 )
+        self.fail( "Loads didn't complete" )
+
+    def test_load( self ):
+        handles = [ self.loader.load( Asset, 'asset%i' % index ) for index in range( 4 ) ]
+        self.assertFalse( any( handle.is_ready for handle in handles ), "Loaded before pump" )
+
+        self.pump_until_done( handles )
+        self.assertEqual( self.loader.num_pending, 0, "Loads still pending" )
+        for index, handle in enumerate( handles ):
+            self.assertTrue( handle.is_ready, "Load didn't complete" )
+            self.assertEqual( handle.get().name, 'asset%i' % index, "Incorrect asset" )
+            self.assertTrue( handle.result.is_ready, "Asset not finalised" )
+
+    def test_budget( self ):
+        # each step takes longer than the budget
+        # so a single step is run per pump
+        # the load completes on the pump after the last step
+        handle = self.loader.load( Asset, 'slow', num_steps = 4, step_time = 0.005 )
+        while self.loader._prepared.empty():
+            time.sleep( 0.001 )
+
+        for frame in range( 5 ):
+            self.loader.pump( 1.0 )
+            self.assertEqual( handle.is_ready, frame == 4, "Incorrect number of steps per pump" )
+
+    def test_callbacks( self ):
+        loaded = []
+        handle = self.loader.load( Asset, 'asset' )
+        handle.add_callback( loaded.append )
+        self.pump_until_done( [ handle ] )
+        self.assertEqual( loaded, [ handle ], "Callback not called" )
+
+        # callbacks added later are called immediately
+        handle.add_callback( loaded.append )
+        self.assertEqual( len( loaded ), 2, "Callback not called" )
+
+    def test_errors( self ):
+        prepare_failed = self.loader.load( Asset, None )
+        finalise_failed = self.loader.load( Asset, 'asset', fail = True )
+        loaded = self.loader.load( Asset, 'asset' )
+        self.pump_until_done( [ prepare_failed, finalise_failed, loaded ] )
+
+        self.assertTrue( isinstance( prepare_failed.error, ValueError ), "Prepare error not stored" )
+        self.assertTrue( isinstance( finalise_failed.error, RuntimeError ), "Finalise error not stored" )
+        self.assertRaises( ValueError, prepare_failed.get )
+        self.assertTrue( loaded.is_ready, "Errors stopped other loads" )
+        self.assertEqual( self.loader.num_pending, 0, "Loads still pending" )
+
+    def test_completed_handle( self ):
+        asset = Asset( 'asset' )
+        handle = completed_handle( asset )
+        self.assertTrue( handle.is_ready, "Handle not completed" )
+        self.assertTrue( handle.get() is asset, "Incorrect asset" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import math
+
+import numpy
+
+from razorback import lod
+
+
+def sphere( rings, segments ):
+    # a uv sphere with a texture seam
+    # the first and last column of vertices share positions
+    positions = []
+    for ring in range( rings + 1 ):
+        theta = math.pi * ring / rings
+        for segment in range( segments + 1 ):
+            phi = 2.0 * math.pi * segment / segments
+            positions.append( (
+                math.sin( theta ) * math.cos( phi ),
+                math.sin( theta ) * math.sin( phi ),
+                math.cos( theta )
+                ) )
+
+    indices = []
+    for ring in range( rings ):
+        for segment in range( segments ):
+            a = ring * (segments + 1) + segment
+            b = a + segments + 1
+            indices.extend( [ a, b, a + 1, a + 1, b, b + 1 ] )
+
+    positions = numpy.array( positions, dtype = 'float32' )
+    # make the seam positions identical
+    positions[ segments :: segments + 1 ] = positions[ 0 :: segments + 1 ]
+    return positions, numpy.array( indices, dtype = 'uint32' )
+
+
+class test_lod( unittest.TestCase ):
+
+    def setUp( self ):
+        self.positions, self.indices = sphere( 12, 16 )
+
+    def tearDown( self ):
+        pass
+
+    def test_seam_vertices( self ):
+        positions = numpy.array( [
+            (0.0, 0.0, 0.0),
+            (1.0, 0.0, 0.0),
+            (0.0, 0.0, 0.0),
+            (0.0, 1.0, 0.0),
+            ] )
+        locked = lod.seam_vertices( positions )
+        self.assertEqual( list( locked ), [ True, False, True, False ], "Incorrect seam vertices" )
+
+    def test_lod_chain( self ):
+        num_triangles = len( self.indices ) // 3
+        levels = lod.lod_chain( self.positions, self.indices, lod.default_ratios )
+
+        self.assertEqual( len( levels ), len( lod.default_ratios ), "Incorrect number of levels" )
+        self.assertTrue( numpy.array_equal( levels[ 0 ], self.indices ), "Full level changed" )
+
+        counts = [ len( level ) // 3 for level in levels ]
+        for previous, count in zip( counts, counts[ 1: ] ):
+            self.assertLess( count, previous, "Level was not simplified" )
+
+        for ratio, level in zip( lod.default_ratios[ 1: ], levels[ 1: ] ):
+            self.assertEqual( level.dtype, self.indices.dtype, "Incorrect index type" )
+            self.assertEqual( len( level ) % 3, 0, "Incomplete triangle" )
+            self.assertLessEqual( len( level ) // 3, int( math.ceil( num_triangles * ratio * 1.5 ) ), "Too many triangles" )
+
+            # every level indexes the original vertices
+            self.assertTrue( numpy.all( level < len( self.positions ) ), "Invalid index" )
+
+            # no degenerate triangles
+            triangles = level.reshape( -1, 3 )
+            self.assertTrue( numpy.all( triangles[ :, 0 ] != triangles[ :, 1 ] ), "Degenerate triangle" )
+            self.assertTrue( numpy.all( triangles[ :, 1 ] != triangles[ :, 2 ] ), "Degenerate triangle" )
+            self.assertTrue( numpy.all( triangles[ :, 2 ] != triangles[ :, 0 ] ), "Degenerate triangle" )
+
+    def test_locked( self ):
+        level = lod.lod_chain( self.positions, self.indices, (1.0, 0.25) )[ 1 ]
+
+        # the seam vertices are never removed
+        # the pole vertices are ignored as their
+        # triangles have no area
+        seam = numpy.arange( 1, 12 ) * 17
+        seam = numpy.concatenate( [ seam, seam + 16 ] )
+
+        used = numpy.zeros( len( self.positions ), dtype = 'bool' )
+        used[ level ] = True
+        self.assertTrue( numpy.all( used[ seam ] ), "Seam vertex removed" )
+
+    def test_selector( self ):
+        selector = lod.LODSelector( (200, 100, 50) )
+
+        self.assertEqual( selector.num_levels, 4, "Incorrect number of levels" )
+        self.assertEqual( selector.select( 300 ), 0, "Incorrect level" )
+        self.assertEqual( selector.select( 150 ), 1, "Incorrect level" )
+        self.assertEqual( selector.select( 10 ), 3, "Incorrect level" )
+        self.assertEqual( selector.select( 10, num_levels = 2 ), 1, "Level not clamped" )
+        self.assertEqual(
+            list( selector.select( numpy.array( [ 300, 75, 10 ] ) ) ),
+            [ 0, 2, 3 ],
+            "Incorrect levels"
+            )
+
+        self.assertRaises( ValueError, lod.LODSelector, (50, 100) )
+
+    def test_projected_size( self ):
+        # a sphere filling a 90 degree view
+        size = lod.projected_size( 1.0, 1.0, 90.0, 600 )
+        self.assertAlmostEqual( size, 600.0, places = 4, msg = "Incorrect projected size" )
+
+        self.assertGreater(
+            lod.projected_size( 1.0, 2.0, 60.0, 600 ),
+            lod.projected_size( 1.0, 4.0, 60.0, 600 ),
+            "Size should decrease with distance"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
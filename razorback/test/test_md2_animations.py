@@ -0,0 +1,84 @@
+import unittest
+
+import numpy
+
+from razorback.md2.animations import AnimationTable, AnimationStateArray
+
+
+class test_md2_animations( unittest.TestCase ):
+
+    def setUp( self ):
+        self.table = AnimationTable(
+            [ 'stand01', 'stand02', 'run01', 'run02', 'run03', 'extra01' ],
+            {
+                'stand': (0, 1, 9.0),
+                'run': (2, 4, 10.0),
+                }
+            )
+
+    def tearDown( self ):
+        pass
+
+    def test_frames( self ):
+        self.assertEqual( self.table.num_frames, 6, "Incorrect frame count" )
+        self.assertEqual( self.table.frame_name( 3 ), 'run02', "Incorrect frame name" )
+
+    def test_animations( self ):
+        self.assertEqual( self.table.names, [ 'run', 'stand' ], "Incorrect animations" )
+        self.assertEqual( self.table.animation( 0 ), 'stand', "Incorrect animation" )
+        self.assertEqual( self.table.animation( 4 ), 'run', "Incorrect animation" )
+        self.assertEqual( self.table.animation( 5 ), None, "Frame should have no animation" )
+
+        self.assertEqual( self.table.start_end_frame( 'run' ), (2, 4), "Incorrect frame range" )
+        self.assertEqual( self.table.animation_frame_rate( 'stand' ), 9.0, "Incorrect frame rate" )
+
+        self.assertEqual( self.table.frame_rate( 1 ), 9.0, "Incorrect frame rate" )
+        self.assertEqual(
+            self.table.frame_rate( 5 ),
+            AnimationTable.default_frame_rate,
+            "Incorrect default frame rate"
+            )
+
+    def test_state_loop( self ):
+        states = AnimationStateArray( self.table, 3 )
+        states.set_animation( slice( None ), 'run' )
+
+        self.assertEqual( states.frame1.tolist(), [ 2, 2, 2 ], "Incorrect start frame" )
+        self.assertEqual( states.frame2.tolist(), [ 3, 3, 3 ], "Incorrect next frame" )
+
+        states.rates[:] = [ 10.0, 20.0, 5.0 ]
+        states.step( 0.25 )
+
+        # 4.5, 7.0 wrapped to 4.0, 3.25
+        self.assertEqual( states.frame1.tolist(), [ 4, 4, 3 ], "Incorrect frame" )
+        self.assertEqual( states.frame2.tolist(), [ 2, 2, 4 ], "Incorrect next frame" )
+        self.assertTrue(
+            numpy.allclose( states.fractions, [ 0.5, 0.0, 0.25 ] ),
+            "Incorrect fractions"
+            )
+
+    def test_state_clamp( self ):
+        states = AnimationStateArray( self.table, 2 )
+        states.set_animation( [ 0 ], 'stand', loop_mode = AnimationStateArray.clamp )
+        states.step( 1.0 )
+
+        # stand clamps on its last frame
+        # the other instance plays every frame at the default rate
+        self.assertEqual( states.frame1.tolist(), [ 1, 1 ], "Incorrect frame" )
+        self.assertEqual( states.frame2.tolist(), [ 1, 2 ], "Incorrect next frame" )
+        self.assertTrue(
+            numpy.allclose( states.fractions, [ 0.0, 0.0 ] ),
+            "Incorrect fractions"
+            )
+
+    def test_state_set_frames( self ):
+        states = AnimationStateArray( self.table, 2 )
+        states.set_frames( slice( None ), [ 3.5, 5.0 ] )
+
+        self.assertEqual( states.animations.tolist(), [ 0, -1 ], "Incorrect animations" )
+        self.assertEqual( states.rates.tolist(), [ 10.0, 7.0 ], "Incorrect rates" )
+        self.assertEqual( states.frame2.tolist(), [ 4, 0 ], "Incorrect next frame" )
+
+
+if __name__ == '__main__':
+    unittest.main()
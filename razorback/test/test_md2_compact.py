@@ -0,0 +1,89 @@
+import unittest
+
+import numpy
+
+from razorback.md2 import compact
+
+
+class test_md2_compact( unittest.TestCase ):
+
+    def setUp( self ):
+        random = numpy.random.RandomState( 0 )
+
+        num_frames = 4
+        num_vertices = 300
+
+        normals = random.normal( size = (num_frames, num_vertices, 3) )
+        normals /= numpy.sqrt( numpy.sum( normals * normals, axis = -1 ) )[ ..., numpy.newaxis ]
+
+        self.frames = numpy.empty( (num_frames, num_vertices, 6), dtype = 'float32' )
+        self.frames[ ..., 0:3 ] = random.uniform( -40.0, 40.0, (num_frames, num_vertices, 3) )
+        self.frames[ ..., 3:6 ] = normals
+
+    def tearDown( self ):
+        pass
+
+    def test_octahedral( self ):
+        normals = numpy.array( [
+            (0.0, 0.0, 1.0),
+            (0.0, 0.0, -1.0),
+            (1.0, 0.0, 0.0),
+            (0.0, -1.0, 0.0),
+            ] )
+        encoded = compact.octahedral_encode( normals )
+        self.assertEqual( encoded.dtype, numpy.uint8, "Incorrect encoded type" )
+
+        decoded = compact.octahedral_decode( encoded )
+        self.assertTrue( numpy.allclose( decoded, normals, atol = 0.01 ), "Incorrect normals" )
+
+    def test_quantise_frames( self ):
+        quantised, bounds = compact.quantise_frames( self.frames )
+
+        self.assertEqual( quantised.dtype, numpy.uint16, "Incorrect frame type" )
+        self.assertEqual( quantised.shape, (4, 300, 4), "Incorrect frame shape" )
+        self.assertEqual( bounds.shape, (4, 2, 4), "Incorrect bounds shape" )
+
+        # 8 bytes per vertex instead of 24
+        self.assertEqual( quantised.nbytes * 3, self.frames.nbytes, "Incorrect frame size" )
+
+        frames = compact.dequantise_frames( quantised, bounds )
+
+        # each frame's positions span 65535 steps
+        step = (self.frames[ ..., 0:3 ].max() - self.frames[ ..., 0:3 ].min()) / 65535.0
+        error = numpy.abs( frames[ ..., 0:3 ] - self.frames[ ..., 0:3 ] ).max()
+        self.assertLessEqual( error, step, "Position error too large" )
+
+        # octahedral normals are within a couple of degrees
+        dots = numpy.sum( frames[ ..., 3:6 ] * self.frames[ ..., 3:6 ], axis = -1 )
+        self.assertGreater( dots.min(), numpy.cos( numpy.radians( 2.0 ) ), "Normal error too large" )
+
+    def test_flat_frame( self ):
+        # a frame with every vertex at the same position
+        frames = numpy.zeros( (1, 3, 6), dtype = 'float32' )
+        frames[ ..., 0:3 ] = 5.0
+        frames[ ..., 5 ] = 1.0
+
+        quantised, bounds = compact.quantise_frames( frames )
+        result = compact.dequantise_frames( quantised, bounds )
+        self.assertTrue( numpy.allclose( result, frames, atol = 0.01 ), "Incorrect flat frame" )
+
+    def test_quantise_tcs( self ):
+        tcs = numpy.array( [ (0.0, 1.0), (0.5, 0.25) ], dtype = 'float32' )
+        quantised = compact.quantise_tcs( tcs )
+        self.assertEqual( quantised.dtype, numpy.uint16, "Incorrect tc type" )
+        self.assertEqual( quantised.tolist(), [ [ 0, 65535 ], [ 32768, 16384 ] ], "Incorrect tcs" )
+
+        # wrapped texture coordinates stay as floats
+        self.assertEqual( compact.quantise_tcs( tcs + 1.0 ), None, "Wrapped tcs quantised" )
+
+    def test_vertex_shader( self ):
+        source = '#version 150\n\nvoid main() {}\n'
+        self.assertEqual( compact.vertex_shader( source, False ), source, "Float shader changed" )
+
+        lines = compact.vertex_shader( source, True ).split( '\n' )
+        self.assertEqual( lines[ 0 ], '#version 150', "Version must be first" )
+        self.assertEqual( lines[ 1 ], '#define COMPACT_FRAMES', "Missing define" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from collections import namedtuple
+
+import numpy
+
+from razorback.md2.unify import unify_indices, process_vertices, process_vertices_loop, process_frame_array
+
+
+frame_layout = namedtuple( 'Frame', [ 'name', 'vertices', 'normals' ] )
+triangle_layout = namedtuple( 'Triangles', [ 'vertex_indices', 'tc_indices' ] )
+md2_layout = namedtuple( 'MD2', [ 'frames', 'triangles', 'tcs' ] )
+
+
+class test_md2_unify( unittest.TestCase ):
+
+    def setUp( self ):
+        pass
+
+    def tearDown( self ):
+        pass
+
+    def create_md2( self, num_frames, num_vertices, num_tcs, num_triangles ):
+        random = numpy.random.RandomState( 0 )
+        frames = [
+            frame_layout(
+                'frame%i' % index,
+                random.rand( num_vertices, 3 ),
+                random.rand( num_vertices, 3 )
+                )
+            for index in range( num_frames )
+            ]
+        triangles = triangle_layout(
+            random.randint( 0, num_vertices, (num_triangles, 3) ),
+            random.randint( 0, num_tcs, (num_triangles, 3) )
+            )
+        # include duplicate tc values
+        tcs = numpy.floor( random.rand( num_tcs, 2 ) * 4.0 ) / 4.0
+        return md2_layout( frames, triangles, tcs )
+
+    def test_unify_indices( self ):
+        tcs = numpy.array( [
+            [ 0.0, 0.0 ],
+            [ 1.0, 0.0 ],
+            [ 0.0, 0.0 ],
+            ] )
+        indices, new_tcs, vertex_map = unify_indices(
+            [ 0, 1, 0, 1, 0, 1 ],
+            [ 0, 1, 1, 1, 2, 0 ],
+            tcs,
+            3
+            )
+
+        self.assertEqual(
+            indices.tolist(),
+            [ 0, 1, 3, 1, 0, 4 ],
+            "Incorrect indices"
+            )
+        self.assertEqual(
+            vertex_map.tolist(),
+            [ 0, 1, 2, 0, 1 ],
+            "Incorrect vertex mapping"
+            )
+        self.assertEqual(
+            new_tcs.tolist(),
+            [ [ 0.0, 0.0 ], [ 1.0, 0.0 ], [ 0.0, 0.0 ], [ 1.0, 0.0 ], [ 0.0, 0.0 ] ],
+            "Incorrect texture coordinates"
+            )
+
+    def test_matches_loop( self ):
+        md2 = self.create_md2( 5, 50, 40, 200 )
+
+        indices1, tcs1, frames1 = process_vertices( md2 )
+        indices2, tcs2, frames2 = process_vertices_loop( md2 )
+
+        self.assertEqual( indices1.dtype, indices2.dtype, "Index type differs" )
+        self.assertEqual( indices1.tostring(), indices2.tostring(), "Indices differ" )
+        self.assertEqual( tcs1.tostring(), tcs2.tostring(), "Texture coordinates differ" )
+        self.assertEqual( len( frames1 ), len( frames2 ), "Frame count differs" )
+
+        for frame1, frame2 in zip( frames1, frames2 ):
+            self.assertEqual( frame1.name, frame2.name, "Frame names differ" )
+            self.assertEqual(
+                frame1.vertices.tostring(),
+                frame2.vertices.tostring(),
+                "Frame vertices differ"
+                )
+            self.assertEqual(
+                frame1.normals.tostring(),
+                frame2.normals.tostring(),
+                "Frame normals differ"
+                )
+
+    def test_frame_array( self ):
+        md2 = self.create_md2( 4, 30, 20, 60 )
+
+        indices1, tcs1, frames1 = process_vertices( md2 )
+        indices2, tcs2, frames2 = process_frame_array( md2 )
+
+        self.assertEqual( indices2.dtype, numpy.uint32, "Incorrect index type" )
+        self.assertEqual( tcs2.dtype, numpy.float32, "Incorrect tc type" )
+        self.assertEqual( frames2.shape, (4, len( tcs1 ), 6), "Incorrect frame shape" )
+        self.assertTrue( frames2.flags.c_contiguous, "Frames not contiguous" )
+
+        self.assertTrue( numpy.array_equal( indices1, indices2 ), "Indices differ" )
+        self.assertTrue( numpy.array_equal( tcs1.astype( 'float32' ), tcs2 ), "Texture coordinates differ" )
+        for frame1, frame2 in zip( frames1, frames2 ):
+            self.assertTrue(
+                numpy.array_equal( frame1.vertices.astype( 'float32' ), frame2[ :, 0:3 ] ),
+                "Frame vertices differ"
+                )
+            self.assertTrue(
+                numpy.array_equal( frame1.normals.astype( 'float32' ), frame2[ :, 3:6 ] ),
+                "Frame normals differ"
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
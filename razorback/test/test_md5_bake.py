@@ -0,0 +1,164 @@
+import unittest
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy
+
+from razorback import mesh_cache
+from razorback.md5.bake import bake_animation
+from razorback.md5.skinning import Skinner
+from razorback.md5.skeleton import Skeleton
+
+
+arrays_layout = namedtuple( 'Arrays', [ 'tcs', 'bone_indices', 'weights', 'indices' ] )
+mesh_data_layout = namedtuple( 'MeshData', [ 'arrays', 'mesh_sizes' ] )
+
+
+class Interrupted( Exception ):
+    pass
+
+
+class TestAnimation( object ):
+
+    frame_rate = 24
+
+    def __init__( self, skeletons ):
+        self.skeletons = skeletons
+        self.interrupt_at = None
+
+    @property
+    def num_frames( self ):
+        return len( self.skeletons )
+
+    def skeleton( self, index ):
+        if index == self.interrupt_at:
+            raise Interrupted()
+        return self.skeletons[ index ]
+
+
+class test_md5_bake( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.original_directory = mesh_cache.directory
+        mesh_cache.directory = os.path.join( self.directory, 'cache' )
+
+        self.mesh_filename = os.path.join( self.directory, 'model.md5mesh' )
+        self.animation_filename = os.path.join( self.directory, 'model.md5anim' )
+        for filename in [ self.mesh_filename, self.animation_filename ]:
+            with open( filename, 'wb' ) as f:
+                f.write( filename )
+
+        random = numpy.random.RandomState( 0 )
+        num_joints = 4
+        num_vertices = 30
+
+        weights = random.uniform( -1.0, 1.0, (num_vertices, 4, 4) ).astype( 'float32' )
+        weights[ ..., 3 ] = 0.25
+        self.mesh_data = mesh_data_layout(
+            arrays_layout(
+                random.rand( num_vertices, 2 ).astype( 'float32' ),
+                random.randint( 0, num_joints, (num_vertices, 4) ).astype( 'float32' ),
+                weights,
+                random.randint( 0, 15, (20, 3) ).astype( 'uint32' )
+                ),
+            [ (15, 10), (15, 10) ]
+            )
+
+        skeletons = []
+        for index in range( 10 ):
+            orientations = random.uniform( -1.0, 1.0, (num_joints, 4) )
+            orientations /= numpy.sqrt( numpy.sum( orientations ** 2, axis = -1 ) )[ :, numpy.newaxis ]
+            skeletons.append( Skeleton(
+                numpy.arange( num_joints ) - 1,
+                random.uniform( -5.0, 5.0, (num_joints, 3) ).astype( 'float32' ),
+                orientations.astype( 'float32' )
+                ) )
+        self.animation = TestAnimation( skeletons )
+
+    def tearDown( self ):
+        mesh_cache.directory = self.original_directory
+        shutil.rmtree( self.directory )
+
+    def bake( self, **kwargs ):
+        return bake_animation(
+            self.mesh_data,
+            self.animation,
+            self.mesh_filename,
+            self.animation_filename,
+            checkpoint = 4,
+            **kwargs
+            )
+
+    def test_bake( self ):
+        baked = bake_animation( self.mesh_data, self.animation )
+
+        self.assertEqual( baked.frames.shape, (10, 30, 6), "Incorrect frame shape" )
+        self.assertEqual( baked.indices.dtype, numpy.uint32, "Incorrect index type" )
+        self.assertEqual( baked.indices.max(), 29, "Indices not offset by sub-mesh" )
+        self.assertEqual( baked.report.baked_frames, 10, "Incorrect report" )
+        self.assertEqual( baked.report.nbytes, 10 * 30 * 6 * 4, "Incorrect report" )
+
+        skinner = Skinner(
+            self.mesh_data.arrays.weights,
+            self.mesh_data.arrays.bone_indices,
+            baked.indices
+            )
+        positions, normals = skinner.skin( self.animation.skeletons[ 3 ] )
+        self.assertTrue( numpy.allclose( baked.frames[ 3, :, 0:3 ], positions ), "Incorrect positions" )
+        self.assertTrue( numpy.allclose( baked.frames[ 3, :, 3:6 ], normals ), "Incorrect normals" )
+
+    def test_cache( self ):
+        baked = self.bake()
+        self.assertFalse( baked.report.cached, "Bake loaded from an empty cache" )
+
+        cached = self.bake()
+        self.assertTrue( cached.report.cached, "Bake not cached" )
+        self.assertTrue( numpy.array_equal( baked.frames, cached.frames ), "Cached frames differ" )
+
+        # changing the mesh invalidates the bake
+        with open( self.mesh_filename, 'wb' ) as f:
+            f.write( 'new mesh' )
+        self.assertFalse( self.bake().report.cached, "Bake not invalidated" )
+
+    def test_vertex_order( self ):
+        baked = self.bake()
+
+        # the same meshes with their vertices reversed
+        order = numpy.concatenate( [ numpy.arange( 15 )[ ::-1 ], numpy.arange( 15, 30 )[ ::-1 ] ] )
+        arrays = self.mesh_data.arrays
+        self.mesh_data = mesh_data_layout(
+            arrays_layout(
+                arrays.tcs[ order ],
+                arrays.bone_indices[ order ],
+                arrays.weights[ order ],
+                (14 - arrays.indices).astype( 'uint32' )
+                ),
+            self.mesh_data.mesh_sizes
+            )
+        reordered = self.bake()
+        self.assertFalse( reordered.report.cached, "Bake of another vertex order loaded" )
+        self.assertTrue(
+            numpy.allclose( reordered.frames, baked.frames[ :, order ] ),
+            "Incorrect reordered frames"
+            )
+        self.assertTrue( self.bake().report.cached, "Reordered bake not cached" )
+
+    def test_resume( self ):
+        expected = bake_animation( self.mesh_data, self.animation )
+
+        # progress is saved every 4 frames
+        self.animation.interrupt_at = 6
+        self.assertRaises( Interrupted, self.bake )
+
+        self.animation.interrupt_at = None
+        baked = self.bake()
+
+        self.assertEqual( baked.report.baked_frames, 6, "Bake did not resume" )
+        self.assertTrue( numpy.array_equal( baked.frames, expected.frames ), "Resumed frames differ" )
+
+
+if __name__ == '__main__':
+    unittest.main()
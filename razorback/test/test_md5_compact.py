@@ -0,0 +1,132 @@
+import unittest
+from collections import namedtuple
+
+import numpy
+
+from razorback.md5 import quaternions
+from razorback.md5 import compact
+from razorback.md5.skinning import skin_positions
+from razorback.md5.skeleton import Skeleton
+
+
+mesh_layout = namedtuple( 'MeshLayout', [ 'tcs', 'bone_indices', 'weights', 'indices' ] )
+
+def random_skeleton( random, num_joints ):
+    orientations = random.uniform( -1.0, 1.0, (num_joints, 4) )
+    orientations /= numpy.sqrt( numpy.sum( orientations ** 2, axis = -1 ) )[ :, numpy.newaxis ]
+    return Skeleton(
+        numpy.arange( num_joints ) - 1,
+        random.uniform( -10.0, 10.0, (num_joints, 3) ).astype( 'float32' ),
+        orientations.astype( 'float32' )
+        )
+
+
+class test_md5_compact( unittest.TestCase ):
+
+    def setUp( self ):
+        random = numpy.random.RandomState( 0 )
+
+        num_joints = 8
+        num_vertices = 200
+
+        self.bind_skeleton = random_skeleton( random, num_joints )
+        self.pose_skeleton = random_skeleton( random, num_joints )
+
+        # generate weights the way an md5mesh stores them
+        # each weight is the vertex's bind pose position
+        # relative to the weight's joint
+        self.positions = random.uniform( -20.0, 20.0, (num_vertices, 3) )
+        self.bone_indices = random.randint( 0, num_joints, (num_vertices, 4) ).astype( 'float32' )
+        joints = self.bone_indices.astype( 'int32' )
+
+        inverse = self.bind_skeleton.orientations[ joints ] * [ -1.0, -1.0, -1.0, 1.0 ]
+        offsets = self.positions[ :, numpy.newaxis ] - self.bind_skeleton.positions[ joints ]
+
+        self.weights = numpy.empty( (num_vertices, 4, 4), dtype = 'float32' )
+        self.weights[ ..., 0:3 ] = quaternions.apply_to_vector( inverse, offsets )
+        biases = random.uniform( 0.0, 1.0, (num_vertices, 4) )
+        self.weights[ ..., 3 ] = biases / biases.sum( axis = -1 )[ :, numpy.newaxis ]
+
+        self.mesh = mesh_layout(
+            numpy.zeros( (num_vertices, 2), dtype = 'float32' ),
+            self.bone_indices,
+            self.weights,
+            numpy.zeros( (0, 3), dtype = 'uint32' )
+            )
+
+    def tearDown( self ):
+        pass
+
+    def test_to_matrix( self ):
+        random = numpy.random.RandomState( 1 )
+        quats = quaternions.normalise( random.uniform( -1.0, 1.0, (10, 4) ) )
+        vectors = random.uniform( -1.0, 1.0, (10, 3) )
+
+        matrices = quaternions.to_matrix( quats )
+        rotated = numpy.einsum( 'nab,nb->na', matrices, vectors )
+        expected = quaternions.apply_to_vector( quats, vectors )
+        self.assertTrue( numpy.allclose( rotated, expected ), "Matrices don't match quaternions" )
+
+    def test_quantise_biases( self ):
+        biases = numpy.array( [
+            (0.5, 0.25, 0.25, 0.0),
+            (1.0, 1.0, 1.0, 0.0),
+            (0.0, 0.0, 0.0, 0.0),
+            ] )
+        quantised = compact.quantise_biases( biases )
+
+        self.assertEqual( quantised.dtype, numpy.uint16, "Incorrect bias type" )
+        self.assertEqual( list( quantised[ 0 ] ), [ 32767, 16384, 16384, 0 ], "Incorrect biases" )
+        self.assertEqual( list( quantised.astype( 'int64' ).sum( axis = -1 )[ :2 ] ), [ 65535, 65535 ], "Biases don't sum to 1" )
+
+    def test_bone_index_type( self ):
+        self.assertEqual( compact.bone_index_type( 256 ), 'uint8', "Incorrect index type" )
+        self.assertEqual( compact.bone_index_type( 257 ), 'uint16', "Incorrect index type" )
+
+    def test_compact_arrays( self ):
+        arrays = compact.compact_arrays( self.mesh, self.bind_skeleton )
+
+        self.assertEqual( arrays.bone_indices.dtype, numpy.uint8, "Incorrect index type" )
+        self.assertEqual( arrays.biases.dtype, numpy.uint16, "Incorrect bias type" )
+        self.assertTrue( numpy.allclose( arrays.positions, self.positions, atol = 1e-3 ), "Incorrect bind pose" )
+
+        # 24 bytes of skinning data per vertex
+        size = sum(
+            array.itemsize * array.shape[ 1 ]
+            for array in [ arrays.positions, arrays.bone_indices, arrays.biases ]
+            )
+        self.assertEqual( size, 24, "Incorrect vertex size" )
+
+    def test_skinning_matrices( self ):
+        arrays = compact.compact_arrays( self.mesh, self.bind_skeleton )
+        inverse_bind = compact.inverse_bind_matrices( self.bind_skeleton )
+
+        # the bind pose is unchanged by its own skinning matrices
+        matrices = compact.skinning_matrices( self.bind_skeleton, inverse_bind )
+        identity = numpy.zeros( (3, 4) )
+        identity[ :, 0:3 ] = numpy.identity( 3 )
+        self.assertTrue( numpy.allclose( matrices, identity, atol = 1e-5 ), "Bind pose isn't identity" )
+
+        # other poses match skinning the weights
+        matrices = compact.skinning_matrices( self.pose_skeleton, inverse_bind )
+        result = compact.skin_compact( arrays.positions, arrays.bone_indices, arrays.biases, matrices )
+        expected = skin_positions(
+            self.weights,
+            self.bone_indices.astype( 'int32' ),
+            self.pose_skeleton.positions,
+            self.pose_skeleton.orientations
+            )
+        self.assertTrue( numpy.allclose( result, expected, atol = 0.01 ), "Skinned positions differ" )
+
+    def test_vertex_shader( self ):
+        source = '#version 150\nvoid main() {}\n'
+        self.assertEqual( compact.vertex_shader( source, False ), source, "Weights shader changed" )
+        self.assertEqual(
+            compact.vertex_shader( source, True ).split( '\n' )[ 0:2 ],
+            [ '#version 150', '#define COMPACT_SKINNING' ],
+            "Missing define"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
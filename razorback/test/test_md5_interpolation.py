@@ -0,0 +1,85 @@
+import unittest
+import math
+
+import numpy
+
+from razorback.md5 import quaternions
+from razorback.md5.skeleton import Skeleton, Animation
+
+
+def rotation_z( angle ):
+    return numpy.array( [ 0.0, 0.0, math.sin( angle / 2.0 ), math.cos( angle / 2.0 ) ] )
+
+
+class test_md5_interpolation( unittest.TestCase ):
+
+    def setUp( self ):
+        pass
+
+    def tearDown( self ):
+        pass
+
+    def test_slerp( self ):
+        quat1 = numpy.array( [ rotation_z( 0.0 ), rotation_z( 0.0 ) ] )
+        quat2 = numpy.array( [ rotation_z( math.pi / 2.0 ), -rotation_z( 1.0 ) ] )
+
+        result = quaternions.slerp( quat1, quat2, 0.25 )
+
+        # the second quaternion is negated and should
+        # still take the shortest path
+        self.assertTrue(
+            numpy.allclose( result, [ rotation_z( math.pi / 8.0 ), rotation_z( 0.25 ) ] ),
+            "Incorrect slerp"
+            )
+
+    def test_nlerp( self ):
+        quat1 = numpy.array( [ rotation_z( 0.0 ) ] )
+        quat2 = numpy.array( [ rotation_z( 1.0 ) ] )
+
+        self.assertTrue(
+            numpy.allclose( quaternions.nlerp( quat1, quat2, 0.5 ), [ rotation_z( 0.5 ) ] ),
+            "Incorrect nlerp"
+            )
+        self.assertTrue(
+            numpy.allclose( quaternions.nlerp( quat1, quat2, [ 0.0, 1.0 ] ), [ quat1[ 0 ], quat2[ 0 ] ] ),
+            "Incorrect nlerp end points"
+            )
+
+    def test_interpolate( self ):
+        parents = numpy.array( [ -1, 0 ] )
+        skeleton1 = Skeleton(
+            parents,
+            numpy.array( [ [ 0.0, 0.0, 0.0 ], [ 1.0, 0.0, 0.0 ] ], dtype = 'float32' ),
+            numpy.array( [ rotation_z( 0.0 ), rotation_z( 0.0 ) ], dtype = 'float32' )
+            )
+        skeleton2 = Skeleton(
+            parents,
+            numpy.array( [ [ 2.0, 0.0, 0.0 ], [ 1.0, 4.0, 0.0 ] ], dtype = 'float32' ),
+            numpy.array( [ rotation_z( 1.0 ), rotation_z( 2.0 ) ], dtype = 'float32' )
+            )
+
+        out = Skeleton.empty( parents )
+        positions = out.positions
+        result = Skeleton.interpolate( skeleton1, skeleton2, 0.5, out = out, slerp = True )
+
+        self.assertTrue( result is out, "Output skeleton not used" )
+        self.assertTrue( result.positions is positions, "Output arrays reallocated" )
+        self.assertTrue(
+            numpy.allclose( result.positions, [ [ 1.0, 0.0, 0.0 ], [ 1.0, 2.0, 0.0 ] ] ),
+            "Incorrect positions"
+            )
+        self.assertTrue(
+            numpy.allclose( result.orientations, [ rotation_z( 0.5 ), rotation_z( 1.0 ) ], atol = 1e-6 ),
+            "Incorrect orientations"
+            )
+
+        # interpolating into one of the inputs
+        Skeleton.interpolate( skeleton1, skeleton2, 0.25, out = skeleton2 )
+        self.assertTrue(
+            numpy.allclose( skeleton2.positions[ 0 ], [ 0.5, 0.0, 0.0 ] ),
+            "Incorrect in place interpolation"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
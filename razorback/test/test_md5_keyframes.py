@@ -0,0 +1,180 @@
+import unittest
+from collections import namedtuple
+
+import numpy
+
+from razorback.md5.keyframes import KeyframeBuilder, component_indices
+from razorback.md5.skeleton import Skeleton, KeyframeSkeleton, Animation
+
+
+hierarchy_joint_layout = namedtuple( 'HierarchyJoint', [ 'name', 'parent', 'flags', 'start_index' ] )
+base_frame_joint_layout = namedtuple( 'BaseFrameJoint', [ 'position', 'orientation' ] )
+
+
+class Hierarchy( list ):
+
+    @property
+    def num_joints( self ):
+        return len( self )
+
+
+class Frame( object ):
+
+    def __init__( self, values ):
+        self.values = values
+
+    def value( self, index ):
+        return self.values[ index ]
+
+
+class MD5Anim( object ):
+
+    def __init__( self, hierarchy, base_frame, frames ):
+        self.hierarchy = hierarchy
+        self.base_frame = base_frame
+        self.frames = frames
+        self.frame_rate = 24
+
+
+class test_md5_keyframes( unittest.TestCase ):
+
+    def setUp( self ):
+        random = numpy.random.RandomState( 0 )
+
+        num_joints = 12
+        num_frames = 20
+
+        # a chain with branches
+        parents = [ -1, 0, 1, 2, 1, 4, 0, 6, 7, -1, 9, 10 ]
+        flags = random.randint( 0, 64, num_joints )
+
+        hierarchy = Hierarchy()
+        start_index = 0
+        for index in range( num_joints ):
+            hierarchy.append(
+                hierarchy_joint_layout( 'joint%i' % index, parents[ index ], flags[ index ], start_index )
+                )
+            start_index += bin( flags[ index ] ).count( '1' )
+
+        def random_orientation():
+            xyz = random.uniform( -0.5, 0.5, 3 )
+            w = numpy.sqrt( 1.0 - numpy.sum( xyz ** 2 ) )
+            return numpy.append( xyz, w )
+
+        base_frame = [
+            base_frame_joint_layout(
+                random.uniform( -10.0, 10.0, 3 ),
+                random_orientation()
+                )
+            for index in range( num_joints )
+            ]
+
+        frames = []
+        for index in range( num_frames ):
+            values = numpy.empty( start_index )
+            for joint in hierarchy:
+                count = bin( joint.flags ).count( '1' )
+                values[ joint.start_index : joint.start_index + count ] = random.uniform( -0.5, 0.5, count )
+            frames.append( Frame( values ) )
+
+        self.md5anim = MD5Anim( hierarchy, base_frame, frames )
+
+    def tearDown( self ):
+        pass
+
+    def test_component_indices( self ):
+        indices = component_indices(
+            numpy.array( [ 0, 1 | 8, 63 ] ),
+            numpy.array( [ 0, 0, 2 ] )
+            )
+
+        self.assertEqual(
+            indices.tolist(),
+            [
+                [ -1, -1, -1, -1, -1, -1 ],
+                [ 0, -1, -1, 1, -1, -1 ],
+                [ 2, 3, 4, 5, 6, 7 ],
+                ],
+            "Incorrect component indices"
+            )
+
+    def test_matches_keyframe_skeleton( self ):
+        positions, orientations = KeyframeBuilder( self.md5anim ).build()
+
+        for index, frame in enumerate( self.md5anim.frames ):
+            skeleton = KeyframeSkeleton( self.md5anim, frame )
+
+            self.assertTrue(
+                numpy.allclose( skeleton.positions, positions[ index ], atol = 1e-4 ),
+                "Positions differ"
+                )
+            self.assertTrue(
+                numpy.allclose( skeleton.orientations, orientations[ index ], atol = 1e-5 ),
+                "Orientations differ"
+                )
+
+    def test_build_frames( self ):
+        builder = KeyframeBuilder( self.md5anim )
+        positions, orientations = builder.build()
+        subset_positions, subset_orientations = builder.build( [ 5, 2 ] )
+
+        self.assertTrue( numpy.array_equal( subset_positions[ 0 ], positions[ 5 ] ), "Incorrect frame" )
+        self.assertTrue( numpy.array_equal( subset_orientations[ 1 ], orientations[ 2 ] ), "Incorrect frame" )
+
+    def test_animation( self ):
+        animation = Animation( self.md5anim )
+        skeleton = KeyframeSkeleton( self.md5anim, self.md5anim.frames[ 3 ] )
+
+        self.assertEqual( animation.num_frames, 20, "Incorrect frame count" )
+        self.assertEqual(
+            list( animation.skeleton( 3 ).parents ),
+            list( skeleton.parents ),
+            "Incorrect parents"
+            )
+        self.assertTrue(
+            numpy.allclose( animation.skeleton( 3 ).positions, skeleton.positions, atol = 1e-4 ),
+            "Positions differ"
+            )
+
+    def test_animation_cache( self ):
+        animation = Animation( self.md5anim, cache_size = 4 )
+
+        animation.skeleton( 0 )
+        animation.skeleton( 1 )
+        animation.skeleton( 0 )
+        self.assertEqual( (animation.hits, animation.misses), (1, 2), "Incorrect statistics" )
+
+        # 0 is more recent than 1, so 1 is evicted first
+        animation.prefetch( 10, 3 )
+        self.assertEqual( list( animation.skeletons.keys() ), [ 0, 10, 11, 12 ], "Incorrect cache" )
+
+        animation.skeleton( 11 )
+        self.assertEqual( (animation.hits, animation.misses), (2, 2), "Prefetch should not miss" )
+
+        # prefetching wraps at the end of the animation
+        animation.prefetch( 19, 2 )
+        self.assertEqual( list( animation.skeletons.keys() ), [ 12, 11, 0, 19 ], "Incorrect cache" )
+
+    def test_animation_sample( self ):
+        animation = Animation( self.md5anim )
+        out = animation.sample( 3.25 / animation.frame_rate )
+
+        expected = Skeleton.interpolate( animation.skeleton( 3 ), animation.skeleton( 4 ), 0.25 )
+        self.assertTrue( numpy.allclose( out.positions, expected.positions ), "Incorrect positions" )
+        self.assertTrue( numpy.allclose( out.orientations, expected.orientations ), "Incorrect orientations" )
+
+        # the last frame interpolates to the first when looping
+        self.assertEqual( animation.frame_interpolation( 19.5 / animation.frame_rate ), (19, 0, 0.5), "Incorrect looping frames" )
+        self.assertEqual( animation.frame_interpolation( 30.0 / animation.frame_rate, loop = False ), (19, 19, 0.0), "Incorrect clamped frames" )
+
+        # blending an animation with itself at the same time changes nothing
+        blended = Animation.blend( animation, 1.0, animation, 1.0, 0.5, out = out )
+        self.assertTrue( blended is out, "Output skeleton not used" )
+        self.assertTrue(
+            numpy.allclose( blended.positions, animation.sample( 1.0 ).positions, atol = 1e-5 ),
+            "Incorrect blend"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
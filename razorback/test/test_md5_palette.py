@@ -0,0 +1,104 @@
+import unittest
+
+# must be imported before pyglet.gl
+from razorback.benchmarks.gl_stub import RecordingGL
+
+import numpy
+from pyglet.gl import *
+
+import razorback.upload
+import razorback.md5.palette
+from razorback.md5.palette import PaletteAtlas
+from razorback.md5.skeleton import Skeleton
+
+
+class test_md5_palette( unittest.TestCase ):
+
+    def setUp( self ):
+        self.gl = RecordingGL( razorback.upload, razorback.md5.palette )
+        self.gl.install()
+
+    def tearDown( self ):
+        self.gl.uninstall()
+
+    def create_skeleton( self, num_joints, value ):
+        return Skeleton(
+            numpy.arange( num_joints ) - 1,
+            numpy.zeros( (num_joints, 3), dtype = 'float32' ) + value,
+            numpy.zeros( (num_joints, 4), dtype = 'float32' ) + value
+            )
+
+    def test_allocate( self ):
+        atlas = PaletteAtlas( 4 )
+
+        base1 = atlas.allocate( 3 )
+        base2 = atlas.allocate( 3 )
+        self.assertEqual( (base1, base2), (0, 3), "Incorrect palette bases" )
+        self.assertTrue( atlas.capacity >= 6, "Atlas did not grow" )
+
+        # released ranges are re-used
+        atlas.release( base1 )
+        self.assertEqual( atlas.allocate( 2 ), 0, "Free range not re-used" )
+        self.assertEqual( atlas.allocate( 1 ), 2, "Free range not re-used" )
+        self.assertEqual( atlas.allocate( 1 ), 6, "Incorrect palette base" )
+
+    def test_release( self ):
+        atlas = PaletteAtlas( 16 )
+        bases = [ atlas.allocate( 2 ) for index in range( 5 ) ]
+
+        # adjacent free ranges are merged
+        atlas.release( bases[ 1 ] )
+        atlas.release( bases[ 3 ] )
+        atlas.release( bases[ 2 ] )
+        self.assertEqual( atlas.free, [ (2, 6) ], "Free ranges not merged" )
+        self.assertEqual( atlas.allocate( 5 ), 2, "Merged range not re-used" )
+
+        # releasing the last range shrinks the atlas,
+        # including the free ranges below it
+        atlas.release( 2 )
+        atlas.release( bases[ 4 ] )
+        self.assertEqual( (atlas.size, atlas.free), (2, []), "Atlas not trimmed" )
+        atlas.release( bases[ 0 ] )
+        self.assertEqual( (atlas.size, atlas.free), (0, []), "Atlas not trimmed" )
+
+    def test_upload( self ):
+        atlas = PaletteAtlas( 8 )
+        base1 = atlas.allocate( 2 )
+        base2 = atlas.allocate( 3 )
+
+        atlas.set_skeleton( base1, self.create_skeleton( 2, 1.0 ) )
+        atlas.set_skeleton( base2, self.create_skeleton( 3, 2.0 ) )
+        self.assertRaises( ValueError, atlas.set_skeleton, base1, self.create_skeleton( 3, 0.0 ) )
+
+        atlas.upload()
+        atlas.upload()
+
+        # the texture buffer is only linked once
+        self.assertEqual( self.gl.count( 'glTexBuffer' ), 1, "Texture buffer re-linked" )
+        self.assertEqual( self.gl.count( 'glBufferSubData' ), 2, "Incorrect upload count" )
+
+        joints = numpy.fromstring( self.gl.data( 'glBufferSubData' )[ -1 ], dtype = 'float32' )
+        joints = joints.reshape( -1, 2, 4 )
+        self.assertEqual( len( joints ), 5, "Incorrect number of joints uploaded" )
+        self.assertTrue( numpy.all( joints[ 0:2, 0 ] == 1.0 ), "Incorrect orientations" )
+        self.assertTrue( numpy.all( joints[ 2:5, 1, 0:3 ] == 2.0 ), "Incorrect positions" )
+
+    def test_upload_free( self ):
+        atlas = PaletteAtlas( 8 )
+        bases = [ atlas.allocate( 2 ) for index in range( 4 ) ]
+        atlas.release( bases[ 1 ] )
+        atlas.release( bases[ 3 ] )
+
+        # free ranges aren't uploaded
+        atlas.upload()
+        calls = [ call[ 1 ] for call in self.gl.calls if call[ 0 ] == 'glBufferSubData' ]
+        joint_bytes = 2 * 4 * 4
+        self.assertEqual(
+            [ (offset, size) for target, offset, size, data in calls ],
+            [ (0, 2 * joint_bytes), (4 * joint_bytes, 2 * joint_bytes) ],
+            "Incorrect ranges uploaded"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
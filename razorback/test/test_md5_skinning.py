@@ -0,0 +1,89 @@
+import unittest
+
+import numpy
+
+from razorback.md5.skinning import Skinner, skin_positions, skin_positions_loop, generate_normals, mesh_indices
+from razorback.md5.skeleton import Skeleton
+
+
+class test_md5_skinning( unittest.TestCase ):
+
+    def setUp( self ):
+        random = numpy.random.RandomState( 0 )
+
+        num_joints = 8
+        num_vertices = 500
+
+        orientations = random.uniform( -1.0, 1.0, (num_joints, 4) )
+        orientations /= numpy.sqrt( numpy.sum( orientations ** 2, axis = -1 ) )[ :, numpy.newaxis ]
+        self.skeleton = Skeleton(
+            numpy.arange( num_joints ) - 1,
+            random.uniform( -10.0, 10.0, (num_joints, 3) ).astype( 'float32' ),
+            orientations.astype( 'float32' )
+            )
+
+        # biases sum to 1.0, unused weights have a bias of 0.0
+        self.weights = random.uniform( -5.0, 5.0, (num_vertices, 4, 4) ).astype( 'float32' )
+        biases = random.uniform( 0.0, 1.0, (num_vertices, 4) )
+        biases[ :, 3 ] = 0.0
+        self.weights[ ..., 3 ] = biases / biases.sum( axis = -1 )[ :, numpy.newaxis ]
+
+        self.bone_indices = random.randint( 0, num_joints, (num_vertices, 4) ).astype( 'float32' )
+
+    def tearDown( self ):
+        pass
+
+    def test_matches_loop( self ):
+        joints = self.bone_indices.astype( 'int32' )
+        expected = skin_positions_loop(
+            self.weights,
+            joints,
+            self.skeleton.positions,
+            self.skeleton.orientations
+            )
+        result = skin_positions(
+            self.weights,
+            joints,
+            self.skeleton.positions,
+            self.skeleton.orientations
+            )
+
+        self.assertTrue( numpy.allclose( result, expected, atol = 1e-4 ), "Positions differ" )
+
+    def test_threads( self ):
+        skinner = Skinner( self.weights, self.bone_indices )
+        threaded = Skinner( self.weights, self.bone_indices, threads = 4, chunk_size = 64 )
+
+        positions, normals = skinner.skin( self.skeleton )
+        threaded_positions, normals = threaded.skin( self.skeleton )
+        threaded.close()
+
+        self.assertEqual( normals, None, "Normals generated without indices" )
+        self.assertTrue(
+            numpy.array_equal( positions, threaded_positions ),
+            "Threaded positions differ"
+            )
+
+    def test_normals( self ):
+        # a square in the xy plane, split into 2 sub-meshes
+        positions = numpy.array( [
+            [ 0.0, 0.0, 0.0 ],
+            [ 1.0, 0.0, 0.0 ],
+            [ 1.0, 1.0, 0.0 ],
+            [ 0.0, 1.0, 0.0 ],
+            [ 5.0, 5.0, 5.0 ],
+            ], dtype = 'float32' )
+        indices = mesh_indices( [ [ 0, 1, 2 ], [ 1, 2, 0 ] ], [ (3, 1), (2, 1) ] )
+
+        self.assertEqual( indices.tolist(), [ [ 0, 1, 2 ], [ 4, 5, 3 ] ], "Incorrect mesh indices" )
+
+        normals = generate_normals( positions, numpy.array( [ [ 0, 1, 2 ], [ 0, 2, 3 ] ] ) )
+        self.assertTrue(
+            numpy.allclose( normals[ 0:4 ], [ 0.0, 0.0, 1.0 ] ),
+            "Incorrect normals"
+            )
+        self.assertTrue( numpy.all( normals[ 4 ] == 0.0 ), "Unused vertex should have no normal" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+import os
+import json
+import struct
+import shutil
+import tempfile
+
+import numpy
+
+from razorback import mesh_cache
+
+
+class test_mesh_cache( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.original_directory = mesh_cache.directory
+        mesh_cache.directory = os.path.join( self.directory, 'cache' )
+
+        self.source = os.path.join( self.directory, 'model.md2' )
+        with open( self.source, 'wb' ) as f:
+            f.write( 'model data' )
+
+    def tearDown( self ):
+        mesh_cache.directory = self.original_directory
+        shutil.rmtree( self.directory )
+
+    def save( self ):
+        self.indices = numpy.arange( 9, dtype = 'uint32' )
+        self.frames = numpy.random.rand( 3, 5, 6 ).astype( 'float32' )
+        mesh_cache.save(
+            self.source,
+            'md2',
+            [
+                ('indices', self.indices),
+                ('frames', self.frames),
+                ('empty', numpy.empty( (0, 2), dtype = 'float32' )),
+                ],
+            { 'frame_names': [ 'stand01', 'stand02', 'stand03' ] }
+            )
+
+    def test_round_trip( self ):
+        self.assertEqual(
+            mesh_cache.load( self.source, 'md2' ),
+            None,
+            "Cache loaded before it was saved"
+            )
+
+        self.save()
+        header, blocks = mesh_cache.load( self.source, 'md2' )
+
+        self.assertEqual(
+            header[ 'frame_names' ],
+            [ 'stand01', 'stand02', 'stand03' ],
+            "Incorrect header"
+            )
+        self.assertTrue(
+            isinstance( blocks[ 'frames' ], numpy.memmap ),
+            "Blocks not memory mapped"
+            )
+        self.assertTrue(
+            numpy.array_equal( blocks[ 'indices' ], self.indices ),
+            "Incorrect indices"
+            )
+        self.assertTrue(
+            numpy.array_equal( blocks[ 'frames' ], self.frames ),
+            "Incorrect frames"
+            )
+        self.assertEqual( blocks[ 'frames' ].dtype, numpy.float32, "Incorrect type" )
+        self.assertEqual( blocks[ 'empty' ].shape, (0, 2), "Incorrect shape" )
+
+        # the data type is part of the key
+        self.assertEqual( mesh_cache.load( self.source, 'obj' ), None, "Incorrect kind loaded" )
+
+    def test_invalidation( self ):
+        self.save()
+
+        # modify the source file
+        with open( self.source, 'wb' ) as f:
+            f.write( 'new model data' )
+        self.assertEqual(
+            mesh_cache.load( self.source, 'md2' ),
+            None,
+            "Cache not invalidated by size"
+            )
+
+        self.save()
+        stat = os.stat( self.source )
+        os.utime( self.source, (stat.st_atime, stat.st_mtime + 10.0) )
+        self.assertEqual(
+            mesh_cache.load( self.source, 'md2' ),
+            None,
+            "Cache not invalidated by modification time"
+            )
+
+        self.save()
+        original_version = mesh_cache.__version__
+        mesh_cache.__version__ = 'test'
+        try:
+            self.assertEqual(
+                mesh_cache.load( self.source, 'md2' ),
+                None,
+                "Cache not invalidated by version"
+                )
+        finally:
+            mesh_cache.__version__ = original_version
+
+        self.save()
+        mesh_cache.content_version += 1
+        try:
+            self.assertEqual(
+                mesh_cache.load( self.source, 'md2' ),
+                None,
+                "Cache not invalidated by content version"
+                )
+        finally:
+            mesh_cache.content_version -= 1
+
+    def test_corrupt( self ):
+        self.save()
+        path = mesh_cache.cache_filename( self.source, 'md2' )
+        with open( path, 'rb' ) as f:
+            contents = f.read()
+
+        # truncate the last block
+        with open( path, 'wb' ) as f:
+            f.write( contents[ :-8 ] )
+        self.assertEqual( mesh_cache.load( self.source, 'md2' ), None, "Truncated cache loaded" )
+
+        # remove the block descriptions from the header
+        prefix_size = struct.calcsize( '<8sII' )
+        file_magic, version, header_size = struct.unpack( '<8sII', contents[ :prefix_size ] )
+        header = json.loads( contents[ prefix_size:prefix_size + header_size ] )
+        del header[ 'blocks' ]
+        encoded = json.dumps( header )
+        with open( path, 'wb' ) as f:
+            f.write( struct.pack( '<8sII', file_magic, version, len( encoded ) ) )
+            f.write( encoded )
+        self.assertEqual( mesh_cache.load( self.source, 'md2' ), None, "Cache without blocks loaded" )
+
+    def test_replace( self ):
+        self.save()
+        header, blocks = mesh_cache.load( self.source, 'md2' )
+        frames = numpy.array( blocks[ 'frames' ] )
+
+        # replace the cache while the first is still mapped
+        self.save()
+        self.assertTrue(
+            numpy.array_equal( blocks[ 'frames' ], frames ),
+            "Mapped blocks changed by a new cache"
+            )
+        header, blocks = mesh_cache.load( self.source, 'md2' )
+        self.assertTrue(
+            numpy.array_equal( blocks[ 'frames' ], self.frames ),
+            "Replaced cache not loaded"
+            )
+        self.assertEqual(
+            os.listdir( mesh_cache.directory ),
+            [ os.path.basename( mesh_cache.cache_filename( self.source, 'md2' ) ) ],
+            "Temporary files left in the cache directory"
+            )
+
+    def test_dependencies( self ):
+        dependency = os.path.join( self.directory, 'model.md5mesh' )
+        with open( dependency, 'wb' ) as f:
+            f.write( 'mesh data' )
+
+        array = numpy.arange( 4, dtype = 'float32' )
+        mesh_cache.save( self.source, 'bake', [ ('frames', array) ], dependencies = [ dependency ] )
+
+        self.assertNotEqual(
+            mesh_cache.load( self.source, 'bake', dependencies = [ dependency ] ),
+            None,
+            "Cache with dependencies not loaded"
+            )
+        self.assertEqual(
+            mesh_cache.load( self.source, 'bake' ),
+            None,
+            "Cache loaded with missing dependencies"
+            )
+
+        with open( dependency, 'wb' ) as f:
+            f.write( 'new mesh data' )
+        self.assertEqual(
+            mesh_cache.load( self.source, 'bake', dependencies = [ dependency ] ),
+            None,
+            "Cache not invalidated by dependency"
+            )
+
+    def test_disabled( self ):
+        mesh_cache.enabled = False
+        try:
+            self.save()
+        finally:
+            mesh_cache.enabled = True
+        self.assertEqual(
+            mesh_cache.load( self.source, 'md2' ),
+            None,
+            "Cache written while disabled"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
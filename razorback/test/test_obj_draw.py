@@ -0,0 +1,81 @@
+import unittest
+
+import numpy
+
+from razorback.obj import draw
+
+
+class test_obj_draw( unittest.TestCase ):
+
+    def setUp( self ):
+        # 2 meshes with points, lines and faces
+        # the first has a single lower level of detail
+        self.meshes = [
+            ( [ 'a' ], numpy.arange( 0, 8, dtype = 'uint32' ), 1, 1, 6 ),
+            ( [ 'b' ], numpy.arange( 10, 16, dtype = 'uint32' ), 0, 0, 6 ),
+            ]
+        self.lods = [
+            [ numpy.array( [ 20, 21, 22 ], dtype = 'uint32' ) ],
+            [],
+            ]
+
+    def tearDown( self ):
+        pass
+
+    def test_buffer_layout( self ):
+        indices, ranges = draw.buffer_layout( self.meshes, self.lods )
+
+        self.assertEqual(
+            indices.tolist(),
+            [ 0, 1, 2, 3, 4, 5, 6, 7, 10, 11, 12, 13, 14, 15, 20, 21, 22 ],
+            "Incorrect indices"
+            )
+        self.assertEqual(
+            ranges,
+            [
+                ( (0, 1), (1, 1), [ (2, 6), (14, 3) ] ),
+                ( (1, 0), (2, 0), [ (8, 6) ] ),
+                ],
+            "Incorrect ranges"
+            )
+
+    def test_merge_ranges( self ):
+        self.assertEqual(
+            draw.merge_ranges( [ (8, 6), (2, 6), (20, 0), (30, 2) ] ),
+            [ (2, 12), (30, 2) ],
+            "Incorrect merged ranges"
+            )
+
+    def test_draw_table( self ):
+        indices, ranges = draw.buffer_layout( self.meshes, self.lods )
+
+        # the faces of both meshes are adjacent
+        self.assertEqual(
+            draw.draw_table( ranges, 0 ),
+            [
+                ('points', [ (0, 1) ]),
+                ('lines', [ (1, 1) ]),
+                ('faces', [ (2, 12) ]),
+                ],
+            "Incorrect draw table"
+            )
+
+        # the second mesh has no lower level of detail
+        self.assertEqual(
+            draw.draw_table( ranges[ 1: ], 1 ),
+            [ ('faces', [ (8, 6) ]) ],
+            "Incorrect lod draw table"
+            )
+        self.assertEqual(
+            draw.draw_table( ranges, 1 ),
+            [
+                ('points', [ (0, 1) ]),
+                ('lines', [ (1, 1) ]),
+                ('faces', [ (8, 9) ]),
+                ],
+            "Incorrect lod draw table"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
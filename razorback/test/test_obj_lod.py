@@ -0,0 +1,82 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import numpy
+
+import razorback.benchmarks.gl_stub
+from razorback import mesh_cache
+from razorback.obj import Data
+
+
+def grid( size ):
+    vertices = [
+        [ float( x ), float( y ), 0.0 ]
+        for y in range( size + 1 )
+        for x in range( size + 1 )
+        ]
+    indices = []
+    for y in range( size ):
+        for x in range( size ):
+            a = y * (size + 1) + x
+            b = a + size + 1
+            indices.extend( [ a, b, a + 1, a + 1, b, b + 1 ] )
+    return numpy.array( vertices, dtype = 'float32' ), numpy.array( indices, dtype = 'uint32' )
+
+
+class test_obj_lod( unittest.TestCase ):
+
+    def setUp( self ):
+        self.directory = tempfile.mkdtemp()
+        self.original_directory = mesh_cache.directory
+        mesh_cache.directory = os.path.join( self.directory, 'cache' )
+
+        self.filename = os.path.join( self.directory, 'grid.obj' )
+        with open( self.filename, 'wb' ) as f:
+            f.write( 'grid' )
+
+        self.ratios = [ 1.0, 0.5, 0.25 ]
+
+    def tearDown( self ):
+        mesh_cache.directory = self.original_directory
+        shutil.rmtree( self.directory )
+
+    def test_layouts( self ):
+        # the same grid with its vertices numbered
+        # as streamed and as parsed
+        vertices, indices = grid( 8 )
+        streamed = (vertices, [ ([ 'grid' ], indices, 0, 0, len( indices )) ])
+        order = numpy.arange( len( vertices ) )[ ::-1 ]
+        remap = numpy.empty_like( order )
+        remap[ order ] = numpy.arange( len( order ) )
+        parsed = (
+            vertices[ order ],
+            [ ([ 'grid' ], remap[ indices ].astype( 'uint32' ), 0, 0, len( indices )) ]
+            )
+
+        # the levels of the parsed vertices from an empty cache
+        filename = os.path.join( self.directory, 'parsed.obj' )
+        shutil.copy( self.filename, filename )
+        expected = Data._lod_chains( filename, parsed[ 0 ], parsed[ 1 ], self.ratios, 'obj' )
+
+        # a streamed load followed by a parsed load
+        Data._lod_chains( self.filename, streamed[ 0 ], streamed[ 1 ], self.ratios, 'streamed' )
+        chains = Data._lod_chains( self.filename, parsed[ 0 ], parsed[ 1 ], self.ratios, 'obj' )
+        self.assertEqual( len( chains[ 0 ] ), 2, "Incorrect number of levels" )
+        for level, expected_level in zip( chains[ 0 ], expected[ 0 ] ):
+            self.assertTrue(
+                numpy.array_equal( level, expected_level ),
+                "Levels of streamed vertices loaded"
+                )
+
+        # the parsed levels are now cached
+        self.assertEqual(
+            mesh_cache.load( self.filename, 'objlod' )[ 0 ][ 'vertices' ],
+            'obj',
+            "Parsed levels not cached"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
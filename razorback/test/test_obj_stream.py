@@ -0,0 +1,231 @@
+import unittest
+from collections import namedtuple
+from StringIO import StringIO
+
+import numpy
+
+from razorback.obj.stream import stream, stream_lines, VertexTable, parse_values, parse_corners
+from razorback.obj.unify import process_vertices
+
+
+obj_layout = namedtuple( 'OBJ', [ 'vertices', 'texture_coords', 'normals', 'meshes' ] )
+
+obj_data = """
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 1
+vn 0 0 1
+g quad
+f 1/1/1 2/2/1 3/1/1 4/2/1
+f 1/1/1 3/1/1 -1//-1
+g line
+l 1 2 3
+p -1
+"""
+
+# the same data as read by pymesh
+obj_model = obj_layout(
+    [ [ 0.0, 0.0, 0.0 ], [ 1.0, 0.0, 0.0 ], [ 1.0, 1.0, 0.0 ], [ 0.0, 1.0, 0.0 ] ],
+    [ [ 0.0, 0.0 ], [ 1.0, 1.0 ] ],
+    [ [ 0.0, 0.0, 1.0 ] ],
+    [
+        {
+            'groups': [ 'quad' ],
+            'points': [],
+            'lines': [],
+            'faces': [
+                [ (0, 0, 0), (1, 1, 0), (2, 0, 0), (3, 1, 0) ],
+                [ (0, 0, 0), (2, 0, 0), (3, None, 0) ],
+                ],
+            },
+        {
+            'groups': [ 'line' ],
+            'points': [ (3, None, None) ],
+            'lines': [ [ (0, None, None), (1, None, None), (2, None, None) ] ],
+            'faces': [],
+            },
+        ]
+    )
+
+
+class test_obj_stream( unittest.TestCase ):
+
+    def setUp( self ):
+        self.lines = obj_data.splitlines()
+
+    def tearDown( self ):
+        pass
+
+    def combine( self, chunks ):
+        """Joins the chunks into the values of process_vertices.
+        """
+        arrays = [
+            numpy.concatenate( [ chunk[ index ] for chunk in chunks ] )
+            for index in range( 3 )
+            ]
+
+        meshes = {}
+        for chunk in chunks:
+            for mesh, groups, points, lines, faces in chunk.meshes:
+                if mesh not in meshes:
+                    meshes[ mesh ] = (groups, [], [], [])
+                for indices, array in zip( meshes[ mesh ][ 1: ], [ points, lines, faces ] ):
+                    indices.append( array )
+
+        result = []
+        for mesh in sorted( meshes.keys() ):
+            groups, points, lines, faces = meshes[ mesh ]
+            points, lines, faces = [ numpy.concatenate( indices ) for indices in [ points, lines, faces ] ]
+            result.append(
+                (groups, numpy.concatenate( [ points, lines, faces ] ), len( points ), len( lines ), len( faces ))
+                )
+        return arrays + [ result ]
+
+    def test_vertex_table( self ):
+        table = VertexTable()
+
+        indices, added = table.unify( [ (0, 0, 0), (1, 0, 0), (0, 0, 0), (0, 1, -1) ] )
+        self.assertEqual( indices.tolist(), [ 0, 1, 0, 2 ], "Incorrect indices" )
+        self.assertEqual( added.tolist(), [ [ 0, 0, 0 ], [ 1, 0, 0 ], [ 0, 1, -1 ] ], "Incorrect vertices" )
+
+        # later calls reuse existing vertices
+        indices, added = table.unify( [ (0, 1, -1), (2, 0, 0), (0, 0, 0), (0, 2, 0) ] )
+        self.assertEqual( indices.tolist(), [ 2, 3, 0, 4 ], "Incorrect indices" )
+        self.assertEqual( added.tolist(), [ [ 2, 0, 0 ], [ 0, 2, 0 ] ], "Incorrect vertices" )
+        self.assertEqual( table.count, 5, "Incorrect vertex count" )
+
+        # calls that add no vertices
+        indices, added = table.unify( [ (2, 0, 0), (0, 0, 0) ] )
+        self.assertEqual( indices.tolist(), [ 3, 0 ], "Incorrect indices" )
+        self.assertEqual( added.shape, (0, 3), "Incorrect vertices" )
+        self.assertEqual( table.count, 5, "Incorrect vertex count" )
+
+    def test_single_chunk( self ):
+        chunks = list( stream( StringIO( obj_data ) ) )
+        self.assertEqual( len( chunks ), 1, "Incorrect number of chunks" )
+
+        vertices, tcs, normals, meshes = self.combine( chunks )
+        expected = process_vertices( obj_model )
+
+        self.assertEqual( vertices.tolist(), expected[ 0 ].tolist(), "Incorrect vertices" )
+        self.assertEqual( tcs.tolist(), expected[ 1 ].tolist(), "Incorrect texture coordinates" )
+        self.assertEqual( normals.tolist(), expected[ 2 ].tolist(), "Incorrect normals" )
+        for mesh, expected_mesh in zip( meshes, expected[ 3 ] ):
+            self.assertEqual( mesh[ 0 ], expected_mesh[ 0 ], "Incorrect groups" )
+            self.assertEqual( mesh[ 1 ].tolist(), expected_mesh[ 1 ].tolist(), "Incorrect indices" )
+            self.assertEqual( mesh[ 2: ], expected_mesh[ 2: ], "Incorrect counts" )
+
+    def test_chunks( self ):
+        chunks = list( stream( StringIO( obj_data ), chunk_size = 4, block_size = 16 ) )
+        self.assertTrue( len( chunks ) > 1, "Data not chunked" )
+
+        vertices, tcs, normals, meshes = self.combine( chunks )
+        expected = process_vertices( obj_model )
+
+        # vertices may be numbered differently
+        # but the same data must be rendered
+        self.assertEqual( len( vertices ), len( expected[ 0 ] ), "Incorrect vertex count" )
+        for mesh, expected_mesh in zip( meshes, expected[ 3 ] ):
+            self.assertEqual( mesh[ 2: ], expected_mesh[ 2: ], "Incorrect counts" )
+            for array, expected_array in zip( [ vertices, tcs, normals ], expected[ :3 ] ):
+                self.assertEqual(
+                    array[ mesh[ 1 ] ].tolist(),
+                    expected_array[ expected_mesh[ 1 ] ].tolist(),
+                    "Incorrect vertex data"
+                    )
+
+    def test_repeated_faces( self ):
+        data = 'v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\nf 1 2 3\nf 3 1 2\n'
+        chunks = list( stream( StringIO( data ), chunk_size = 1, block_size = 8 ) )
+        self.assertTrue( len( chunks ) > 1, "Data not chunked" )
+
+        vertices, tcs, normals, meshes = self.combine( chunks )
+        self.assertEqual( len( vertices ), 3, "Incorrect vertex count" )
+        self.assertEqual( meshes[ 0 ][ 1 ].tolist(), [ 0, 1, 2, 0, 1, 2, 2, 0, 1 ], "Incorrect indices" )
+
+    def test_chunk_size( self ):
+        # a grid of quads is parsed in a single block
+        size = 40
+        lines = [
+            'v %i %i 0' % (x, y)
+            for y in range( size + 1 )
+            for x in range( size + 1 )
+            ]
+        for y in range( size ):
+            for x in range( size ):
+                a = y * (size + 1) + x + 1
+                lines.append( 'f %i %i %i %i' % (a, a + 1, a + size + 2, a + size + 1) )
+
+        for chunks in [
+            list( stream( StringIO( '\n'.join( lines ) ), chunk_size = 256 ) ),
+            list( stream_lines( lines, chunk_size = 256 ) ),
+            ]:
+            self.assertTrue( len( chunks ) > 1, "Data not chunked" )
+            # each quad's 4 corners are 2 triangles
+            corners = [
+                sum( len( mesh[ 4 ] ) for mesh in chunk.meshes ) * 2 // 3
+                for chunk in chunks
+                ]
+            self.assertTrue( max( corners ) <= 256, "Chunk larger than the chunk size" )
+            self.assertTrue( max( len( chunk[ 0 ] ) for chunk in chunks ) <= 256, "Chunk larger than the chunk size" )
+            self.assertEqual( sum( corners ), size * size * 4, "Incorrect number of corners" )
+
+            vertices, tcs, normals, meshes = self.combine( chunks )
+            self.assertEqual( len( vertices ), (size + 1) ** 2, "Incorrect vertex count" )
+
+    def test_parse_values( self ):
+        values = parse_values( [ 'v 1 2 3', 'v -4.5 5e1 6' ], 'v', 3 )
+        self.assertEqual( values.tolist(), [ [ 1, 2, 3 ], [ -4.5, 50, 6 ] ], "Incorrect values" )
+
+        # lines with extra values aren't parsed
+        self.assertEqual( parse_values( [ 'vt 0 1', 'vt 0 1 0' ], 'vt', 2 ), None, "Irregular values parsed" )
+
+    def test_parse_corners( self ):
+        formats = [
+            ([ 'f 1 2 3', 'f 3 4 5 -1' ], [ [ 1, 0, 0 ], [ 2, 0, 0 ] ]),
+            ([ 'f 1/4 2/5 3/6' ], [ [ 1, 4, 0 ], [ 2, 5, 0 ] ]),
+            ([ 'f 1//4 2//5 3//6' ], [ [ 1, 0, 4 ], [ 2, 0, 5 ] ]),
+            ([ 'f 1/4/7 2/5/8 3/6/9' ], [ [ 1, 4, 7 ], [ 2, 5, 8 ] ]),
+            ]
+        for lines, expected in formats:
+            corners, lengths = parse_corners( lines, 'f' )
+            self.assertEqual( corners[ :2 ].tolist(), expected, "Incorrect corners for %s" % lines[ 0 ] )
+            self.assertEqual( lengths.sum(), len( corners ), "Incorrect lengths for %s" % lines[ 0 ] )
+
+        corners, lengths = parse_corners( [ 'f 1 2 3', 'f 3 4 5 -1' ], 'f' )
+        self.assertEqual( lengths.tolist(), [ 3, 4 ], "Incorrect lengths" )
+        self.assertEqual( corners[ -1 ].tolist(), [ -1, 0, 0 ], "Incorrect relative index" )
+
+        # mixed formats are parsed a line at a time
+        mixed = [
+            [ 'f 1/1 2/2 3/3', 'f 1 2 3' ],
+            [ 'f 1/1 2/2 3/3', 'f 1//1 2//2 3//3' ],
+            [ 'f 1/1 2/2 3/3', 'f 1 2/2/2 3/3' ],
+            [ 'f 1//1 2//2 3//3', 'f 1/1/1 2/2/2 3/3/3' ],
+            ]
+        for lines in mixed:
+            self.assertEqual( parse_corners( lines, 'f' ), None, "Mixed formats parsed %s" % lines )
+
+    def test_stream_lines( self ):
+        chunks = list( stream( StringIO( obj_data ) ) )
+        line_chunks = list( stream_lines( self.lines ) )
+
+        for chunk, line_chunk in zip( self.combine( chunks ), self.combine( line_chunks ) )[ :3 ]:
+            self.assertEqual( chunk.tolist(), line_chunk.tolist(), "Incorrect vertex data" )
+
+        # a file with mixed formats
+        lines = self.lines + [ 'f 1/1/1 2//1 3/2/1' ]
+        chunks = list( stream( StringIO( '\n'.join( lines ) ) ) )
+        line_chunks = list( stream_lines( lines ) )
+        self.assertEqual(
+            self.combine( chunks )[ 3 ][ -1 ][ 1 ].tolist(),
+            self.combine( line_chunks )[ 3 ][ -1 ][ 1 ].tolist(),
+            "Incorrect indices"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
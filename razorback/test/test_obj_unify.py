@@ -0,0 +1,108 @@
+import unittest
+from collections import namedtuple
+
+import numpy
+
+from razorback.obj.unify import process_vertices, process_vertices_loop, strip_to_lines, fan_to_triangles, corner_keys
+
+
+obj_layout = namedtuple( 'OBJ', [ 'vertices', 'texture_coords', 'normals', 'meshes' ] )
+
+
+class test_obj_unify( unittest.TestCase ):
+
+    def setUp( self ):
+        pass
+
+    def tearDown( self ):
+        pass
+
+    def create_obj( self, num_meshes, num_vertices, num_tcs, num_normals ):
+        random = numpy.random.RandomState( 0 )
+
+        def corner():
+            # include missing texture coordinates and normals
+            tc = int( random.randint( 0, num_tcs ) ) if random.rand() > 0.2 else None
+            normal = int( random.randint( 0, num_normals ) ) if random.rand() > 0.2 else None
+            return (int( random.randint( 0, num_vertices ) ), tc, normal)
+
+        def polygon( length ):
+            return [ corner() for index in range( length ) ]
+
+        meshes = [
+            {
+                'groups': [ 'group%i' % index ],
+                'points': polygon( random.randint( 0, 5 ) ),
+                'lines': [ polygon( random.randint( 2, 5 ) ) for line in range( random.randint( 0, 4 ) ) ],
+                'faces': [ polygon( random.randint( 3, 7 ) ) for face in range( random.randint( 0, 40 ) ) ],
+                }
+            for index in range( num_meshes )
+            ]
+        return obj_layout(
+            random.rand( num_vertices, 3 ).tolist(),
+            random.rand( num_tcs, 2 ).tolist(),
+            random.rand( num_normals, 3 ).tolist(),
+            meshes
+            )
+
+    def test_strip_to_lines( self ):
+        self.assertEqual(
+            strip_to_lines( numpy.array( [ 3, 2 ] ) ).tolist(),
+            [ 0, 1, 1, 2, 3, 4 ],
+            "Incorrect line segments"
+            )
+
+    def test_fan_to_triangles( self ):
+        self.assertEqual(
+            fan_to_triangles( numpy.array( [ 5, 3 ] ) ).tolist(),
+            [ 0, 1, 2, 0, 2, 3, 0, 3, 4, 5, 6, 7 ],
+            "Incorrect triangles"
+            )
+
+    def test_corner_keys( self ):
+        # index ranges whose product overflows int64
+        # fall back to structured keys
+        for scale in [ 1, 2 ** 30 ]:
+            corners = numpy.array( [
+                (0, -1, -1),
+                (3, 1, 2),
+                (0, -1, -1),
+                (1, 2, 3),
+                (3, 1, 2),
+                (1, 3, 2),
+                ], dtype = 'int64' ) * scale
+            keys = corner_keys( corners )
+            _, inverse = numpy.unique( keys, return_inverse = True )
+            self.assertEqual( inverse.ravel().tolist(), [ 0, 3, 0, 1, 3, 2 ], "Incorrect keys for scale %i" % scale )
+
+        self.assertEqual( len( corner_keys( numpy.zeros( (0, 3), dtype = 'int64' ) ) ), 0, "Incorrect empty keys" )
+
+    def test_matches_loop( self ):
+        model = self.create_obj( 5, 30, 10, 8 )
+
+        vertices, tcs, normals, meshes = process_vertices( model )
+        expected = process_vertices_loop( model )
+
+        self.assertEqual( vertices.tostring(), expected[ 0 ].tostring(), "Incorrect vertices" )
+        self.assertEqual( tcs.tostring(), expected[ 1 ].tostring(), "Incorrect texture coordinates" )
+        self.assertEqual( normals.tostring(), expected[ 2 ].tostring(), "Incorrect normals" )
+
+        self.assertEqual( len( meshes ), len( expected[ 3 ] ), "Incorrect number of meshes" )
+        for mesh, expected_mesh in zip( meshes, expected[ 3 ] ):
+            self.assertEqual( mesh[ 0 ], expected_mesh[ 0 ], "Incorrect groups" )
+            self.assertEqual( mesh[ 1 ].dtype, numpy.uint32, "Incorrect index type" )
+            self.assertEqual( mesh[ 1 ].tolist(), expected_mesh[ 1 ].tolist(), "Incorrect indices" )
+            self.assertEqual( mesh[ 2: ], expected_mesh[ 2: ], "Incorrect counts" )
+
+    def test_empty( self ):
+        model = obj_layout( [], [], [], [] )
+        vertices, tcs, normals, meshes = process_vertices( model )
+
+        self.assertEqual( vertices.shape, (0, 3), "Incorrect vertices" )
+        self.assertEqual( tcs.shape, (0, 2), "Incorrect texture coordinates" )
+        self.assertEqual( normals.shape, (0, 3), "Incorrect normals" )
+        self.assertEqual( meshes, [], "Incorrect meshes" )
+
+
+if __name__ == '__main__':
+    unittest.main()
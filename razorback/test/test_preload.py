@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from razorback import mesh_cache
+from razorback import preload
+from razorback import md2
+from razorback import obj
+
+
+def grid( size ):
+    lines = []
+    for y in range( size + 1 ):
+        for x in range( size + 1 ):
+            lines.append( 'v %i %i 0' % (x, y) )
+    lines.append( 'g grid' )
+    for y in range( size ):
+        for x in range( size ):
+            corner = y * (size + 1) + x + 1
+            lines.append( 'f %i %i %i %i' % (corner, corner + 1, corner + size + 2, corner + size + 1) )
+    return '\n'.join( lines ) + '\n'
+
+
+class test_preload( unittest.TestCase ):
+
+    def setUp( self ):
+        self.enabled = mesh_cache.enabled
+        mesh_cache.enabled = False
+
+        self.directory = tempfile.mkdtemp()
+        self.filenames = []
+        for size in [ 2, 5, 3 ]:
+            filename = os.path.join( self.directory, 'grid%i.obj' % size )
+            with open( filename, 'w' ) as file:
+                file.write( grid( size ) )
+            self.filenames.append( filename )
+
+        self.options = { '.obj': { 'chunk_size': 16 } }
+
+    def tearDown( self ):
+        mesh_cache.enabled = self.enabled
+        shutil.rmtree( self.directory )
+
+    def test_data_type( self ):
+        self.assertTrue( preload.data_type( 'ogre.MD2' ) is md2.Data, "Incorrect type" )
+        self.assertTrue( preload.data_type( 'level/castle.obj' ) is obj.Data, "Incorrect type" )
+        self.assertRaises( ValueError, preload.data_type, 'ogre.md5mesh' )
+
+    def test_cache_key( self ):
+        # the level of detail ratios are part of the key
+        for data_type in [ md2.Data, obj.Data ]:
+            keys = [
+                data_type.cache_key( 'model' ),
+                data_type.cache_key( 'model', lod_ratios = [ 1.0, 0.5 ] ),
+                data_type.cache_key( 'model', lod_ratios = (1.0, 0.25) ),
+                ]
+            self.assertEqual( len( set( keys ) ), 3, "Options not part of the key" )
+            self.assertEqual(
+                data_type.cache_key( 'model', lod_ratios = [ 1.0, 0.5 ] ),
+                data_type.cache_key( 'model', lod_ratios = (1.0, 0.5) ),
+                "Equal options have different keys"
+                )
+
+    def test_md2_cache_key( self ):
+        # the frame options are part of the key
+        keys = [
+            md2.Data.cache_key( 'model.md2' ),
+            md2.Data.cache_key( 'model.md2', frame_format = 'compact' ),
+            md2.Data.cache_key( 'model.md2', frame_storage = 'memory' ),
+            md2.Data.cache_key( 'model.md2', frame_storage = 'memory', frame_format = 'compact' ),
+            ]
+        self.assertEqual( len( set( keys ) ), 4, "Frame options not part of the key" )
+
+    def test_prepare( self ):
+        serial = preload.prepare( self.filenames, processes = 1, options = self.options )
+        pooled = preload.prepare( self.filenames, processes = 2, options = self.options )
+
+        for size, data, pooled_data in zip( [ 2, 5, 3 ], serial, pooled ):
+            self.assertFalse( pooled_data.is_ready, "Data was finalised" )
+            self.assertEqual( pooled_data.vbo, None, "Vertices were uploaded" )
+            self.assertEqual( pooled_data.meshes, { 'grid': [ 0 ] }, "Incorrect groups" )
+            self.assertEqual( len( pooled_data._upload[ 0 ] ), (size + 1) ** 2, "Incorrect vertices" )
+            self.assertEqual( pooled_data.mesh_ranges, data.mesh_ranges, "Incorrect ranges" )
+            for array, pooled_array in zip( data._upload, pooled_data._upload ):
+                self.assertTrue( numpy.array_equal( array, pooled_array ), "Pooled arrays differ" )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+# must be imported before pyglet.gl
+from razorback.benchmarks.gl_stub import RecordingGL
+
+import numpy
+from pyglet.gl import *
+
+import razorback.upload
+from razorback.upload import buffer_data, buffer_sub_data, allocate_buffer, GrowableBuffer
+
+
+class test_upload( unittest.TestCase ):
+
+    def setUp( self ):
+        self.gl = RecordingGL( razorback.upload )
+        self.gl.install()
+
+    def tearDown( self ):
+        self.gl.uninstall()
+
+    def test_buffer_data( self ):
+        array = numpy.arange( 12, dtype = 'float32' ).reshape( 4, 3 )
+        buffer_data( GL_ARRAY_BUFFER, array, GL_DYNAMIC_DRAW )
+
+        self.assertEqual( self.gl.count( 'glBufferData' ), 1, "Incorrect call count" )
+
+        name, args, data = self.gl.calls[ 0 ]
+        self.assertEqual( args[ 0 ], GL_ARRAY_BUFFER, "Incorrect target" )
+        self.assertEqual( args[ 1 ], array.nbytes, "Incorrect size" )
+        self.assertEqual( args[ 3 ], GL_DYNAMIC_DRAW, "Incorrect usage" )
+        self.assertEqual( data, array.tostring(), "Incorrect data" )
+
+    def test_buffer_sub_data( self ):
+        array = numpy.arange( 4, dtype = 'uint32' )
+        buffer_sub_data( GL_ELEMENT_ARRAY_BUFFER, 16, array )
+
+        name, args, data = self.gl.calls[ 0 ]
+        self.assertEqual( name, 'glBufferSubData', "Incorrect function" )
+        self.assertEqual( args[ 1 ], 16, "Incorrect offset" )
+        self.assertEqual( args[ 2 ], array.nbytes, "Incorrect size" )
+        self.assertEqual( data, array.tostring(), "Incorrect data" )
+
+    def test_allocate_buffer( self ):
+        allocate_buffer( GL_TEXTURE_BUFFER, 64, GL_STREAM_DRAW )
+
+        name, args, data = self.gl.calls[ 0 ]
+        self.assertEqual( name, 'glBufferData', "Incorrect function" )
+        self.assertEqual( args[ 1 ], 64, "Incorrect size" )
+        self.assertEqual( args[ 2 ], None, "Storage should be uninitialised" )
+        self.assertEqual( args[ 3 ], GL_STREAM_DRAW, "Incorrect usage" )
+
+    def test_invalid_arrays( self ):
+        array = numpy.zeros( (4, 3), dtype = 'float32' )
+
+        # not contiguous
+        self.assertRaises(
+            ValueError,
+            buffer_data, GL_ARRAY_BUFFER, array[ :, :2 ]
+            )
+        # incorrect type
+        self.assertRaises(
+            ValueError,
+            buffer_data, GL_ARRAY_BUFFER, array, dtype = 'uint32'
+            )
+        # no OpenGL type
+        self.assertRaises(
+            ValueError,
+            buffer_data, GL_ARRAY_BUFFER, array.astype( 'float64' )
+            )
+        self.assertEqual( self.gl.count(), 0, "Invalid data uploaded" )
+
+    def test_growable_buffer( self ):
+        buffer = GrowableBuffer( GL_ARRAY_BUFFER, 32 )
+        first = buffer.buffer.value
+
+        array = numpy.arange( 6, dtype = 'float32' )
+        self.assertEqual( buffer.append( array ), 0, "Incorrect offset" )
+        self.assertEqual( buffer.append( array ), 24, "Incorrect offset" )
+
+        # the second array didn't fit
+        self.assertEqual( self.gl.count( 'glCopyBufferSubData' ), 1, "Buffer not grown" )
+        self.assertEqual( self.gl.count( 'glDeleteBuffers' ), 1, "Old buffer not deleted" )
+        self.assertNotEqual( buffer.buffer.value, first, "Buffer not replaced" )
+        self.assertEqual( buffer.capacity, 64, "Incorrect capacity" )
+        self.assertEqual( buffer.nbytes, 48, "Incorrect size" )
+
+        copy = [ call for call in self.gl.calls if call[ 0 ] == 'glCopyBufferSubData' ][ 0 ]
+        self.assertEqual( copy[ 1 ][ 4 ], 24, "Incorrect bytes copied" )
+        self.assertEqual( self.gl.data( 'glBufferSubData' ), [ array.tostring() ] * 2, "Incorrect data" )
+
+
+if __name__ == '__main__':
+    unittest.main()
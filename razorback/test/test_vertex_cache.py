@@ -0,0 +1,124 @@
+import unittest
+
+import numpy
+
+from razorback import vertex_cache
+from razorback import mesh_cache
+
+
+def grid( size ):
+    indices = []
+    for y in range( size ):
+        for x in range( size ):
+            a = y * (size + 1) + x
+            b = a + size + 1
+            indices.extend( [ a, b, a + 1, a + 1, b, b + 1 ] )
+    return numpy.array( indices, dtype = 'uint32' ), (size + 1) ** 2
+
+
+class test_vertex_cache( unittest.TestCase ):
+
+    def setUp( self ):
+        indices, self.num_vertices = grid( 24 )
+
+        # shuffle the triangles so there is little re-use
+        random = numpy.random.RandomState( 0 )
+        triangles = indices.reshape( -1, 3 )
+        self.indices = triangles[ random.permutation( len( triangles ) ) ].ravel()
+
+    def tearDown( self ):
+        pass
+
+    def test_acmr( self ):
+        # a single triangle transforms 3 vertices
+        self.assertEqual( vertex_cache.acmr( [ 0, 1, 2 ] ), 3.0, "Incorrect ACMR" )
+        # a quad re-uses 2 vertices
+        self.assertEqual( vertex_cache.acmr( [ 0, 1, 2, 2, 1, 3 ] ), 2.0, "Incorrect ACMR" )
+        # a cache of 3 vertices misses the re-used vertex
+        self.assertEqual( vertex_cache.acmr( [ 0, 1, 2, 3, 4, 5, 0, 4, 5 ], size = 3 ), 7 / 3.0, "Incorrect ACMR" )
+        self.assertEqual( vertex_cache.acmr( [] ), 0.0, "Incorrect ACMR" )
+
+    def test_optimise_indices( self ):
+        result = vertex_cache.optimise_indices( self.indices, self.num_vertices )
+
+        self.assertEqual( result.dtype, self.indices.dtype, "Incorrect index type" )
+        self.assertEqual( result.shape, self.indices.shape, "Incorrect index shape" )
+
+        # the same triangles with the same winding
+        def triangles( indices ):
+            return sorted( tuple( triangle ) for triangle in indices.reshape( -1, 3 ).tolist() )
+        def rotate( triangle ):
+            # rotate the smallest index to the front to compare winding
+            index = triangle.index( min( triangle ) )
+            return tuple( triangle[ index: ] + triangle[ :index ] )
+        self.assertEqual(
+            sorted( rotate( list( triangle ) ) for triangle in triangles( result ) ),
+            sorted( rotate( list( triangle ) ) for triangle in triangles( self.indices ) ),
+            "Triangles changed"
+            )
+
+        before = vertex_cache.acmr( self.indices )
+        after = vertex_cache.acmr( result )
+        self.assertLess( after, before, "ACMR not improved" )
+        self.assertLess( after, 1.0, "ACMR too high for a grid" )
+
+    def test_vertex_fetch_order( self ):
+        # vertex 0 is unused
+        indices = numpy.array( [ 3, 1, 2, 2, 1, 4 ], dtype = 'uint16' )
+        order, remapped = vertex_cache.vertex_fetch_order( indices, 5 )
+
+        self.assertEqual( list( order ), [ 3, 1, 2, 4, 0 ], "Incorrect vertex order" )
+        self.assertEqual( list( remapped ), [ 0, 1, 2, 2, 1, 3 ], "Incorrect indices" )
+        self.assertEqual( remapped.dtype, indices.dtype, "Incorrect index type" )
+        self.assertTrue( numpy.array_equal( order[ remapped ], indices ), "Indices don't match" )
+
+    def test_optimise( self ):
+        vertices = numpy.arange( self.num_vertices * 3, dtype = 'float32' ).reshape( -1, 3 )
+        indices, order, report = vertex_cache.optimise( self.indices, self.num_vertices )
+
+        # the reordered vertices give the same triangles
+        self.assertTrue(
+            numpy.array_equal(
+                numpy.sort( vertices[ order ][ indices ].reshape( -1, 9 ), axis = 0 ),
+                numpy.sort( vertices[ vertex_cache.optimise_indices( self.indices ) ].reshape( -1, 9 ), axis = 0 )
+                ),
+            "Vertices don't match"
+            )
+
+        # vertices are used in order
+        first = numpy.unique( indices, return_index = True )[ 1 ]
+        self.assertTrue( numpy.all( numpy.diff( first ) > 0 ), "Vertices not in first use order" )
+
+        self.assertEqual( report.triangles, len( self.indices ) // 3, "Incorrect triangle count" )
+        self.assertLess( report.acmr_after, report.acmr_before, "ACMR not improved" )
+
+    def test_enabled( self ):
+        # only meshes saved to the mesh cache are reordered
+        enabled = mesh_cache.enabled
+        limit = vertex_cache.max_triangles
+        try:
+            mesh_cache.enabled = True
+            self.assertTrue( vertex_cache.enabled( 'model.md2' ), "Cached mesh not reordered" )
+            self.assertFalse( vertex_cache.enabled(), "Uncached mesh reordered" )
+
+            # large meshes take too long to reorder
+            self.assertTrue( vertex_cache.enabled( 'model.md2', limit ), "Mesh at the limit not reordered" )
+            self.assertFalse( vertex_cache.enabled( 'model.md2', limit + 1 ), "Large mesh reordered" )
+            vertex_cache.max_triangles = None
+            self.assertTrue( vertex_cache.enabled( 'model.md2', limit + 1 ), "Large mesh not reordered" )
+            vertex_cache.max_triangles = limit
+
+            mesh_cache.enabled = False
+            self.assertFalse( vertex_cache.enabled( 'model.md2' ), "Uncached mesh reordered" )
+
+            vertex_cache.reorder_uncached = True
+            self.assertTrue( vertex_cache.enabled(), "Uncached mesh not reordered" )
+            self.assertFalse( vertex_cache.enabled( None, limit + 1 ), "Large mesh reordered" )
+        finally:
+            mesh_cache.enabled = enabled
+            vertex_cache.reorder_uncached = False
+            vertex_cache.max_triangles = limit
+
+
+if __name__ == '__main__':
+    unittest.main()
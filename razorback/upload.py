@@ -0,0 +1,130 @@
+"""
+Uploads NumPy arrays to OpenGL buffer objects.
+
+The array's memory is passed directly to OpenGL.
+This avoids converting each value to a Python object
+and copying the data into a ctypes array first.
+"""
+
+import numpy
+from pyglet.gl import *
+
+
+# numpy types that map directly to an OpenGL type
+gl_types = {
+    numpy.dtype( 'float32' ): GL_FLOAT,
+    numpy.dtype( 'uint32' ): GL_UNSIGNED_INT,
+    numpy.dtype( 'int32' ): GL_INT,
+    numpy.dtype( 'uint16' ): GL_UNSIGNED_SHORT,
+    numpy.dtype( 'int16' ): GL_SHORT,
+    numpy.dtype( 'uint8' ): GL_UNSIGNED_BYTE,
+    numpy.dtype( 'int8' ): GL_BYTE,
+    }
+
+
+def check_array( array, dtype = None ):
+    """Ensures an array can be passed to OpenGL as is.
+
+    @param array: the numpy array to check.
+    @param dtype: the type the array must be.
+    If None, any type with an OpenGL equivalent is accepted.
+    @raise ValueError: if the array is the wrong type or
+    is not C contiguous.
+    """
+    if dtype != None and array.dtype != numpy.dtype( dtype ):
+        raise ValueError(
+            "Array must be of type %s, not %s" % (numpy.dtype( dtype ), array.dtype)
+            )
+    if array.dtype not in gl_types:
+        raise ValueError( "Array type %s has no OpenGL equivalent" % array.dtype )
+    if not array.flags.c_contiguous:
+        raise ValueError( "Array must be C contiguous" )
+
+def buffer_data( target, array, usage = GL_STATIC_DRAW, dtype = None ):
+    """Replaces the data store of the buffer bound to
+    target with the contents of array.
+    """
+    check_array( array, dtype )
+    glBufferData( target, array.nbytes, array.ctypes.data, usage )
+
+def allocate_buffer( target, nbytes, usage = GL_STATIC_DRAW ):
+    """Replaces the data store of the buffer bound to
+    target with uninitialised storage of nbytes.
+
+    Calling this with the buffer's current size orphans
+    the old storage, so the driver doesn't wait for draw
+    calls still using it before the buffer is written to.
+    """
+    glBufferData( target, nbytes, None, usage )
+
+def buffer_sub_data( target, offset, array, dtype = None ):
+    """Writes the contents of array into the buffer bound
+    to target, beginning at offset bytes.
+    """
+    check_array( array, dtype )
+    glBufferSubData( target, offset, array.nbytes, array.ctypes.data )
+
+
+class GrowableBuffer( object ):
+    """A buffer object that arrays are appended to.
+
+    When the buffer runs out of space a buffer of twice
+    the size is created and the existing data is copied
+    into it by OpenGL with glCopyBufferSubData, so the data
+    never needs to be kept in system memory.
+
+    Because the buffer object changes as it grows, vertex
+    attributes should be pointed at the buffer once every
+    array has been appended.
+    """
+
+    def __init__( self, target, capacity = 1024 * 1024, usage = GL_STATIC_DRAW ):
+        super( GrowableBuffer, self ).__init__()
+
+        self.target = target
+        self.usage = usage
+        self.capacity = capacity
+        self.nbytes = 0
+
+        self.buffer = (GLuint)()
+        glGenBuffers( 1, self.buffer )
+        glBindBuffer( self.target, self.buffer )
+        allocate_buffer( self.target, self.capacity, self.usage )
+        glBindBuffer( self.target, 0 )
+
+    def append( self, array, dtype = None ):
+        """Writes the contents of array after the data
+        already in the buffer.
+
+        @return: the offset in bytes the array was written to.
+        """
+        check_array( array, dtype )
+
+        offset = self.nbytes
+        if offset + array.nbytes > self.capacity:
+            self._grow( offset + array.nbytes )
+
+        glBindBuffer( self.target, self.buffer )
+        glBufferSubData( self.target, offset, array.nbytes, array.ctypes.data )
+        glBindBuffer( self.target, 0 )
+
+        self.nbytes += array.nbytes
+        return offset
+
+    def _grow( self, nbytes ):
+        capacity = max( nbytes, self.capacity * 2 )
+
+        buffer = (GLuint)()
+        glGenBuffers( 1, buffer )
+        glBindBuffer( GL_COPY_WRITE_BUFFER, buffer )
+        allocate_buffer( GL_COPY_WRITE_BUFFER, capacity, self.usage )
+
+        if self.nbytes > 0:
+            glBindBuffer( GL_COPY_READ_BUFFER, self.buffer )
+            glCopyBufferSubData( GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, self.nbytes )
+            glBindBuffer( GL_COPY_READ_BUFFER, 0 )
+        glBindBuffer( GL_COPY_WRITE_BUFFER, 0 )
+
+        glDeleteBuffers( 1, self.buffer )
+        self.buffer = buffer
+        self.capacity = capacity
@@ -0,0 +1,253 @@
+"""
+Reorders triangle meshes for the GPU's vertex caches.
+
+Triangles are reordered with Tom Forsyth's linear speed
+vertex cache optimisation so that vertices are re-used while
+they are still in the post-transform cache.
+Vertices are then reordered into the order they are first
+used, so vertex fetches read memory sequentially.
+
+The average cache miss ratio (ACMR) is the number of vertices
+transformed per triangle. It is 3.0 for a mesh with no re-use
+and approaches 0.5 for large regular meshes.
+
+The optimisation runs in Python and takes tens of microseconds
+per triangle, so the loaders only reorder meshes that are saved
+to the mesh cache and have at most max_triangles triangles,
+see enabled.
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from razorback import mesh_cache
+
+
+# the number of entries in the simulated vertex cache
+cache_size = 32
+
+# the scoring values from Forsyth's paper
+cache_decay_power = 1.5
+last_triangle_score = 0.75
+valence_boost_scale = 2.0
+valence_boost_power = 0.5
+
+# set to True to also reorder meshes that aren't saved
+# to the mesh cache, such as streamed OBJs
+reorder_uncached = False
+
+# meshes with more triangles than this aren't reordered
+# by the loaders, at around 60us per triangle this limits
+# the optimisation to about 3 seconds of a cold load
+# set to None to reorder meshes of any size
+max_triangles = 50000
+
+
+cache_report = namedtuple(
+    'cache_report',
+    [
+        'triangles',
+        'vertices',
+        'acmr_before',
+        'acmr_after',
+        ]
+    )
+
+
+def enabled( filename = None, num_triangles = 0 ):
+    """Returns True if a loaded mesh should be reordered.
+
+    @param filename: the source file the reordered mesh is
+    cached for, or None if the mesh isn't cached.
+    @param num_triangles: the number of triangles reordered.
+    Meshes with more than max_triangles aren't reordered.
+    """
+    if max_triangles != None and num_triangles > max_triangles:
+        return False
+    return reorder_uncached or mesh_cache.is_enabled( filename )
+
+def acmr( indices, size = cache_size ):
+    """Returns the average cache miss ratio of the indices
+    for a FIFO cache of the specified size.
+    """
+    indices = numpy.asarray( indices ).ravel()
+    num_triangles = len( indices ) // 3
+    if num_triangles == 0:
+        return 0.0
+
+    cache = set()
+    fifo = []
+    misses = 0
+    for index in indices.tolist():
+        if index in cache:
+            continue
+        misses += 1
+        cache.add( index )
+        fifo.append( index )
+        if len( fifo ) > size:
+            cache.discard( fifo.pop( 0 ) )
+    return misses / float( num_triangles )
+
+def format_report( name, report ):
+    """Returns a single line description of a cache report.
+    """
+    return '%s: %i triangles, %i vertices, ACMR %.3f -> %.3f' % (
+        name,
+        report.triangles,
+        report.vertices,
+        report.acmr_before,
+        report.acmr_after
+        )
+
+def _vertex_score( position, remaining, size ):
+    if remaining == 0:
+        # the vertex isn't used by any more triangles
+        return -1.0
+
+    score = 0.0
+    if position >= 0:
+        if position < 3:
+            # the vertices of the last triangle get a
+            # fixed score so the next triangle doesn't
+            # strongly favour re-using them
+            score = last_triangle_score
+        else:
+            scale = 1.0 / (size - 3)
+            score = (1.0 - (position - 3) * scale) ** cache_decay_power
+
+    # favour vertices with few triangles left so they
+    # can be removed from the cache
+    score += valence_boost_scale * remaining ** -valence_boost_power
+    return score
+
+def optimise_indices( indices, num_vertices = None, size = cache_size ):
+    """Reorders triangles to improve vertex cache re-use.
+
+    The vertices of each triangle keep their winding.
+
+    @param indices: the triangle indices.
+    @param num_vertices: the number of vertices. If None, the
+    largest index is used.
+    @return: the reordered indices, of the same type and
+    shape as indices.
+    """
+    indices = numpy.asarray( indices )
+    triangles = indices.reshape( -1, 3 )
+    num_triangles = len( triangles )
+    if num_triangles == 0:
+        return indices.copy()
+
+    if num_vertices == None:
+        num_vertices = int( triangles.max() ) + 1
+
+    # the triangles using each vertex
+    flat = triangles.ravel().astype( 'int64' )
+    order = numpy.argsort( flat, kind = 'mergesort' )
+    counts = numpy.bincount( flat, minlength = num_vertices )
+    starts = numpy.concatenate( [ [ 0 ], numpy.cumsum( counts ) ] ).tolist()
+    vertex_triangles = (order // 3).tolist()
+
+    tris = triangles.tolist()
+    remaining = counts.tolist()
+    positions = [ -1 ] * num_vertices
+    scores = [ _vertex_score( -1, count, size ) for count in remaining ]
+    triangle_scores = [ scores[ a ] + scores[ b ] + scores[ c ] for a, b, c in tris ]
+    added = [ False ] * num_triangles
+
+    cache = []
+    output = []
+    cursor = 0
+    best = max( range( num_triangles ), key = triangle_scores.__getitem__ )
+
+    while True:
+        if best < 0:
+            # no triangle uses a cached vertex
+            # continue with the next triangle in order
+            while cursor < num_triangles and added[ cursor ]:
+                cursor += 1
+            if cursor == num_triangles:
+                break
+            best = cursor
+
+        triangle = tris[ best ]
+        added[ best ] = True
+        output.append( best )
+
+        # remove the triangle from its vertices
+        for vertex in triangle:
+            remaining[ vertex ] -= 1
+            start = starts[ vertex ]
+            end = start + remaining[ vertex ]
+            entries = vertex_triangles[ start : end + 1 ]
+            entries.remove( best )
+            vertex_triangles[ start : end ] = entries
+
+        # move the triangle's vertices to the front
+        # of the cache
+        cache = triangle + [ vertex for vertex in cache if vertex not in triangle ]
+
+        # update the score of every cached vertex and
+        # the triangles that use them
+        for position, vertex in enumerate( cache ):
+            positions[ vertex ] = position if position < size else -1
+        for vertex in cache:
+            score = _vertex_score( positions[ vertex ], remaining[ vertex ], size )
+            delta = score - scores[ vertex ]
+            scores[ vertex ] = score
+            start = starts[ vertex ]
+            for face in vertex_triangles[ start : start + remaining[ vertex ] ]:
+                triangle_scores[ face ] += delta
+        cache = cache[ :size ]
+
+        # find the next best triangle from those
+        # that use a cached vertex
+        best = -1
+        best_score = -1.0
+        for vertex in cache:
+            start = starts[ vertex ]
+            for face in vertex_triangles[ start : start + remaining[ vertex ] ]:
+                if triangle_scores[ face ] > best_score:
+                    best = face
+                    best_score = triangle_scores[ face ]
+
+    return triangles[ output ].astype( indices.dtype ).reshape( indices.shape )
+
+def vertex_fetch_order( indices, num_vertices ):
+    """Returns the order of vertices by their first use
+    in the indices.
+
+    Vertices that aren't used are placed at the end.
+
+    @return: a tuple of the new order of the vertices, such that
+    new_vertices = vertices[ order ], and the indices into
+    the reordered vertices.
+    """
+    indices = numpy.asarray( indices )
+    flat = indices.ravel()
+
+    used, first = numpy.unique( flat, return_index = True )
+    used = used[ numpy.argsort( first ) ]
+
+    unused = numpy.ones( num_vertices, dtype = 'bool' )
+    unused[ used ] = False
+    order = numpy.concatenate( [ used, numpy.nonzero( unused )[ 0 ] ] ).astype( 'int64' )
+
+    remap = numpy.empty( num_vertices, dtype = 'int64' )
+    remap[ order ] = numpy.arange( num_vertices )
+    return order, remap[ flat ].astype( indices.dtype ).reshape( indices.shape )
+
+def optimise( indices, num_vertices, size = cache_size ):
+    """Reorders triangles for the vertex cache and then
+    vertices for fetching.
+
+    @return: a tuple of the new indices, the order of the
+    vertices (see vertex_fetch_order) and a cache_report.
+    """
+    before = acmr( indices, size )
+    indices = optimise_indices( indices, num_vertices, size )
+    after = acmr( indices, size )
+    order, indices = vertex_fetch_order( indices, num_vertices )
+
+    report = cache_report( len( indices.ravel() ) // 3, num_vertices, before, after )
+    return indices, order, report